@@ -1,210 +1,137 @@
 # backend_app.py
 
-from flask import Flask, request, jsonify, send_file
+from flask import Blueprint, Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import json
+import logging
 import os
+import tarfile
 from datetime import datetime, timedelta  # 用于处理时间
 
-app = Flask(__name__)
-CORS(app)
-
-
-# --- Helper function to format for namelist (especially for arrays for single domain) ---
-def get_single_param_val(data_dict, param_key, default_val=None):
-    """Safely get the first element if it's an array, or the value itself."""
-    val_arr = data_dict.get(param_key)
-    if isinstance(val_arr, list):
-        return val_arr[0] if val_arr else default_val
-    return val_arr if val_arr is not None else default_val
-
-
-def format_namelist_value(value):
-    if isinstance(value, bool):
-        return f".{str(value).lower()}."
-    if isinstance(value, str) and not value.startswith("'"):  #
-        return f"'{value}'"  # Add quotes for strings if not already present
-    return value
-
-
-# --- Namelist Generation Functions (Single Domain Focus) ---
+import io
+
+from artifact_store import create_artifact_store, is_valid_artifact_ref
+from config_store import (
+    ConfigNotFound,
+    ConfigStoreError,
+    VersionConflict,
+    create_config_store,
+    document_cache,
+    merge_patch,
+)
+from namelist_cache import canonical_config_hash, namelist_cache
+from validation_rules import compile_validator
+from static_responses import PrecomputedResponse, serve_precomputed
+from namelist_parser import (
+    ImportLimitError,
+    bulk_import,
+    check_archive_size,
+    check_import_limits,
+    iter_tar_pairs,
+    pair_namelist_files,
+)
+from metrics import (
+    configure_logging,
+    flush_shared_metrics,
+    install_request_metrics,
+    log_event,
+    log_sampled,
+    registry,
+    stage_timer,
+)
+from ensemble import ARCHIVE_FORMATS, SweepError, expand_sweep, get_executor, shutdown_executor, stream_archive
+from decomposition import TuningError, apply_tuning, tune_decomposition
+from segmentation import SegmentError, plan_segments
+from lifecycle import install_lifecycle, lifecycle
+from job_queue import (
+    ANONYMOUS_USER,
+    DEFAULT_PRIORITY,
+    JOB_STATUSES,
+    MAX_POLL_WAIT,
+    JobError,
+    JobLimitError,
+    JobNotFound,
+    StreamSlots,
+    create_job_queue,
+)
+from upload_store import UploadError, create_upload_store
+from netcdf_reader import NetCDFFormatError, describe, open_dataset
+from wind_analysis import (
+    DEFAULT_SECTORS,
+    AnalysisError,
+    analyse_wind_resource,
+    analysis_id_for,
+    grid_coordinates,
+    save_results,
+    summarize,
+)
+from weibull import WEIBULL_METHODS, fit_weibull_grid
+from domain_geometry import GEOMETRY_FORMATS, GeometryError, geometry_cache, render_geometry
+from site_extraction import INTERPOLATION_METHODS, extract_site_series, site_index_cache, to_npz_bytes
+from tile_pyramid import DEFAULT_TILE_SIZE, TileError, build_pyramid, load_manifest, read_tile, tile_cache
+from namelist_render import (
+    format_namelist_value,
+    get_single_param_val,
+    render_input_namelist,
+    render_wps_namelist,
+)
+
+api = Blueprint("api", __name__)
+
+# 持久化存储(SQLite 数据库、上传与作业目录)由 create_app() 创建，每个进程一次；只导入本模块不会触碰数据目录
+artifact_store = None
+upload_store = None
+config_store = None
+job_queue = None
+# 每条SSE连接占住一个请求线程直到作业结束：限制每个worker同时打开的流，超出时503并提示改用 ?after= 轮询
+event_streams = StreamSlots(int(os.environ.get("WOLFER_JOB_MAX_STREAMS", 4)))
+EVENT_STREAM_RETRY_SECONDS = 5
+
+registry.add_gauge_collector(lambda: [
+    (f"wolfer_namelist_cache_{key}", f"Namelist cache {key}", value)
+    for key, value in namelist_cache.stats().items()
+    if key in ("entries", "hits", "misses", "evictions", "expirations")
+])
+registry.add_gauge_collector(lambda: [
+    (f"wolfer_tile_cache_{key}", f"Wind map tile cache {key}", value)
+    for key, value in tile_cache.stats().items()
+    if key in ("entries", "hits", "misses", "evictions")
+])
+registry.add_gauge_collector(lambda: [
+    (f"wolfer_site_index_cache_{key}", f"Site spatial index cache {key}", value)
+    for key, value in site_index_cache.stats().items()
+    if key in ("entries", "hits", "misses")
+])
+registry.add_gauge_collector(lambda: [
+    (f"wolfer_config_document_cache_{key}", f"Stored config document cache {key}", value)
+    for key, value in document_cache.stats().items()
+    if key in ("entries", "hits", "misses")
+])
+registry.add_gauge_collector(lambda: [
+    (f"wolfer_geometry_cache_{key}", f"Domain geometry cache {key}", value)
+    for key, value in geometry_cache.stats().items()
+    if key in ("entries", "hits", "misses", "evictions")
+])
+
+
+# --- Namelist Generation Functions ---
+# 各节的字段定义见 namelist_render.py，启动时编译为渲染函数；max_dom > 1 时逐域输出列
 def generate_wps_namelist_content(data):
-    """Generates namelist.wps content for a single domain."""
-    share = data.get("time_control", {})  # WPS share uses time_control for start/end
-    geogrid = data.get("domain_setup", {})
-    # Defaults for ungrib and metgrid for simplicity
-    ungrib_out_format = 'WPS'
-    ungrib_prefix = 'FILE'
-    metgrid_fg_name = 'FILE'
-    metgrid_io_form = 2
-
-    # &share section
-    # WRF WPS namelist typically expects dates as strings directly
-    start_date_wps = get_single_param_val(share, "start_date_str_arr", "YYYY-MM-DD_HH:MM:SS")
-    end_date_wps = get_single_param_val(share, "end_date_str_arr", "YYYY-MM-DD_HH:MM:SS")
-
-    content = "&share\n"
-    content += f" wrf_core = 'ARW',\n"  # Typically ARW
-    content += f" max_dom = {geogrid.get('max_dom', 1)},\n"
-    content += f" start_date = {format_namelist_value(start_date_wps)},\n"
-    content += f" end_date = {format_namelist_value(end_date_wps)},\n"
-    content += f" interval_seconds = {share.get('interval_seconds_wps', 21600)},\n"
-    content += f" io_form_geogrid = 2,\n"  # Common default
-    content += "/\n\n"
-
-    # &geogrid section
-    content += "&geogrid\n"
-    content += f" parent_id = {get_single_param_val(geogrid, 'parent_id_arr', 1)},\n"  # WPS usually starts parent_id at 1 for the first domain
-    content += f" parent_grid_ratio = {get_single_param_val(geogrid, 'parent_grid_ratio_arr', 1)},\n"
-    content += f" i_parent_start = {get_single_param_val(geogrid, 'i_parent_start_arr', 1)},\n"
-    content += f" j_parent_start = {get_single_param_val(geogrid, 'j_parent_start_arr', 1)},\n"
-    content += f" e_we = {get_single_param_val(geogrid, 'e_we_arr', 100)},\n"
-    content += f" e_sn = {get_single_param_val(geogrid, 'e_sn_arr', 100)},\n"
-    content += f" dx = {get_single_param_val(geogrid, 'dx_arr', 10000.0)},\n"  # Assuming already in meters
-    content += f" dy = {get_single_param_val(geogrid, 'dy_arr', 10000.0)},\n"  # Assuming already in meters
-    content += f" map_proj = {format_namelist_value(geogrid.get('map_proj', 'lambert'))},\n"
-    content += f" ref_lat = {geogrid.get('ref_lat', 0.0)},\n"
-    content += f" ref_lon = {geogrid.get('ref_lon', 0.0)},\n"
-    content += f" truelat1 = {geogrid.get('truelat1', 0.0)},\n"
-    content += f" truelat2 = {geogrid.get('truelat2', 0.0)},\n"
-    content += f" stand_lon = {geogrid.get('stand_lon', 0.0)},\n"
-    content += f" geog_data_path = {format_namelist_value(geogrid.get('geog_data_path', '/path/to/geog'))},\n"
-    # geog_data_res is a bit more complex, often a list. For simplicity, taking the first or default.
-    # geog_data_res_val = get_single_param_val(geogrid, 'geog_data_res_arr', 'default')
-    # content += f" geog_data_res = {format_namelist_value(geog_data_res_val)},\n"
-    content += "/\n\n"
-
-    # &ungrib section
-    content += "&ungrib\n"
-    content += f" out_format = {format_namelist_value(ungrib_out_format)},\n"
-    content += f" prefix = {format_namelist_value(ungrib_prefix)},\n"
-    content += "/\n\n"
-
-    # &metgrid section
-    content += "&metgrid\n"
-    content += f" fg_name = {format_namelist_value(metgrid_fg_name)},\n"
-    content += f" io_form_metgrid = {metgrid_io_form},\n"
-    content += "/\n"
-
-    return content
+    """Generates namelist.wps content for all domains up to max_dom."""
+    return render_wps_namelist(data)
 
 
 def generate_input_namelist_content(data):
-    """Generates namelist.input content for a single domain."""
-    tc = data.get("time_control", {})
-    dom = data.get("domain_setup", {})
-    phy = data.get("physics", {})
-    dyn = data.get("dynamics", {})
-    bdy = data.get("bdy_control", {})
-    quilt = data.get("namelist_quilt", {})
-
-    # Time parsing
-    start_datetime_str = get_single_param_val(tc, "start_date_str_arr", "2000-01-01_00:00:00")
-    end_datetime_str = get_single_param_val(tc, "end_date_str_arr", "2000-01-01_03:00:00")
+    """Generates namelist.input content for all domains up to max_dom."""
+    return render_input_namelist(data)
 
-    try:
-        sdt = datetime.strptime(start_datetime_str, "%Y-%m-%d_%H:%M:%S")
-        edt = datetime.strptime(end_datetime_str, "%Y-%m-%d_%H:%M:%S")
-    except ValueError:  # Fallback if parsing fails
-        sdt = datetime(2000, 1, 1, 0, 0, 0)
-        edt = datetime(2000, 1, 1, 3, 0, 0)
-
-    run_seconds_total = (edt - sdt).total_seconds()
-    run_days = int(run_seconds_total // 86400)
-    run_hours = int((run_seconds_total % 86400) // 3600)
-    # For namelist.input, often individual start/end components are listed
-    start_year = sdt.year
-    start_month = sdt.month
-    start_day = sdt.day
-    start_hour = sdt.hour
-    # ... and so on for minute, second, end_year etc.
-
-    content = "&time_control\n"
-    content += f" run_days = {run_days},\n"
-    content += f" run_hours = {run_hours},\n"
-    content += f" run_minutes = 0,\n"  # Assuming minutes/seconds from duration are handled by run_hours
-    content += f" run_seconds = 0,\n"
-    content += f" start_year = {start_year},\n"
-    content += f" start_month = {start_month:02d},\n"  # Pad month/day if needed by namelist format
-    content += f" start_day = {start_day:02d},\n"
-    content += f" start_hour = {start_hour:02d},\n"
-    # ... similarly for end_year, end_month etc.
-    content += f" end_year = {edt.year},\n"
-    content += f" end_month = {edt.month:02d},\n"
-    content += f" end_day = {edt.day:02d},\n"
-    content += f" end_hour = {edt.hour:02d},\n"
-    content += f" interval_seconds = {tc.get('interval_seconds_input', 10800)},\n"
-    content += f" input_from_file = {format_namelist_value(get_single_param_val(tc, 'input_from_file_arr', True))},\n"
-    history_interval_val = get_single_param_val(tc, "history_interval_arr", 3)
-    history_interval_unit = get_single_param_val(tc, "history_interval_unit_arr", "h")
-    if history_interval_unit == 'h':
-        content += f" history_interval = {history_interval_val * 60}, ! Converted from hours to minutes\n"  # WRF often takes minutes for history_interval
-        # Or use history_interval_h, history_interval_m, history_interval_d directly if available
-    else:  # assuming minutes or days
-        content += f" history_interval = {history_interval_val}, ! Unit: {history_interval_unit}\n"
-
-    content += f" frames_per_outfile = {get_single_param_val(tc, 'frames_per_outfile_arr', 1)},\n"
-    content += f" restart = {format_namelist_value(tc.get('restart_enabled', False))},\n"
-    content += f" restart_interval = {tc.get('restart_interval_h', 6) * 60}, ! Converted to minutes\n"  # Often in minutes
-    content += f" io_form_history = {tc.get('io_form_history', 2)},\n"
-    # ... add other tc parameters ...
-    content += f" nocolons = {format_namelist_value(tc.get('nocolons', True))},\n"
-    content += "/\n\n"
-
-    content += "&domains\n"
-    content += f" time_step = {dom.get('time_step', 60)},\n"
-    content += f" max_dom = {dom.get('max_dom', 1)},\n"
-    content += f" e_we = {get_single_param_val(dom, 'e_we_arr', 100)},\n"
-    content += f" e_sn = {get_single_param_val(dom, 'e_sn_arr', 100)},\n"
-    content += f" e_vert = {get_single_param_val(dom, 'e_vert_arr', 35)},\n"
-    content += f" dx = {get_single_param_val(dom, 'dx_arr', 10000.0)},\n"
-    content += f" dy = {get_single_param_val(dom, 'dy_arr', 10000.0)},\n"
-    content += f" grid_id = {get_single_param_val(dom, 'parent_id_arr', 1)}, ! Assuming grid_id matches parent_id for WPS for domain 1\n"  # Actually, grid_id is 1 for d01
-    content += f" parent_id = {get_single_param_val(dom, 'parent_id_arr', 0)}, ! For namelist.input, d01 parent_id is 0\n"
-    content += f" i_parent_start = {get_single_param_val(dom, 'i_parent_start_arr', 0)},\n"  # For d01, these are 0 or 1 depending on convention
-    content += f" j_parent_start = {get_single_param_val(dom, 'j_parent_start_arr', 0)},\n"
-    content += f" parent_grid_ratio = {get_single_param_val(dom, 'parent_grid_ratio_arr', 1)},\n"
-    content += f" parent_time_step_ratio = {get_single_param_val(dom, 'parent_time_step_ratio_arr', 1)},\n"
-    content += f" feedback = {get_single_param_val(dom, 'feedback_arr', 1)},\n"
-    # ... add other dom parameters ...
-    content += "/\n\n"
-
-    content += "&physics\n"
-    content += f" mp_physics = {get_single_param_val(phy, 'mp_physics_arr', 8)},\n"
-    content += f" ra_lw_physics = {get_single_param_val(phy, 'ra_lw_physics_arr', 1)},\n"
-    content += f" ra_sw_physics = {get_single_param_val(phy, 'ra_sw_physics_arr', 1)},\n"
-    content += f" radt = {get_single_param_val(phy, 'radt_arr', 30)},\n"
-    content += f" sf_sfclay_physics = {get_single_param_val(phy, 'sf_sfclay_physics_arr', 1)},\n"
-    content += f" sf_surface_physics = {get_single_param_val(phy, 'sf_surface_physics_arr', 2)},\n"
-    content += f" bl_pbl_physics = {get_single_param_val(phy, 'bl_pbl_physics_arr', 1)},\n"
-    content += f" bldt = {get_single_param_val(phy, 'bldt_arr', 0)},\n"
-    content += f" cu_physics = {get_single_param_val(phy, 'cu_physics_arr', 1)},\n"
-    content += f" cudt = {get_single_param_val(phy, 'cudt_arr', 5)},\n"
-    # ... add other phy parameters ...
-    content += "/\n\n"
-
-    content += "&dynamics\n"
-    content += f" diff_opt = {get_single_param_val(dyn, 'diff_opt_arr', 1)},\n"
-    content += f" km_opt = {get_single_param_val(dyn, 'km_opt_arr', 4)},\n"
-    content += f" non_hydrostatic = {format_namelist_value(get_single_param_val(dyn, 'non_hydrostatic_arr', True))},\n"
-    content += f" w_damping = {get_single_param_val(dyn, 'w_damping_arr', 0)},\n"  # Assuming damp_opt might make this active
-    # ... add other dyn parameters ...
-    content += "/\n\n"
-
-    content += "&bdy_control\n"
-    content += f" spec_bdy_width = {get_single_param_val(bdy, 'spec_bdy_width_arr', 5)},\n"
-    content += f" spec_zone = {get_single_param_val(bdy, 'spec_zone_arr', 1)},\n"
-    content += f" relax_zone = {get_single_param_val(bdy, 'relax_zone_arr', 4)},\n"
-    content += f" specified = {format_namelist_value(get_single_param_val(bdy, 'specified_arr', True))},\n"
-    content += f" nested = {format_namelist_value(get_single_param_val(bdy, 'nested_arr', False))},\n"
-    content += "/\n\n"
-
-    content += "&namelist_quilt\n"
-    content += f" nio_tasks_per_group = {quilt.get('nio_tasks_per_group', 0)},\n"
-    content += f" nio_groups = {quilt.get('nio_groups', 1)},\n"
-    content += "/\n"
-
-    return content
+
+def render_namelist_files(data):
+    """Renders both namelist files for one config; used by single and batch generation."""
+    return {
+        "namelist.wps": generate_wps_namelist_content(data),
+        "namelist.input": generate_input_namelist_content(data),
+    }
 
 
 # 默认的物理参数选项
@@ -263,34 +190,127 @@ DATA_SOURCES = [
     {"id": "FNL", "name": "NCEP FNL", "description": "NCEP最终分析数据"}
 ]
 
-@app.route('/api/generate-namelist', methods=['POST'])
+# 默认配置
+DEFAULT_CONFIG = {
+    "time_control": {
+        "start_date_str_arr": ["2001-10-25_00:00:00"],
+        "end_date_str_arr": ["2001-10-26_00:00:00"],
+        "interval_seconds_wps": 21600,
+        "interval_seconds_input": 10800,
+    },
+    "domain_setup": {
+        "max_dom": 1,
+        "e_we_arr": [100],
+        "e_sn_arr": [100],
+        "dx_arr": [30000],
+        "dy_arr": [30000],
+        "map_proj": "lambert",
+        "ref_lat": 40.0,
+        "ref_lon": 116.0,
+        "truelat1": 30.0,
+        "truelat2": 60.0,
+        "stand_lon": 116.0,
+    },
+    "physics": {
+        "mp_physics_arr": [8],
+        "ra_lw_physics_arr": [1],
+        "ra_sw_physics_arr": [1],
+        "sf_sfclay_physics_arr": [1],
+        "sf_surface_physics_arr": [2],
+        "bl_pbl_physics_arr": [1],
+        "cu_physics_arr": [1],
+    },
+    "dynamics": {
+        "diff_opt_arr": [1],
+        "km_opt_arr": [4],
+        "non_hydrostatic_arr": [True],
+    }
+}
+
+# 校验规则与物理方案查找表在启动时编译一次
+config_validator = compile_validator(PHYSICS_OPTIONS)
+
+# 常量接口的响应体在启动时序列化并压缩一次
+STATIC_RESPONSES = {
+    "options": PrecomputedResponse({
+        "physics": PHYSICS_OPTIONS,
+        "projections": PROJECTIONS,
+        "dataSources": DATA_SOURCES
+    }),
+    "physics_options": PrecomputedResponse(PHYSICS_OPTIONS),
+    "projections": PrecomputedResponse(PROJECTIONS),
+    "data_sources": PrecomputedResponse(DATA_SOURCES),
+    "configuration": PrecomputedResponse(DEFAULT_CONFIG),
+}
+
+@api.route('/api/generate-namelist', methods=['POST'])
 def generate_namelist_endpoint():
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
-    data = request.get_json()
-    print("Received data for namelist generation:")
-    print(json.dumps(data, indent=2))
-
-    # Generate content (focus on single domain for now)
-    namelist_wps_str = generate_wps_namelist_content(data)
-    namelist_input_str = generate_input_namelist_content(data)
+    with stage_timer("parse"):
+        data = request.get_json()
+
+    # 按ID/版本引用已保存的配置：文档与哈希取自存储，跳过上传和解析
+    stored = None
+    if isinstance(data, dict) and data.get("config_id") is not None:
+        try:
+            with stage_timer("config_lookup"):
+                stored = config_store.get(data["config_id"], data.get("version"))
+        except ConfigStoreError as e:
+            return _config_store_error(e)
+    config = data
+    if stored is not None:
+        config = stored["document"]
+        if data.get("tuning") is not None:
+            config = dict(config, tuning=data["tuning"])
+
+    # 相同配置的哈希即ETag：客户端带If-None-Match重复提交时直接返回304
+    with stage_timer("cache_lookup"):
+        if stored is not None and config is stored["document"]:
+            config_hash = stored["config_hash"]
+        else:
+            config_hash = canonical_config_hash(config)
+        etag = f'"{config_hash}"'
+        if config_hash in request.if_none_match:
+            return Response(status=304, headers={'ETag': etag})
+        files = namelist_cache.get(config_hash)
+
+    log_sampled(logging.DEBUG, "namelist generation request", config_hash=config_hash,
+                config=lambda: config)
+
+    # 可选调优：按核数选出 MPI 分解与 quilting，写入 &domains / &namelist_quilt
+    tuning = None
+    render_data = config
+    if isinstance(config, dict) and config.get("tuning") is not None:
+        try:
+            with stage_timer("tuning"):
+                tuning = tune_decomposition(config, config["tuning"])
+        except TuningError as e:
+            return jsonify({"error": str(e)}), 400
+        render_data = apply_tuning(config, tuning)
+
+    if files is None:
+        with stage_timer("render_wps"):
+            namelist_wps_str = generate_wps_namelist_content(render_data)
+        with stage_timer("render_input"):
+            namelist_input_str = generate_input_namelist_content(render_data)
+        files = {"namelist.wps": namelist_wps_str, "namelist.input": namelist_input_str}
+        namelist_cache.put(config_hash, files)
+    namelist_wps_str = files['namelist.wps']
+    namelist_input_str = files['namelist.input']
 
     # 存储生成的文件内容，供下载使用
-    if not hasattr(app, 'recent_generated_files'):
-        app.recent_generated_files = {}
-    app.recent_generated_files['namelist.wps'] = namelist_wps_str
-    app.recent_generated_files['namelist.input'] = namelist_input_str
+    with stage_timer("store"):
+        artifact_id = artifact_store.put(files)
 
-    print("\n--- Generated namelist.wps ---")
-    print(namelist_wps_str)
-    print("\n--- Generated namelist.input ---")
-    print(namelist_input_str)
+    log_sampled(logging.DEBUG, "namelists generated", config_hash=config_hash, artifact_id=artifact_id,
+                namelist_wps=namelist_wps_str, namelist_input=namelist_input_str)
 
     # 创建下载链接
     base_url = request.host_url.rstrip('/')  # 获取请求的主机URL
     download_links = {
-        "namelist_wps": f"{base_url}/api/download/namelist.wps",
-        "namelist_input": f"{base_url}/api/download/namelist.input"
+        "namelist_wps": f"{base_url}/api/download/{artifact_id}/namelist.wps",
+        "namelist_input": f"{base_url}/api/download/{artifact_id}/namelist.input"
     }
     
     # 创建日志消息
@@ -303,181 +323,674 @@ def generate_namelist_endpoint():
     ]
 
     # 返回符合前端期望的格式
-    return jsonify({
-        "success": True,
-        "message": "Namelist content generated successfully.",
-        "output_dir": data.get("output_dir", "默认输出目录"),
-        "messages": messages,
-        "download_links": download_links,
-        "file_contents": {
-            "namelist_wps": namelist_wps_str,
-            "namelist_input": namelist_input_str
-        }
-    }), 200
+    with stage_timer("serialize"):
+        response = jsonify({
+            "success": True,
+            "message": "Namelist content generated successfully.",
+            "output_dir": data.get("output_dir", "默认输出目录"),
+            "artifact_id": artifact_id,
+            "messages": messages,
+            "download_links": download_links,
+            "file_contents": {
+                "namelist_wps": namelist_wps_str,
+                "namelist_input": namelist_input_str
+            },
+            **({"tuning": tuning} if tuning is not None else {}),
+            **({"config_id": stored["config_id"], "version": stored["version"]} if stored is not None else {}),
+        })
+    response.headers['ETag'] = etag
+    return response, 200
+
+
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """获取namelist缓存统计"""
+    return jsonify(namelist_cache.stats()), 200
+
+@api.route('/api/generate-namelist/batch', methods=['POST'])
+def generate_namelist_batch_endpoint():
+    """批量(集合)生成namelist，以zip/tar流式返回"""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    data = request.get_json()
+    archive_format = data.get("format", "zip")
+    if archive_format not in ARCHIVE_FORMATS:
+        return jsonify({"error": f"Unsupported archive format: {archive_format}"}), 400
+    # 在开始流式输出之前完成展开，这样扫描参数错误仍能以JSON返回
+    try:
+        members = expand_sweep(data.get("base_config", {}), data.get("sweep", {}))
+    except SweepError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if archive_format == "zip":
+        mimetype, filename = "application/zip", "namelist_ensemble.zip"
+    else:
+        mimetype, filename = "application/gzip", "namelist_ensemble.tar.gz"
+
+    return Response(
+        stream_archive(members, render_namelist_files, archive_format),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            'X-Ensemble-Members': str(len(members)),
+        },
+    )
+
+@api.route('/api/generate-namelist/segments', methods=['POST'])
+def generate_namelist_segments_endpoint():
+    """长时段切分：每段一对namelist，manifest.json 给出段间依赖顺序，以zip/tar流式返回"""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be an object"}), 400
+    archive_format = data.get("format", "zip")
+    if archive_format not in ARCHIVE_FORMATS:
+        return jsonify({"error": f"Unsupported archive format: {archive_format}"}), 400
+    try:
+        members, summary = plan_segments(data.get("config", {}), data.get("segment", {}))
+    except SegmentError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if archive_format == "zip":
+        mimetype, filename = "application/zip", "namelist_segments.zip"
+    else:
+        mimetype, filename = "application/gzip", "namelist_segments.tar.gz"
+
+    return Response(
+        stream_archive(members, render_namelist_files, archive_format, manifest_extra={"segmentation": summary}),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            'X-Segments': str(len(members)),
+            # 起点/段长/预热被对齐到分析时刻时列出被调整的字段，详情见 manifest.json
+            'X-Segments-Adjusted': ",".join(summary["adjusted"]),
+        },
+    )
 
 # 新增API端点
-@app.route('/api/configuration', methods=['GET'])
+@api.route('/api/configuration', methods=['GET'])
 def get_configuration():
     """获取默认配置"""
-    default_config = {
-        "time_control": {
-            "start_date_str_arr": ["2001-10-25_00:00:00"],
-            "end_date_str_arr": ["2001-10-26_00:00:00"],
-            "interval_seconds_wps": 21600,
-            "interval_seconds_input": 10800,
-        },
-        "domain_setup": {
-            "max_dom": 1,
-            "e_we_arr": [100],
-            "e_sn_arr": [100],
-            "dx_arr": [30000],
-            "dy_arr": [30000],
-            "map_proj": "lambert",
-            "ref_lat": 40.0,
-            "ref_lon": 116.0,
-            "truelat1": 30.0,
-            "truelat2": 60.0,
-            "stand_lon": 116.0,
-        },
-        "physics": {
-            "mp_physics_arr": [8],
-            "ra_lw_physics_arr": [1],
-            "ra_sw_physics_arr": [1],
-            "sf_sfclay_physics_arr": [1],
-            "sf_surface_physics_arr": [2],
-            "bl_pbl_physics_arr": [1],
-            "cu_physics_arr": [1],
-        },
-        "dynamics": {
-            "diff_opt_arr": [1],
-            "km_opt_arr": [4],
-            "non_hydrostatic_arr": [True],
-        }
-    }
-    return jsonify(default_config), 200
+    return serve_precomputed(STATIC_RESPONSES["configuration"])
 
-@app.route('/api/configuration', methods=['POST'])
+@api.route('/api/configuration', methods=['POST'])
 def save_configuration():
-    """保存整个配置"""
+    """保存整个配置：不带 config_id 时新建，带 config_id 时作为 Merge Patch 生成新版本"""
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
     data = request.get_json()
-    # 这里可以添加配置保存逻辑，例如写入数据库或文件
-    # 现在仅返回成功消息
-    return jsonify({"message": "Configuration saved successfully"}), 200
-
-@app.route('/api/physics-options', methods=['GET'])
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be an object"}), 400
+    config_id = request.args.get("config_id")
+    try:
+        if config_id is None:
+            saved = config_store.create(data, project=request.args.get("project"),
+                                        name=request.args.get("name", ""))
+        else:
+            saved = config_store.patch(config_id, data, request.args.get("base_version"))
+    except ConfigStoreError as e:
+        return _config_store_error(e)
+    return jsonify({"message": "Configuration saved successfully", **saved}), 200
+
+@api.route('/api/physics-options', methods=['GET'])
 def get_physics_options():
     """获取物理参数选项"""
-    return jsonify(PHYSICS_OPTIONS), 200
+    return serve_precomputed(STATIC_RESPONSES["physics_options"])
 
-@app.route('/api/projections', methods=['GET'])
+@api.route('/api/projections', methods=['GET'])
 def get_projections():
     """获取投影选项"""
-    return jsonify(PROJECTIONS), 200
+    return serve_precomputed(STATIC_RESPONSES["projections"])
 
-@app.route('/api/data-sources', methods=['GET'])
+@api.route('/api/data-sources', methods=['GET'])
 def get_data_sources():
     """获取数据源选项"""
-    return jsonify(DATA_SOURCES), 200
+    return serve_precomputed(STATIC_RESPONSES["data_sources"])
 
-@app.route('/api/validate', methods=['POST'])
+@api.route('/api/validate', methods=['POST'])
 def validate_config():
-    """验证配置的有效性"""
+    """验证配置的有效性，一次返回全部错误与警告；请求体为数组时批量校验"""
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
     data = request.get_json()
-    # 这里可以添加配置验证逻辑
-    # 简单示例：验证必填字段
-    errors = []
-    
-    # 检查时间控制部分
-    if 'time_control' not in data:
-        errors.append("Missing time_control section")
-    elif 'start_date_str_arr' not in data['time_control'] or not data['time_control']['start_date_str_arr']:
-        errors.append("Missing start date")
-    elif 'end_date_str_arr' not in data['time_control'] or not data['time_control']['end_date_str_arr']:
-        errors.append("Missing end date")
-    
-    # 检查域设置部分
-    if 'domain_setup' not in data:
-        errors.append("Missing domain_setup section")
-    elif 'e_we_arr' not in data['domain_setup'] or not data['domain_setup']['e_we_arr']:
-        errors.append("Missing grid size (e_we)")
-    elif 'e_sn_arr' not in data['domain_setup'] or not data['domain_setup']['e_sn_arr']:
-        errors.append("Missing grid size (e_sn)")
-    
-    if errors:
-        return jsonify({"valid": False, "errors": errors}), 400
-    
-    return jsonify({"valid": True}), 200
 
-@app.route('/api/options', methods=['GET'])
+    if isinstance(data, list):
+        with stage_timer("validate"):
+            results = config_validator.validate_batch(data)
+        return jsonify({
+            "valid": all(r["valid"] for r in results),
+            "results": [dict(r, index=i) for i, r in enumerate(results)],
+        }), 200
+
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a configuration object or an array of them"}), 400
+    with stage_timer("validate"):
+        result = config_validator.validate(data)
+
+    if not result["valid"]:
+        return jsonify(result), 400
+    return jsonify({"valid": True, "warnings": result["warnings"]}), 200
+
+@api.route('/api/domain-geometry', methods=['POST'])
+def domain_geometry_preview():
+    """模拟域几何预览：各域经纬度边界与可选的抽稀网格，?format=geojson|binary，?mesh=每个方向的最多网格线数"""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    data = request.get_json()
+    domain_setup = data.get("domain_setup", data) if isinstance(data, dict) else data
+    fmt = request.args.get('format', 'geojson')
+    if fmt not in GEOMETRY_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(GEOMETRY_FORMATS)}"}), 400
+    try:
+        mesh_lines = int(request.args.get('mesh', 0))
+    except ValueError:
+        return jsonify({"error": "mesh must be an integer"}), 400
+
+    try:
+        with stage_timer("domain_geometry"):
+            etag, body, layout = render_geometry(domain_setup, fmt, mesh_lines)
+    except GeometryError as e:
+        return jsonify({"error": str(e)}), 400
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers=headers)
+    if fmt == "binary":
+        headers['X-Geometry-Layout'] = json.dumps(layout, separators=(",", ":"))
+        return Response(body, status=200, mimetype='application/octet-stream', headers=headers)
+    return Response(body, status=200, mimetype='application/geo+json', headers=headers)
+
+@api.route('/api/options', methods=['GET'])
 def get_all_options():
     """获取所有选项集合"""
-    options = {
-        "physics": PHYSICS_OPTIONS,
-        "projections": PROJECTIONS,
-        "dataSources": DATA_SOURCES
-    }
-    return jsonify(options), 200
+    return serve_precomputed(STATIC_RESPONSES["options"])
 
-@app.route('/api/download/<filename>', methods=['GET'])
-def download_file(filename):
+@api.route('/api/download/<artifact_id>/<filename>', methods=['GET'])
+def download_file(artifact_id, filename):
     """下载生成的文件"""
-    # 用于存储最近生成的文件内容的内存字典
-    # 实际应用中应该使用数据库或文件系统存储这些内容
-    global recent_generated_files
-    if not hasattr(app, 'recent_generated_files'):
-        app.recent_generated_files = {
-            'namelist.wps': "",
-            'namelist.input': ""
-        }
-    
-    if filename == 'namelist.wps':
-        # 返回最近生成的namelist.wps内容
-        content = app.recent_generated_files.get('namelist.wps', "&share\n wrf_core = 'ARW',\n max_dom = 1\n/")
-        return content, 200, {
-            'Content-Type': 'text/plain',
-            'Content-Disposition': f'attachment; filename={filename}'
-        }
-    elif filename == 'namelist.input':
-        # 返回最近生成的namelist.input内容
-        content = app.recent_generated_files.get('namelist.input', "&time_control\n run_days = 1\n/")
-        return content, 200, {
-            'Content-Type': 'text/plain',
-            'Content-Disposition': f'attachment; filename={filename}'
-        }
-    else:
+    if not is_valid_artifact_ref(artifact_id, filename):
         return jsonify({"error": "File not found"}), 404
+    located = artifact_store.locate(artifact_id, filename)
+    if located is None:
+        return jsonify({"error": "File not found or expired"}), 404
+
+    source, created_at = located
+    # 磁盘后端直接按路径发送(可走sendfile零拷贝)，内存后端用BytesIO；两者均支持Range与条件请求
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return send_file(
+        source,
+        mimetype='text/plain',
+        as_attachment=True,
+        download_name=filename,
+        etag=f"{artifact_id}-{filename}",
+        last_modified=created_at,
+        conditional=True,
+    )
+
+@api.route('/api/download/<filename>', methods=['GET'])
+def download_latest_file(filename):
+    """旧的下载地址：文件已按artifact ID保存，需使用生成接口返回的下载链接"""
+    return jsonify({
+        "error": "File not found",
+        "message": "Download links now include an artifact id; use download_links from /api/generate-namelist"
+    }), 404
+
+@api.route('/api/import/namelists', methods=['POST'])
+def import_namelists():
+    """批量导入已有的namelist.wps/namelist.input，返回对应的JSON配置"""
+    # 支持两种上传方式：tar/tar.gz包(archive字段或请求体)，或多个namelist文件(files字段)
+    try:
+        # 先按 Content-Length 拒绝超限的上传，再解析表单或读取请求体
+        check_archive_size(request.content_length)
+        archive = request.files.get('archive')
+        uploaded = request.files.getlist('files')
+        if archive is not None:
+            pairs = list(iter_tar_pairs(fileobj=archive.stream))
+        elif uploaded:
+            check_import_limits(len(uploaded), request.content_length or 0)
+            texts = {f.filename: f.read().decode('utf-8', errors='replace') for f in uploaded}
+            pairs = [(key, {kind: texts[name] for kind, name in files.items()})
+                     for key, files in sorted(pair_namelist_files(texts).items())]
+        elif request.content_length:
+            pairs = list(iter_tar_pairs(fileobj=io.BytesIO(request.get_data())))
+        else:
+            return jsonify({"error": "No namelist files or archive uploaded"}), 400
+    except tarfile.TarError as e:
+        return jsonify({"error": f"Invalid archive: {e}"}), 400
+    except ImportLimitError as e:
+        return jsonify({"error": str(e)}), 413
+
+    if not pairs:
+        return jsonify({"error": "No namelist.wps/namelist.input files found"}), 400
+    # 大批量用共享的渲染进程池，不为每个请求新建进程池
+    results, stats = bulk_import(pairs, executor=get_executor())
+    for result in results:
+        result.pop("bytes", None)
+        result.pop("parse_seconds", None)
+    return jsonify({"success": stats["failed"] == 0, "results": results, "stats": stats}), 200
+
+@api.route('/api/wrfout', methods=['POST'])
+def upload_wrfout():
+    """上传wrfout文件：请求体即文件内容，按块流式写入磁盘，文件名由 ?filename= 给出"""
+    filename = request.args.get('filename') or request.headers.get('X-Filename', '')
+    try:
+        with stage_timer("upload"):
+            info = upload_store.save_stream(request.stream, filename)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with open_dataset(upload_store.locate(info["upload_id"])) as dataset:
+            info["summary"] = describe(dataset)
+    except NetCDFFormatError as e:
+        upload_store.delete(info["upload_id"])
+        return jsonify({"error": f"Unreadable NetCDF file: {e}"}), 400
+    return jsonify(info), 201
+
+@api.route('/api/wrfout/<upload_id>', methods=['GET'])
+def get_wrfout(upload_id):
+    """已上传wrfout文件的维度、变量与时间范围"""
+    path = upload_store.locate(upload_id)
+    if path is None:
+        return jsonify({"error": "Upload not found"}), 404
+    with open_dataset(path) as dataset:
+        summary = describe(dataset)
+    return jsonify({"upload_id": upload_id, "filename": os.path.basename(path), "summary": summary}), 200
+
+@api.route('/api/wrfout/<upload_id>/analysis', methods=['POST'])
+def analyse_wrfout(upload_id):
+    """风资源分析：逐格点平均风速、风功率密度、风向频率；数组结果以NPZ下载，响应中为全域汇总"""
+    path = upload_store.locate(upload_id)
+    if path is None:
+        return jsonify({"error": "Upload not found"}), 404
+    params = request.get_json(silent=True) or {}
+    heights = params.get('heights', ["10m"])
+    sectors = params.get('sectors', DEFAULT_SECTORS)
+    if not isinstance(heights, list) or not heights:
+        return jsonify({"error": "heights must be a non-empty list"}), 400
+
+    analysis_id = analysis_id_for(upload_id, {"heights": heights, "sectors": sectors})
+    result_path = os.path.join(upload_store.analysis_dir(upload_id), f"{analysis_id}.npz")
+    summary_path = os.path.join(upload_store.analysis_dir(upload_id), f"{analysis_id}.json")
+    if os.path.exists(summary_path) and os.path.exists(result_path):
+        with open(summary_path, encoding='utf-8') as fh:
+            summary = json.load(fh)
+    else:
+        try:
+            with stage_timer("analyse"), open_dataset(path) as dataset:
+                results = analyse_wind_resource(dataset, heights=heights, sectors=sectors)
+                save_results(results, result_path, grid_coordinates(dataset))
+        except (AnalysisError, NetCDFFormatError) as e:
+            return jsonify({"error": str(e)}), 400
+        summary = summarize(results)
+        with open(summary_path, 'w', encoding='utf-8') as fh:
+            json.dump(summary, fh)
 
-@app.route('/api/time-config', methods=['POST'])
-def save_time_config():
-    """保存时间配置"""
+    return jsonify({
+        "upload_id": upload_id,
+        "analysis_id": analysis_id,
+        "summary": summary,
+        "download_link": f"/api/wrfout/{upload_id}/analysis/{analysis_id}.npz",
+    }), 200
+
+@api.route('/api/wrfout/<upload_id>/analysis/<analysis_id>.npz', methods=['GET'])
+def download_wrfout_analysis(upload_id, analysis_id):
+    """下载分析结果数组(NPZ：<高度>/mean_speed、power_density、direction_frequency 与 XLAT/XLONG)"""
+    if upload_store.locate(upload_id) is None or not analysis_id.isalnum():
+        return jsonify({"error": "Analysis not found"}), 404
+    path = os.path.join(upload_store.analysis_dir(upload_id), f"{analysis_id}.npz")
+    if not os.path.isfile(path):
+        return jsonify({"error": "Analysis not found"}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f"wind_resource_{analysis_id}.npz", conditional=True)
+
+@api.route('/api/wrfout/<upload_id>/weibull', methods=['POST'])
+def fit_wrfout_weibull(upload_id):
+    """逐格点Weibull拟合(k、c、平均风速)，结果切成瓦片金字塔落盘，地图缩放平移直接读瓦片"""
+    path = upload_store.locate(upload_id)
+    if path is None:
+        return jsonify({"error": "Upload not found"}), 404
+    params = request.get_json(silent=True) or {}
+    spec = {
+        "kind": "weibull",
+        "height": params.get('height', "10m"),
+        "method": params.get('method', "moments"),
+        "encoding": params.get('encoding', "float16"),
+        "tile_size": params.get('tile_size', DEFAULT_TILE_SIZE),
+    }
+    if spec["method"] not in WEIBULL_METHODS:
+        return jsonify({"error": f"method must be one of {', '.join(WEIBULL_METHODS)}"}), 400
+    if not isinstance(spec["tile_size"], int):
+        return jsonify({"error": "tile_size must be an integer"}), 400
+    try:
+        workers = min(max(int(params.get('workers', 1)), 1), os.cpu_count() or 1)
+    except (TypeError, ValueError):
+        return jsonify({"error": "workers must be an integer"}), 400
+
+    pyramid_id = analysis_id_for(upload_id, spec)
+    root = os.path.join(upload_store.analysis_dir(upload_id), "pyramids", pyramid_id)
+    manifest = load_manifest(root)
+    if manifest is None:
+        try:
+            with stage_timer("weibull_fit"):
+                results = fit_weibull_grid(path, heights=[spec["height"]], method=spec["method"], workers=workers)
+            label = next(key for key in results if key != "meta")
+            fields = results[label]
+            with stage_timer("tile_pyramid"):
+                manifest = build_pyramid(fields, root, tile_size=spec["tile_size"], encoding=spec["encoding"], extra={
+                    "height": label,
+                    "method": spec["method"],
+                    "meta": results["meta"],
+                })
+        except (AnalysisError, NetCDFFormatError, TileError) as e:
+            return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "upload_id": upload_id,
+        "pyramid_id": pyramid_id,
+        "manifest": manifest,
+        "tile_url": f"/api/wrfout/{upload_id}/tiles/{pyramid_id}/{{field}}/{{z}}/{{y}}/{{x}}",
+    }), 200
+
+@api.route('/api/wrfout/<upload_id>/tiles/<pyramid_id>/<field>/<int:z>/<int:y>/<int:x>', methods=['GET'])
+def get_wrfout_tile(upload_id, pyramid_id, field, z, y, x):
+    """读取一张瓦片：tile_size×tile_size 的原始 float16/uint8 数组(行优先)，编码见 manifest"""
+    if upload_store.locate(upload_id) is None or not pyramid_id.isalnum():
+        return jsonify({"error": "Pyramid not found"}), 404
+    root = os.path.join(upload_store.analysis_dir(upload_id), "pyramids", pyramid_id)
+    manifest = load_manifest(root)
+    if manifest is None:
+        return jsonify({"error": "Pyramid not found"}), 404
+
+    # 瓦片内容由金字塔参数唯一决定，可长期缓存
+    etag = f'"{pyramid_id}-{field}-{z}-{y}-{x}"'
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=31536000, immutable'}
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers=headers)
+    try:
+        data = read_tile(root, manifest, field, z, y, x)
+    except TileError as e:
+        return jsonify({"error": str(e)}), 404
+    size = manifest["tile_size"]
+    headers.update({'X-Tile-Dtype': manifest["encoding"], 'X-Tile-Shape': f"{size},{size}"})
+    return Response(data, status=200, mimetype='application/octet-stream', headers=headers)
+
+@api.route('/api/wrfout/<upload_id>/sites', methods=['POST'])
+def extract_wrfout_sites(upload_id):
+    """风机点位时间序列：按经纬度双线性插值10 m/轮毂高度风，返回列式NPZ(每个数组为 点位×时间)"""
+    path = upload_store.locate(upload_id)
+    if path is None:
+        return jsonify({"error": "Upload not found"}), 404
+    params = request.get_json(silent=True) or {}
+    sites = params.get('sites')
+    if not isinstance(sites, list) or not sites or not all(isinstance(site, dict) for site in sites):
+        return jsonify({"error": "sites must be a non-empty list of {id, lat, lon} objects"}), 400
+    method = params.get('method', "bilinear")
+    if method not in INTERPOLATION_METHODS:
+        return jsonify({"error": f"method must be one of {', '.join(INTERPOLATION_METHODS)}"}), 400
+    try:
+        lat = [float(site['lat']) for site in sites]
+        lon = [float(site['lon']) for site in sites]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Every site needs numeric lat and lon"}), 400
+    site_ids = [str(site.get('id', index)) for index, site in enumerate(sites)]
+
+    try:
+        with stage_timer("site_extraction"), open_dataset(path) as dataset:
+            arrays = extract_site_series(dataset, lat, lon, heights=params.get('heights', ["10m"]), method=method)
+    except (AnalysisError, NetCDFFormatError) as e:
+        return jsonify({"error": str(e)}), 400
+    arrays["site_id"] = site_ids
+    return Response(to_npz_bytes(arrays), status=200, mimetype='application/octet-stream', headers={
+        'Content-Disposition': f'attachment; filename="sites_{upload_id[:12]}.npz"',
+        'X-Sites': str(len(site_ids)),
+        'X-Time-Steps': str(len(arrays["times"])),
+    })
+
+def _config_store_error(e):
+    if isinstance(e, VersionConflict):
+        return jsonify({"error": str(e), "head_version": e.head_version}), 409
+    return jsonify({"error": str(e)}), 404 if isinstance(e, ConfigNotFound) else 400
+
+def _save_section(section, message):
+    """分节保存：请求体是该节的 Merge Patch；没有 config_id 时以默认配置为底新建"""
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
     data = request.get_json()
-    # 这里可以添加时间配置处理逻辑
-    return jsonify({"message": "Time configuration saved successfully"}), 200
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be an object"}), 400
+    config_id = request.args.get("config_id")
+    try:
+        if config_id is None:
+            saved = config_store.create(merge_patch(DEFAULT_CONFIG, {section: data}),
+                                        project=request.args.get("project"), name=request.args.get("name", ""))
+        else:
+            saved = config_store.patch(config_id, {section: data}, request.args.get("base_version"))
+    except ConfigStoreError as e:
+        return _config_store_error(e)
+    return jsonify({"message": message, **saved}), 200
+
+@api.route('/api/time-config', methods=['POST'])
+def save_time_config():
+    """保存时间配置"""
+    return _save_section("time_control", "Time configuration saved successfully")
 
-@app.route('/api/domain-config', methods=['POST'])
+@api.route('/api/domain-config', methods=['POST'])
 def save_domain_config():
     """保存域配置"""
-    if not request.is_json:
-        return jsonify({"error": "Request must be JSON"}), 400
-    data = request.get_json()
-    # 这里可以添加域配置处理逻辑
-    return jsonify({"message": "Domain configuration saved successfully"}), 200
+    return _save_section("domain_setup", "Domain configuration saved successfully")
 
-@app.route('/api/physics-config', methods=['POST'])
+@api.route('/api/physics-config', methods=['POST'])
 def save_physics_config():
     """保存物理参数配置"""
+    return _save_section("physics", "Physics configuration saved successfully")
+
+@api.route('/api/projects', methods=['GET'])
+def list_projects():
+    """项目列表及各自的配置数量"""
+    return jsonify({"projects": config_store.projects()}), 200
+
+@api.route('/api/configs', methods=['GET'])
+def list_configs():
+    """已保存的配置(按更新时间倒序)，可用 ?project= 过滤"""
+    try:
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"configs": config_store.list_configs(request.args.get("project"), limit)}), 200
+
+@api.route('/api/configs/<config_id>', methods=['GET'])
+def get_stored_config(config_id):
+    """读取已保存配置的某个版本(默认最新)，版本不可变，ETag 为 ID+版本"""
+    try:
+        stored = config_store.get(config_id, request.args.get("version"))
+    except ConfigStoreError as e:
+        return _config_store_error(e)
+    etag = f'"{config_id}-v{stored["version"]}"'
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers={'ETag': etag})
+    response = jsonify(stored)
+    response.headers['ETag'] = etag
+    return response, 200
+
+@api.route('/api/configs/<config_id>', methods=['PATCH'])
+def patch_stored_config(config_id):
+    """对整个配置文档应用 JSON Merge Patch，?base_version= 用于乐观并发检查"""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    try:
+        saved = config_store.patch(config_id, request.get_json(), request.args.get("base_version"))
+    except ConfigStoreError as e:
+        return _config_store_error(e)
+    return jsonify(saved), 200
+
+@api.route('/api/configs/<config_id>/versions', methods=['GET'])
+def list_config_versions(config_id):
+    """配置的版本历史(新版本在前)，?limit= 与 ?before= 分页"""
+    try:
+        versions = config_store.versions(config_id, int(request.args.get("limit", 100)), request.args.get("before"))
+    except ValueError as e:
+        if isinstance(e, ConfigStoreError):
+            return _config_store_error(e)
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"config_id": config_id, "versions": versions}), 200
+
+def _job_user():
+    """作业命名空间：取自 X-Wolfer-User 请求头，客户端可以任意设置。
+    只用于分组、列表与配额，不是访问控制；需要隔离时由前置的认证代理改写该请求头"""
+    return request.headers.get("X-Wolfer-User") or ANONYMOUS_USER
+
+def _job_error(e):
+    if isinstance(e, JobLimitError):
+        return jsonify({"error": str(e)}), 429
+    return jsonify({"error": str(e)}), 404 if isinstance(e, JobNotFound) else 400
+
+@api.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """提交WPS/WRF流水线作业：生成namelist写入作业工作目录后入队，立即返回202，进度见 events_url"""
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
     data = request.get_json()
-    # 这里可以添加物理参数配置处理逻辑
-    return jsonify({"message": "Physics configuration saved successfully"}), 200
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be an object"}), 400
+    try:
+        if data.get("config_id") is not None:
+            config = config_store.get(data["config_id"], data.get("version"))["document"]
+        else:
+            config = data.get("config")
+    except ConfigStoreError as e:
+        return _config_store_error(e)
+    if not isinstance(config, dict):
+        return jsonify({"error": "config (or config_id) is required"}), 400
+
+    files = render_namelist_files(config)
+    time_control = config.get("time_control", {})
+    window = ((time_control.get("start_date_str_arr") or [None])[0],
+              (time_control.get("end_date_str_arr") or [None])[0])
+    try:
+        job = job_queue.submit(files, data.get("stages"), _job_user(), data.get("priority", DEFAULT_PRIORITY),
+                               window if all(isinstance(value, str) for value in window) else None)
+    except JobError as e:
+        return _job_error(e)
+    base_url = request.host_url.rstrip('/')
+    job["events_url"] = f"{base_url}/api/jobs/{job['job_id']}/events"
+    return jsonify(job), 202
+
+@api.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """X-Wolfer-User 命名空间下的作业，新的在前，可用 ?status= 过滤(命名空间不是访问控制，见 _job_user)"""
+    status = request.args.get("status")
+    if status is not None and status not in JOB_STATUSES:
+        return jsonify({"error": f"status must be one of {', '.join(JOB_STATUSES)}"}), 400
+    try:
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"jobs": job_queue.list_jobs(_job_user(), status, limit)}), 200
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """作业状态与总进度；作业不在 X-Wolfer-User 命名空间下时返回404"""
+    try:
+        return jsonify(job_queue.get(job_id, _job_user())), 200
+    except JobError as e:
+        return _job_error(e)
+
+@api.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消作业：排队中的立即取消，运行中的由运行线程终止其进程组；只能取消 X-Wolfer-User 命名空间下的作业"""
+    try:
+        return jsonify(job_queue.cancel(job_id, _job_user())), 200
+    except JobError as e:
+        return _job_error(e)
+
+@api.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """以Server-Sent Events推送作业事件；断线重连时带 Last-Event-ID 从断点继续，作业结束后关闭。
+    带 ?after=<事件ID>&wait=<秒> 时改为长轮询，返回JSON；作业须在 X-Wolfer-User 命名空间下"""
+    user = _job_user()
+    if "after" in request.args:
+        try:
+            after, wait = int(request.args["after"]), float(request.args.get("wait", 0))
+        except ValueError:
+            return jsonify({"error": "after must be an integer and wait a number"}), 400
+        try:
+            return jsonify(job_queue.events(job_id, user, after, wait, stop=lambda: lifecycle.draining)), 200
+        except JobError as e:
+            return _job_error(e)
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or 0)
+        job_queue.get(job_id, user)
+    except ValueError as e:
+        if isinstance(e, JobError):
+            return _job_error(e)
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    if not event_streams.acquire():
+        response = jsonify({
+            "error": f"Too many open event streams (limit {event_streams.limit} per worker)",
+            "poll_url": f"{request.base_url}?after={last_event_id}&wait={MAX_POLL_WAIT:g}",
+        })
+        response.headers["Retry-After"] = str(EVENT_STREAM_RETRY_SECONDS)
+        return response, 503
+    # 排空时结束流，客户端会自动重连到其他worker
+    events = job_queue.stream_events(job_id, user, last_event_id, stop=lambda: lifecycle.draining)
+    response = Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # 连接关闭(包括客户端中途断开)时归还名额
+    response.call_on_close(event_streams.release)
+    return response
+
+def _create_stores():
+    """Opens the persistent stores on the first call in this process; later calls reuse them."""
+    global artifact_store, upload_store, config_store, job_queue
+    if job_queue is not None:
+        return
+    # 生成文件按内容寻址保存，下载链接携带artifact ID，避免并发用户互相覆盖
+    artifact_store = create_artifact_store()
+    # 上传的wrfout文件(流式落盘)及其分析结果
+    upload_store = create_upload_store()
+    # 版本化的项目/配置文档(SQLite)，分节端点按 JSON Merge Patch 增量更新
+    config_store = create_config_store()
+    # WPS/WRF 流水线作业：共享的优先级队列 + 每个进程的有界运行线程池，进度经 SSE 推送
+    job_queue = create_job_queue()
+    registry.add_gauge_collector(lambda: [
+        (f"wolfer_jobs_{status}", f"Pipeline jobs {status}", count)
+        for status, count in job_queue.stats().items()
+    ] + [("wolfer_job_event_streams", "Open job event streams in this worker", event_streams.active)])
+
+def create_app():
+    """应用工厂：每个服务进程(worker)调用一次，打开存储并预热渲染器后才报告就绪；不启动作业运行线程"""
+    app = Flask(__name__)
+    CORS(app)
+    configure_logging()
+    _create_stores()
+    log_event(logging.INFO, "config store", path=os.path.abspath(config_store.path))
+    # 请求/阶段耗时直方图，GET /api/metrics 以Prometheus格式输出(设置 WOLFER_METRICS_DIR 时汇总各worker)
+    install_request_metrics(app)
+    # 在途请求计数与 /api/health/live、/api/health/ready 探针
+    install_lifecycle(app)
+    app.register_blueprint(api)
+
+    render_namelist_files(DEFAULT_CONFIG)
+    lifecycle.on_shutdown(shutdown_executor)
+    # worker 退出前写出最后一次指标快照
+    lifecycle.on_shutdown(flush_shared_metrics)
+    lifecycle.mark_ready()
+    return app
+
+def start_job_runners():
+    """作业运行线程：只由服务入口在每个worker进程里调用(重复调用无副作用)，导入模块或测试时不会启动"""
+    job_queue.start()
+    lifecycle.on_shutdown(job_queue.shutdown)
+
 
 if __name__ == '__main__':
+    # 开发服务器；生产环境使用 serve.py (多进程 + 线程池 + 优雅关闭)
+    app = create_app()
+    # debug 模式下重载器的父进程只负责监视文件，作业只在实际服务请求的子进程里运行
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_job_runners()
     # 确保应用监听所有公共接口，而不仅仅是 127.0.0.1
     app.run(host='0.0.0.0', debug=True, port=5001)
\ No newline at end of file
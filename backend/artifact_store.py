@@ -0,0 +1,160 @@
+# artifact_store.py
+# 生成文件的存储：按内容寻址的artifact ID，可选内存(LRU)或本地磁盘(多worker共享)后端
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+ARTIFACT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+FILENAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def artifact_id_for(files):
+    """Content-addressed ID: identical file sets always map to the same ID."""
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(files[name].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def is_valid_artifact_ref(artifact_id, filename):
+    return bool(ARTIFACT_ID_RE.match(artifact_id)) and bool(FILENAME_RE.match(filename))
+
+
+class MemoryArtifactStore:
+    """Per-process LRU store; fine for a single worker."""
+
+    def __init__(self, max_artifacts=256, ttl_seconds=86400, clock=time.time):
+        self.max_artifacts = max_artifacts
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._artifacts = OrderedDict()  # id -> (created_at, {filename: bytes})
+        self._lock = threading.Lock()
+
+    def put(self, files):
+        artifact_id = artifact_id_for(files)
+        payload = {name: content.encode("utf-8") for name, content in files.items()}
+        with self._lock:
+            self._artifacts[artifact_id] = (self._clock(), payload)
+            self._artifacts.move_to_end(artifact_id)
+            while len(self._artifacts) > self.max_artifacts:
+                self._artifacts.popitem(last=False)
+        return artifact_id
+
+    def locate(self, artifact_id, filename):
+        """Returns ``(bytes, created_at)`` or ``None`` if unknown or expired."""
+        with self._lock:
+            entry = self._artifacts.get(artifact_id)
+            if entry is None:
+                return None
+            created_at, payload = entry
+            if created_at + self.ttl_seconds <= self._clock():
+                del self._artifacts[artifact_id]
+                return None
+            self._artifacts.move_to_end(artifact_id)
+        data = payload.get(filename)
+        return (data, created_at) if data is not None else None
+
+    def evict_expired(self):
+        now = self._clock()
+        with self._lock:
+            expired = [aid for aid, (created_at, _) in self._artifacts.items()
+                       if created_at + self.ttl_seconds <= now]
+            for aid in expired:
+                del self._artifacts[aid]
+        return len(expired)
+
+
+class DiskArtifactStore:
+    """Stores artifacts under ``root/<id[:2]>/<id>/<filename>``, shared by all workers on a host.
+
+    Writes go through a temp file and ``os.replace`` so concurrent workers
+    producing the same artifact never expose a partial file. An artifact's
+    directory mtime is its creation time for TTL purposes.
+    """
+
+    def __init__(self, root, ttl_seconds=86400, sweep_interval=300, clock=time.time):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._last_sweep = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def _artifact_dir(self, artifact_id):
+        return os.path.join(self.root, artifact_id[:2], artifact_id)
+
+    def put(self, files):
+        artifact_id = artifact_id_for(files)
+        directory = self._artifact_dir(artifact_id)
+        os.makedirs(directory, exist_ok=True)
+        for name, content in files.items():
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                continue
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(content.encode("utf-8"))
+            os.replace(tmp_path, path)
+        # 重复生成同一内容时刷新过期时间
+        os.utime(directory)
+        self._maybe_sweep()
+        return artifact_id
+
+    def locate(self, artifact_id, filename):
+        """Returns ``(path, created_at)`` or ``None`` if unknown or expired."""
+        directory = self._artifact_dir(artifact_id)
+        try:
+            created_at = os.stat(directory).st_mtime
+        except FileNotFoundError:
+            return None
+        if created_at + self.ttl_seconds <= self._clock():
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+        path = os.path.join(directory, filename)
+        return (path, created_at) if os.path.isfile(path) else None
+
+    def _maybe_sweep(self):
+        now = self._clock()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.evict_expired()
+
+    def evict_expired(self):
+        cutoff = self._clock() - self.ttl_seconds
+        removed = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    if entry.is_dir() and entry.stat().st_mtime <= cutoff:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        removed += 1
+                except FileNotFoundError:  # 另一个worker已清理
+                    continue
+        return removed
+
+
+def create_artifact_store():
+    """Builds the store selected by WOLFER_ARTIFACT_BACKEND (``memory`` or ``disk``)."""
+    backend = os.environ.get("WOLFER_ARTIFACT_BACKEND", "memory")
+    ttl_seconds = float(os.environ.get("WOLFER_ARTIFACT_TTL", 86400))
+    if backend == "disk":
+        root = os.environ.get("WOLFER_ARTIFACT_DIR",
+                              os.path.join(tempfile.gettempdir(), "wolfer_artifacts"))
+        return DiskArtifactStore(root, ttl_seconds=ttl_seconds)
+    if backend == "memory":
+        return MemoryArtifactStore(
+            max_artifacts=int(os.environ.get("WOLFER_ARTIFACT_MAX", 256)),
+            ttl_seconds=ttl_seconds,
+        )
+    raise ValueError(f"Unknown artifact backend: {backend}")
@@ -0,0 +1,157 @@
+# bench_load.py
+# 本地压测：用 serve.py 启动不同worker数的服务，在不同并发下压 /api/generate-namelist，输出吞吐与p50/p99延迟
+#
+#   python backend/benchmarks/bench_load.py --workers 1,2,4 --concurrency 1,8,32 --duration 10
+#
+# 默认每个请求的配置都不同(绕过namelist缓存，测渲染路径)；--cached 则重复同一配置。
+
+import argparse
+import copy
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_render import BASE_CONFIG  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, threads, server):
+    env = dict(os.environ, WOLFER_LOG_LEVEL="WARNING")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--bind", f"127.0.0.1:{port}",
+         "--workers", str(workers), "--threads", str(threads), "--server", server],
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    ready = 0
+    # 每个worker各自预热，连续几次就绪再开始，尽量确保所有worker都已启动
+    while time.monotonic() < deadline and ready < 3 * workers:
+        try:
+            status, _ = request(port, "GET", "/api/health/ready")
+            ready = ready + 1 if status == 200 else 0
+        except OSError:
+            ready = 0
+        time.sleep(0.05)
+    if ready == 0:
+        process.kill()
+        raise RuntimeError("server did not become ready")
+    return process
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def config_body(index, cached):
+    config = copy.deepcopy(BASE_CONFIG)
+    if not cached:
+        config["domain_setup"]["ref_lat"] = 20.0 + (index % 100000) * 1e-4
+    return json.dumps(config).encode("utf-8")
+
+
+def run_level(port, concurrency, duration, cached):
+    """``concurrency`` closed-loop clients for ``duration`` seconds; returns latencies (s) and errors."""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    counter = iter(range(10 ** 12))
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(slot):
+        while time.perf_counter() < stop_at:
+            with lock:
+                index = next(counter)
+            body = config_body(index, cached)
+            start = time.perf_counter()
+            try:
+                status, _ = request(port, "POST", "/api/generate-namelist", body)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies[slot].append(time.perf_counter() - start)
+            else:
+                errors[slot] += 1
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return np.array([x for slot in latencies for x in slot]), sum(errors), elapsed
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /api/generate-namelist across worker and concurrency levels.")
+    parser.add_argument("--workers", type=_int_list, default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=8, help="request threads per worker")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "builtin"), default="auto")
+    parser.add_argument("--cached", action="store_true", help="repeat one config so responses come from the cache")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'workers':>8}{'clients':>9}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for workers in args.workers:
+        port = free_port()
+        process = start_server(port, workers, args.threads, args.server)
+        try:
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = run_level(port, concurrency, args.duration, args.cached)
+                p50, p99 = (np.percentile(latencies, [50, 99]) * 1000) if latencies.size else (float("nan"),) * 2
+                row = {
+                    "workers": workers, "threads": args.threads, "concurrency": concurrency,
+                    "requests": int(latencies.size), "errors": errors,
+                    "throughput_rps": latencies.size / elapsed, "p50_ms": float(p50), "p99_ms": float(p99),
+                }
+                results.append(row)
+                print(f"{workers:>8}{concurrency:>9}{row['requests']:>10}{errors:>8}"
+                      f"{row['throughput_rps']:>10.1f}{p50:>10.2f}{p99:>10.2f}")
+        finally:
+            stop_server(process)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"cached": args.cached, "duration": args.duration, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_render.py
+# 对比字符串拼接版本与编译渲染器的namelist生成速度，并校验两者输出逐字节一致
+#
+#   python backend/benchmarks/bench_render.py --members 2000
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import legacy_render  # noqa: E402
+from ensemble import expand_sweep  # noqa: E402
+from namelist_render import render_input_namelist, render_wps_namelist  # noqa: E402
+
+BASE_CONFIG = {
+    "time_control": {
+        "start_date_str_arr": ["2001-10-25_00:00:00"],
+        "end_date_str_arr": ["2001-10-26_00:00:00"],
+        "interval_seconds_wps": 21600,
+        "interval_seconds_input": 10800,
+    },
+    "domain_setup": {
+        "max_dom": 1,
+        "e_we_arr": [100],
+        "e_sn_arr": [100],
+        "dx_arr": [30000],
+        "dy_arr": [30000],
+        "map_proj": "lambert",
+        "ref_lat": 40.0,
+        "ref_lon": 116.0,
+        "truelat1": 30.0,
+        "truelat2": 60.0,
+        "stand_lon": 116.0,
+    },
+    "physics": {
+        "mp_physics_arr": [8],
+        "ra_lw_physics_arr": [1],
+        "ra_sw_physics_arr": [1],
+        "sf_sfclay_physics_arr": [1],
+        "sf_surface_physics_arr": [2],
+        "bl_pbl_physics_arr": [1],
+        "cu_physics_arr": [1],
+    },
+    "dynamics": {
+        "diff_opt_arr": [1],
+        "km_opt_arr": [4],
+        "non_hydrostatic_arr": [True],
+    },
+}
+
+
+def ensemble_configs(members):
+    """Physics × start-date sweep trimmed to ``members`` configs."""
+    start_dates = [f"2001-{month:02d}-{day:02d}_00:00:00" for month in range(1, 13) for day in (1, 15)]
+    sweep = {
+        "physics": {
+            "mp_physics": [1, 3, 4, 6, 8, 10],
+            "bl_pbl_physics": [1, 2, 4, 5],
+            "cu_physics": [0, 1, 2, 3],
+        },
+        "start_dates": start_dates,
+    }
+    configs = [m["config"] for m in expand_sweep(BASE_CONFIG, sweep)]
+    while len(configs) < members:
+        configs += configs
+    return configs[:members]
+
+
+def time_renderer(wps_fn, input_fn, configs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for config in configs:
+            wps_fn(config)
+            input_fn(config)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, default=2000, help="ensemble size")
+    parser.add_argument("--repeat", type=int, default=5, help="best-of repetitions")
+    args = parser.parse_args()
+
+    configs = ensemble_configs(args.members)
+    for config in configs:
+        assert render_wps_namelist(config) == legacy_render.generate_wps_namelist_content(config)
+        assert render_input_namelist(config) == legacy_render.generate_input_namelist_content(config)
+
+    legacy = time_renderer(legacy_render.generate_wps_namelist_content,
+                           legacy_render.generate_input_namelist_content, configs, args.repeat)
+    compiled = time_renderer(render_wps_namelist, render_input_namelist, configs, args.repeat)
+
+    print(f"members: {len(configs)} (outputs byte-identical)")
+    print(f"legacy   : {legacy * 1000:8.2f} ms  ({legacy / len(configs) * 1e6:6.1f} us/member)")
+    print(f"compiled : {compiled * 1000:8.2f} ms  ({compiled / len(configs) * 1e6:6.1f} us/member)")
+    print(f"speedup  : {legacy / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
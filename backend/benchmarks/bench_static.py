@@ -0,0 +1,103 @@
+# bench_static.py
+# 对比常量接口每次jsonify与预计算字节响应的吞吐(requests/sec)，并校验两者解码后的内容一致
+#
+#   python backend/benchmarks/bench_static.py --requests 5000
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify  # noqa: E402
+from flask_cors import CORS  # noqa: E402
+
+import app as wolfer  # noqa: E402
+from metrics import install_request_metrics  # noqa: E402
+
+flask_app = wolfer.create_app()
+
+ENDPOINTS = {
+    "/api/options": lambda: {
+        "physics": wolfer.PHYSICS_OPTIONS,
+        "projections": wolfer.PROJECTIONS,
+        "dataSources": wolfer.DATA_SOURCES,
+    },
+    "/api/physics-options": lambda: wolfer.PHYSICS_OPTIONS,
+    "/api/projections": lambda: wolfer.PROJECTIONS,
+    "/api/data-sources": lambda: wolfer.DATA_SOURCES,
+    "/api/configuration": lambda: wolfer.DEFAULT_CONFIG,
+}
+
+
+def legacy_app():
+    """The previous behaviour: every hit re-serializes the constant through jsonify."""
+    legacy = Flask("legacy_static")
+    # 同样的CORS与计时钩子，只比较响应体的生成方式
+    CORS(legacy)
+    install_request_metrics(legacy)
+    for path, payload in ENDPOINTS.items():
+        legacy.add_url_rule(path, path, lambda payload=payload: (jsonify(payload()), 200))
+    return legacy
+
+
+def requests_per_second(client, path, count, headers):
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(path, headers=headers)
+    return count / (time.perf_counter() - start)
+
+
+def view_microseconds(view, count, headers):
+    """Cost of producing the response alone, without the WSGI round trip of the test client."""
+    with flask_app.test_request_context(headers=headers):
+        start = time.perf_counter()
+        for _ in range(count):
+            view()
+        return (time.perf_counter() - start) / count * 1e6
+
+
+def decoded(response):
+    body = response.get_data()
+    if response.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000, help="requests per endpoint and variant")
+    args = parser.parse_args()
+
+    before = legacy_app().test_client()
+    after = flask_app.test_client()
+    gzip_headers = {"Accept-Encoding": "gzip"}
+
+    views = dict(zip(ENDPOINTS, (wolfer.get_all_options, wolfer.get_physics_options, wolfer.get_projections,
+                                 wolfer.get_data_sources, wolfer.get_configuration)))
+
+    print(f"{'endpoint':<24}{'jsonify rps':>14}{'precomputed rps':>18}{'gzip rps':>12}{'304 rps':>12}"
+          f"{'bytes':>8}{'gzip bytes':>12}{'jsonify us':>12}{'precomputed us':>16}")
+    for path, payload in ENDPOINTS.items():
+        plain = after.get(path)
+        compressed = after.get(path, headers=gzip_headers)
+        assert decoded(plain) == decoded(compressed) == json.loads(json.dumps(payload())), path
+
+        etag = {"If-None-Match": plain.headers["ETag"]}
+        assert after.get(path, headers=etag).status_code == 304, path
+
+        legacy_rps = requests_per_second(before, path, args.requests, {})
+        plain_rps = requests_per_second(after, path, args.requests, {})
+        gzip_rps = requests_per_second(after, path, args.requests, gzip_headers)
+        revalidate_rps = requests_per_second(after, path, args.requests, etag)
+        legacy_us = view_microseconds(lambda: jsonify(payload()), args.requests, {})
+        view_us = view_microseconds(views[path], args.requests, gzip_headers)
+        print(f"{path:<24}{legacy_rps:>14.0f}{plain_rps:>18.0f}{gzip_rps:>12.0f}{revalidate_rps:>12.0f}"
+              f"{len(plain.get_data()):>8}{len(compressed.get_data()):>12}{legacy_us:>12.1f}{view_us:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
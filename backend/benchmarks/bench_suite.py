@@ -0,0 +1,445 @@
+# bench_suite.py
+# 性能回归套件：namelist 生成函数、常用小函数与每一个 Flask 路由(测试客户端)，输出JSON并与基线比较，超出阈值即失败
+#
+#   python backend/benchmarks/bench_suite.py --json results.json
+#   python backend/benchmarks/bench_suite.py --baseline backend/benchmarks/baseline.json --threshold 0.25
+#   python backend/benchmarks/bench_suite.py --save-baseline backend/benchmarks/baseline.json
+#
+# 基线与机器相关：在部署前跑基准的同一台(或同规格)机器上重新生成；架构、CPU 型号或核数与基线不同时拒绝比较。
+
+import argparse
+import atexit
+import copy
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tarfile
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+# 在导入 app 之前指定临时目录与线程执行器，避免污染真实数据目录
+_WORK_DIR = tempfile.mkdtemp(prefix="wolfer_bench_")
+atexit.register(shutil.rmtree, _WORK_DIR, ignore_errors=True)
+os.environ.setdefault("WOLFER_UPLOAD_DIR", os.path.join(_WORK_DIR, "uploads"))
+os.environ.setdefault("WOLFER_CONFIG_DB", os.path.join(_WORK_DIR, "configs.sqlite3"))
+# 作业只测请求路径：不启动运行线程，排队上限放开
+os.environ.setdefault("WOLFER_JOB_DIR", os.path.join(_WORK_DIR, "jobs"))
+os.environ.setdefault("WOLFER_JOB_WORKERS", "0")
+os.environ.setdefault("WOLFER_JOB_USER_QUEUED", "1000000")
+os.environ.setdefault("WOLFER_BATCH_EXECUTOR", "thread")
+os.environ.setdefault("WOLFER_LOG_LEVEL", "WARNING")
+
+from bench_render import BASE_CONFIG, ensemble_configs  # noqa: E402
+from wrfout_fixture import synthetic_wrfout  # noqa: E402
+
+import app as wolfer  # noqa: E402
+from namelist_render import format_namelist_value, get_single_param_val  # noqa: E402
+from netcdf_reader import open_dataset  # noqa: E402
+from site_extraction import extract_site_series  # noqa: E402
+from weibull import fit_weibull_grid  # noqa: E402
+from wind_analysis import analyse_wind_resource  # noqa: E402
+
+# 应用工厂不启动作业运行线程，基准只测请求路径
+flask_app = wolfer.create_app()
+
+DEFAULT_THRESHOLD = 0.25
+# 绝对差低于此值(微秒)的变化视为噪声，不算回归
+DEFAULT_MIN_DELTA_US = 2.0
+# 基线 meta 中必须与当前机器一致才能比较的字段
+HOST_KEYS = ("machine", "cpu_model", "cpus")
+# 路由之外不计入覆盖检查的规则
+UNBENCHMARKED_RULES = {"/static/<path:filename>"}
+
+
+def large_config(max_dom=5):
+    """Multi-domain config with every per-domain array filled in, as a heavy single request."""
+    config = copy.deepcopy(BASE_CONFIG)
+    config["time_control"].update({
+        "start_date_str_arr": ["2020-07-01_00:00:00"] * max_dom,
+        "end_date_str_arr": ["2020-07-08_00:00:00"] * max_dom,
+        "history_interval_arr": [60, 30, 15, 10, 10][:max_dom],
+        "history_interval_unit_arr": ["m"] * max_dom,
+        "frames_per_outfile_arr": [24, 48, 96, 144, 144][:max_dom],
+        "input_from_file_arr": [True] * max_dom,
+    })
+    config["domain_setup"].update({
+        "max_dom": max_dom,
+        "e_we_arr": [301, 331, 451, 391, 301][:max_dom],
+        "e_sn_arr": [251, 301, 391, 361, 301][:max_dom],
+        "e_vert_arr": [51] * max_dom,
+        "dx_arr": [27000], "dy_arr": [27000],
+        "parent_id_arr": [1, 1, 2, 3, 4][:max_dom],
+        "parent_grid_ratio_arr": [1, 3, 3, 3, 3][:max_dom],
+        "parent_time_step_ratio_arr": [1, 3, 3, 3, 3][:max_dom],
+        "i_parent_start_arr": [1, 90, 100, 140, 120][:max_dom],
+        "j_parent_start_arr": [1, 80, 90, 120, 100][:max_dom],
+        "time_step": 120,
+    })
+    for key, values in (("mp_physics_arr", 8), ("ra_lw_physics_arr", 4), ("ra_sw_physics_arr", 4),
+                        ("sf_sfclay_physics_arr", 1), ("sf_surface_physics_arr", 2), ("bl_pbl_physics_arr", 1)):
+        config["physics"][key] = [values] * max_dom
+    config["physics"]["cu_physics_arr"] = [1, 1, 0, 0, 0][:max_dom]
+    config["physics"]["radt_arr"] = [27] * max_dom
+    return config
+
+
+def timed(fn, min_round_seconds=0.02, rounds=7):
+    """Per-call seconds over ``rounds`` rounds, each long enough to swamp timer resolution."""
+    fn()
+    iterations = 1
+    while iterations < 1 << 20:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_seconds:
+            break
+        iterations = min(max(iterations * 2, int(iterations * min_round_seconds / max(elapsed, 1e-9))), 1 << 20)
+    samples = []
+    gc.collect()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations)
+    samples.sort()
+    return {
+        "median_us": statistics.median(samples) * 1e6,
+        "min_us": samples[0] * 1e6,
+        "max_us": samples[-1] * 1e6,
+        "ops_per_sec": 1.0 / statistics.median(samples),
+        "iterations": iterations,
+        "rounds": rounds,
+    }
+
+
+class Suite:
+    """Benchmark cases keyed by name; route cases record the URL rule they exercise."""
+
+    def __init__(self):
+        self.cases = {}
+        self.routes = {}
+
+    def add(self, name, fn, rule=None):
+        self.cases[name] = fn
+        if rule is not None:
+            self.routes.setdefault(rule, []).append(name)
+
+    def route(self, name, rule, client_call, expect=200):
+        """Adds a test-client case and checks its status once, so an error path is never timed by accident."""
+        response = client_call()
+        if response.status_code != expect:
+            raise AssertionError(f"{name}: expected {expect}, got {response.status_code}: {response.data[:200]!r}")
+
+        def call():
+            response = client_call()
+            for _ in response.response:  # 流式响应也要读完
+                pass
+            response.close()
+        self.add(name, call, rule)
+
+
+def _namelist_tar(configs):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for index, config in enumerate(configs):
+            for filename, content in wolfer.render_namelist_files(config).items():
+                payload = content.encode("utf-8")
+                info = tarfile.TarInfo(f"run{index:03d}/{filename}")
+                info.size = len(payload)
+                tar.addfile(info, io.BytesIO(payload))
+    return buffer.getvalue()
+
+
+def build_suite(scale=1):
+    suite = Suite()
+    small = copy.deepcopy(BASE_CONFIG)
+    large = large_config()
+    ensemble = ensemble_configs(200 * scale)
+    counter = itertools.count()
+
+    # --- 生成函数与小工具 ---
+    suite.add("render.wps.small", lambda: wolfer.generate_wps_namelist_content(small))
+    suite.add("render.input.small", lambda: wolfer.generate_input_namelist_content(small))
+    suite.add("render.wps.large", lambda: wolfer.generate_wps_namelist_content(large))
+    suite.add("render.input.large", lambda: wolfer.generate_input_namelist_content(large))
+    suite.add("render.ensemble", lambda: [wolfer.render_namelist_files(c) for c in ensemble])
+    time_control = large["time_control"]
+    suite.add("helpers.get_single_param_val", lambda: (
+        get_single_param_val(time_control, "start_date_str_arr", ""),
+        get_single_param_val(time_control, "interval_seconds_wps", 21600),
+        get_single_param_val(time_control, "missing_arr", 3),
+    ))
+    values = [True, False, "lambert", "'quoted'", 30000, 40.5, None]
+    suite.add("helpers.format_namelist_value", lambda: [format_namelist_value(v) for v in values])
+    suite.add("validate.batch", lambda: wolfer.config_validator.validate_batch(ensemble))
+
+    # --- 路由 ---
+    client = flask_app.test_client()
+    for rule, path in (("/api/configuration", "/api/configuration"),
+                       ("/api/physics-options", "/api/physics-options"),
+                       ("/api/projections", "/api/projections"),
+                       ("/api/data-sources", "/api/data-sources"),
+                       ("/api/options", "/api/options"),
+                       ("/api/cache/stats", "/api/cache/stats"),
+                       ("/api/health/live", "/api/health/live"),
+                       ("/api/health/ready", "/api/health/ready"),
+                       ("/api/metrics", "/api/metrics")):
+        suite.route(f"GET {path}", rule, lambda path=path: client.get(path))
+    suite.route("GET /api/options gzip", "/api/options",
+                lambda: client.get("/api/options", headers={"Accept-Encoding": "gzip"}))
+    suite.route("POST /api/configuration", "/api/configuration",
+                lambda: client.post("/api/configuration", json=small))
+    # 分节保存：对同一份已存配置打补丁，每次值不同因而都生成新版本
+    config_id = client.post("/api/configuration?project=bench", json=large).get_json()["config_id"]
+    for path, patch in (("/api/time-config", lambda n: {"history_interval_arr": [60 + n % 7] * 5}),
+                        ("/api/domain-config", lambda n: {"ref_lat": 30 + n % 1000 * 1e-3}),
+                        ("/api/physics-config", lambda n: {"radt_arr": [n % 30 + 1] * 5})):
+        suite.route(f"POST {path}", path, lambda path=path, patch=patch: client.post(
+            f"{path}?config_id={config_id}", json=patch(next(counter))))
+    suite.route("PATCH stored config", "/api/configs/<config_id>", lambda: client.patch(
+        f"/api/configs/{config_id}", json={"dynamics": {"epssm": round(0.1 + next(counter) % 50 * 1e-3, 3)}}))
+    suite.route("GET stored config", "/api/configs/<config_id>",
+                lambda: client.get(f"/api/configs/{config_id}?version=1"))
+    suite.route("GET stored config versions", "/api/configs/<config_id>/versions",
+                lambda: client.get(f"/api/configs/{config_id}/versions?limit=50"))
+    suite.route("GET configs", "/api/configs", lambda: client.get("/api/configs?project=bench"))
+    suite.route("GET projects", "/api/projects", lambda: client.get("/api/projects"))
+
+    generate = "/api/generate-namelist"
+    suite.route("POST generate small cached", generate, lambda: client.post(generate, json=small))
+    # output_dir 进入配置哈希：每次不同即绕过缓存，测完整渲染路径
+    suite.route("POST generate small uncached", generate,
+                lambda: client.post(generate, json=dict(small, output_dir=f"run{next(counter)}")))
+    suite.route("POST generate large uncached", generate,
+                lambda: client.post(generate, json=dict(large, output_dir=f"run{next(counter)}")))
+    suite.route("POST generate large tuned", generate,
+                lambda: client.post(generate, json=dict(large, tuning={"cores": 512}, output_dir=f"t{next(counter)}")))
+    suite.route("POST generate stored ref", generate,
+                lambda: client.post(generate, json={"config_id": config_id, "version": 1}))
+    etag = client.post(generate, json=small).headers["ETag"]
+    suite.route("POST generate 304", generate,
+                lambda: client.post(generate, json=small, headers={"If-None-Match": etag}), expect=304)
+
+    sweep = {"physics": {"mp_physics": [6, 8], "cu_physics": [0, 1, 2, 3]}, "start_dates": [
+        f"2020-{month:02d}-01_00:00:00" for month in range(1, 1 + 4 * scale)]}
+    suite.route("POST generate batch zip", "/api/generate-namelist/batch",
+                lambda: client.post("/api/generate-namelist/batch", json={"base_config": small, "sweep": sweep}))
+    long_run = copy.deepcopy(large)
+    long_run["time_control"]["end_date_str_arr"] = ["2020-12-31_00:00:00"] * 5
+    suite.route("POST generate segments", "/api/generate-namelist/segments",
+                lambda: client.post("/api/generate-namelist/segments",
+                                    json={"config": long_run, "segment": {"length_hours": 240}}))
+
+    suite.route("POST validate single", "/api/validate", lambda: client.post("/api/validate", json=large))
+    suite.route("POST validate batch", "/api/validate", lambda: client.post("/api/validate", json=ensemble))
+
+    geometry = "/api/domain-geometry"
+    suite.route("POST domain-geometry cached", geometry,
+                lambda: client.post(f"{geometry}?mesh=100", json=large))
+    suite.route("POST domain-geometry uncached", geometry, lambda: client.post(
+        f"{geometry}?format=binary&mesh=100",
+        json=dict(large["domain_setup"], ref_lat=30 + next(counter) % 100000 * 1e-4)))
+
+    suite.route("POST job submit", "/api/jobs", lambda: client.post(
+        "/api/jobs", json={"config_id": config_id, "version": 1}, headers={"X-Wolfer-User": "bench"}), expect=202)
+    bench_user = {"X-Wolfer-User": "bench"}
+    job_id = client.post("/api/jobs", json={"config": small}, headers=bench_user).get_json()["job_id"]
+    suite.route("GET jobs", "/api/jobs", lambda: client.get("/api/jobs?limit=50", headers=bench_user))
+    suite.route("GET job", "/api/jobs/<job_id>", lambda: client.get(f"/api/jobs/{job_id}", headers=bench_user))
+    suite.route("POST job cancel", "/api/jobs/<job_id>/cancel",
+                lambda: client.post(f"/api/jobs/{job_id}/cancel", headers=bench_user))
+    # 已结束的作业：流式回放全部事件后立即关闭；轮询立即返回全部事件与 done
+    suite.route("GET job events replay", "/api/jobs/<job_id>/events",
+                lambda: client.get(f"/api/jobs/{job_id}/events", headers=bench_user, buffered=True))
+    suite.route("GET job events poll", "/api/jobs/<job_id>/events",
+                lambda: client.get(f"/api/jobs/{job_id}/events?after=0&wait=10", headers=bench_user))
+
+    artifact_id = client.post(generate, json=small).get_json()["artifact_id"]
+    suite.route("GET download artifact", "/api/download/<artifact_id>/<filename>",
+                lambda: client.get(f"/api/download/{artifact_id}/namelist.input"))
+    suite.route("GET download legacy", "/api/download/<filename>",
+                lambda: client.get("/api/download/namelist.input"), expect=404)
+
+    archive = _namelist_tar(ensemble[:20 * scale])
+    suite.route("POST import namelists", "/api/import/namelists", lambda: client.post(
+        "/api/import/namelists", data=archive, content_type="application/gzip"))
+
+    # --- wrfout 相关 ---
+    wrfout_path = os.path.join(_WORK_DIR, "wrfout_d01_2020-01-01_00:00:00")
+    synthetic_wrfout(wrfout_path, steps=24 * scale, ny=60, nx=80)
+    with open(wrfout_path, "rb") as fh:
+        wrfout_bytes = fh.read()
+    suite.route("POST wrfout upload", "/api/wrfout", lambda: client.post(
+        "/api/wrfout?filename=wrfout_d01.nc", data=wrfout_bytes), expect=201)
+    upload_id = client.post("/api/wrfout?filename=wrfout_d01.nc", data=wrfout_bytes).get_json()["upload_id"]
+    base = f"/api/wrfout/{upload_id}"
+    suite.route("GET wrfout describe", "/api/wrfout/<upload_id>", lambda: client.get(base))
+
+    analysis = client.post(f"{base}/analysis", json={"heights": ["10m", 80]}).get_json()
+    suite.route("POST wrfout analysis cached", "/api/wrfout/<upload_id>/analysis",
+                lambda: client.post(f"{base}/analysis", json={"heights": ["10m", 80]}))
+    suite.route("GET wrfout analysis npz", "/api/wrfout/<upload_id>/analysis/<analysis_id>.npz",
+                lambda: client.get(analysis["download_link"]))
+
+    pyramid = client.post(f"{base}/weibull", json={"height": 80, "tile_size": 32}).get_json()
+    suite.route("POST wrfout weibull cached", "/api/wrfout/<upload_id>/weibull",
+                lambda: client.post(f"{base}/weibull", json={"height": 80, "tile_size": 32}))
+    tile = pyramid["tile_url"].format(field="k", z=0, y=0, x=0)
+    suite.route("GET wrfout tile", "/api/wrfout/<upload_id>/tiles/<pyramid_id>/<field>/<int:z>/<int:y>/<int:x>",
+                lambda: client.get(tile))
+
+    sites = [{"id": f"T{i}", "lat": 31 + (i % 40) * 0.2, "lon": 111 + (i // 40) * 0.2} for i in range(200)]
+    suite.route("POST wrfout sites", "/api/wrfout/<upload_id>/sites",
+                lambda: client.post(f"{base}/sites", json={"sites": sites, "heights": ["10m", 100]}))
+
+    def with_dataset(fn):
+        def run():
+            with open_dataset(wrfout_path) as dataset:
+                return fn(dataset)
+        return run
+    suite.add("wind.analysis", with_dataset(lambda ds: analyse_wind_resource(ds, heights=["10m", 80])))
+    suite.add("wind.weibull_fit", lambda: fit_weibull_grid(wrfout_path, heights=[80]))
+    suite.add("wind.site_extraction", with_dataset(lambda ds: extract_site_series(
+        ds, [s["lat"] for s in sites], [s["lon"] for s in sites], heights=["10m", 100])))
+    return suite
+
+
+def uncovered_routes(suite):
+    rules = {rule.rule for rule in flask_app.url_map.iter_rules()} - UNBENCHMARKED_RULES
+    return sorted(rules - set(suite.routes))
+
+
+def cpu_model():
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or None
+
+
+def host_meta():
+    return {"machine": platform.machine(), "cpu_model": cpu_model(), "cpus": os.cpu_count()}
+
+
+def host_mismatch(meta, baseline_meta):
+    """``{key: (baseline, current)}`` for every host property that differs from the baseline's."""
+    return {key: (baseline_meta.get(key), meta.get(key)) for key in HOST_KEYS
+            if baseline_meta.get(key) != meta.get(key)}
+
+
+def compare(results, baseline, threshold, min_delta_us, pattern=None):
+    """Per-case ``(name, baseline_us, current_us, ratio, regressed)``.
+
+    Compares the fastest round: it is far less sensitive to scheduler noise
+    on a shared machine than the median. A baseline case (matching
+    ``pattern``) that did not run has ``current_us`` ``None`` and counts as
+    regressed, so deleting or renaming a case cannot hide a slowdown.
+    """
+    rows = []
+    for name, previous in baseline.items():
+        current = results.get(name)
+        before = previous["min_us"]
+        if current is None:
+            if pattern is None or pattern.search(name):
+                rows.append((name, before, None, None, True))
+            continue
+        after = current["min_us"]
+        ratio = after / before if before else float("inf")
+        regressed = ratio > 1 + threshold and after - before > min_delta_us
+        rows.append((name, before, after, ratio, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generators and every HTTP route; compare to a baseline.")
+    parser.add_argument("--filter", help="only run cases whose name matches this regex")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-ms", type=float, default=20.0, help="minimum duration of one timing round")
+    parser.add_argument("--scale", type=int, default=1, help="multiplies batch/ensemble payload sizes")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fail when a case is slower than baseline by more than this fraction")
+    parser.add_argument("--min-delta-us", type=float, default=DEFAULT_MIN_DELTA_US)
+    parser.add_argument("--allow-host-mismatch", action="store_true",
+                        help="compare even if the baseline was recorded on a different machine")
+    args = parser.parse_args()
+
+    suite = build_suite(args.scale)
+    missing = uncovered_routes(suite)
+    pattern = re.compile(args.filter) if args.filter else None
+
+    results = {}
+    print(f"{'case':<40}{'median us':>14}{'min us':>12}{'ops/s':>12}")
+    for name, fn in suite.cases.items():
+        if pattern and not pattern.search(name):
+            continue
+        results[name] = timed(fn, args.min_round_ms / 1000, args.rounds)
+        r = results[name]
+        print(f"{name:<40}{r['median_us']:>14.1f}{r['min_us']:>12.1f}{r['ops_per_sec']:>12.0f}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            **host_meta(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "scale": args.scale,
+            "rounds": args.rounds,
+        },
+        "results": results,
+        "uncovered_routes": missing,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+
+    failed = False
+    if missing:
+        print(f"\nroutes without a benchmark case: {', '.join(missing)}")
+        failed = True
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        mismatch = host_mismatch(report["meta"], baseline.get("meta", {}))
+        if mismatch and not args.allow_host_mismatch:
+            for key, (before, after) in mismatch.items():
+                print(f"\nbaseline {key} {before!r} != this host {after!r}")
+            print("baseline was recorded on a different host; re-record it with --save-baseline on this one")
+            sys.exit(2)
+        rows = compare(results, baseline["results"], args.threshold, args.min_delta_us, pattern)
+        print(f"\n{'case':<40}{'baseline us':>14}{'current us':>12}{'ratio':>8}")
+        for name, before, after, ratio, regressed in rows:
+            if after is None:
+                print(f"{name:<40}{before:>14.1f}{'-':>12}{'-':>8}  MISSING")
+                continue
+            print(f"{name:<40}{before:>14.1f}{after:>12.1f}{ratio:>8.2f}{'  REGRESSION' if regressed else ''}")
+        missing_cases = [row[0] for row in rows if row[2] is None]
+        regressions = [row[0] for row in rows if row[4] and row[2] is not None]
+        if missing_cases:
+            print(f"\n{len(missing_cases)} baseline case(s) did not run")
+            failed = True
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
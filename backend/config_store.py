@@ -0,0 +1,278 @@
+# config_store.py
+# 项目/配置存储：SQLite(WAL，多worker共享一个文件)保存配置文档的每个版本，分节端点以 JSON Merge Patch 增量更新
+#
+# 版本不可变：文档按规范化JSON(排序键、紧凑分隔)存放，同时记下其哈希(与 canonical_config_hash 相同)，
+# 生成时按 ID/版本引用即可直接复用哈希命中 namelist 缓存，无需重新上传与解析。
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from namelist_cache import NamelistCache
+
+CONFIG_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+PROJECT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._ -]{0,63}$")
+DEFAULT_PROJECT = "default"
+MAX_DOCUMENT_BYTES = 1 << 20
+MAX_LIST_LIMIT = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    head_version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS configs_project_updated ON configs (project, updated_at DESC);
+CREATE TABLE IF NOT EXISTS config_versions (
+    config_id TEXT NOT NULL REFERENCES configs (id),
+    version INTEGER NOT NULL,
+    document TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (config_id, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS config_versions_hash ON config_versions (config_hash);
+"""
+
+# 已解析的不可变版本：(config_id, version) -> (document, config_hash)；调用方不得修改文档
+document_cache = NamelistCache(
+    max_entries=int(os.environ.get("WOLFER_CONFIG_DOCUMENT_CACHE_SIZE", 256)),
+    ttl_seconds=float(os.environ.get("WOLFER_CONFIG_DOCUMENT_CACHE_TTL", 3600)),
+)
+
+
+class ConfigStoreError(ValueError):
+    """Raised for an unusable store request (bad ID, patch or document)."""
+
+
+class ConfigNotFound(ConfigStoreError):
+    """Raised when a config or one of its versions does not exist."""
+
+
+class VersionConflict(ConfigStoreError):
+    """Raised when ``base_version`` is no longer the head version."""
+
+    def __init__(self, config_id, base_version, head_version):
+        super().__init__(f"Config {config_id} is at version {head_version}, not {base_version}")
+        self.head_version = head_version
+
+
+def merge_patch(target, patch):
+    """RFC 7386 JSON Merge Patch: objects merge recursively, ``null`` deletes, anything else replaces."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _canonical(document):
+    """``(text, hash)``; the hash equals ``canonical_config_hash(document)``."""
+    text = json.dumps(document, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    raw = text.encode("utf-8")
+    if len(raw) > MAX_DOCUMENT_BYTES:
+        raise ConfigStoreError(f"Config exceeds the {MAX_DOCUMENT_BYTES} byte limit")
+    return text, hashlib.sha256(raw).hexdigest()
+
+
+def _check_id(config_id):
+    if not isinstance(config_id, str) or not CONFIG_ID_RE.match(config_id):
+        raise ConfigNotFound(f"Unknown config: {config_id}")
+
+
+def _check_version(version):
+    if version is None:
+        return None
+    if isinstance(version, str) and version.isdigit():
+        version = int(version)
+    if isinstance(version, bool) or not isinstance(version, int) or version < 1:
+        raise ConfigStoreError("version must be a positive integer")
+    return version
+
+
+class ThreadConnections:
+    """One SQLite connection per thread (re-opened after a fork), in autocommit mode with WAL enabled."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __call__(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def write(self, fn):
+        """Runs ``fn(conn)`` inside a ``BEGIN IMMEDIATE`` transaction and returns its result."""
+        conn = self()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+
+class ConfigStore:
+    """Versioned config documents grouped by project, in one SQLite file shared by all workers.
+
+    Writes run in ``BEGIN IMMEDIATE`` transactions so concurrent patches get
+    distinct, gap-free version numbers.
+    """
+
+    def __init__(self, path, clock=time.time, cache=document_cache):
+        self.path = path
+        self._clock = clock
+        self._cache = cache
+        self._connection = ThreadConnections(path)
+        self._write = self._connection.write
+        self._connection().executescript(SCHEMA)
+
+    @staticmethod
+    def _summary(row):
+        return {"config_id": row["id"], "project": row["project"], "name": row["name"],
+                "version": row["head_version"], "created_at": row["created_at"], "updated_at": row["updated_at"]}
+
+    def create(self, document, project=DEFAULT_PROJECT, name=""):
+        """Stores ``document`` as version 1 of a new config; returns its summary plus ``config_hash``."""
+        if not isinstance(document, dict):
+            raise ConfigStoreError("Config must be a JSON object")
+        project = project or DEFAULT_PROJECT
+        if not isinstance(project, str) or not PROJECT_RE.match(project):
+            raise ConfigStoreError("Invalid project name")
+        if not isinstance(name, str) or len(name) > 200:
+            raise ConfigStoreError("name must be a string of at most 200 characters")
+        text, config_hash = _canonical(document)
+        config_id = uuid.uuid4().hex
+        now = self._clock()
+
+        def insert(conn):
+            conn.execute("INSERT INTO configs (id, project, name, head_version, created_at, updated_at) "
+                         "VALUES (?, ?, ?, 1, ?, ?)", (config_id, project, name, now, now))
+            conn.execute("INSERT INTO config_versions (config_id, version, document, config_hash, created_at) "
+                         "VALUES (?, 1, ?, ?, ?)", (config_id, text, config_hash, now))
+
+        self._write(insert)
+        return {"config_id": config_id, "project": project, "name": name, "version": 1,
+                "created_at": now, "updated_at": now, "config_hash": config_hash, "changed": True}
+
+    def patch(self, config_id, patch, base_version=None):
+        """Applies a merge patch to the head version, storing the result as a new version.
+
+        With ``base_version`` the patch is rejected (``VersionConflict``) if
+        another writer got there first. A patch that changes nothing does not
+        create a version; ``changed`` reports which happened.
+        """
+        _check_id(config_id)
+        base_version = _check_version(base_version)
+        if not isinstance(patch, dict):
+            raise ConfigStoreError("Patch must be a JSON object")
+
+        def apply(conn):
+            row = conn.execute("SELECT * FROM configs WHERE id = ?", (config_id,)).fetchone()
+            if row is None:
+                raise ConfigNotFound(f"Unknown config: {config_id}")
+            head = row["head_version"]
+            if base_version is not None and base_version != head:
+                raise VersionConflict(config_id, base_version, head)
+            current = conn.execute("SELECT document, config_hash FROM config_versions "
+                                   "WHERE config_id = ? AND version = ?", (config_id, head)).fetchone()
+            text, config_hash = _canonical(merge_patch(json.loads(current["document"]), patch))
+            summary = self._summary(row)
+            if config_hash == current["config_hash"]:
+                return dict(summary, config_hash=config_hash, changed=False)
+            now = self._clock()
+            conn.execute("INSERT INTO config_versions (config_id, version, document, config_hash, created_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (config_id, head + 1, text, config_hash, now))
+            conn.execute("UPDATE configs SET head_version = ?, updated_at = ? WHERE id = ?",
+                         (head + 1, now, config_id))
+            return dict(summary, version=head + 1, updated_at=now, config_hash=config_hash, changed=True)
+
+        return self._write(apply)
+
+    def get(self, config_id, version=None):
+        """``{..summary, "version", "config_hash", "document"}`` for ``version`` (default: head)."""
+        _check_id(config_id)
+        version = _check_version(version)
+        conn = self._connection()
+        row = conn.execute("SELECT * FROM configs WHERE id = ?", (config_id,)).fetchone()
+        if row is None:
+            raise ConfigNotFound(f"Unknown config: {config_id}")
+        if version is None:
+            version = row["head_version"]
+        cached = self._cache.get((config_id, version))
+        if cached is None:
+            stored = conn.execute("SELECT document, config_hash FROM config_versions "
+                                  "WHERE config_id = ? AND version = ?", (config_id, version)).fetchone()
+            if stored is None:
+                raise ConfigNotFound(f"Config {config_id} has no version {version}")
+            cached = (json.loads(stored["document"]), stored["config_hash"])
+            self._cache.put((config_id, version), cached)
+        document, config_hash = cached
+        return dict(self._summary(row), version=version, head_version=row["head_version"],
+                    config_hash=config_hash, document=document)
+
+    def versions(self, config_id, limit=100, before=None):
+        """Version history without the documents, newest first; page with ``before=<oldest version seen>``."""
+        _check_id(config_id)
+        before = _check_version(before)
+        limit = max(1, min(int(limit), MAX_LIST_LIMIT))
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM configs WHERE id = ?", (config_id,)).fetchone() is None:
+            raise ConfigNotFound(f"Unknown config: {config_id}")
+        rows = conn.execute(
+            "SELECT version, config_hash, created_at FROM config_versions "
+            "WHERE config_id = ? AND version < ? ORDER BY version DESC LIMIT ?",
+            (config_id, before if before is not None else 2 ** 62, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_configs(self, project=None, limit=100):
+        """Config summaries, most recently updated first, optionally for one project."""
+        limit = max(1, min(int(limit), MAX_LIST_LIMIT))
+        conn = self._connection()
+        if project is None:
+            rows = conn.execute("SELECT * FROM configs ORDER BY updated_at DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM configs WHERE project = ? ORDER BY updated_at DESC LIMIT ?",
+                                (project, limit)).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def projects(self):
+        rows = self._connection().execute(
+            "SELECT project, COUNT(*) AS configs, MAX(updated_at) AS updated_at FROM configs "
+            "GROUP BY project ORDER BY project").fetchall()
+        return [dict(row) for row in rows]
+
+
+def default_data_dir():
+    """WOLFER_DATA_DIR, else the per-user data directory (``$XDG_DATA_HOME/wolfer``)."""
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.environ.get("WOLFER_DATA_DIR") or os.path.join(base, "wolfer")
+
+
+def create_config_store():
+    # 配置是持久数据，不放在会被系统清理的临时目录里
+    path = os.environ.get("WOLFER_CONFIG_DB") or os.path.join(default_data_dir(), "configs.sqlite3")
+    return ConfigStore(path)
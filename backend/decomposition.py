@@ -0,0 +1,228 @@
+# decomposition.py
+# MPI 分解与 I/O quilting 自动调优：按核数与各域网格选出 nproc_x/nproc_y 和 nio_tasks_per_group/nio_groups
+#
+# 代价模型：每步工作量 ∝ 最大 patch 面积(负载不均) + 光晕交换 ∝ patch 周长，按各域层数与相对父域的步数加权；
+# 输出量按 WRF 默认 Registry 的历史场数估算(io_form=2，float32 不压缩)，只用于量级判断。
+
+import copy
+import math
+
+from namelist_render import domain_columns
+from nest_validation import build_nest_table
+
+MAX_CORES = 1_000_000
+DEFAULT_MIN_PATCH = 10
+QUILTING_MODES = ("auto", "off")
+# 光晕交换每个边界点相对一个内部格点计算的代价
+HALO_COST = 8.0
+# 默认历史输出：3D 场个数、2D 场个数、土壤层场(4层×5个)
+HISTORY_3D_FIELDS = 19
+HISTORY_2D_FIELDS = 120
+HISTORY_SOIL_VALUES = 20
+# 每个 I/O 任务一次历史写出承担的数据量；达到 QUILT_MIN_CORES 才值得拿出任务做 I/O
+IO_BYTES_PER_TASK = 256 * 1024 ** 2
+QUILT_MIN_CORES = 64
+# 历史输出间隔不超过此值(分钟)且核数足够时用两组 I/O 任务，上一次写出未完成时下一次可以并行
+DOUBLE_BUFFER_MINUTES = 15
+DOUBLE_BUFFER_MIN_CORES = 256
+
+
+class TuningError(ValueError):
+    """Raised for an unusable tuning request."""
+
+
+def _int_option(options, key, default, low, high):
+    value = options.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise TuningError(f"tuning.{key} must be an integer between {low} and {high}")
+    return value
+
+
+def _grids(data):
+    """Per-domain ``(nx, ny, nz, steps)`` mass-grid sizes; steps counts d01 steps' worth of work."""
+    dom = data.get("domain_setup", {})
+    table, max_doms, errors = build_nest_table([dom])
+    if errors[0]:
+        raise TuningError("; ".join(errors[0]))
+    max_dom = int(max_doms[0])
+    e_vert = domain_columns(dom.get("e_vert_arr"), max_dom, 35)
+    time_ratios = domain_columns(dom.get("parent_time_step_ratio_arr"), max_dom, 1, 3)
+    grids, steps = [], []
+    for d in range(max_dom):
+        try:
+            nx, ny = int(table["e_we"][0, d]) - 1, int(table["e_sn"][0, d]) - 1
+            nz, ratio = int(e_vert[d]) - 1, float(time_ratios[d])
+        except (TypeError, ValueError):
+            raise TuningError("e_we/e_sn/e_vert/parent_time_step_ratio must be numbers") from None
+        if min(nx, ny, nz) < 1 or ratio < 1:
+            raise TuningError(f"d{d + 1:02d} grid is too small to decompose")
+        parent = int(table["parent_id"][0, d]) - 1 if d else -1
+        steps.append(steps[parent] * ratio if 0 <= parent < d else 1.0)
+        grids.append((nx, ny, nz, steps[-1]))
+    return grids
+
+
+def estimate_output(data, grids):
+    """Approximate history volume per domain: bytes per write, per file and per simulated hour."""
+    tc = data.get("time_control", {})
+    max_dom = len(grids)
+    intervals = domain_columns(tc.get("history_interval_arr"), max_dom, 3)
+    units = domain_columns(tc.get("history_interval_unit_arr"), max_dom, "h")
+    frames = domain_columns(tc.get("frames_per_outfile_arr"), max_dom, 1)
+    domains = []
+    for d, (nx, ny, nz, _) in enumerate(grids):
+        try:
+            minutes = float(intervals[d]) * (60 if units[d] == 'h' else 1)
+            frame_count = max(int(frames[d]), 1)
+        except (TypeError, ValueError):
+            raise TuningError("history_interval_arr and frames_per_outfile_arr must be numbers") from None
+        per_write = 4 * nx * ny * (HISTORY_3D_FIELDS * nz + HISTORY_2D_FIELDS + HISTORY_SOIL_VALUES)
+        domains.append({
+            "id": d + 1,
+            "history_interval_minutes": minutes,
+            "frames_per_outfile": frame_count,
+            "per_write_bytes": per_write,
+            "per_file_bytes": per_write * frame_count,
+            "per_simulated_hour_bytes": int(per_write * 60 / minutes) if minutes > 0 else None,
+        })
+    return {"per_history_write_bytes": sum(d["per_write_bytes"] for d in domains), "domains": domains}
+
+
+def _cost(grids, px, py):
+    cost = 0.0
+    for nx, ny, nz, steps in grids:
+        patch_x, patch_y = math.ceil(nx / px), math.ceil(ny / py)
+        cost += steps * nz * (patch_x * patch_y + HALO_COST * 2 * (patch_x + patch_y))
+    return cost
+
+
+def best_decomposition(grids, tasks, min_patch=DEFAULT_MIN_PATCH, row_multiple=1):
+    """Cheapest ``(nproc_x, nproc_y, cost)`` with ``nproc_x * nproc_y == tasks``, or ``None``.
+
+    Every domain's patches must be at least ``min_patch`` points on each side;
+    ``nproc_y`` must be a multiple of ``row_multiple`` (I/O tasks per group).
+    """
+    max_x = min(nx for nx, _, _, _ in grids) // min_patch
+    max_y = min(ny for _, ny, _, _ in grids) // min_patch
+    best = None
+    for px in range(1, math.isqrt(tasks) + 1):
+        if tasks % px:
+            continue
+        for x, y in ((px, tasks // px), (tasks // px, px)):
+            if x > max_x or y > max_y or y % row_multiple:
+                continue
+            cost = _cost(grids, x, y)
+            # 代价相同时取 nproc_x 较小者：x 方向 patch 更长，内层循环访存连续
+            if best is None or (cost, x) < (best[2], best[0]):
+                best = (x, y, cost)
+    return best
+
+
+def _largest_decomposition(grids, tasks, min_patch, row_multiple=1):
+    """Best decomposition using at most ``tasks`` tasks (fewer when ``tasks`` itself cannot be split)."""
+    max_x = min(nx for nx, _, _, _ in grids) // min_patch
+    max_y = min(ny for _, ny, _, _ in grids) // min_patch
+    for count in range(min(tasks, max_x * max_y), 0, -1):
+        found = best_decomposition(grids, count, min_patch, row_multiple)
+        if found is not None:
+            return count, found
+    return 0, None
+
+
+def _quilt_candidates(cores, output, quilting):
+    """``(nio_tasks_per_group, nio_groups)`` options to try, preferred first; (0, 1) disables quilting."""
+    if quilting == "off" or cores < QUILT_MIN_CORES:
+        return [(0, 1)]
+    per_write = output["per_history_write_bytes"]
+    groups = 1
+    shortest = min((d["history_interval_minutes"] for d in output["domains"]), default=0)
+    if 0 < shortest <= DOUBLE_BUFFER_MINUTES and cores >= DOUBLE_BUFFER_MIN_CORES:
+        groups = 2
+    # I/O 任务不超过总核数的 1/16
+    tasks = min(max(math.ceil(per_write / IO_BYTES_PER_TASK), 1), max(cores // (16 * groups), 1))
+    return [(t, groups) for t in range(tasks, 0, -1)] + [(0, 1)]
+
+
+def tune_decomposition(data, options):
+    """Chooses nproc_x/nproc_y and quilting for ``options = {"cores", "min_patch", "quilting"}``.
+
+    Returns the plan with per-domain patch sizes, the output estimate and a
+    human-readable rationale.
+    """
+    if not isinstance(options, dict):
+        raise TuningError("tuning must be an object")
+    if "cores" not in options:
+        raise TuningError("tuning.cores is required")
+    cores = _int_option(options, "cores", None, 1, MAX_CORES)
+    min_patch = _int_option(options, "min_patch", DEFAULT_MIN_PATCH, 1, 1000)
+    quilting = options.get("quilting", "auto")
+    if quilting not in QUILTING_MODES:
+        raise TuningError(f"tuning.quilting must be one of {', '.join(QUILTING_MODES)}")
+
+    grids = _grids(data)
+    output = estimate_output(data, grids)
+    rationale = []
+
+    candidates = [(t, g, cores - t * g) for t, g in _quilt_candidates(cores, output, quilting) if cores > t * g]
+    plan = None
+    for tasks_per_group, groups, available in candidates:
+        found = best_decomposition(grids, available, min_patch, max(tasks_per_group, 1))
+        if found is not None:
+            plan = (tasks_per_group, groups, available, found)
+            break
+    if plan is None:
+        # 核数无法恰好分解(如质数或超过网格允许的最大分块数)，退而求其次少用一些核
+        for tasks_per_group, groups, available in candidates:
+            compute, found = _largest_decomposition(grids, available, min_patch, max(tasks_per_group, 1))
+            if found is not None and (plan is None or compute > plan[2]):
+                plan = (tasks_per_group, groups, compute, found)
+        if plan is None:
+            raise TuningError(f"No decomposition gives patches of at least {min_patch} points")
+        idle = cores - plan[2] - plan[0] * plan[1]
+        rationale.append(f"{cores} tasks cannot all be used with patches of at least {min_patch} points; "
+                         f"{idle} task(s) are left idle.")
+    tasks_per_group, groups, compute, (nproc_x, nproc_y, _) = plan
+
+    smallest = min(grids, key=lambda g: g[0] * g[1])
+    rationale.append(f"{nproc_x}x{nproc_y} decomposition over {compute} compute tasks minimises the largest "
+                     f"patch plus halo perimeter, weighted by vertical levels and time steps per domain.")
+    rationale.append(f"Smallest domain ({smallest[0]}x{smallest[1]} points) gets "
+                     f"{math.ceil(smallest[0] / nproc_x)}x{math.ceil(smallest[1] / nproc_y)}-point patches "
+                     f"(minimum {min_patch}).")
+    per_write_mb = output["per_history_write_bytes"] / 1024 ** 2
+    if tasks_per_group:
+        rationale.append(f"About {per_write_mb:.0f} MB per history write: {groups} I/O group(s) of "
+                         f"{tasks_per_group} task(s) write asynchronously; nproc_y is a multiple of "
+                         f"nio_tasks_per_group.")
+    elif quilting == "off":
+        rationale.append("Quilting disabled by request; compute tasks write history output themselves.")
+    else:
+        rationale.append(f"About {per_write_mb:.0f} MB per history write on {cores} cores: "
+                         f"dedicated I/O tasks would not pay for themselves.")
+
+    return {
+        "cores": cores,
+        "compute_tasks": compute,
+        "io_tasks": tasks_per_group * groups,
+        "idle_tasks": cores - compute - tasks_per_group * groups,
+        "nproc_x": nproc_x,
+        "nproc_y": nproc_y,
+        "nio_tasks_per_group": tasks_per_group,
+        "nio_groups": groups,
+        "min_patch": min_patch,
+        "domains": [{"id": d + 1, "grid": [nx, ny, nz], "patch": [math.ceil(nx / nproc_x), math.ceil(ny / nproc_y)]}
+                    for d, (nx, ny, nz, _) in enumerate(grids)],
+        "output": output,
+        "rationale": rationale,
+    }
+
+
+def apply_tuning(data, plan):
+    """Copy of ``data`` with the plan's decomposition and quilting settings filled in."""
+    tuned = copy.deepcopy(data)
+    tuned.pop("tuning", None)
+    domain_setup = tuned.setdefault("domain_setup", {})
+    domain_setup["nproc_x"] = plan["nproc_x"]
+    domain_setup["nproc_y"] = plan["nproc_y"]
+    tuned["namelist_quilt"] = {"nio_tasks_per_group": plan["nio_tasks_per_group"], "nio_groups": plan["nio_groups"]}
+    return tuned
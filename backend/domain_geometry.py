@@ -0,0 +1,207 @@
+# domain_geometry.py
+# 模拟域几何预览：由 domain_setup 的投影参数与网格尺寸算出各域(含嵌套)的经纬度边界和可抽稀的网格，供前端画图
+#
+# 与 WPS 一致：d01 的中心在 (ref_lat, ref_lon)；嵌套域左下角位于父域第 (i_parent_start, j_parent_start) 个错位格点。
+# 结果按几何参数缓存，编码后的响应字节也一并缓存，拖动域时重复请求直接命中。
+
+import json
+import math
+import os
+
+import numpy as np
+
+from namelist_cache import NamelistCache, canonical_config_hash
+from nest_validation import build_nest_table
+from wrf_projection import EARTH_RADIUS, Projection, ProjectionError
+
+GEOMETRY_FORMATS = ("geojson", "binary")
+# 每条边最多的采样段数 (Lambert/极射赤面下边界是曲线)
+BOUNDARY_SEGMENTS = 64
+MAX_MESH_LINES = 500
+COORDINATE_DECIMALS = 5
+METRES_PER_DEGREE = 2 * math.pi * EARTH_RADIUS / 360.0
+
+GEOMETRY_KEYS = ("max_dom", "map_proj", "ref_lat", "ref_lon", "truelat1", "truelat2", "stand_lon",
+                 "dx_arr", "dy_arr", "e_we_arr", "e_sn_arr", "parent_id_arr", "parent_grid_ratio_arr",
+                 "i_parent_start_arr", "j_parent_start_arr")
+
+geometry_cache = NamelistCache(
+    max_entries=int(os.environ.get("WOLFER_GEOMETRY_CACHE_SIZE", 512)),
+    ttl_seconds=float(os.environ.get("WOLFER_GEOMETRY_CACHE_TTL", 3600)),
+)
+
+
+class GeometryError(ValueError):
+    """Raised when domain_setup does not describe a drawable grid."""
+
+
+def _number(domain_setup, key, default):
+    value = domain_setup.get(key, default)
+    if isinstance(value, bool):
+        raise GeometryError(f"{key} must be a number")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise GeometryError(f"{key} must be a number") from None
+    if not math.isfinite(value):
+        raise GeometryError(f"{key} must be a number")
+    return value
+
+
+def _edge_samples(count, segments):
+    """Indices ``0..count`` with at most ``segments`` steps, always including both ends."""
+    return np.unique(np.linspace(0, count, min(count, segments) + 1).round())
+
+
+def _mesh_samples(count, lines):
+    return np.unique(np.linspace(0, count - 1, min(count, lines)).round())
+
+
+def geometry_key(domain_setup, mesh_lines=0):
+    return canonical_config_hash({"domain_setup": {key: domain_setup.get(key) for key in GEOMETRY_KEYS},
+                                  "mesh": mesh_lines})
+
+
+def compute_geometry(domain_setup, mesh_lines=0):
+    """Per-domain boundary (and optional decimated mass-point mesh) in lat/lon.
+
+    Each domain is ``{"id", "parent", "dx", "dy", "e_we", "e_sn", "boundary",
+    "mesh_lat", "mesh_lon"}``; ``boundary`` is a closed ``(n, 2)`` lon/lat ring
+    along the outer (staggered) grid edge, counter-clockwise from the
+    south-west corner. ``mesh_*`` are ``(rows, cols)`` mass points, or ``None``.
+    """
+    if not isinstance(domain_setup, dict):
+        raise GeometryError("domain_setup must be an object")
+    if not 0 <= mesh_lines <= MAX_MESH_LINES:
+        raise GeometryError(f"mesh must be between 0 and {MAX_MESH_LINES}")
+    table, max_doms, errors = build_nest_table([domain_setup])
+    if errors[0]:
+        raise GeometryError("; ".join(errors[0]))
+    max_dom = int(max_doms[0])
+    columns = {name: table[name][0, :max_dom] for name in table}
+
+    ref_lat = _number(domain_setup, "ref_lat", 0.0)
+    ref_lon = _number(domain_setup, "ref_lon", 0.0)
+    if abs(ref_lat) > 90:
+        raise GeometryError("ref_lat must be between -90 and 90")
+    try:
+        projection = Projection(domain_setup.get("map_proj", "lambert"),
+                                _number(domain_setup, "truelat1", 30.0),
+                                _number(domain_setup, "truelat2", 60.0),
+                                _number(domain_setup, "stand_lon", ref_lon))
+    except ProjectionError as e:
+        raise GeometryError(str(e)) from None
+
+    dx, dy = float(columns["dx"][0]), float(columns["dy"][0])
+    if not (dx > 0 and dy > 0):
+        raise GeometryError("dx and dy must be positive")
+    if not projection.metric and dx > 90:
+        # lat-lon 网格在 WPS 中以度为单位；给的是米时按赤道换算
+        dx, dy = dx / METRES_PER_DEGREE, dy / METRES_PER_DEGREE
+    for name in ("e_we", "e_sn", "ratio"):
+        values = columns[name]
+        if not np.all(np.isfinite(values)) or np.any(values < (2 if name != "ratio" else 1)):
+            raise GeometryError(f"{name} values must be numbers >= {2 if name != 'ratio' else 1}")
+
+    # 各域左下角错位格点在投影平面上的坐标与格距
+    ref_x, ref_y = projection.forward(ref_lat, ref_lon)
+    origins, spacing = [], []
+    for d in range(max_dom):
+        e_we, e_sn = columns["e_we"][d], columns["e_sn"][d]
+        if d == 0:
+            spacing.append((dx, dy))
+            origins.append((ref_x - (e_we - 1) / 2 * dx, ref_y - (e_sn - 1) / 2 * dy))
+            continue
+        parent = int(columns["parent_id"][d]) - 1
+        if not 0 <= parent < d:
+            raise GeometryError(f"d{d + 1:02d} parent_id must refer to an earlier domain")
+        ratio = columns["ratio"][d]
+        (pdx, pdy), (px, py) = spacing[parent], origins[parent]
+        spacing.append((pdx / ratio, pdy / ratio))
+        origins.append((px + (columns["i_start"][d] - 1) * pdx, py + (columns["j_start"][d] - 1) * pdy))
+
+    curved = projection.code in (1, 2)
+    domains = []
+    for d in range(max_dom):
+        (ddx, ddy), (x0, y0) = spacing[d], origins[d]
+        cells_x, cells_y = int(columns["e_we"][d]) - 1, int(columns["e_sn"][d]) - 1
+        segments = BOUNDARY_SEGMENTS if curved else 1
+        ix, iy = _edge_samples(cells_x, segments), _edge_samples(cells_y, segments)
+        # 逆时针：南边 -> 东边 -> 北边 -> 西边，首尾闭合
+        ring_i = np.concatenate([ix, np.full(len(iy) - 1, cells_x), ix[::-1][1:], np.zeros(len(iy) - 1)])
+        ring_j = np.concatenate([np.zeros(len(ix)), iy[1:], np.full(len(ix) - 1, cells_y), iy[::-1][1:]])
+        lat, lon = projection.inverse(x0 + ring_i * ddx, y0 + ring_j * ddy)
+        domain = {
+            "id": d + 1, "parent": int(columns["parent_id"][d]) if d else 0,
+            "dx": ddx, "dy": ddy, "e_we": cells_x + 1, "e_sn": cells_y + 1,
+            "boundary": np.stack([lon, lat], axis=1),
+            "mesh_lat": None, "mesh_lon": None,
+        }
+        if mesh_lines:
+            mi, mj = _mesh_samples(cells_x, mesh_lines), _mesh_samples(cells_y, mesh_lines)
+            grid_x, grid_y = np.meshgrid(x0 + (mi + 0.5) * ddx, y0 + (mj + 0.5) * ddy)
+            domain["mesh_lat"], domain["mesh_lon"] = projection.inverse(grid_x, grid_y)
+        domains.append(domain)
+    return {"map_proj": projection.code, "domains": domains}
+
+
+def to_geojson(geometry):
+    """Compact GeoJSON FeatureCollection: one Polygon per domain plus a MultiLineString per mesh."""
+    def coords(lon, lat):
+        return np.round(np.stack([lon, lat], axis=-1), COORDINATE_DECIMALS).tolist()
+
+    features = []
+    for domain in geometry["domains"]:
+        properties = {key: domain[key] for key in ("id", "parent", "dx", "dy", "e_we", "e_sn")}
+        ring = domain["boundary"]
+        features.append({"type": "Feature", "properties": dict(properties, kind="boundary"),
+                         "geometry": {"type": "Polygon", "coordinates": [coords(ring[:, 0], ring[:, 1])]}})
+        if domain["mesh_lat"] is not None:
+            lat, lon = domain["mesh_lat"], domain["mesh_lon"]
+            lines = coords(lon, lat) + coords(lon.T, lat.T)
+            features.append({"type": "Feature", "properties": dict(properties, kind="mesh"),
+                             "geometry": {"type": "MultiLineString", "coordinates": lines}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def to_binary(geometry):
+    """``(layout, body)``: a little-endian float32 buffer and the offsets needed to slice it.
+
+    Per domain the body holds the boundary ring as ``(n, 2)`` lon/lat pairs,
+    then (if requested) the mesh as ``(rows, cols, 2)`` lon/lat pairs.
+    """
+    parts, layout, offset = [], [], 0
+    for domain in geometry["domains"]:
+        entry = {key: domain[key] for key in ("id", "parent", "dx", "dy", "e_we", "e_sn")}
+        blocks = [("boundary", domain["boundary"])]
+        if domain["mesh_lat"] is not None:
+            blocks.append(("mesh", np.stack([domain["mesh_lon"], domain["mesh_lat"]], axis=-1)))
+        for name, array in blocks:
+            array = np.ascontiguousarray(array, dtype="<f4")
+            entry[name] = {"offset": offset, "shape": list(array.shape)}
+            parts.append(array.tobytes())
+            offset += array.nbytes
+        layout.append(entry)
+    return {"map_proj": geometry["map_proj"], "dtype": "float32", "domains": layout}, b"".join(parts)
+
+
+def render_geometry(domain_setup, fmt="geojson", mesh_lines=0, cache=geometry_cache):
+    """``(etag, body, layout)`` for the preview, memoised by the geometry parameters and output format."""
+    if fmt not in GEOMETRY_FORMATS:
+        raise GeometryError(f"format must be one of {', '.join(GEOMETRY_FORMATS)}")
+    # 非对象的 domain_setup 不能参与缓存键，否则会命中 {} 的缓存结果
+    if not isinstance(domain_setup, dict):
+        raise GeometryError("domain_setup must be an object")
+    key = (geometry_key(domain_setup, mesh_lines), fmt)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    geometry = compute_geometry(domain_setup, mesh_lines)
+    if fmt == "geojson":
+        body = json.dumps(to_geojson(geometry), separators=(",", ":")).encode("utf-8")
+        layout = None
+    else:
+        layout, body = to_binary(geometry)
+    result = (f'"{key[0][:24]}-{fmt}"', body, layout)
+    cache.put(key, result)
+    return result
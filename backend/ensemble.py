@@ -0,0 +1,284 @@
+# ensemble.py
+# 集合(批量)namelist生成：展开参数扫描组合，并行渲染，边生成边流式打包输出
+
+import copy
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+MAX_BATCH_MEMBERS = int(os.environ.get("WOLFER_BATCH_MAX_MEMBERS", 5000))
+BATCH_CHUNK_SIZE = int(os.environ.get("WOLFER_BATCH_CHUNK_SIZE", 16))
+ARCHIVE_FORMATS = ("zip", "tar")
+
+WRF_DATE_FORMAT = "%Y-%m-%d_%H:%M:%S"
+
+_executor = None
+
+
+class SweepError(ValueError):
+    """Raised when a sweep spec cannot be expanded."""
+
+
+def default_pool_size():
+    """CPUs per server worker: every prefork worker owns a pool, so they split the machine."""
+    server_workers = max(int(os.environ.get("WOLFER_WORKERS", 1)), 1)
+    return max((os.cpu_count() or 1) // server_workers, 1)
+
+
+def _pool_context():
+    # 服务进程里有线程(作业执行器、SSE)，fork 出的子进程可能继承被持有的锁；改用 forkserver/spawn
+    method = os.environ.get("WOLFER_BATCH_START_METHOD")
+    if method is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def get_executor():
+    """Lazily create the shared render pool (process pool unless WOLFER_BATCH_EXECUTOR=thread)."""
+    global _executor
+    if _executor is None:
+        workers = int(os.environ.get("WOLFER_BATCH_WORKERS", 0)) or default_pool_size()
+        if os.environ.get("WOLFER_BATCH_EXECUTOR", "process") == "thread":
+            _executor = ThreadPoolExecutor(max_workers=workers)
+        else:
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _set_sweep_value(section, key, value):
+    """Write one sweep value into a config section.
+
+    Keys ending in ``_arr`` are replaced verbatim. A bare key (e.g. ``mp_physics``)
+    is applied to every domain column of ``<key>_arr`` when the base config has
+    that array, otherwise it is stored as a scalar.
+    """
+    if key.endswith("_arr"):
+        section[key] = value
+        return
+    arr_key = f"{key}_arr"
+    existing = section.get(arr_key)
+    if isinstance(existing, list):
+        section[arr_key] = [value] * max(len(existing), 1)
+    else:
+        section[key] = value
+
+
+def _shift_time_window(time_control, start_str):
+    """Move the run window so it starts at ``start_str`` while keeping its length."""
+    try:
+        new_start = datetime.strptime(start_str, WRF_DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise SweepError(f"Invalid start date in sweep: {start_str!r}")
+
+    starts = time_control.get("start_date_str_arr") or []
+    ends = time_control.get("end_date_str_arr") or []
+    try:
+        duration = (datetime.strptime(ends[0], WRF_DATE_FORMAT)
+                    - datetime.strptime(starts[0], WRF_DATE_FORMAT))
+    except (IndexError, TypeError, ValueError):
+        raise SweepError("base_config.time_control needs valid start/end dates to sweep start_dates")
+
+    new_end = new_start + duration
+    width = max(len(starts), 1)
+    time_control["start_date_str_arr"] = [new_start.strftime(WRF_DATE_FORMAT)] * width
+    time_control["end_date_str_arr"] = [new_end.strftime(WRF_DATE_FORMAT)] * width
+
+
+def _member_name(index, params):
+    parts = [f"m{index:04d}"]
+    for path, value in params:
+        label = path.rsplit(".", 1)[-1].replace("_physics", "").replace("_arr", "")
+        if path == "start_dates":
+            value = str(value).replace("-", "").replace(":", "").replace("_", "T")
+            label = "start"
+        elif isinstance(value, (list, tuple)):
+            value = "-".join(str(v) for v in value)
+        parts.append(f"{label}{value}")
+    return "_".join(parts).replace("/", "-").replace(":", "").replace(" ", "")
+
+
+def expand_sweep(base_config, sweep):
+    """Expand ``sweep`` into the cartesian product of ensemble members.
+
+    ``sweep`` maps config sections to ``{key: [values, ...]}`` (e.g.
+    ``{"physics": {"mp_physics": [6, 8], "cu_physics": [0, 1]}}``) and may carry
+    a ``start_dates`` list, which shifts the base run window to each start date.
+    Returns a list of ``{"index", "name", "params", "config"}`` dicts.
+    """
+    if not isinstance(base_config, dict):
+        raise SweepError("base_config must be an object")
+    if not isinstance(sweep, dict):
+        raise SweepError("sweep must be an object")
+
+    axes = []
+    for section, entries in sweep.items():
+        if section == "start_dates":
+            if not isinstance(entries, list) or not entries:
+                raise SweepError("sweep.start_dates must be a non-empty list")
+            axes.append(("start_dates", entries))
+            continue
+        if not isinstance(entries, dict):
+            raise SweepError(f"sweep.{section} must be an object of value lists")
+        for key, values in entries.items():
+            if not isinstance(values, list) or not values:
+                raise SweepError(f"sweep.{section}.{key} must be a non-empty list")
+            axes.append((f"{section}.{key}", values))
+
+    total = 1
+    for _, values in axes:
+        total *= len(values)
+    if total > MAX_BATCH_MEMBERS:
+        raise SweepError(f"Sweep expands to {total} members (limit {MAX_BATCH_MEMBERS})")
+
+    paths = [path for path, _ in axes]
+    members = []
+    for index, combo in enumerate(itertools.product(*(values for _, values in axes))):
+        config = copy.deepcopy(base_config)
+        params = list(zip(paths, combo))
+        for path, value in params:
+            if path == "start_dates":
+                _shift_time_window(config.setdefault("time_control", {}), value)
+            else:
+                section, key = path.split(".", 1)
+                _set_sweep_value(config.setdefault(section, {}), key, value)
+        members.append({
+            "index": index,
+            "name": _member_name(index, params),
+            "params": dict(params),
+            "config": config,
+        })
+    return members
+
+
+def render_chunk(render_fn, chunk):
+    """Render a chunk of members inside a pool worker; failures are returned, not raised."""
+    results = []
+    for member in chunk:
+        try:
+            files = render_fn(member["config"])
+            results.append((member["index"], files, None))
+        except Exception as exc:  # 单个成员失败不应中断整个批次
+            results.append((member["index"], None, f"{type(exc).__name__}: {exc}"))
+    return results
+
+
+def iter_rendered(members, render_fn, executor=None, chunk_size=BATCH_CHUNK_SIZE):
+    """Yield ``(member, files, error)`` in completion order.
+
+    Closing the generator early (client disconnect) cancels the chunks that
+    have not started, so the shared pool is not kept busy for nobody.
+    """
+    executor = executor or get_executor()
+    by_index = {m["index"]: m for m in members}
+    futures = {}
+    try:
+        for start in range(0, len(members), chunk_size):
+            chunk = members[start:start + chunk_size]
+            futures[executor.submit(render_chunk, render_fn, chunk)] = chunk
+
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as exc:  # e.g. BrokenProcessPool
+                error = f"{type(exc).__name__}: {exc}"
+                results = [(m["index"], None, error) for m in futures[future]]
+            for index, files, error in results:
+                yield by_index[index], files, error
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that the archive writers flush into."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _tar_add(tar, name, payload, mtime):
+    info = tarfile.TarInfo(name)
+    info.size = len(payload)
+    info.mtime = mtime
+    tar.addfile(info, io.BytesIO(payload))
+
+
+def stream_archive(members, render_fn, archive_format="zip", executor=None, manifest_extra=None):
+    """Yield archive bytes as members finish rendering.
+
+    Each member becomes ``<name>/<filename>`` in the archive; a final
+    ``manifest.json`` records parameters and per-member success or error,
+    plus any ``manifest_extra`` keys.
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise SweepError(f"Unsupported archive format: {archive_format}")
+
+    sink = _StreamBuffer()
+    mtime = int(time.time())
+    if archive_format == "zip":
+        archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+
+        def add(name, payload):
+            archive.writestr(name, payload)
+    else:
+        archive = tarfile.open(fileobj=sink, mode="w|gz")
+
+        def add(name, payload):
+            _tar_add(archive, name, payload, mtime)
+
+    manifest = []
+    rendered = iter_rendered(members, render_fn, executor=executor)
+    try:
+        for member, files, error in rendered:
+            entry = {"index": member["index"], "name": member["name"], "params": member["params"]}
+            if error is None:
+                for filename, content in files.items():
+                    add(f"{member['name']}/{filename}", content.encode("utf-8"))
+                entry.update({"success": True, "files": sorted(files)})
+            else:
+                entry.update({"success": False, "error": error})
+            manifest.append(entry)
+            data = sink.drain()
+            if data:
+                yield data
+
+        manifest.sort(key=lambda e: e["index"])
+        summary = {
+            "total": len(manifest),
+            "succeeded": sum(1 for e in manifest if e["success"]),
+            "failed": sum(1 for e in manifest if not e["success"]),
+            "members": manifest,
+        }
+        summary.update(manifest_extra or {})
+        add("manifest.json", json.dumps(summary, indent=2, ensure_ascii=False).encode("utf-8"))
+    finally:
+        # 客户端断开时响应被关闭，GeneratorExit 落到这里：取消尚未开始渲染的块
+        rendered.close()
+        archive.close()
+    yield sink.drain()
@@ -0,0 +1,673 @@
+# job_queue.py
+# WPS/WRF 流水线作业：SQLite 作业表是所有worker进程共享的优先级队列，每个进程一个有界线程池认领作业，
+# 按阶段(geogrid/ungrib/metgrid/real/wrf)启动可配置的可执行文件；请求线程只负责入队和读状态，从不等待作业。
+#
+# 每个作业一个工作目录：namelist.wps/namelist.input、各阶段日志与 events.jsonl。运行中增量读取日志并解析为进度，
+# 事件追加写入 events.jsonl(行号即事件ID)，任意worker的 SSE 端点都能跟读；取消请求同样经作业表传递给运行方。
+#
+# 作业的 user 是调用方自报的命名空间(HTTP 层取自 X-Wolfer-User)，只用于分组、列表与配额，不是访问控制。
+
+import json
+import logging
+import os
+import re
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from config_store import ThreadConnections, default_data_dir
+from metrics import log_event
+
+STAGES = ("geogrid", "ungrib", "metgrid", "real", "wrf")
+STAGE_EXECUTABLES = {stage: f"{stage}.exe" for stage in STAGES}
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+USER_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._@-]{0,63}$")
+ANONYMOUS_USER = "anonymous"
+MIN_PRIORITY, MAX_PRIORITY, DEFAULT_PRIORITY = 0, 9, 5
+
+POLL_INTERVAL = 0.2
+CANCEL_CHECK_INTERVAL = 0.5
+STATE_UPDATE_INTERVAL = 1.0
+KILL_GRACE_SECONDS = 10
+SWEEP_INTERVAL = 600
+# 进度变化不足此值时不发事件(wrf 每个时间步都打印一行 Timing)
+PROGRESS_STEP = 0.005
+MAX_LOG_LINE = 2000
+# 轮询(?after=)：一次最多等待的秒数与返回的事件数
+MAX_POLL_WAIT = 25.0
+MAX_POLL_EVENTS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    stages TEXT NOT NULL,
+    stage_index INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    window_start TEXT,
+    window_end TEXT,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user, status);
+"""
+
+# 各阶段：(按模拟时刻推进的日志行, 成功结束标志)。WPS 程序出错时退出码也可能是 0，因此以标志判定成功
+STAGE_PATTERNS = {
+    "geogrid": (None, "Successful completion of geogrid"),
+    "ungrib": (re.compile(r"Inventory for date = (\d{4}-\d\d-\d\d[ _]\d\d:\d\d:\d\d)"),
+               "Successful completion of ungrib"),
+    "metgrid": (re.compile(r"Processing (\d{4}-\d\d-\d\d_\d\d(?::\d\d:\d\d)?)"),
+                "Successful completion of metgrid"),
+    "real": (re.compile(r"Time period #\s*\d+ to process = (\d{4}-\d\d-\d\d_\d\d:\d\d:\d\d)"),
+             "SUCCESS COMPLETE REAL_EM INIT"),
+    "wrf": (re.compile(r"Timing for main: time (\d{4}-\d\d-\d\d_\d\d:\d\d:\d\d) on domain\s+1:"),
+            "SUCCESS COMPLETE WRF"),
+}
+DOMAIN_RE = re.compile(r"Processing domain\s+(\d+)\s+of\s+(\d+)")
+ERROR_RE = re.compile(r"\b(?:ERROR|FATAL)\b|Segmentation fault")
+# real/wrf 用 MPI 运行时日志写在 rsl 文件里
+RSL_STAGES = ("real", "wrf")
+RSL_RE = re.compile(r"^rsl\.(?:out|error)\.\d+$")
+
+
+class JobError(ValueError):
+    """Raised for an unusable job request."""
+
+
+class JobNotFound(JobError):
+    """Raised when a job does not exist (or belongs to another user)."""
+
+
+class JobLimitError(JobError):
+    """Raised when a user already has the maximum number of unfinished jobs."""
+
+
+def _parse_time(text):
+    text = text.replace("_", " ")
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class StageProgress:
+    """Fraction of one stage completed, updated line by line from its log.
+
+    Stages that loop over domains (geogrid, metgrid) report
+    ``(domain - 1 + time fraction) / domains``; the time fraction is the
+    latest simulated time reached within the run window.
+    """
+
+    def __init__(self, stage, window):
+        self.time_re, self.success_marker = STAGE_PATTERNS[stage]
+        self.window = window
+        self.domain, self.domains, self.time_fraction = 1, 1, 0.0
+        self.completed = False
+
+    @property
+    def fraction(self):
+        if self.completed:
+            return 1.0
+        return min((self.domain - 1 + self.time_fraction) / self.domains, 1.0)
+
+    def feed(self, line):
+        """Updates the state from one log line; returns ``"error"``/``"info"`` for lines worth reporting."""
+        if self.success_marker in line:
+            self.completed = True
+            return "info"
+        match = DOMAIN_RE.search(line)
+        if match:
+            domain, domains = int(match.group(1)), int(match.group(2))
+            if 1 <= domain <= domains:
+                self.domain, self.domains, self.time_fraction = domain, domains, 0.0
+            return None
+        match = self.time_re.search(line) if self.time_re is not None else None
+        if match:
+            moment = _parse_time(match.group(1))
+            if moment is not None and self.window is not None:
+                start, end = self.window
+                span = (end - start).total_seconds()
+                if span > 0:
+                    fraction = (moment - start).total_seconds() / span
+                    self.time_fraction = max(self.time_fraction, min(max(fraction, 0.0), 1.0))
+            return None
+        return "error" if ERROR_RE.search(line) else None
+
+
+class LogTail:
+    """Complete lines appended to a file since the previous call; the file need not exist yet."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self._partial = b""
+
+    def lines(self, final=False):
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(self.offset)
+                chunk = fh.read()
+        except FileNotFoundError:
+            chunk = b""
+        self.offset += len(chunk)
+        parts = (self._partial + chunk).split(b"\n")
+        self._partial = parts.pop()
+        if final and self._partial:
+            parts.append(self._partial)
+            self._partial = b""
+        return [part.decode("utf-8", "replace").rstrip("\r")[:MAX_LOG_LINE] for part in parts]
+
+
+class EventLog:
+    """Append-only ``events.jsonl``; an event's ID is its line number.
+
+    Only one writer at a time: the submitter before the job is queued, the
+    worker running it, or the canceller of a still-queued job.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, "rb") as fh:
+                self.count = sum(1 for _ in fh)
+        except FileNotFoundError:
+            self.count = 0
+
+    def append(self, kind, **fields):
+        self.count += 1
+        event = {"id": self.count, "time": time.time(), "type": kind, **fields}
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(event, separators=(",", ":"), ensure_ascii=False) + "\n")
+        return event
+
+
+class StreamSlots:
+    """Per-process cap on open event streams; each one holds a request thread until its job ends."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+
+def _terminate(process):
+    """SIGTERM the stage's process group, then SIGKILL after a grace period."""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(KILL_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+
+def _archive_rsl(workdir, stage):
+    """Moves rsl.out.*/rsl.error.* into ``rsl_<stage>/`` so the next MPI stage starts with fresh logs."""
+    names = [name for name in os.listdir(workdir) if RSL_RE.match(name)]
+    if names:
+        target = os.path.join(workdir, f"rsl_{stage}")
+        os.makedirs(target, exist_ok=True)
+        for name in names:
+            os.replace(os.path.join(workdir, name), os.path.join(target, name))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Priority queue of pipeline jobs in ``root/jobs.sqlite3`` plus a bounded pool of runner threads.
+
+    Jobs are claimed highest priority first (then oldest), skipping users who
+    already have ``user_running`` jobs running anywhere; ``user_queued`` caps
+    each user's unfinished jobs. Runners poll for work, so a job submitted to
+    one worker process may run in another.
+
+    ``user`` is a caller-supplied namespace, not an authenticated identity:
+    it keeps one client's jobs out of another's listings and limits, but
+    anyone who names the namespace can read or cancel its jobs.
+    """
+
+    def __init__(self, root, workers=2, user_running=1, user_queued=20, commands=None,
+                 stage_timeout=0.0, require_marker=True, retention_seconds=7 * 86400, clock=time.time):
+        self.root = root
+        self.workers = workers
+        self.user_running = user_running
+        self.user_queued = user_queued
+        commands = commands or {}
+        self.commands = {stage: list(commands.get(stage) or [STAGE_EXECUTABLES[stage]]) for stage in STAGES}
+        self.stage_timeout = stage_timeout
+        self.require_marker = require_marker
+        self.retention_seconds = retention_seconds
+        self._clock = clock
+        os.makedirs(root, exist_ok=True)
+        self._db = ThreadConnections(os.path.join(root, "jobs.sqlite3"))
+        self._db().executescript(SCHEMA)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.owner = None
+
+    # --- 提交与查询(请求线程) ---
+    def workdir(self, job_id):
+        return os.path.join(self.root, job_id[:2], job_id)
+
+    def _events_path(self, job_id):
+        return os.path.join(self.workdir(job_id), "events.jsonl")
+
+    def submit(self, files, stages=None, user=ANONYMOUS_USER, priority=DEFAULT_PRIORITY, window=None):
+        """Queues a job whose working directory holds ``files``; returns the job.
+
+        ``stages`` is a subset of ``STAGES`` in pipeline order (default: all);
+        ``window`` is the ``(start, end)`` WRF date strings used to turn
+        simulated times in the logs into progress.
+        """
+        stages = list(STAGES) if stages is None else stages
+        if (not isinstance(stages, list) or not stages or any(stage not in STAGES for stage in stages)
+                or stages != sorted(set(stages), key=STAGES.index)):
+            raise JobError(f"stages must be a non-empty subset of {', '.join(STAGES)}, in that order")
+        if isinstance(priority, bool) or not isinstance(priority, int) or not MIN_PRIORITY <= priority <= MAX_PRIORITY:
+            raise JobError(f"priority must be an integer between {MIN_PRIORITY} and {MAX_PRIORITY}")
+        if not USER_RE.match(user or ""):
+            raise JobError("Invalid user name")
+        start, end = window or (None, None)
+
+        job_id = uuid.uuid4().hex
+        workdir = self.workdir(job_id)
+        os.makedirs(workdir)
+        for name, content in files.items():
+            with open(os.path.join(workdir, name), "w", encoding="utf-8") as fh:
+                fh.write(content)
+        now = self._clock()
+        EventLog(self._events_path(job_id)).append("status", status="queued", stages=stages, priority=priority)
+
+        def insert(conn):
+            unfinished = conn.execute("SELECT COUNT(*) FROM jobs WHERE user = ? AND status IN ('queued', 'running')",
+                                      (user,)).fetchone()[0]
+            if unfinished >= self.user_queued:
+                raise JobLimitError(f"User {user} already has {unfinished} unfinished job(s) "
+                                    f"(limit {self.user_queued})")
+            conn.execute("INSERT INTO jobs (id, user, priority, status, stages, window_start, window_end, created_at) "
+                         "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                         (job_id, user, priority, json.dumps(stages), start, end, now))
+
+        try:
+            self._db.write(insert)
+        except BaseException:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        self._wake.set()
+        return self.get(job_id, user)
+
+    @staticmethod
+    def _job(row):
+        stages = json.loads(row["stages"])
+        return {
+            "job_id": row["id"], "user": row["user"], "priority": row["priority"], "status": row["status"],
+            "stages": stages,
+            "stage": stages[row["stage_index"]] if row["stage_index"] < len(stages) else None,
+            "stage_index": row["stage_index"], "progress": row["progress"], "message": row["message"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "created_at": row["created_at"], "started_at": row["started_at"], "finished_at": row["finished_at"],
+        }
+
+    def _row(self, job_id, user=None):
+        """The job's row; another user's job is reported as unknown rather than forbidden."""
+        if not isinstance(job_id, str) or not JOB_ID_RE.match(job_id):
+            raise JobNotFound(f"Unknown job: {job_id}")
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (user is not None and row["user"] != user):
+            raise JobNotFound(f"Unknown job: {job_id}")
+        return row
+
+    def get(self, job_id, user):
+        return self._job(self._row(job_id, user))
+
+    def list_jobs(self, user, status=None, limit=100):
+        """``user``'s jobs, newest first."""
+        limit = max(1, min(int(limit), 500))
+        if status is None:
+            rows = self._db().execute("SELECT * FROM jobs WHERE user = ? ORDER BY created_at DESC LIMIT ?",
+                                      (user, limit)).fetchall()
+        else:
+            rows = self._db().execute("SELECT * FROM jobs WHERE user = ? AND status = ? "
+                                      "ORDER BY created_at DESC LIMIT ?", (user, status, limit)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def cancel(self, job_id, user):
+        """Cancels a queued job at once; a running job is stopped by its runner within a second or so."""
+        self._row(job_id, user)
+        now = self._clock()
+
+        def apply(conn):
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row["status"] == "queued":
+                conn.execute("UPDATE jobs SET status = 'cancelled', message = 'Cancelled before start', "
+                             "finished_at = ? WHERE id = ?", (now, job_id))
+                return True
+            if row["status"] == "running":
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return False
+
+        if self._db.write(apply):
+            EventLog(self._events_path(job_id)).append("status", status="cancelled", message="Cancelled before start")
+        return self.get(job_id, user)
+
+    def stats(self):
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for row in self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[row[0]] = row[1]
+        return counts
+
+    def stream_events(self, job_id, user, last_event_id=0, stop=lambda: False, heartbeat=15.0):
+        """Server-Sent Events for the job from ``last_event_id`` on; ends after the final status event."""
+        self._row(job_id, user)
+        tail = LogTail(self._events_path(job_id))
+        yield "retry: 2000\n\n"
+        quiet_since = last_check = time.monotonic()
+        finished = False
+        while True:
+            lines = tail.lines()
+            for line in lines:
+                event = json.loads(line)
+                if event["id"] <= last_event_id:
+                    continue
+                last_event_id = event["id"]
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {line}\n\n"
+                if event["type"] == "status" and event["status"] in TERMINAL_STATUSES:
+                    return
+            now = time.monotonic()
+            if lines:
+                quiet_since = now
+                continue
+            if finished or stop():
+                return
+            if now - last_check >= 1.0:
+                # 客户端在结束之后才(重新)连接时，终态事件已经在 last_event_id 之前；再读一遍文件后结束
+                last_check = now
+                finished = self._row(job_id)["status"] in TERMINAL_STATUSES
+                if finished:
+                    continue
+            if now - quiet_since >= heartbeat:
+                quiet_since = now
+                yield ": keep-alive\n\n"
+            time.sleep(0.25)
+
+    def events(self, job_id, user, after=0, wait=0.0, stop=lambda: False, limit=MAX_POLL_EVENTS):
+        """Polling alternative to ``stream_events``: events after ``after``, waiting up to ``wait`` seconds.
+
+        Returns ``{"events", "last_event_id", "done"}``; the client polls
+        again with ``after=last_event_id`` until ``done``. The wait is capped
+        at ``MAX_POLL_WAIT`` so a poll never holds a request thread for long.
+        """
+        self._row(job_id, user)
+        wait = min(wait, MAX_POLL_WAIT) if wait > 0 else 0.0
+        deadline = time.monotonic() + wait
+        tail = LogTail(self._events_path(job_id))
+        pending, terminal_id = [], None
+        while True:
+            for line in tail.lines():
+                event = json.loads(line)
+                if event["type"] == "status" and event["status"] in TERMINAL_STATUSES:
+                    terminal_id = event["id"]
+                if event["id"] > after:
+                    pending.append(event)
+            if pending or terminal_id is not None or stop() or time.monotonic() >= deadline:
+                break
+            time.sleep(0.25)
+        events = pending[:limit]
+        last_event_id = events[-1]["id"] if events else after
+        return {"events": events, "last_event_id": last_event_id,
+                "done": terminal_id is not None and terminal_id <= last_event_id}
+
+    # --- 运行(worker 线程) ---
+    def start(self):
+        """Starts this process's runner threads; further calls in the same process do nothing."""
+        with self._start_lock:
+            if self._started_pid == os.getpid() or self.workers <= 0:
+                return
+            self._started_pid = os.getpid()
+            self.owner = f"{socket.gethostname()}:{os.getpid()}"
+            self._stopping.clear()
+            self._requeue_orphans()
+            self._threads = [threading.Thread(target=self._worker, name=f"wolfer-job-{index}", daemon=True)
+                             for index in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def shutdown(self, timeout=KILL_GRACE_SECONDS + 5):
+        """Stops the runners; jobs they were running go back to the queue at their current stage."""
+        self._stopping.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        self._started_pid = None
+
+    def _requeue_orphans(self):
+        """Re-queues jobs left running by a dead process on this host."""
+        host = socket.gethostname()
+        orphans = []
+        for row in self._db().execute("SELECT id, owner FROM jobs WHERE status = 'running'").fetchall():
+            owner_host, _, pid = (row["owner"] or "").rpartition(":")
+            if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                orphans.append((row["id"], row["owner"]))
+        for job_id, owner in orphans:
+            requeued = self._db.write(lambda conn: conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE id = ? AND status = 'running' AND owner = ?",
+                (job_id, owner)).rowcount)
+            if requeued:
+                EventLog(self._events_path(job_id)).append("status", status="queued", message="Worker exited; requeued")
+
+    def _claim(self):
+        def apply(conn):
+            row = conn.execute(
+                "SELECT * FROM jobs AS j WHERE status = 'queued' AND (SELECT COUNT(*) FROM jobs AS r "
+                "WHERE r.user = j.user AND r.status = 'running') < ? ORDER BY priority DESC, created_at LIMIT 1",
+                (self.user_running,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', owner = ?, started_at = COALESCE(started_at, ?) "
+                             "WHERE id = ?", (self.owner, self._clock(), row["id"]))
+            return row
+
+        return self._db.write(apply)
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._db.write(lambda conn: conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?",
+                                                 (*fields.values(), job_id)))
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except Exception:
+                log_event(logging.ERROR, "job claim failed")
+                row = None
+            if row is None:
+                self._maybe_sweep()
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            try:
+                self._run(row)
+            except Exception as e:
+                # 运行器自身出错(如磁盘满)：作业记为失败，线程继续服务其他作业
+                log_event(logging.ERROR, "job runner failed", job_id=row["id"], error=repr(e))
+                self._update(row["id"], status="failed", message=f"Internal error: {e}", finished_at=self._clock())
+                EventLog(self._events_path(row["id"])).append("status", status="failed", message="Internal error")
+
+    def _run(self, row):
+        job_id = row["id"]
+        workdir = self.workdir(job_id)
+        events = EventLog(self._events_path(job_id))
+        stages = json.loads(row["stages"])
+        start, end = _parse_time(row["window_start"] or ""), _parse_time(row["window_end"] or "")
+        window = (start, end) if start and end else None
+        events.append("status", status="running", stage=stages[row["stage_index"]])
+        log_event(logging.INFO, "job started", job_id=job_id, user=row["user"], stages=stages[row["stage_index"]:])
+
+        for index in range(row["stage_index"], len(stages)):
+            outcome, message = self._run_stage(job_id, stages, index, window, workdir, events)
+            if outcome == "succeeded":
+                self._update(job_id, stage_index=index + 1, progress=(index + 1) / len(stages))
+                continue
+            if outcome == "interrupted":
+                self._update(job_id, status="queued", owner=None, message=message)
+                events.append("status", status="queued", message=message)
+                return
+            self._update(job_id, status=outcome, message=message, finished_at=self._clock())
+            events.append("status", status=outcome, message=message)
+            log_event(logging.INFO, "job finished", job_id=job_id, status=outcome, reason=message)
+            return
+        self._update(job_id, status="succeeded", progress=1.0, message="", finished_at=self._clock())
+        events.append("status", status="succeeded")
+        log_event(logging.INFO, "job finished", job_id=job_id, status="succeeded")
+
+    def _run_stage(self, job_id, stages, index, window, workdir, events):
+        """Runs one stage to completion; returns ``(outcome, message)``."""
+        stage, total = stages[index], len(stages)
+        argv = self.commands[stage]
+        log_path = os.path.join(workdir, f"{stage}.log")
+        tails = [LogTail(log_path)]
+        if stage in RSL_STAGES:
+            _archive_rsl(workdir, "previous")
+            tails.append(LogTail(os.path.join(workdir, "rsl.error.0000")))
+        progress = StageProgress(stage, window)
+        events.append("stage", stage=stage, status="started", command=argv)
+        self._update(job_id, message=f"Running {stage}")
+        started = time.monotonic()
+        try:
+            with open(log_path, "wb") as log:
+                process = subprocess.Popen(argv, cwd=workdir, stdin=subprocess.DEVNULL, stdout=log,
+                                           stderr=subprocess.STDOUT, start_new_session=True)
+        except OSError as e:
+            message = f"{stage}: cannot start {argv[0]}: {e.strerror or e}"
+            events.append("stage", stage=stage, status="failed", message=message)
+            return "failed", message
+
+        def consume(final=False):
+            for tail in tails:
+                for line in tail.lines(final):
+                    level = progress.feed(line)
+                    if level is not None:
+                        events.append("log", stage=stage, level=level, line=line)
+
+        reported = index / total
+        last_state = last_cancel_check = started
+        stopped = None
+        while True:
+            code = process.poll()
+            consume(final=code is not None)
+            overall = (index + progress.fraction) / total
+            if overall - reported >= PROGRESS_STEP:
+                reported = overall
+                events.append("progress", stage=stage, stage_progress=round(progress.fraction, 4),
+                              progress=round(overall, 4))
+            now = time.monotonic()
+            if now - last_state >= STATE_UPDATE_INTERVAL:
+                last_state = now
+                self._update(job_id, progress=round(overall, 4))
+            if code is not None:
+                break
+            if self._stopping.is_set():
+                stopped = ("interrupted", "Server shutting down; requeued")
+            elif now - last_cancel_check >= CANCEL_CHECK_INTERVAL:
+                last_cancel_check = now
+                if self._row(job_id)["cancel_requested"]:
+                    stopped = ("cancelled", "Cancelled by user")
+            if stopped is None and self.stage_timeout and now - started > self.stage_timeout:
+                stopped = ("failed", f"{stage} exceeded the {self.stage_timeout:g}s stage timeout")
+            if stopped is not None:
+                _terminate(process)
+                consume(final=True)
+                break
+            time.sleep(POLL_INTERVAL)
+
+        if stage in RSL_STAGES:
+            _archive_rsl(workdir, stage)
+        seconds = round(time.monotonic() - started, 3)
+        outcome, message = stopped or ("succeeded", "")
+        if stopped is None and code != 0:
+            outcome, message = "failed", f"{stage} exited with status {code}"
+        elif stopped is None and self.require_marker and not progress.completed:
+            outcome, message = "failed", f"{stage} finished without '{progress.success_marker}'"
+        events.append("stage", stage=stage, status=outcome, seconds=seconds,
+                      **({"message": message} if message else {}))
+        return outcome, message
+
+    def _maybe_sweep(self):
+        now = self._clock()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        cutoff = now - self.retention_seconds
+        expired = [row["id"] for row in self._db().execute(
+            "SELECT id FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?",
+            (cutoff,)).fetchall()]
+        for job_id in expired:
+            shutil.rmtree(self.workdir(job_id), ignore_errors=True)
+        if expired:
+            self._db.write(lambda conn: conn.executemany("DELETE FROM jobs WHERE id = ?",
+                                                         [(job_id,) for job_id in expired]))
+
+
+def create_job_queue():
+    # 作业表、历史与工作目录是持久数据，与配置库放在同一个数据目录下
+    root = os.environ.get("WOLFER_JOB_DIR") or os.path.join(default_data_dir(), "jobs")
+    commands = {stage: shlex.split(os.environ[f"WOLFER_JOB_COMMAND_{stage.upper()}"])
+                for stage in STAGES if os.environ.get(f"WOLFER_JOB_COMMAND_{stage.upper()}")}
+    return JobQueue(
+        root,
+        workers=int(os.environ.get("WOLFER_JOB_WORKERS", 2)),
+        user_running=int(os.environ.get("WOLFER_JOB_USER_RUNNING", 1)),
+        user_queued=int(os.environ.get("WOLFER_JOB_USER_QUEUED", 20)),
+        commands=commands,
+        stage_timeout=float(os.environ.get("WOLFER_JOB_STAGE_TIMEOUT", 0)),
+        require_marker=os.environ.get("WOLFER_JOB_REQUIRE_MARKER", "1") != "0",
+        retention_seconds=float(os.environ.get("WOLFER_JOB_RETENTION", 7 * 86400)),
+    )
@@ -0,0 +1,109 @@
+# lifecycle.py
+# 进程生命周期：就绪/存活探针、在途请求计数、优雅关闭时的排空与清理钩子
+
+import logging
+import threading
+import time
+
+from flask import jsonify
+
+from metrics import log_event
+
+
+class Lifecycle:
+    """Readiness and drain state of one server process."""
+
+    def __init__(self):
+        self._ready = threading.Event()
+        self._draining = threading.Event()
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._shutdown_hooks = []
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and not self._draining.is_set()
+
+    @property
+    def draining(self):
+        return self._draining.is_set()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def mark_ready(self):
+        self._ready.set()
+
+    def on_shutdown(self, hook):
+        """Registers ``hook`` to run on shutdown; registering the same hook again does nothing."""
+        if hook not in self._shutdown_hooks:
+            self._shutdown_hooks.append(hook)
+
+    def request_started(self):
+        with self._idle:
+            self._in_flight += 1
+
+    def request_finished(self):
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight <= 0:
+                self._idle.notify_all()
+
+    def begin_shutdown(self):
+        """Stops reporting ready so load balancers drain this process."""
+        if not self._draining.is_set():
+            self._draining.set()
+            log_event(logging.INFO, "draining", in_flight=self._in_flight)
+
+    def wait_idle(self, timeout):
+        """Blocks until no request is in flight or ``timeout`` seconds pass; returns True if idle."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=30):
+        """Drains in-flight requests, then runs the shutdown hooks once."""
+        self.begin_shutdown()
+        idle = self.wait_idle(timeout)
+        hooks, self._shutdown_hooks = self._shutdown_hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception:
+                logging.getLogger("wolfer").exception("shutdown hook failed")
+        log_event(logging.INFO, "shutdown complete", drained=idle, in_flight=self._in_flight)
+        return idle
+
+
+lifecycle = Lifecycle()
+
+
+def install_lifecycle(app, state=lifecycle):
+    """Registers in-flight tracking and the /api/health/live and /api/health/ready probes on ``app``."""
+
+    @app.before_request
+    def _track_request():
+        state.request_started()
+
+    @app.teardown_request
+    def _untrack_request(exc):
+        state.request_finished()
+
+    @app.route('/api/health/live', methods=['GET'])
+    def health_live():
+        """存活探针：进程能处理请求即返回200"""
+        return jsonify({"status": "alive"}), 200
+
+    @app.route('/api/health/ready', methods=['GET'])
+    def health_ready():
+        """就绪探针：启动预热完成且未进入排空时返回200，否则503"""
+        if state.ready:
+            return jsonify({"status": "ready", "in_flight": state.in_flight}), 200
+        status = "draining" if state.draining else "starting"
+        return jsonify({"status": status, "in_flight": state.in_flight}), 503
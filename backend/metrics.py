@@ -0,0 +1,365 @@
+# metrics.py
+# 请求级计时、阶段计时直方图(Prometheus文本格式，多worker时经共享目录汇总)、结构化分级采样日志与按请求的cProfile开关
+
+import cProfile
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import g, request
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_HEADER = "X-Wolfer-Profile"
+
+logger = logging.getLogger("wolfer")
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label tuple."""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), list(series)] for labels, series in self._series.items()]
+
+    def render(self, items=None):
+        """Renders this process's series, or ``items`` merged from several processes."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        if items is None:
+            with self._lock:
+                items = dict(self._series)
+        for labels, series in sorted(items.items()):
+            base = ",".join(f'{k}="{_escape_label(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def render(self, items=None):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        if items is None:
+            with self._lock:
+                items = dict(self._values)
+        for labels, value in sorted(items.items()):
+            base = ",".join(f'{k}="{_escape_label(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._gauge_collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_gauge_collector(self, collector):
+        """``collector()`` returns ``[(name, help, value), ...]`` evaluated at scrape time."""
+        self._gauge_collectors.append(collector)
+
+    def snapshot(self):
+        """Counter and histogram state as JSON-serialisable lists, keyed by metric name."""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render_prometheus(self, snapshots=None):
+        """Prometheus text; with ``snapshots`` the counters and histograms are summed across them.
+
+        Gauge collectors always report the rendering process.
+        """
+        lines = []
+        for metric in self._metrics:
+            if snapshots is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render(_merge_series(snapshots, metric.name)))
+        for collector in self._gauge_collectors:
+            for name, help_text, value in collector():
+                lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+def _merge_series(snapshots, name):
+    merged = {}
+    for snapshot in snapshots:
+        for labels, value in snapshot.get(name, ()):
+            key = tuple(labels)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = current + value
+    return merged
+
+
+class SharedMetrics:
+    """Per-process snapshots in a directory shared by the workers of one server.
+
+    Each worker writes its counters and histograms to ``<pid>-<token>.json`` at
+    most every ``flush_interval`` seconds (a throttled flush is deferred, not
+    dropped, so a file is never older than that) and on every scrape; a scrape
+    sums all files, so /api/metrics reports the whole server whichever worker
+    answers. Files of exited workers are kept so totals never go backwards.
+    """
+
+    def __init__(self, directory, registry, flush_interval=1.0, clock=time.monotonic):
+        self.directory = directory
+        self.registry = registry
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._last_flush = float("-inf")
+        self._lock = threading.Lock()
+        self._timer = None
+        self._pid = None
+        self._path = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _own_path(self):
+        # fork 之后重新取名，子进程不会覆盖父进程或同 pid 旧进程的文件
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f"{self._pid}-{uuid.uuid4().hex[:8]}.json")
+        return self._path
+
+    def flush(self, force=False):
+        now = self._clock()
+        if not force and now - self._last_flush < self.flush_interval:
+            self._defer(self.flush_interval - (now - self._last_flush))
+            return
+        # 另一个线程正在写时跳过；抓取时(force)等它写完
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._last_flush = now
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(self.registry.snapshot(), fh)
+            os.replace(tmp_path, self._own_path())
+        finally:
+            self._lock.release()
+
+    def _defer(self, delay):
+        timer = self._timer
+        if timer is not None and timer.is_alive():
+            return
+        self._timer = threading.Timer(delay, self.flush, kwargs={"force": True})
+        self._timer.daemon = True
+        self._timer.start()
+
+    def collect(self):
+        """Flushes this process and returns every worker's snapshot."""
+        self.flush(force=True)
+        snapshots = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):  # 被替换或清理中的文件
+                continue
+        return snapshots
+
+
+def clear_shared_metrics(directory):
+    """Removes the snapshots left by a previous server run."""
+    if not os.path.isdir(directory):
+        return
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".json") or entry.name.startswith(".tmp-"):
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+registry = MetricsRegistry()
+request_duration = registry.register(Histogram(
+    "wolfer_http_request_duration_seconds", "HTTP request latency by endpoint",
+    ("endpoint", "method", "status")))
+stage_duration = registry.register(Histogram(
+    "wolfer_stage_duration_seconds", "Time spent in each request processing stage",
+    ("endpoint", "stage")))
+requests_total = registry.register(Counter(
+    "wolfer_http_requests_total", "HTTP requests by endpoint and status",
+    ("endpoint", "method", "status")))
+
+
+def _endpoint_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+@contextmanager
+def stage_timer(stage):
+    """Times a processing stage of the current request (parse, render_wps, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - start, _endpoint_label(), stage)
+
+
+# --- logging ---
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and any ``fields``."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """Sets up the ``wolfer`` logger from WOLFER_LOG_LEVEL / WOLFER_LOG_FORMAT (json|text)."""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    if os.environ.get("WOLFER_LOG_FORMAT", "json") == "json":
+        handler.setFormatter(StructuredFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(os.environ.get("WOLFER_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+
+LOG_SAMPLE_RATE = float(os.environ.get("WOLFER_LOG_SAMPLE_RATE", 0.01))
+
+
+def log_event(level, message, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"fields": fields})
+
+
+def log_sampled(level, message, rate=None, **fields):
+    """Like log_event, but only for a ``rate`` fraction of calls.
+
+    Fields may be zero-argument callables so expensive payloads (full configs,
+    rendered namelists) are only built when the record is actually emitted.
+    """
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    if not logger.isEnabledFor(level) or random.random() >= rate:
+        return
+    fields = {k: v() if callable(v) else v for k, v in fields.items()}
+    logger.log(level, message, extra={"fields": fields})
+
+
+# --- per-request hooks ---
+PROFILING_ENABLED = os.environ.get("WOLFER_ALLOW_PROFILING") == "1"
+PROFILE_DIR = os.environ.get("WOLFER_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "wolfer_profiles"))
+
+# 多worker时由 serve.py 设置 WOLFER_METRICS_DIR；未设置时 /api/metrics 只反映当前进程
+shared_metrics = None
+
+
+def flush_shared_metrics():
+    if shared_metrics is not None:
+        shared_metrics.flush(force=True)
+
+
+def install_request_metrics(app):
+    """Registers the timing/profiling hooks and the /api/metrics endpoint on ``app``."""
+    global shared_metrics
+    directory = os.environ.get("WOLFER_METRICS_DIR")
+    if directory and (shared_metrics is None or shared_metrics.directory != directory):
+        shared_metrics = SharedMetrics(directory, registry,
+                                       flush_interval=float(os.environ.get("WOLFER_METRICS_FLUSH_SECONDS", 1.0)))
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+        if PROFILING_ENABLED and request.headers.get(PROFILE_HEADER) == "1":
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def _record_request(response):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            # 响应里只给不透明ID，服务器上的路径只写日志
+            profile_id = uuid.uuid4().hex
+            path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+            profiler.dump_stats(path)
+            log_event(logging.INFO, "profile saved", profile_id=profile_id, path=path)
+            response.headers["X-Wolfer-Profile-Id"] = profile_id
+
+        started = g.pop("request_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            labels = (_endpoint_label(), request.method, str(response.status_code))
+            request_duration.observe(elapsed, *labels)
+            requests_total.inc(*labels)
+            log_event(logging.DEBUG, "request", endpoint=labels[0], method=labels[1],
+                      status=response.status_code, duration_ms=round(elapsed * 1000, 3))
+        if shared_metrics is not None:
+            shared_metrics.flush()
+        return response
+
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
+        """Prometheus格式的指标；多worker时计数与直方图为全部worker之和，gauge 取自响应的worker"""
+        snapshots = shared_metrics.collect() if shared_metrics is not None else None
+        body = registry.render_prometheus(snapshots)
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
@@ -0,0 +1,479 @@
+# namelist_parser.py
+# Fortran namelist 流式解析器，把已有的 namelist.wps / namelist.input 映射回本工具的JSON配置格式，
+# 并支持目录或tar包的并行批量导入
+#
+#   python backend/namelist_parser.py /archive/runs --workers 8 --output configs.jsonl
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+
+# 批量导入上限：归档成员数与解压后的总字节数，在解析之前检查
+MAX_IMPORT_MEMBERS = int(os.environ.get("WOLFER_IMPORT_MAX_MEMBERS", 10000))
+MAX_IMPORT_BYTES = int(os.environ.get("WOLFER_IMPORT_MAX_BYTES", 256 * 1024 ** 2))
+# 上传的请求体(压缩包本身)上限，读入内存之前按 Content-Length 检查；默认再给每个成员留出tar头与块对齐的余量
+MAX_IMPORT_ARCHIVE_BYTES = int(os.environ.get("WOLFER_IMPORT_MAX_ARCHIVE_BYTES",
+                                              MAX_IMPORT_BYTES + MAX_IMPORT_MEMBERS * 1024))
+# 少于此数的配置直接在当前线程解析，不值得分发到进程池
+INLINE_IMPORT_PAIRS = 16
+
+
+class ImportLimitError(ValueError):
+    """Raised when an import archive has too many members or too much uncompressed data."""
+
+
+def check_import_limits(count, total_bytes, max_members=MAX_IMPORT_MEMBERS, max_bytes=MAX_IMPORT_BYTES):
+    if count > max_members:
+        raise ImportLimitError(f"Import has more than {max_members} files")
+    if total_bytes > max_bytes:
+        raise ImportLimitError(f"Import exceeds {max_bytes} uncompressed bytes")
+
+
+def check_archive_size(length, max_bytes=MAX_IMPORT_ARCHIVE_BYTES):
+    if length is not None and length > max_bytes:
+        raise ImportLimitError(f"Upload exceeds {max_bytes} bytes")
+
+
+class NamelistSyntaxError(ValueError):
+    def __init__(self, message, line_no=None):
+        super().__init__(f"line {line_no}: {message}" if line_no else message)
+        self.line_no = line_no
+
+
+# 每个token前的空白由前缀 \s* 吸收，error 组兜底，使 finditer 能连续覆盖整行
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+    (?P<comma>,)
+  | (?P<comment>!.*)
+  | (?P<end>/|[&$]end\b)
+  | (?P<group>[&$][A-Za-z_]\w*)
+  | (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+  | (?P<repeat>\d+)\*
+  | (?P<assign>=)
+  | (?P<logical>\.(?:true|false|t|f)\.?)
+  | (?P<number>[+-]?(?:\d+\.?\d*|\.\d+)(?:[eEdD][+-]?\d+)?(?![\w.]))
+  | (?P<name>[A-Za-z_][\w%]*(?:\(\s*\d+\s*(?::\s*\d*\s*)?\))?)
+  | (?P<error>\S)
+    )
+""", re.X | re.I)
+
+_SEPARATOR_AFTER_REPEAT = frozenset(" \t\r\n,/!")
+
+
+def tokenize(lines):
+    """Yields ``(kind, value, line_no)`` from an iterable of lines.
+
+    Works line by line so arbitrarily large files are never held in memory.
+    Comments and whitespace are dropped; ``repeat`` tokens carry ``(count, is_null)``.
+    """
+    for line_no, line in enumerate(lines, 1):
+        line = line.rstrip()
+        for match in _TOKEN_RE.finditer(line):
+            kind = match.lastgroup
+            if kind == "comment":
+                break
+            if kind == "repeat":
+                # 3*1 -> repeat then value; "3*" followed by a separator -> three null values
+                pos = match.end()
+                is_null = pos >= len(line) or line[pos] in _SEPARATOR_AFTER_REPEAT
+                yield "repeat", (int(match.group("repeat")), is_null), line_no
+            elif kind == "error":
+                raise NamelistSyntaxError(f"unexpected character {match.group(kind)!r}", line_no)
+            elif kind == "end":
+                yield "end", "/", line_no
+            else:
+                yield kind, match.group(kind), line_no
+
+
+def _convert(kind, text):
+    if kind == "string":
+        quote = text[0]
+        return text[1:-1].replace(quote * 2, quote)
+    if kind == "logical":
+        return text.strip(".").lower() in ("true", "t")
+    if kind == "number":
+        try:
+            return int(text)
+        except ValueError:
+            return float(text.replace("d", "e").replace("D", "e"))
+    # 未加引号的值：T/F 视为逻辑值，其余按字符串保留
+    if text.upper() in ("T", "F"):
+        return text.upper() == "T"
+    return text
+
+
+_INDEX_RE = re.compile(r"^([A-Za-z_][\w%]*)\(\s*(\d+)")
+
+
+def _store(group, name, values):
+    """Assigns ``values`` to ``name`` (or ``name(i)`` starting at column i) in ``group``."""
+    match = _INDEX_RE.match(name)
+    if match is None:
+        group[name.lower()] = values
+        return
+    key, start = match.group(1).lower(), int(match.group(2)) - 1
+    current = group.setdefault(key, [])
+    if len(current) < start + len(values):
+        current.extend([None] * (start + len(values) - len(current)))
+    current[start:start + len(values)] = values
+
+
+def parse_namelist(source):
+    """Parses Fortran namelist text (str, file object or iterable of lines).
+
+    Returns ``{group: {variable: [values, ...]}}`` with lower-cased names;
+    every variable is a list (one entry per domain column). Null values
+    (``1,,3`` or ``3*``) become ``None``.
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+
+    groups = {}
+    group = None
+    name = None
+    values = []
+    expect_value = False
+    pending_repeat = None
+    pending_name = None  # a bare word that may be the next variable name or an unquoted value
+
+    def finish_variable():
+        nonlocal name, values
+        if name is not None:
+            _store(group, name, values)
+        name, values = None, []
+
+    def add_value(value):
+        nonlocal pending_repeat, expect_value
+        count = 1
+        if pending_repeat is not None:
+            count, pending_repeat = pending_repeat, None
+        values.extend([value] * count)
+        expect_value = False
+
+    for kind, text, line_no in tokenize(source):
+        if pending_name is not None:
+            word, pending_name = pending_name, None
+            if kind == "assign":
+                finish_variable()
+                name, expect_value = word, True
+                continue
+            if name is None:
+                raise NamelistSyntaxError(f"value {word!r} outside an assignment", line_no)
+            add_value(_convert("name", word))
+
+        if group is None:
+            if kind == "group":
+                group = groups.setdefault(text[1:].lower(), {})
+                continue
+            raise NamelistSyntaxError(f"expected '&group', got {text!r}", line_no)
+
+        if kind == "end":
+            finish_variable()
+            group = None
+        elif kind == "name":
+            pending_name = text
+        elif kind == "assign":
+            raise NamelistSyntaxError("'=' without a variable name", line_no)
+        elif kind == "comma":
+            if name is None:
+                raise NamelistSyntaxError("',' outside an assignment", line_no)
+            if expect_value:
+                add_value(None)
+            expect_value = True
+        elif kind == "repeat":
+            count, is_null = text
+            if is_null:
+                values.extend([None] * count)
+                expect_value = False
+            else:
+                pending_repeat = count
+        elif kind in ("string", "logical", "number"):
+            if name is None:
+                raise NamelistSyntaxError(f"value {text!r} outside an assignment", line_no)
+            add_value(_convert(kind, text))
+        elif kind == "group":
+            raise NamelistSyntaxError(f"group {text!r} opened before previous group was closed", line_no)
+
+    if pending_name is not None or group is not None:
+        raise NamelistSyntaxError("unterminated namelist group (missing '/')")
+    return groups
+
+
+# --- 映射回 GET /api/configuration 的JSON结构 ---
+# (namelist group, variable) -> (config section, config key); 未列出的变量按 <name>_arr 写入对应节
+SCALAR_KEYS = {
+    ("share", "max_dom"): ("domain_setup", "max_dom"),
+    ("share", "interval_seconds"): ("time_control", "interval_seconds_wps"),
+    ("geogrid", "map_proj"): ("domain_setup", "map_proj"),
+    ("geogrid", "ref_lat"): ("domain_setup", "ref_lat"),
+    ("geogrid", "ref_lon"): ("domain_setup", "ref_lon"),
+    ("geogrid", "truelat1"): ("domain_setup", "truelat1"),
+    ("geogrid", "truelat2"): ("domain_setup", "truelat2"),
+    ("geogrid", "stand_lon"): ("domain_setup", "stand_lon"),
+    ("geogrid", "geog_data_path"): ("domain_setup", "geog_data_path"),
+    ("time_control", "interval_seconds"): ("time_control", "interval_seconds_input"),
+    ("time_control", "io_form_history"): ("time_control", "io_form_history"),
+    ("time_control", "nocolons"): ("time_control", "nocolons"),
+    ("domains", "time_step"): ("domain_setup", "time_step"),
+    ("domains", "max_dom"): ("domain_setup", "max_dom"),
+    ("domains", "nproc_x"): ("domain_setup", "nproc_x"),
+    ("domains", "nproc_y"): ("domain_setup", "nproc_y"),
+    ("namelist_quilt", "nio_tasks_per_group"): ("namelist_quilt", "nio_tasks_per_group"),
+    ("namelist_quilt", "nio_groups"): ("namelist_quilt", "nio_groups"),
+}
+
+ARRAY_SECTIONS = {
+    "time_control": "time_control",
+    "geogrid": "domain_setup",
+    "domains": "domain_setup",
+    "physics": "physics",
+    "dynamics": "dynamics",
+    "bdy_control": "bdy_control",
+}
+
+# 由起止时间推出或另行处理的变量
+_DERIVED = {
+    ("time_control", name) for name in (
+        "run_days", "run_hours", "run_minutes", "run_seconds",
+        "start_year", "start_month", "start_day", "start_hour", "start_minute", "start_second",
+        "end_year", "end_month", "end_day", "end_hour", "end_minute", "end_second",
+        "history_interval", "history_interval_h", "history_interval_d", "history_interval_m",
+        "restart", "restart_interval", "frames_per_outfile", "input_from_file",
+    )
+} | {("share", "start_date"), ("share", "end_date"), ("domains", "grid_id"), ("domains", "parent_id"),
+     ("geogrid", "dx"), ("geogrid", "dy"), ("geogrid", "parent_id")}
+
+
+def _first(values, default=None):
+    return values[0] if values else default
+
+
+def _dates_from_components(tc, prefix):
+    years = tc.get(f"{prefix}_year")
+    if not years:
+        return None
+    dates = []
+    for d in range(len(years)):
+        def part(name, default=0):
+            column = tc.get(f"{prefix}_{name}") or []
+            value = column[d] if d < len(column) else (column[-1] if column else default)
+            return default if value is None else int(value)
+        try:
+            dates.append(datetime(part("year"), part("month", 1), part("day", 1),
+                                  part("hour"), part("minute"), part("second")).strftime("%Y-%m-%d_%H:%M:%S"))
+        except (TypeError, ValueError):
+            return None
+    return dates
+
+
+def _history_columns(tc):
+    """history_interval (minutes) -> (values, units) in the generator's hour/minute convention."""
+    if tc.get("history_interval_h"):
+        return list(tc["history_interval_h"]), ["h"] * len(tc["history_interval_h"])
+    minutes = tc.get("history_interval")
+    if not minutes:
+        return None, None
+    if all(isinstance(v, int) and v % 60 == 0 for v in minutes):
+        return [v // 60 for v in minutes], ["h"] * len(minutes)
+    return list(minutes), ["m"] * len(minutes)
+
+
+def namelists_to_config(wps=None, input_nml=None):
+    """Maps parsed namelist.wps / namelist.input groups onto the tool's JSON config dicts."""
+    wps = wps or {}
+    input_nml = input_nml or {}
+    config = {"time_control": {}, "domain_setup": {}, "physics": {}, "dynamics": {}}
+
+    # namelist.input 优先于 namelist.wps，因此先处理WPS再让input覆盖
+    for groups in (wps, input_nml):
+        for group_name, variables in groups.items():
+            for var, values in variables.items():
+                if (group_name, var) in _DERIVED:
+                    continue
+                if (group_name, var) in SCALAR_KEYS:
+                    section, key = SCALAR_KEYS[(group_name, var)]
+                    config.setdefault(section, {})[key] = _first(values)
+                elif group_name in ARRAY_SECTIONS:
+                    config.setdefault(ARRAY_SECTIONS[group_name], {})[f"{var}_arr"] = values
+
+    tc = config["time_control"]
+    dom = config["domain_setup"]
+    share = wps.get("share", {})
+    geogrid = wps.get("geogrid", {})
+    input_tc = input_nml.get("time_control", {})
+    domains = input_nml.get("domains", {})
+
+    starts = share.get("start_date") or _dates_from_components(input_tc, "start")
+    ends = share.get("end_date") or _dates_from_components(input_tc, "end")
+    if starts:
+        tc["start_date_str_arr"] = starts
+    if ends:
+        tc["end_date_str_arr"] = ends
+
+    history, units = _history_columns(input_tc)
+    if history:
+        tc["history_interval_arr"] = history
+        tc["history_interval_unit_arr"] = units
+    for var, key in (("frames_per_outfile", "frames_per_outfile_arr"), ("input_from_file", "input_from_file_arr")):
+        if input_tc.get(var):
+            tc[key] = input_tc[var]
+    if input_tc.get("restart"):
+        tc["restart_enabled"] = _first(input_tc["restart"])
+    if input_tc.get("restart_interval"):
+        minutes = _first(input_tc["restart_interval"])
+        tc["restart_interval_h"] = minutes // 60 if isinstance(minutes, int) and minutes % 60 == 0 else minutes / 60
+
+    # dx/dy：namelist.input 逐域给出；WPS只有d01
+    for var in ("dx", "dy"):
+        if domains.get(var):
+            dom[f"{var}_arr"] = domains[var]
+        elif geogrid.get(var):
+            dom[f"{var}_arr"] = geogrid[var]
+    # d01 的 parent_id / i,j_parent_start 在两个文件中约定不同(input为0，WPS为1)，单域时交给生成器默认值处理
+    parents = domains.get("parent_id") or geogrid.get("parent_id")
+    if parents and len(parents) > 1:
+        dom["parent_id_arr"] = parents
+    for key in ("i_parent_start_arr", "j_parent_start_arr"):
+        if len(dom.get(key) or []) <= 1:
+            dom.pop(key, None)
+    return config
+
+
+# --- 批量导入 ---
+NAMELIST_FILE_RE = re.compile(r"(^|[._-])(wps|input)([._-]|$)")
+
+
+def _pair_key(path):
+    """Groups ``run1/namelist.wps`` with ``run1/namelist.input`` (and ``*.wps.2001`` with ``*.input.2001``)."""
+    directory, name = os.path.split(path)
+    match = NAMELIST_FILE_RE.search(name)
+    if match is None:
+        return None, None
+    kind = match.group(2)
+    key = name[:match.start(2)] + "*" + name[match.end(2):]
+    return os.path.join(directory, key), kind
+
+
+def pair_namelist_files(paths):
+    pairs = {}
+    for path in paths:
+        key, kind = _pair_key(path)
+        if key is not None:
+            pairs.setdefault(key, {})[kind] = path
+    return pairs
+
+
+def parse_pair(item):
+    """Worker entry point: ``(name, {"wps": text, "input": text})`` -> result dict."""
+    name, texts = item
+    started = time.perf_counter()
+    try:
+        wps = parse_namelist(texts["wps"]) if texts.get("wps") is not None else None
+        input_nml = parse_namelist(texts["input"]) if texts.get("input") is not None else None
+        config = namelists_to_config(wps, input_nml)
+        result = {"name": name, "success": True, "config": config}
+    except (NamelistSyntaxError, ValueError, TypeError) as exc:
+        result = {"name": name, "success": False, "error": str(exc)}
+    result["bytes"] = sum(len(t) for t in texts.values() if t is not None)
+    result["parse_seconds"] = time.perf_counter() - started
+    return result
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as fh:
+        return fh.read()
+
+
+def iter_directory_pairs(root):
+    paths = []
+    for directory, _, filenames in os.walk(root):
+        paths.extend(os.path.join(directory, f) for f in filenames)
+    for key, files in sorted(pair_namelist_files(paths).items()):
+        yield os.path.relpath(key, root), {kind: _read_text(path) for kind, path in files.items()}
+
+
+def iter_tar_pairs(fileobj=None, path=None, max_members=MAX_IMPORT_MEMBERS, max_bytes=MAX_IMPORT_BYTES):
+    """Yields ``(name, texts)`` pairs from a tar archive.
+
+    The member count and uncompressed size are checked from the headers while
+    scanning, before anything is extracted (``ImportLimitError``).
+    """
+    with tarfile.open(name=path, fileobj=fileobj, mode="r:*") as tar:
+        members, total_bytes = {}, 0
+        for member in tar:
+            if not member.isfile():
+                continue
+            total_bytes += member.size
+            members[member.name] = member
+            check_import_limits(len(members), total_bytes, max_members, max_bytes)
+        for key, files in sorted(pair_namelist_files(members).items()):
+            texts = {}
+            for kind, member_name in files.items():
+                texts[kind] = tar.extractfile(members[member_name]).read().decode("utf-8", errors="replace")
+            yield key, texts
+
+
+def bulk_import(pairs, workers=None, chunksize=8, executor=None):
+    """Parses ``(name, texts)`` pairs; returns ``(results, stats)``.
+
+    Small batches are parsed inline; larger ones go to ``executor`` when given
+    (the server's shared pool), otherwise to a process pool of ``workers``.
+    """
+    pairs = list(pairs)
+    started = time.perf_counter()
+    if workers == 1 or len(pairs) < INLINE_IMPORT_PAIRS:
+        results = [parse_pair(p) for p in pairs]
+    elif executor is not None:
+        results = list(executor.map(parse_pair, pairs, chunksize=chunksize))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_pair, pairs, chunksize=chunksize))
+    elapsed = time.perf_counter() - started
+
+    total_bytes = sum(r["bytes"] for r in results)
+    stats = {
+        "configs": len(results),
+        "succeeded": sum(1 for r in results if r["success"]),
+        "failed": sum(1 for r in results if not r["success"]),
+        "bytes": total_bytes,
+        "elapsed_seconds": round(elapsed, 4),
+        "configs_per_second": round(len(results) / elapsed, 1) if elapsed else None,
+        "mb_per_second": round(total_bytes / 1e6 / elapsed, 3) if elapsed else None,
+    }
+    return results, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import namelist.wps/namelist.input files into JSON configs")
+    parser.add_argument("source", help="directory or tarball of namelists")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--output", help="write one JSON config per line to this file")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        pairs = iter_directory_pairs(args.source)
+    else:
+        pairs = iter_tar_pairs(path=args.source)
+    results, stats = bulk_import(pairs, workers=args.workers)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            for result in results:
+                fh.write(json.dumps(result, ensure_ascii=False) + "\n")
+    for result in results:
+        if not result["success"]:
+            print(f"FAILED {result['name']}: {result['error']}", file=sys.stderr)
+    print(json.dumps(stats, indent=2))
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
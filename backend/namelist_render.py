@@ -0,0 +1,479 @@
+# namelist_render.py
+# namelist.wps / namelist.input 的声明式分节定义，启动时编译为快速渲染函数
+
+import linecache
+import re
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+
+# --- Helper function to format for namelist (especially for arrays for single domain) ---
+def get_single_param_val(data_dict, param_key, default_val=None):
+    """Safely get the first element if it's an array, or the value itself."""
+    val_arr = data_dict.get(param_key)
+    if isinstance(val_arr, list):
+        return val_arr[0] if val_arr else default_val
+    return val_arr if val_arr is not None else default_val
+
+
+def format_namelist_value(value):
+    if isinstance(value, bool):
+        return f".{str(value).lower()}."
+    if isinstance(value, str) and not value.startswith("'"):  #
+        return f"'{value}'"  # Add quotes for strings if not already present
+    return value
+
+
+# One ``name = value,`` line of a namelist section.
+#   source      - config section the value is read from ("time_control", ...),
+#                 "ctx" for values derived by the file's prepare() hook, or None
+#                 for a constant (``default`` is then emitted as-is)
+#   first       - read through get_single_param_val (first domain column)
+#   quote       - pass through format_namelist_value
+#   spec        - format spec applied to the value (e.g. "02d")
+#   comment     - static trailing "! ..." comment; comment_ctx names a ctx key instead
+#   per_domain  - for max_dom > 1, emit one column per domain (ctx values are then lists)
+#   nest_default- column value for nests missing from the input array (default: repeat last)
+#   multi       - replacement Field used only when max_dom > 1
+#   optional    - omit the line entirely when the config does not set the key
+Field = namedtuple(
+    "Field",
+    "name source key default first quote spec comment comment_ctx per_domain nest_default multi optional",
+    defaults=(None, None, None, False, False, "", None, None, False, None, None, False),
+)
+
+MAX_DOMAINS = 21  # WRF 默认 max_domains
+
+
+def const(name, value):
+    return Field(name, None, default=value)
+
+
+# --- namelist.wps ---
+WPS_SECTIONS = (
+    ("share", (
+        const("wrf_core", "'ARW'"),
+        Field("max_dom", "domain_setup", "max_dom", 1),
+        Field("start_date", "time_control", "start_date_str_arr", "YYYY-MM-DD_HH:MM:SS", first=True, quote=True,
+              per_domain=True),
+        Field("end_date", "time_control", "end_date_str_arr", "YYYY-MM-DD_HH:MM:SS", first=True, quote=True,
+              per_domain=True),
+        Field("interval_seconds", "time_control", "interval_seconds_wps", 21600),
+        const("io_form_geogrid", 2),
+    )),
+    ("geogrid", (
+        Field("parent_id", "domain_setup", "parent_id_arr", 1, first=True,
+              multi=Field("parent_id", "ctx", "wps_parent_id", per_domain=True)),
+        Field("parent_grid_ratio", "domain_setup", "parent_grid_ratio_arr", 1, first=True, per_domain=True,
+              nest_default=3),
+        Field("i_parent_start", "domain_setup", "i_parent_start_arr", 1, first=True, per_domain=True),
+        Field("j_parent_start", "domain_setup", "j_parent_start_arr", 1, first=True, per_domain=True),
+        Field("e_we", "domain_setup", "e_we_arr", 100, first=True, per_domain=True),
+        Field("e_sn", "domain_setup", "e_sn_arr", 100, first=True, per_domain=True),
+        # WPS 只需要 d01 的 dx/dy，嵌套域由 parent_grid_ratio 推得
+        Field("dx", "domain_setup", "dx_arr", 10000.0, first=True),  # Assuming already in meters
+        Field("dy", "domain_setup", "dy_arr", 10000.0, first=True),
+        Field("map_proj", "domain_setup", "map_proj", "lambert", quote=True),
+        Field("ref_lat", "domain_setup", "ref_lat", 0.0),
+        Field("ref_lon", "domain_setup", "ref_lon", 0.0),
+        Field("truelat1", "domain_setup", "truelat1", 0.0),
+        Field("truelat2", "domain_setup", "truelat2", 0.0),
+        Field("stand_lon", "domain_setup", "stand_lon", 0.0),
+        Field("geog_data_path", "domain_setup", "geog_data_path", "/path/to/geog", quote=True),
+    )),
+    ("ungrib", (
+        const("out_format", "'WPS'"),
+        const("prefix", "'FILE'"),
+    )),
+    ("metgrid", (
+        const("fg_name", "'FILE'"),
+        const("io_form_metgrid", 2),
+    )),
+)
+
+
+# --- namelist.input ---
+INPUT_SECTIONS = (
+    ("time_control", (
+        Field("run_days", "ctx", "run_days"),
+        Field("run_hours", "ctx", "run_hours"),
+        const("run_minutes", 0),  # Assuming minutes/seconds from duration are handled by run_hours
+        const("run_seconds", 0),
+        Field("start_year", "ctx", "start_year", per_domain=True),
+        Field("start_month", "ctx", "start_month", spec="02d", per_domain=True),
+        Field("start_day", "ctx", "start_day", spec="02d", per_domain=True),
+        Field("start_hour", "ctx", "start_hour", spec="02d", per_domain=True),
+        Field("end_year", "ctx", "end_year", per_domain=True),
+        Field("end_month", "ctx", "end_month", spec="02d", per_domain=True),
+        Field("end_day", "ctx", "end_day", spec="02d", per_domain=True),
+        Field("end_hour", "ctx", "end_hour", spec="02d", per_domain=True),
+        Field("interval_seconds", "time_control", "interval_seconds_input", 10800),
+        Field("input_from_file", "time_control", "input_from_file_arr", True, first=True, quote=True,
+              per_domain=True),
+        Field("history_interval", "ctx", "history_interval", comment_ctx="history_interval_comment",
+              per_domain=True),
+        Field("frames_per_outfile", "time_control", "frames_per_outfile_arr", 1, first=True, per_domain=True),
+        Field("restart", "time_control", "restart_enabled", False, quote=True),
+        Field("restart_interval", "ctx", "restart_interval", comment="Converted to minutes"),
+        Field("io_form_history", "time_control", "io_form_history", 2),
+        Field("nocolons", "time_control", "nocolons", True, quote=True),
+    )),
+    ("domains", (
+        Field("time_step", "domain_setup", "time_step", 60),
+        Field("max_dom", "domain_setup", "max_dom", 1),
+        Field("e_we", "domain_setup", "e_we_arr", 100, first=True, per_domain=True),
+        Field("e_sn", "domain_setup", "e_sn_arr", 100, first=True, per_domain=True),
+        Field("e_vert", "domain_setup", "e_vert_arr", 35, first=True, per_domain=True),
+        Field("dx", "domain_setup", "dx_arr", 10000.0, first=True,
+              multi=Field("dx", "ctx", "dx", per_domain=True)),
+        Field("dy", "domain_setup", "dy_arr", 10000.0, first=True,
+              multi=Field("dy", "ctx", "dy", per_domain=True)),
+        Field("grid_id", "domain_setup", "parent_id_arr", 1, first=True,
+              comment="Assuming grid_id matches parent_id for WPS for domain 1",
+              multi=Field("grid_id", "ctx", "grid_id", per_domain=True)),
+        Field("parent_id", "domain_setup", "parent_id_arr", 0, first=True,
+              comment="For namelist.input, d01 parent_id is 0",
+              multi=Field("parent_id", "ctx", "parent_id", per_domain=True)),
+        Field("i_parent_start", "domain_setup", "i_parent_start_arr", 0, first=True, per_domain=True),
+        Field("j_parent_start", "domain_setup", "j_parent_start_arr", 0, first=True, per_domain=True),
+        Field("parent_grid_ratio", "domain_setup", "parent_grid_ratio_arr", 1, first=True, per_domain=True,
+              nest_default=3),
+        Field("parent_time_step_ratio", "domain_setup", "parent_time_step_ratio_arr", 1, first=True,
+              per_domain=True, nest_default=3),
+        Field("feedback", "domain_setup", "feedback_arr", 1, first=True),
+        # MPI 分解，未给出时由 WRF 自行决定
+        Field("nproc_x", "domain_setup", "nproc_x", optional=True),
+        Field("nproc_y", "domain_setup", "nproc_y", optional=True),
+    )),
+    ("physics", (
+        Field("mp_physics", "physics", "mp_physics_arr", 8, first=True, per_domain=True),
+        Field("ra_lw_physics", "physics", "ra_lw_physics_arr", 1, first=True, per_domain=True),
+        Field("ra_sw_physics", "physics", "ra_sw_physics_arr", 1, first=True, per_domain=True),
+        Field("radt", "physics", "radt_arr", 30, first=True, per_domain=True),
+        Field("sf_sfclay_physics", "physics", "sf_sfclay_physics_arr", 1, first=True, per_domain=True),
+        Field("sf_surface_physics", "physics", "sf_surface_physics_arr", 2, first=True, per_domain=True),
+        Field("bl_pbl_physics", "physics", "bl_pbl_physics_arr", 1, first=True, per_domain=True),
+        Field("bldt", "physics", "bldt_arr", 0, first=True, per_domain=True),
+        Field("cu_physics", "physics", "cu_physics_arr", 1, first=True, per_domain=True),
+        Field("cudt", "physics", "cudt_arr", 5, first=True, per_domain=True),
+    )),
+    ("dynamics", (
+        Field("diff_opt", "dynamics", "diff_opt_arr", 1, first=True, per_domain=True),
+        Field("km_opt", "dynamics", "km_opt_arr", 4, first=True, per_domain=True),
+        Field("non_hydrostatic", "dynamics", "non_hydrostatic_arr", True, first=True, quote=True,
+              per_domain=True),
+        Field("w_damping", "dynamics", "w_damping_arr", 0, first=True),
+    )),
+    ("bdy_control", (
+        Field("spec_bdy_width", "bdy_control", "spec_bdy_width_arr", 5, first=True),
+        Field("spec_zone", "bdy_control", "spec_zone_arr", 1, first=True),
+        Field("relax_zone", "bdy_control", "relax_zone_arr", 4, first=True),
+        Field("specified", "bdy_control", "specified_arr", True, first=True, quote=True, per_domain=True,
+              nest_default=False),
+        Field("nested", "bdy_control", "nested_arr", False, first=True, quote=True, per_domain=True,
+              nest_default=True),
+    )),
+    ("namelist_quilt", (
+        Field("nio_tasks_per_group", "namelist_quilt", "nio_tasks_per_group", 0),
+        Field("nio_groups", "namelist_quilt", "nio_groups", 1),
+    )),
+)
+
+
+def domain_columns(value, max_dom, default=None, nest_default=None):
+    """Pads/truncates a ``*_arr`` value to ``max_dom`` columns.
+
+    Missing nest columns take ``nest_default`` if given, otherwise repeat the
+    last supplied value; an absent or empty array starts from ``default``.
+    """
+    if isinstance(value, list):
+        columns = value[:max_dom]
+    else:
+        columns = [] if value is None else [value]
+    if not columns:
+        columns = [default]
+    if len(columns) < max_dom:
+        fill = columns[-1] if nest_default is None else nest_default
+        columns = columns + [fill] * (max_dom - len(columns))
+    return columns
+
+
+def parent_ids(domain_setup, max_dom):
+    """Parent domain ids (1-based) for every domain; missing nests telescope off the previous domain."""
+    given = domain_setup.get("parent_id_arr")
+    given = given if isinstance(given, list) else []
+    return [given[d] if d < len(given) and given[d] is not None else max(d, 1)
+            for d in range(max_dom)]
+
+
+def nest_resolutions(domain_setup, max_dom, key="dx_arr"):
+    """Per-domain grid spacing: explicit values where given, otherwise parent spacing / parent_grid_ratio."""
+    given = domain_setup.get(key)
+    given = given if isinstance(given, list) else ([] if given is None else [given])
+    ratios = domain_columns(domain_setup.get("parent_grid_ratio_arr"), max_dom, 1, 3)
+    parents = parent_ids(domain_setup, max_dom)
+    spacing = []
+    for d in range(max_dom):
+        if d < len(given) and given[d] is not None:
+            spacing.append(given[d])
+        elif d == 0:
+            spacing.append(10000.0)
+        else:
+            # 非数值的 parent_id / 比例留给校验报告，这里退回上一个域，渲染不因此失败
+            try:
+                parent = int(parents[d]) - 1
+            except (TypeError, ValueError):
+                parent = d - 1
+            parent_dx = spacing[parent] if 0 <= parent < d else spacing[d - 1]
+            try:
+                spacing.append(_compact_number(float(parent_dx) / float(ratios[d])))
+            except (TypeError, ValueError, ZeroDivisionError):
+                spacing.append(parent_dx)
+    return spacing
+
+
+def _compact_number(value):
+    value = round(value, 4)
+    return int(value) if float(value).is_integer() else value
+
+
+def namelist_max_dom(data):
+    """``domain_setup.max_dom`` as an int clamped to [1, MAX_DOMAINS]."""
+    try:
+        max_dom = int(data.get("domain_setup", {}).get("max_dom", 1))
+    except (TypeError, ValueError):
+        return 1
+    return min(max(max_dom, 1), MAX_DOMAINS)
+
+
+@lru_cache(maxsize=4096)
+def _parse_wrf_date(value):
+    # 集合成员之间起止时间大量重复，strptime 的结果值得缓存
+    return datetime.strptime(value, "%Y-%m-%d_%H:%M:%S")
+
+
+def input_time_context(data):
+    """Derives the run length, start/end components and intervals for &time_control."""
+    tc = data.get("time_control", {})
+
+    # Time parsing
+    start_datetime_str = get_single_param_val(tc, "start_date_str_arr", "2000-01-01_00:00:00")
+    end_datetime_str = get_single_param_val(tc, "end_date_str_arr", "2000-01-01_03:00:00")
+
+    try:
+        sdt = _parse_wrf_date(start_datetime_str)
+        edt = _parse_wrf_date(end_datetime_str)
+    except ValueError:  # Fallback if parsing fails
+        sdt = datetime(2000, 1, 1, 0, 0, 0)
+        edt = datetime(2000, 1, 1, 3, 0, 0)
+
+    run_seconds_total = (edt - sdt).total_seconds()
+
+    history_interval_val = get_single_param_val(tc, "history_interval_arr", 3)
+    history_interval_unit = get_single_param_val(tc, "history_interval_unit_arr", "h")
+    if history_interval_unit == 'h':
+        # WRF often takes minutes for history_interval
+        history_interval = history_interval_val * 60
+        history_interval_comment = "Converted from hours to minutes"
+    else:  # assuming minutes or days
+        history_interval = history_interval_val
+        history_interval_comment = f"Unit: {history_interval_unit}"
+
+    return {
+        "run_days": int(run_seconds_total // 86400),
+        "run_hours": int((run_seconds_total % 86400) // 3600),
+        "start_year": sdt.year,
+        "start_month": sdt.month,
+        "start_day": sdt.day,
+        "start_hour": sdt.hour,
+        "end_year": edt.year,
+        "end_month": edt.month,
+        "end_day": edt.day,
+        "end_hour": edt.hour,
+        "history_interval": history_interval,
+        "history_interval_comment": history_interval_comment,
+        "restart_interval": tc.get('restart_interval_h', 6) * 60,  # Often in minutes
+    }
+
+
+def _parse_or(value, fallback):
+    try:
+        return _parse_wrf_date(value)
+    except (TypeError, ValueError):
+        return fallback
+
+
+def nested_input_context(data, max_dom):
+    """input_time_context plus per-domain columns for a nested (max_dom > 1) namelist.input."""
+    ctx = input_time_context(data)
+    tc = data.get("time_control", {})
+    dom = data.get("domain_setup", {})
+
+    d01_start = datetime(ctx["start_year"], ctx["start_month"], ctx["start_day"], ctx["start_hour"])
+    d01_end = datetime(ctx["end_year"], ctx["end_month"], ctx["end_day"], ctx["end_hour"])
+    starts = [_parse_or(v, d01_start) for v in domain_columns(tc.get("start_date_str_arr"), max_dom)]
+    ends = [_parse_or(v, d01_end) for v in domain_columns(tc.get("end_date_str_arr"), max_dom)]
+    for prefix, dates in (("start", starts), ("end", ends)):
+        for part in ("year", "month", "day", "hour"):
+            ctx[f"{prefix}_{part}"] = [getattr(dt, part) for dt in dates]
+
+    intervals = domain_columns(tc.get("history_interval_arr"), max_dom, 3)
+    units = domain_columns(tc.get("history_interval_unit_arr"), max_dom, "h")
+    ctx["history_interval"] = [v * 60 if u == 'h' else v for v, u in zip(intervals, units)]
+
+    ctx["dx"] = nest_resolutions(dom, max_dom, "dx_arr")
+    ctx["dy"] = nest_resolutions(dom, max_dom, "dy_arr")
+    ctx["grid_id"] = list(range(1, max_dom + 1))
+    ctx["parent_id"] = [0] + parent_ids(dom, max_dom)[1:]
+    return ctx
+
+
+def nested_wps_context(data, max_dom):
+    """Per-domain columns for a nested namelist.wps (WPS numbers d01's parent as itself)."""
+    return {"wps_parent_id": [1] + parent_ids(data.get("domain_setup", {}), max_dom)[1:]}
+
+
+def _join(values, spec=""):
+    return ", ".join(format(v, spec) for v in values)
+
+
+def _escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _optional_line(name, value):
+    return "" if value is None else f" {name} = {value},\n"
+
+
+# 生成源码里只出现经过校验的名字；键名与常量分别以 repr 和 _K 下标代入，不拼接任意文本
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _check_identifier(kind, value):
+    if not isinstance(value, str) or not _IDENTIFIER_RE.match(value):
+        raise ValueError(f"Invalid namelist {kind}: {value!r}")
+
+
+def compile_renderer(sections, prepare=None, name="render", nested=False):
+    """Compiles a section schema into a single ``render(data) -> str`` function.
+
+    Every field becomes one local assignment and the whole file one f-string,
+    so rendering costs a dict lookup per value and a single string build,
+    instead of a chain of ``content +=`` appends. With ``nested=True`` the
+    renderer takes ``(data, max_dom)`` and emits per-domain columns.
+
+    Section, field and renderer names must be plain identifiers. The generated
+    source is kept on ``renderer.__source__`` and registered with ``linecache``
+    so tracebacks point at the failing line.
+    """
+    _check_identifier("renderer name", name)
+    constants = []
+    sources = []
+    values = []
+    body = []
+    template = []
+
+    def constant(value):
+        constants.append(value)
+        return f"_K[{len(constants) - 1}]"
+
+    for section_name, fields in sections:
+        _check_identifier("section", section_name)
+        lines = [f"&{section_name}\n"]
+        for field in fields:
+            if nested and field.multi is not None:
+                field = field.multi
+            _check_identifier("field", field.name)
+            if field.source is None:
+                lines.append(_escape(f" {field.name} = {field.default},\n"))
+                continue
+
+            var = f"v{len(values)}"
+            values.append(field)
+            spec = field.spec
+            columns = nested and field.per_domain
+            if field.source == "ctx":
+                expr = f"ctx[{field.key!r}]"
+                if columns:
+                    expr, spec = f"_join({expr}, {spec!r})", ""
+            else:
+                if field.source not in sources:
+                    sources.append(field.source)
+                section_var = f"s{sources.index(field.source)}"
+                default = constant(field.default)
+                if columns:
+                    expr = (f"_columns({section_var}.get({field.key!r}), max_dom, {default}, "
+                            f"{constant(field.nest_default)})")
+                    if field.quote:
+                        expr = f"[_fmt(c) for c in {expr}]"
+                    expr, spec = f"_join({expr}, {spec!r})", ""
+                elif field.first:
+                    # get_single_param_val, inlined
+                    body.append(f"    {var} = {section_var}.get({field.key!r})")
+                    expr = (f"({var}[0] if {var} else {default}) if isinstance({var}, list) "
+                            f"else ({default} if {var} is None else {var})")
+                else:
+                    expr = f"{section_var}.get({field.key!r}, {default})"
+            if field.quote and not columns:
+                expr = f"_fmt({expr})"
+            body.append(f"    {var} = {expr}")
+            if field.optional:
+                body.append(f"    l{var} = _optional_line({field.name!r}, {var})")
+                lines.append(f"{{l{var}}}")
+                continue
+
+            placeholder = f"{{{var}:{spec}}}" if spec else f"{{{var}}}"
+            if field.comment_ctx:
+                body.append(f"    c{var} = ctx[{field.comment_ctx!r}]")
+                lines.append(f" {_escape(field.name)} = {placeholder}, ! {{c{var}}}\n")
+            elif field.comment:
+                lines.append(f" {_escape(field.name)} = {placeholder}, ! {_escape(field.comment)}\n")
+            else:
+                lines.append(f" {_escape(field.name)} = {placeholder},\n")
+        lines.append("/\n")
+        template.append("".join(lines))
+
+    args = "data, max_dom" if nested else "data"
+    header = [f"def {name}({args}):"]
+    if prepare is not None:
+        header.append(f"    ctx = _prepare({args})")
+    for index, source in enumerate(sources):
+        header.append(f"    s{index} = data.get({source!r}, {{}})")
+    template_src = "\n".join(template)
+    code = "\n".join(header + body + [f"    return f{template_src!r}"])
+
+    namespace = {
+        "_K": tuple(constants),
+        "_fmt": format_namelist_value,
+        "_columns": domain_columns,
+        "_join": _join,
+        "_optional_line": _optional_line,
+        "_prepare": prepare,
+    }
+    filename = f"<namelist_render:{name}>"
+    linecache.cache[filename] = (len(code), None, code.splitlines(keepends=True), filename)
+    exec(compile(code, filename, "exec"), namespace)
+    renderer = namespace[name]
+    renderer.__source__ = code
+    return renderer
+
+
+# 启动时编译一次；max_dom > 1 时使用逐域列输出的版本
+_render_wps_single = compile_renderer(WPS_SECTIONS, name="render_wps_namelist")
+_render_wps_nested = compile_renderer(WPS_SECTIONS, prepare=nested_wps_context,
+                                      name="render_wps_namelist_nested", nested=True)
+_render_input_single = compile_renderer(INPUT_SECTIONS, prepare=input_time_context,
+                                        name="render_input_namelist")
+_render_input_nested = compile_renderer(INPUT_SECTIONS, prepare=nested_input_context,
+                                        name="render_input_namelist_nested", nested=True)
+
+
+def render_wps_namelist(data):
+    max_dom = namelist_max_dom(data)
+    return _render_wps_nested(data, max_dom) if max_dom > 1 else _render_wps_single(data)
+
+
+def render_input_namelist(data):
+    max_dom = namelist_max_dom(data)
+    return _render_input_nested(data, max_dom) if max_dom > 1 else _render_input_single(data)
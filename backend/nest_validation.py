@@ -0,0 +1,168 @@
+# nest_validation.py
+# 嵌套域几何校验：把一个或一批配置的全部嵌套域堆成NumPy数组，一次性向量化检查
+
+import numpy as np
+
+from namelist_render import MAX_DOMAINS, domain_columns, nest_resolutions, parent_ids
+
+# 这些数组在 max_dom > 1 时必须为每个域显式给出，不能依赖补齐
+REQUIRED_NEST_KEYS = ("e_we_arr", "e_sn_arr", "parent_grid_ratio_arr", "i_parent_start_arr", "j_parent_start_arr")
+
+DX_RELATIVE_TOLERANCE = 1e-3
+
+
+def _as_float(value):
+    if isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _max_dom(domain_setup):
+    value = domain_setup.get("max_dom", 1)
+    if isinstance(value, bool):
+        return None
+    try:
+        max_dom = int(value)
+    except (TypeError, ValueError):
+        return None
+    return max_dom if float(value) == max_dom else None
+
+
+def build_nest_table(domain_setups):
+    """Stacks the nest geometry of every config into ``(configs, domains)`` float arrays.
+
+    Columns are padded exactly as the namelist renderer pads them, so the
+    checks see the values that would be written. Returns ``(table, max_doms,
+    errors)`` where ``errors`` holds the per-config problems found while
+    building (bad max_dom, missing columns, non-numeric values).
+    """
+    count = len(domain_setups)
+    errors = [[] for _ in range(count)]
+    max_doms = np.ones(count, dtype=np.int64)
+    rows = []
+    for index, dom in enumerate(domain_setups):
+        if not isinstance(dom, dict):
+            errors[index].append("domain_setup must be an object")
+            dom = {}
+        max_dom = _max_dom(dom)
+        if max_dom is None or not 1 <= max_dom <= MAX_DOMAINS:
+            errors[index].append(f"max_dom must be an integer between 1 and {MAX_DOMAINS}")
+            max_dom = 1
+        max_doms[index] = max_dom
+
+        if max_dom > 1:
+            for key in REQUIRED_NEST_KEYS:
+                given = dom.get(key)
+                length = len(given) if isinstance(given, list) else 0
+                if length < max_dom:
+                    errors[index].append(f"{key} has {length} value(s) but max_dom is {max_dom}")
+
+        rows.append({
+            "parent_id": parent_ids(dom, max_dom),
+            "ratio": domain_columns(dom.get("parent_grid_ratio_arr"), max_dom, 1, 3),
+            "i_start": domain_columns(dom.get("i_parent_start_arr"), max_dom, 1),
+            "j_start": domain_columns(dom.get("j_parent_start_arr"), max_dom, 1),
+            "e_we": domain_columns(dom.get("e_we_arr"), max_dom, 100),
+            "e_sn": domain_columns(dom.get("e_sn_arr"), max_dom, 100),
+            "dx": nest_resolutions(dom, max_dom, "dx_arr"),
+            "dy": nest_resolutions(dom, max_dom, "dy_arr"),
+        })
+
+    width = int(max_doms.max()) if count else 1
+    table = {}
+    for name in ("parent_id", "ratio", "i_start", "j_start", "e_we", "e_sn", "dx", "dy"):
+        column = np.full((count, width), np.nan)
+        for index, row in enumerate(rows):
+            values = row[name]
+            column[index, :len(values)] = [_as_float(v) for v in values]
+        table[name] = column
+    return table, max_doms, errors
+
+
+def _report(errors, mask, message):
+    """Appends ``message(config, domain)`` for every True cell of ``mask``."""
+    for config, domain in zip(*np.nonzero(mask)):
+        errors[config].append(message(config, domain))
+
+
+def validate_nest_batch(domain_setups):
+    """Validates the nest trees of many configs at once; returns one error list per config."""
+    table, max_doms, errors = build_nest_table(domain_setups)
+    if not domain_setups:
+        return errors
+
+    count, width = table["e_we"].shape
+    column = np.arange(width)
+    active = column[None, :] < max_doms[:, None]
+    nest = active & (column[None, :] >= 1)
+
+    for name, label in (("parent_id", "parent_id"), ("ratio", "parent_grid_ratio"),
+                        ("i_start", "i_parent_start"), ("j_start", "j_parent_start"),
+                        ("e_we", "e_we"), ("e_sn", "e_sn"), ("dx", "dx"), ("dy", "dy")):
+        _report(errors, active & np.isnan(table[name]),
+                lambda c, d, label=label: f"d{d + 1:02d}: {label} must be numeric")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        parent = table["parent_id"]
+        ratio = table["ratio"]
+        e_we, e_sn = table["e_we"], table["e_sn"]
+        i_start, j_start = table["i_start"], table["j_start"]
+
+        # 非数值的单元格已在上面报告过，下面的检查只看有数值的单元格
+        has_parent, has_ratio = ~np.isnan(parent), ~np.isnan(ratio)
+        # 父域必须是编号更小的域，保证嵌套树按顺序展开
+        bad_parent = nest & has_parent & ((parent < 1) | (parent > column[None, :]) | (parent != np.floor(parent)))
+        _report(errors, bad_parent,
+                lambda c, d: f"d{d + 1:02d}: parent_id {parent[c, d]:g} must refer to an earlier domain (1..{d})")
+
+        _report(errors, active[:, :1] & (ratio[:, :1] != 1) & ~np.isnan(ratio[:, :1]),
+                lambda c, d: f"d01: parent_grid_ratio must be 1, got {ratio[c, 0]:g}")
+        bad_ratio = nest & has_ratio & ((ratio < 1) | (ratio != np.floor(ratio)))
+        _report(errors, bad_ratio,
+                lambda c, d: f"d{d + 1:02d}: parent_grid_ratio must be a positive integer, got {ratio[c, d]:g}")
+
+        for size, label in ((e_we, "e_we"), (e_sn, "e_sn")):
+            _report(errors, active & (size < 2),
+                    lambda c, d, size=size, label=label: f"d{d + 1:02d}: {label} must be at least 2")
+            indivisible = nest & has_ratio & ~bad_ratio & ~np.isnan(size) & (np.mod(size - 1, ratio) != 0)
+            _report(errors, indivisible,
+                    lambda c, d, size=size, label=label:
+                    f"d{d + 1:02d}: {label}-1 ({size[c, d] - 1:g}) must be divisible by parent_grid_ratio ({ratio[c, d]:g})")
+
+        # 把父域的尺寸与分辨率按 parent_id 一次性取出
+        linked = nest & has_parent & ~bad_parent
+        parent_index = np.where(linked, parent - 1, 0).astype(np.int64)
+        parent_we = np.take_along_axis(e_we, parent_index, axis=1)
+        parent_sn = np.take_along_axis(e_sn, parent_index, axis=1)
+        usable = linked & has_ratio & ~bad_ratio
+
+        for start, size, parent_size, label, dim in ((i_start, e_we, parent_we, "i_parent_start", "e_we"),
+                                                      (j_start, e_sn, parent_sn, "j_parent_start", "e_sn")):
+            _report(errors, nest & (start < 1),
+                    lambda c, d, start=start, label=label: f"d{d + 1:02d}: {label} must be >= 1, got {start[c, d]:g}")
+            nest_end = start + (size - 1) / ratio
+            outside = usable & (start >= 1) & (nest_end > parent_size)
+            _report(errors, outside,
+                    lambda c, d, nest_end=nest_end, parent_size=parent_size, label=label, dim=dim:
+                    f"d{d + 1:02d}: nest ends at parent index {nest_end[c, d]:g}, beyond parent {dim} "
+                    f"({parent_size[c, d]:g}); reduce {label} or {dim}")
+
+        for spacing, label in ((table["dx"], "dx"), (table["dy"], "dy")):
+            _report(errors, active & (spacing <= 0),
+                    lambda c, d, label=label: f"d{d + 1:02d}: {label} must be positive")
+            expected = np.take_along_axis(spacing, parent_index, axis=1) / ratio
+            mismatch = usable & (np.abs(spacing - expected) > DX_RELATIVE_TOLERANCE * np.abs(expected))
+            _report(errors, mismatch,
+                    lambda c, d, spacing=spacing, expected=expected, label=label:
+                    f"d{d + 1:02d}: {label} {spacing[c, d]:g} should be parent {label} / parent_grid_ratio "
+                    f"= {expected[c, d]:g}")
+
+    return errors
+
+
+def validate_nests(domain_setup):
+    """Validates the nest tree of a single domain_setup."""
+    return validate_nest_batch([domain_setup])[0]
@@ -0,0 +1,290 @@
+# netcdf_reader.py
+# wrfout 读取：经典/64位偏移/CDF-5格式直接内存映射(不依赖第三方库)，NetCDF-4(HDF5)格式需要可选的 netCDF4 包
+#
+# 变量按需切片读取：只有被访问的时间步会从磁盘读入内存。
+
+import mmap
+import struct
+
+import numpy as np
+
+try:  # NetCDF-4/HDF5 文件才需要
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+NC_DIMENSION = 0x0A
+NC_VARIABLE = 0x0B
+NC_ATTRIBUTE = 0x0C
+
+NC_TYPES = {
+    1: np.dtype(">i1"), 2: np.dtype("S1"), 3: np.dtype(">i2"), 4: np.dtype(">i4"),
+    5: np.dtype(">f4"), 6: np.dtype(">f8"), 7: np.dtype(">u1"), 8: np.dtype(">u2"),
+    9: np.dtype(">u4"), 10: np.dtype(">i8"), 11: np.dtype(">u8"),
+}
+
+HDF5_MAGIC = b"\x89HDF"
+NETCDF3_MAGICS = (b"CDF\x01", b"CDF\x02", b"CDF\x05")
+# sniff_format 需要的文件头长度
+MAGIC_BYTES = 4
+
+
+class NetCDFFormatError(ValueError):
+    """Raised when a file is not a readable NetCDF file."""
+
+
+def sniff_format(head):
+    """``"netcdf3"``, ``"netcdf4"`` or ``None`` from the first bytes of a file."""
+    if head[:MAGIC_BYTES] in NETCDF3_MAGICS:
+        return "netcdf3"
+    if head[:MAGIC_BYTES] == HDF5_MAGIC:
+        return "netcdf4"
+    return None
+
+
+class Variable:
+    """A lazily read variable: ``var[...]`` reads only the requested slab."""
+
+    def __init__(self, name, dimensions, data, attrs):
+        self.name = name
+        self.dimensions = tuple(dimensions)
+        self._data = data
+        self.attrs = attrs
+
+    @property
+    def shape(self):
+        return tuple(self._data.shape)
+
+    @property
+    def dtype(self):
+        return np.dtype(self._data.dtype)
+
+    def __getitem__(self, key):
+        return np.asarray(self._data[key])
+
+    def __len__(self):
+        return self.shape[0] if self.shape else 0
+
+    def take_points(self, prefix, rows, cols):
+        """Values at grid points ``(rows[n], cols[n])`` over the leading ``prefix`` slices.
+
+        Memory-mapped data is indexed pointwise, touching only the pages that
+        hold those points; other backends read the points' bounding box once.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        if isinstance(self._data, np.ndarray):
+            return np.asarray(self._data[tuple(prefix) + (rows, cols)])
+        row0, col0 = int(rows.min()), int(cols.min())
+        box = np.asarray(self._data[tuple(prefix) + (slice(row0, int(rows.max()) + 1),
+                                                     slice(col0, int(cols.max()) + 1))])
+        return box[..., rows - row0, cols - col0]
+
+
+class _HeaderReader:
+    def __init__(self, buffer, version):
+        self.buffer = buffer
+        self.offset = 4
+        self.count_format = ">Q" if version == 5 else ">I"
+        self.offset_format = ">I" if version == 1 else ">Q"
+
+    def _unpack(self, fmt):
+        (value,) = struct.unpack_from(fmt, self.buffer, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return value
+
+    def count(self):
+        return self._unpack(self.count_format)
+
+    def tag(self):
+        return self._unpack(">I")
+
+    def file_offset(self):
+        return self._unpack(self.offset_format)
+
+    def name(self):
+        length = self.count()
+        raw = bytes(self.buffer[self.offset:self.offset + length])
+        self.offset += (length + 3) & ~3
+        return raw.decode("utf-8")
+
+    def values(self, nc_type, count):
+        dtype = NC_TYPES[nc_type]
+        size = dtype.itemsize * count
+        raw = bytes(self.buffer[self.offset:self.offset + size])
+        self.offset += (size + 3) & ~3
+        if nc_type == 2:
+            return raw.rstrip(b"\0").decode("utf-8", "replace")
+        array = np.frombuffer(raw, dtype=dtype).astype(dtype.newbyteorder("="))
+        return array[0].item() if count == 1 else array
+
+    def list_header(self, expected):
+        tag, count = self.tag(), self.count()
+        if tag not in (0, expected) or (tag == 0 and count != 0):
+            raise NetCDFFormatError("corrupt NetCDF header")
+        return count
+
+    def attributes(self):
+        attrs = {}
+        for _ in range(self.list_header(NC_ATTRIBUTE)):
+            name = self.name()
+            nc_type = self.tag()
+            attrs[name] = self.values(nc_type, self.count())
+        return attrs
+
+
+class NetCDF3Dataset:
+    """Memory-mapped reader for classic, 64-bit offset and CDF-5 files.
+
+    Record (unlimited-dimension) variables are exposed as strided NumPy views
+    over the mapping, so slicing ``U10[t0:t1]`` touches only those records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件
+            self._file.close()
+            raise NetCDFFormatError("empty file")
+        if self._mmap[:4] not in NETCDF3_MAGICS:
+            self.close()
+            raise NetCDFFormatError("not a NetCDF classic/64-bit offset/CDF-5 file")
+        try:
+            self._parse_header()
+        except NetCDFFormatError:
+            self.close()
+            raise
+        except (struct.error, KeyError, ValueError, TypeError) as exc:
+            self.close()
+            raise NetCDFFormatError(f"corrupt NetCDF header: {exc}") from exc
+
+    def _parse_header(self):
+        reader = _HeaderReader(self._mmap, self._mmap[3])
+        numrecs = reader.count()
+        dims = []
+        for _ in range(reader.list_header(NC_DIMENSION)):
+            dims.append((reader.name(), reader.count()))
+        self.attrs = reader.attributes()
+
+        specs = []
+        for _ in range(reader.list_header(NC_VARIABLE)):
+            name = reader.name()
+            dimids = [reader.count() for _ in range(reader.count())]
+            attrs = reader.attributes()
+            nc_type = reader.tag()
+            vsize = reader.count()
+            begin = reader.file_offset()
+            specs.append((name, dimids, attrs, NC_TYPES[nc_type], vsize, begin))
+
+        record_dim = next((index for index, (_, length) in enumerate(dims) if length == 0), None)
+        record_vars = [spec for spec in specs if spec[1] and spec[1][0] == record_dim]
+        # 只有一个记录变量时记录之间不做4字节对齐
+        if len(record_vars) == 1:
+            spec = record_vars[0]
+            record_size = spec[3].itemsize * int(np.prod([dims[d][1] for d in spec[1][1:]], dtype=np.int64))
+        else:
+            record_size = sum(spec[4] for spec in record_vars)
+        if numrecs in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):  # 流式写入未回填记录数，按文件长度推算
+            first_record = min((spec[5] for spec in record_vars), default=len(self._mmap))
+            numrecs = (len(self._mmap) - first_record) // record_size if record_size else 0
+
+        self.dimensions = {name: (numrecs if index == record_dim else length)
+                           for index, (name, length) in enumerate(dims)}
+        self.variables = {}
+        for name, dimids, attrs, dtype, vsize, begin in specs:
+            dim_names = [dims[d][0] for d in dimids]
+            shape = tuple(self.dimensions[n] for n in dim_names)
+            inner = shape[1:] if dimids and dimids[0] == record_dim else shape
+            strides = tuple(int(np.prod(inner[i + 1:], dtype=np.int64)) * dtype.itemsize for i in range(len(inner)))
+            if dimids and dimids[0] == record_dim:
+                shape, strides = (numrecs,) + inner, (record_size,) + strides
+            data = np.ndarray(shape, dtype=dtype, buffer=self._mmap, offset=begin, strides=strides) \
+                if all(shape) else np.empty(shape, dtype=dtype)
+            self.variables[name] = Variable(name, dim_names, data, attrs)
+
+    def close(self):
+        self.variables = {}
+        if getattr(self, "_mmap", None) is not None:
+            try:
+                self._mmap.close()
+            except BufferError:  # 仍有切片视图引用映射，交给GC
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NetCDF4Dataset:
+    """Thin adapter over ``netCDF4.Dataset`` with the same interface; HDF5 chunks are read on slicing."""
+
+    def __init__(self, path):
+        if netCDF4 is None:
+            raise NetCDFFormatError("NetCDF-4 (HDF5) files require the optional netCDF4 package")
+        self.path = path
+        self._dataset = netCDF4.Dataset(path, "r")
+        self._dataset.set_auto_mask(False)
+        self.attrs = {name: self._dataset.getncattr(name) for name in self._dataset.ncattrs()}
+        self.dimensions = {name: len(dim) for name, dim in self._dataset.dimensions.items()}
+        self.variables = {
+            name: Variable(name, var.dimensions, var, {a: var.getncattr(a) for a in var.ncattrs()})
+            for name, var in self._dataset.variables.items()
+        }
+
+    def close(self):
+        self._dataset.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_dataset(path):
+    """Opens a wrfout file with the reader matching its on-disk format."""
+    with open(path, "rb") as fh:
+        kind = sniff_format(fh.read(4))
+    if kind == "netcdf3":
+        return NetCDF3Dataset(path)
+    if kind == "netcdf4":
+        return NetCDF4Dataset(path)
+    raise NetCDFFormatError("not a NetCDF file")
+
+
+def wrf_times(dataset):
+    """Decodes the WRF ``Times`` character variable into ``YYYY-MM-DD_HH:MM:SS`` strings."""
+    times = dataset.variables.get("Times")
+    if times is None:
+        return []
+    raw = times[:]
+    return [b"".join(row).decode("ascii", "replace").strip("\0 ") if raw.dtype.kind == "S"
+            else "".join(row) for row in raw]
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def describe(dataset):
+    """Small JSON-able summary: dimensions, variables with shapes, time range."""
+    times = wrf_times(dataset)
+    return {
+        "dimensions": dict(dataset.dimensions),
+        "variables": {name: {"dimensions": list(var.dimensions), "shape": list(var.shape)}
+                      for name, var in dataset.variables.items()},
+        "times": {"count": len(times), "first": times[0] if times else None, "last": times[-1] if times else None},
+        "attributes": {key: _jsonable(dataset.attrs[key]) for key in ("MAP_PROJ", "DX", "DY", "CEN_LAT", "CEN_LON",
+                                                           "TRUELAT1", "TRUELAT2", "STAND_LON", "GRID_ID")
+                       if key in dataset.attrs},
+    }
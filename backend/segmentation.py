@@ -0,0 +1,161 @@
+# segmentation.py
+# 长时段模拟切分：把 time_control 的起止窗口按段长切成多段，每段一对 namelist，可重启链式续跑或带预热独立冷启动
+#
+# 段边界对齐到 interval_seconds(WPS/input 取最小公倍数)的分析时刻：起点向前、段长与预热向上取整，
+# 保证每段的起止时刻都有边界场；发生调整时 summary["adjusted"] 记录请求值与实际值。
+# 结果与集合生成共用 stream_archive，manifest 记录各段的依赖顺序。
+
+import copy
+import math
+from datetime import datetime, timedelta
+
+from ensemble import MAX_BATCH_MEMBERS, WRF_DATE_FORMAT
+
+SEGMENT_MODES = ("restart", "independent")
+
+
+class SegmentError(ValueError):
+    """Raised when a segmentation spec cannot be applied to the config."""
+
+
+def _hours(spec, key, default, minimum=0.0):
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise SegmentError(f"segment.{key} must be a number")
+    if value < minimum:
+        raise SegmentError(f"segment.{key} must be at least {minimum:g}")
+    return float(value)
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _align_up(seconds, step):
+    return math.ceil(seconds / step - 1e-9) * step
+
+
+def _align_start(start, step):
+    """Latest analysis time (a multiple of ``step`` seconds since 1970-01-01 00:00) not after ``start``."""
+    seconds = int((start - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % step)
+
+
+def _boundary_step(time_control):
+    """Common multiple of the WPS and WRF input intervals, in seconds."""
+    steps = []
+    for key, default in (("interval_seconds_wps", 21600), ("interval_seconds_input", 10800)):
+        value = time_control.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise SegmentError(f"time_control.{key} must be a positive integer")
+        steps.append(value)
+    return math.lcm(*steps)
+
+
+def _compact_hours(seconds):
+    hours = seconds / 3600
+    return int(hours) if float(hours).is_integer() else round(hours, 4)
+
+
+def _window(time_control):
+    try:
+        start = datetime.strptime(time_control["start_date_str_arr"][0], WRF_DATE_FORMAT)
+        end = datetime.strptime(time_control["end_date_str_arr"][0], WRF_DATE_FORMAT)
+    except (KeyError, IndexError, TypeError, ValueError):
+        raise SegmentError("time_control needs valid start_date_str_arr/end_date_str_arr") from None
+    if end <= start:
+        raise SegmentError("End date must be after start date")
+    return start, end
+
+
+def _set_window(time_control, start, end):
+    width = max(len(time_control.get("start_date_str_arr") or []), 1)
+    time_control["start_date_str_arr"] = [start.strftime(WRF_DATE_FORMAT)] * width
+    time_control["end_date_str_arr"] = [end.strftime(WRF_DATE_FORMAT)] * width
+
+
+def plan_segments(config, segment):
+    """Splits ``config``'s run window into segments; returns ``(members, summary)``.
+
+    ``segment`` is ``{"length_hours", "spinup_hours", "mode"}``. In ``restart``
+    mode each segment continues from the previous one's restart file (written
+    at its end through ``restart_interval``) and must run after it; in
+    ``independent`` mode every segment cold-starts ``spinup_hours`` early and
+    can run concurrently. Members have the same shape as ``expand_sweep``'s.
+
+    Boundaries must fall on boundary-data analysis times, so the start is moved
+    back to the previous one and the length and spin-up are rounded up to the
+    interval; ``summary["adjusted"]`` lists every value that was changed.
+    """
+    if not isinstance(config, dict):
+        raise SegmentError("config must be an object")
+    if not isinstance(segment, dict):
+        raise SegmentError("segment must be an object")
+    mode = segment.get("mode", "restart")
+    if mode not in SEGMENT_MODES:
+        raise SegmentError(f"segment.mode must be one of {', '.join(SEGMENT_MODES)}")
+    time_control = config.get("time_control")
+    if not isinstance(time_control, dict):
+        raise SegmentError("config.time_control must be an object")
+
+    requested_start, end = _window(time_control)
+    step = _boundary_step(time_control)
+    # 起点向前取到分析时刻，段长与预热向上取整到边界场间隔，段边界 start + k*length 因而都落在分析时刻上
+    start = _align_start(requested_start, step)
+    requested_length = _hours(segment, "length_hours", 24 * 7, minimum=1) * 3600
+    length = _align_up(requested_length, step)
+    requested_spinup = _hours(segment, "spinup_hours", 0.0) * 3600 if mode == "independent" else 0
+    spinup = _align_up(requested_spinup, step)
+    adjusted = {}
+    if start != requested_start:
+        adjusted["start"] = {"requested": requested_start.strftime(WRF_DATE_FORMAT),
+                             "used": start.strftime(WRF_DATE_FORMAT)}
+    for key, requested, used in (("length_hours", requested_length, length),
+                                 ("spinup_hours", requested_spinup, spinup)):
+        if requested != used:
+            adjusted[key] = {"requested": _compact_hours(requested), "used": _compact_hours(used)}
+    count = math.ceil((end - start).total_seconds() / length)
+    if count > MAX_BATCH_MEMBERS:
+        raise SegmentError(f"Window splits into {count} segments (limit {MAX_BATCH_MEMBERS})")
+
+    members = []
+    for index in range(count):
+        seg_start = start + timedelta(seconds=index * length)
+        seg_end = min(seg_start + timedelta(seconds=length), end)
+        run_start = seg_start - timedelta(seconds=spinup) if index else seg_start
+        restart = mode == "restart" and index > 0
+        name = f"s{index:04d}_{seg_start.strftime('%Y%m%dT%H%M%S')}"
+
+        member_config = copy.deepcopy(config)
+        tc = member_config["time_control"]
+        _set_window(tc, run_start, seg_end)
+        if mode == "restart":
+            tc["restart_enabled"] = restart or bool(time_control.get("restart_enabled", False))
+            # 每段结束时写出重启文件，供下一段读取
+            tc["restart_interval_h"] = _compact_hours(length)
+        members.append({
+            "index": index,
+            "name": name,
+            "params": {
+                "segment": index,
+                "start": seg_start.strftime(WRF_DATE_FORMAT),
+                "end": seg_end.strftime(WRF_DATE_FORMAT),
+                "run_start": run_start.strftime(WRF_DATE_FORMAT),
+                "spinup_hours": _compact_hours((seg_start - run_start).total_seconds()),
+                "restart": restart,
+                "depends_on": members[-1]["name"] if restart else None,
+            },
+            "config": member_config,
+        })
+
+    names = [m["name"] for m in members]
+    summary = {
+        "mode": mode,
+        "window": {"start": start.strftime(WRF_DATE_FORMAT), "end": end.strftime(WRF_DATE_FORMAT)},
+        "length_hours": _compact_hours(length),
+        "spinup_hours": _compact_hours(spinup),
+        "boundary_interval_seconds": step,
+        "adjusted": adjusted,
+        # 依赖顺序：同一阶段内的段可以并发，阶段之间按序执行
+        "stages": [[name] for name in names] if mode == "restart" else [names],
+    }
+    return members, summary
@@ -0,0 +1,232 @@
+# serve.py
+# 生产环境入口：多worker进程 × 每进程线程池，SIGTERM时先摘除就绪再排空在途请求
+#
+#   python backend/serve.py --workers 4 --threads 8 --bind 0.0.0.0:5001
+#
+# 安装了 gunicorn 时使用 gunicorn 的 gthread worker；否则使用内置的 prefork 服务器
+# (共享监听socket，每个子进程一个有界线程池，仅限支持 fork 的系统)。
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Wolfer API with a pool of worker processes.")
+    parser.add_argument("--bind", default=os.environ.get("WOLFER_BIND", "0.0.0.0:5001"),
+                        help="host:port to listen on")
+    parser.add_argument("--workers", type=int, default=_env_int("WOLFER_WORKERS", os.cpu_count() or 1),
+                        help="worker processes")
+    parser.add_argument("--threads", type=int, default=_env_int("WOLFER_THREADS", 8),
+                        help="request threads per worker")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.environ.get("WOLFER_GRACEFUL_TIMEOUT", 30)),
+                        help="seconds to let in-flight requests finish on shutdown")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "builtin"),
+                        default=os.environ.get("WOLFER_SERVER", "auto"))
+    return parser.parse_args(argv)
+
+
+def _split_bind(bind):
+    host, _, port = bind.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+# --- gunicorn ---
+def serve_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    def worker_exit(server, worker):
+        from lifecycle import lifecycle
+        lifecycle.shutdown(timeout=0)
+
+    class WolferApplication(BaseApplication):
+        def load_config(self):
+            for key, value in {
+                "bind": args.bind,
+                "workers": args.workers,
+                "threads": args.threads,
+                "worker_class": "gthread",
+                "graceful_timeout": args.graceful_timeout,
+                "worker_exit": worker_exit,
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # 未开启 preload_app，load() 在每个worker进程里各调用一次
+            from app import create_app, start_job_runners
+            app = create_app()
+            start_job_runners()
+            return app
+
+    WolferApplication().run()
+
+
+# --- builtin prefork server ---
+def _make_server(host, port, app, threads, fd):
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        # 每个请求一个连接，线程不会被空闲的 keep-alive 连接占住
+        protocol_version = "HTTP/1.0"
+
+        def log_request(self, code="-", size="-"):
+            # 请求日志由 metrics 的 after_request 钩子输出
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+
+        def __init__(self, *server_args, **kwargs):
+            super().__init__(*server_args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wolfer-request")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process_request_thread, request, client_address)
+
+        def _process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    return PooledWSGIServer(host, port, app, handler=RequestHandler, fd=fd)
+
+
+def run_worker(listener, host, port, threads, graceful_timeout):
+    """Serves requests from the shared ``listener`` until SIGTERM/SIGINT, then drains and exits."""
+    from app import create_app, start_job_runners
+    from lifecycle import lifecycle
+
+    server = _make_server(host, port, create_app(), threads, listener.fileno())
+    start_job_runners()
+
+    def stop(signum, frame):
+        lifecycle.begin_shutdown()
+        # serve_forever 运行在主线程，shutdown() 必须从其他线程调用
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        # 已接受的连接(包括还在线程池队列里的)都处理完，最多等 graceful_timeout 秒
+        lifecycle.begin_shutdown()
+        started = time.monotonic()
+        drain = threading.Thread(target=server.pool.shutdown, daemon=True)
+        drain.start()
+        drain.join(graceful_timeout)
+        lifecycle.shutdown(timeout=max(0.0, graceful_timeout - (time.monotonic() - started)))
+        server.server_close()
+
+
+def serve_builtin(args):
+    host, port = _split_bind(args.bind)
+    listener = socket.create_server((host, port), backlog=2048)
+    listener.set_inheritable(True)
+
+    if args.workers <= 1:
+        run_worker(listener, host, port, args.threads, args.graceful_timeout)
+        return
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(listener, host, port, args.threads, args.graceful_timeout)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        spawn()
+
+    deadline = None
+    while children:
+        if stopping and deadline is None:
+            deadline = time.monotonic() + args.graceful_timeout + 5
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if deadline is not None and time.monotonic() > deadline:
+                for child in list(children):
+                    os.kill(child, signal.SIGKILL)
+            time.sleep(0.2)
+            continue
+        children.discard(pid)
+        if not stopping:
+            # worker 意外退出时补齐
+            spawn()
+    listener.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # worker 进程据此划分CPU：每个 worker 的渲染进程池只取 cpu_count // workers 个进程
+    os.environ["WOLFER_WORKERS"] = str(args.workers)
+    metrics_dir, master_pid = None, os.getpid()
+    if args.workers > 1:
+        # 多个worker之间共享下载文件，默认改用磁盘存储
+        os.environ.setdefault("WOLFER_ARTIFACT_BACKEND", "disk")
+        # 各worker把指标快照写到同一目录，/api/metrics 汇总全部worker；未指定时用本次运行私有的临时目录
+        if os.environ.get("WOLFER_METRICS_DIR"):
+            from metrics import clear_shared_metrics
+            clear_shared_metrics(os.environ["WOLFER_METRICS_DIR"])
+        else:
+            metrics_dir = tempfile.mkdtemp(prefix="wolfer-metrics-")
+            os.environ["WOLFER_METRICS_DIR"] = metrics_dir
+
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "builtin"
+    try:
+        if server == "gunicorn":
+            serve_gunicorn(args)
+        else:
+            serve_builtin(args)
+    finally:
+        # gunicorn 的 worker 以 SystemExit 退出，也会经过这里；只由主进程清理
+        if metrics_dir is not None and os.getpid() == master_pid:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# site_extraction.py
+# 风机点位时间序列提取：每个wrfout域建一次空间索引(缓存)，经纬度 -> 网格分数索引，双线性插值后按列返回
+#
+# 索引优先用投影：把 XLAT/XLONG 投影到 MAP_PROJ 平面，网格在平面上等距，点位定位是 O(1)；
+# 投影参数与网格不吻合时退化为最近点搜索(装有 scipy 用 cKDTree，否则粗网格 + 局部细化)。
+
+import io
+import os
+
+import numpy as np
+
+from namelist_cache import NamelistCache
+from netcdf_reader import wrf_times
+from wind_analysis import DEFAULT_CHUNK_BYTES, AnalysisError, WindReader
+from wrf_projection import Projection, ProjectionError
+
+try:  # 可选：非投影网格的最近点查询
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+MAX_SITES = int(os.environ.get("WOLFER_MAX_SITES", 5000))
+# 投影坐标与等距网格的最大偏差(以格距为单位)，超过则认为投影参数与网格不符
+PROJECTION_TOLERANCE = 0.05
+INTERPOLATION_METHODS = ("bilinear", "nearest")
+
+site_index_cache = NamelistCache(
+    max_entries=int(os.environ.get("WOLFER_SITE_INDEX_CACHE_SIZE", 32)),
+    ttl_seconds=float(os.environ.get("WOLFER_SITE_INDEX_CACHE_TTL", 86400)),
+)
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class ProjectionIndex:
+    """Grid locator using the domain's map projection: the grid is regular on the projection plane."""
+
+    kind = "projection"
+
+    def __init__(self, projection, lat, lon):
+        x, y = projection.forward(lat, lon)
+        ny, nx = lat.shape
+        if nx < 2 or ny < 2:
+            raise ProjectionError("grid too small for a projection index")
+        self.projection = projection
+        self.x0, self.y0 = x[0, 0], y[0, 0]
+        self.dx = float(np.median(np.diff(x, axis=1)))
+        self.dy = float(np.median(np.diff(y, axis=0)))
+        if self.dx == 0 or self.dy == 0:
+            raise ProjectionError("degenerate projected grid")
+        cols, rows = np.meshgrid(np.arange(nx), np.arange(ny))
+        error = max(np.max(np.abs(self.x0 + cols * self.dx - x)) / abs(self.dx),
+                    np.max(np.abs(self.y0 + rows * self.dy - y)) / abs(self.dy))
+        if error > PROJECTION_TOLERANCE:
+            raise ProjectionError(f"projected grid deviates by {error:.2f} cells from a regular grid")
+        self.max_error = float(error)
+
+    def locate(self, lat, lon):
+        x, y = self.projection.forward(lat, lon)
+        return (x - self.x0) / self.dx, (y - self.y0) / self.dy
+
+
+class NearestIndex:
+    """Fallback locator for grids the projection cannot describe.
+
+    Finds the nearest grid point on the sphere (cKDTree if available, else a
+    coarse stride search refined in a local window), then converts to a
+    fractional index with the local grid Jacobian.
+    """
+
+    kind = "nearest"
+
+    def __init__(self, lat, lon):
+        self.lat = lat.astype(np.float64)
+        self.lon = lon.astype(np.float64)
+        self.ny, self.nx = lat.shape
+        self.points = _unit_vectors(self.lat, self.lon)
+        if cKDTree is not None:
+            self.tree = cKDTree(self.points.reshape(-1, 3))
+        else:
+            self.tree = None
+            self.stride = max(1, int(np.sqrt(self.ny * self.nx) // 64))
+            self.coarse = self.points[::self.stride, ::self.stride]
+
+    def _nearest(self, targets):
+        if self.tree is not None:
+            _, flat = self.tree.query(targets)
+            return np.unravel_index(flat, (self.ny, self.nx))
+        coarse = self.coarse.reshape(-1, 3)
+        best = np.argmax(targets @ coarse.T, axis=1)
+        rows, cols = np.unravel_index(best, self.coarse.shape[:2])
+        rows, cols = rows * self.stride, cols * self.stride
+        # 在粗网格命中点周围 ±stride 的窗口里细化
+        offsets = np.arange(-self.stride, self.stride + 1)
+        shape = (len(targets), len(offsets), len(offsets))
+        window_rows = np.broadcast_to(np.clip(rows[:, None, None] + offsets[None, :, None], 0, self.ny - 1), shape)
+        window_cols = np.broadcast_to(np.clip(cols[:, None, None] + offsets[None, None, :], 0, self.nx - 1), shape)
+        scores = np.einsum("swhk,sk->swh", self.points[window_rows, window_cols], targets)
+        best = np.argmax(scores.reshape(len(targets), -1), axis=1)
+        sites = np.arange(len(targets))
+        return (window_rows.reshape(len(targets), -1)[sites, best],
+                window_cols.reshape(len(targets), -1)[sites, best])
+
+    def locate(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        rows, cols = self._nearest(_unit_vectors(lat, lon))
+        # 局部线性化：d(lat,lon) = J · d(i,j)，解出分数偏移
+        r0, c0 = np.clip(rows, 0, self.ny - 2), np.clip(cols, 0, self.nx - 2)
+        coslat = np.cos(np.radians(self.lat[rows, cols]))
+        di = np.stack([self.lat[r0, c0 + 1] - self.lat[r0, c0],
+                       ((self.lon[r0, c0 + 1] - self.lon[r0, c0] + 180) % 360 - 180) * coslat], axis=-1)
+        dj = np.stack([self.lat[r0 + 1, c0] - self.lat[r0, c0],
+                       ((self.lon[r0 + 1, c0] - self.lon[r0, c0] + 180) % 360 - 180) * coslat], axis=-1)
+        delta = np.stack([lat - self.lat[rows, cols],
+                          ((lon - self.lon[rows, cols] + 180) % 360 - 180) * coslat], axis=-1)
+        jacobian = np.stack([di, dj], axis=-1)
+        offsets = np.linalg.solve(jacobian, delta[..., None])[..., 0]
+        return cols + offsets[:, 0], rows + offsets[:, 1]
+
+
+def build_site_index(dataset):
+    lat_var, lon_var = dataset.variables.get("XLAT"), dataset.variables.get("XLONG")
+    if lat_var is None or lon_var is None:
+        raise AnalysisError("wrfout file is missing XLAT/XLONG")
+    lat = lat_var[0] if len(lat_var.shape) == 3 else lat_var[:]
+    lon = lon_var[0] if len(lon_var.shape) == 3 else lon_var[:]
+    lat, lon = lat.astype(np.float64), lon.astype(np.float64)
+    try:
+        index = ProjectionIndex(Projection.from_wrfout(dataset.attrs), lat, lon)
+    except ProjectionError:
+        index = NearestIndex(lat, lon)
+    index.shape = lat.shape
+    return index
+
+
+def get_site_index(dataset):
+    """Per-domain index, cached by file path and modification time."""
+    stat = os.stat(dataset.path)
+    key = (dataset.path, stat.st_mtime_ns, stat.st_size)
+    index = site_index_cache.get(key)
+    if index is None:
+        index = build_site_index(dataset)
+        site_index_cache.put(key, index)
+    return index
+
+
+def interpolation_stencil(fi, fj, shape, method):
+    """Corner cells ``(rows, cols)`` of shape (sites, 4), their weights, and an inside-domain mask."""
+    ny, nx = shape
+    inside = (fi >= -0.5) & (fi <= nx - 0.5) & (fj >= -0.5) & (fj <= ny - 0.5)
+    if method == "nearest":
+        rows = np.clip(np.rint(fj), 0, ny - 1).astype(np.intp)[:, None].repeat(4, axis=1)
+        cols = np.clip(np.rint(fi), 0, nx - 1).astype(np.intp)[:, None].repeat(4, axis=1)
+        weights = np.zeros(rows.shape)
+        weights[:, 0] = 1.0
+        return rows, cols, weights, inside
+    i0 = np.clip(np.floor(fi), 0, nx - 2).astype(np.intp)
+    j0 = np.clip(np.floor(fj), 0, ny - 2).astype(np.intp)
+    wx = np.clip(fi - i0, 0.0, 1.0)
+    wy = np.clip(fj - j0, 0.0, 1.0)
+    rows = np.stack([j0, j0, j0 + 1, j0 + 1], axis=1)
+    cols = np.stack([i0, i0 + 1, i0, i0 + 1], axis=1)
+    weights = np.stack([(1 - wx) * (1 - wy), wx * (1 - wy), (1 - wx) * wy, wx * wy], axis=1)
+    return rows, cols, weights, inside
+
+
+def extract_site_series(dataset, lat, lon, heights=("10m",), method="bilinear", chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Hub-height/10 m wind time series at every site, as columnar arrays.
+
+    Returns ``{"times", "site_lat", "site_lon", "grid_i", "grid_j", "inside",
+    "<height>/u", "<height>/v", "<height>/speed", "<height>/direction"}``;
+    series are ``(sites, time)`` float32, NaN for sites outside the domain.
+    """
+    if method not in INTERPOLATION_METHODS:
+        raise AnalysisError(f"method must be one of {', '.join(INTERPOLATION_METHODS)}")
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.shape != lon.shape or lat.ndim != 1 or not lat.size:
+        raise AnalysisError("lat and lon must be non-empty lists of equal length")
+    if lat.size > MAX_SITES:
+        raise AnalysisError(f"At most {MAX_SITES} sites per request")
+    if not (np.all(np.isfinite(lat)) and np.all(np.isfinite(lon)) and np.all(np.abs(lat) <= 90)):
+        raise AnalysisError("Site coordinates must be finite with |lat| <= 90")
+
+    index = get_site_index(dataset)
+    fi, fj = index.locate(lat, lon)
+    rows, cols, weights, inside = interpolation_stencil(fi, fj, index.shape, method)
+
+    # 所有点位的角点去重后只读一次
+    cells, inverse = np.unique(rows * index.shape[1] + cols, return_inverse=True)
+    inverse = inverse.reshape(rows.shape)
+    reader = WindReader(dataset, heights, chunk_bytes)
+    series = {label: (np.empty((lat.size, reader.steps), dtype=np.float32),
+                      np.empty((lat.size, reader.steps), dtype=np.float32)) for label in reader.labels}
+    for window, winds in reader.point_chunks(cells // index.shape[1], cells % index.shape[1]):
+        for label, (u, v) in winds.items():
+            # (time, cells) -> (sites, time)：按角点权重加权求和
+            series[label][0][:, window] = np.einsum("tsc,sc->st", u[:, inverse], weights)
+            series[label][1][:, window] = np.einsum("tsc,sc->st", v[:, inverse], weights)
+
+    result = {
+        "times": np.array(wrf_times(dataset)),
+        "site_lat": lat.astype(np.float32), "site_lon": lon.astype(np.float32),
+        "grid_i": fi.astype(np.float32), "grid_j": fj.astype(np.float32), "inside": inside,
+    }
+    for label, (u, v) in series.items():
+        u[~inside] = np.nan
+        v[~inside] = np.nan
+        result[f"{label}/u"] = u
+        result[f"{label}/v"] = v
+        result[f"{label}/speed"] = np.hypot(u, v)
+        result[f"{label}/direction"] = (np.degrees(np.arctan2(-u, -v)) % 360.0).astype(np.float32)
+    result["index_kind"] = np.array(index.kind)
+    return result
+
+
+def to_npz_bytes(arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
@@ -0,0 +1,59 @@
+# static_responses.py
+# 常量接口(选项列表、默认配置)的预计算响应：启动时序列化一次，附带gzip/brotli变体、强ETag与Cache-Control
+
+import gzip
+import hashlib
+import json
+import os
+
+from flask import Response, request
+
+try:  # brotli 为可选依赖，未安装时只提供 gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_MAX_AGE = int(os.environ.get("WOLFER_STATIC_MAX_AGE", 3600))
+
+
+class PrecomputedResponse:
+    """A constant JSON payload serialized and compressed once, served as raw bytes."""
+
+    def __init__(self, payload, max_age=STATIC_MAX_AGE):
+        # 与 jsonify 的默认输出一致：键排序、紧凑分隔符、末尾换行
+        body = (json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.digest = digest
+        self.cache_control = f"public, max-age={max_age}"
+        # 每种编码是不同的表示，强ETag各自带后缀
+        self.variants = {None: (body, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+
+    def select_encoding(self, accept_encodings):
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accept_encodings.quality(encoding) > 0:
+                return encoding
+        return None
+
+    def matches(self, if_none_match):
+        if if_none_match.star_tag:
+            return True
+        return any(tag.split("-", 1)[0] == self.digest for tag in if_none_match)
+
+
+def serve_precomputed(precomputed):
+    """Returns the best encoded variant for the current request, or 304 if the client already has it."""
+    encoding = precomputed.select_encoding(request.accept_encodings)
+    body, etag = precomputed.variants[encoding]
+    headers = {
+        "ETag": etag,
+        "Cache-Control": precomputed.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if precomputed.matches(request.if_none_match):
+        return Response(status=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status=200, mimetype="application/json", headers=headers)
@@ -0,0 +1,44 @@
+# conftest.py
+# 后端模块按平铺方式互相导入(与 app.py 相同)，测试时把 backend/ 与 benchmarks/ 加入搜索路径；合成 wrfout 夹具
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from wrfout_fixture import synthetic_wrfout  # noqa: E402
+
+# 23 个时间步：任何大于 1 的时间块都不能整除
+WRFOUT_STEPS = 23
+
+
+@pytest.fixture(scope="session")
+def wrfout_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("wrfout") / "wrfout_d01_2020-01-01_00:00:00"
+    synthetic_wrfout(str(path), steps=WRFOUT_STEPS, ny=12, nx=16, nz=6, seed=3)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def flask_app(tmp_path_factory):
+    """One application per test session; its databases and directories live under a temporary data dir."""
+    root = tmp_path_factory.mktemp("data")
+    os.environ.update({
+        "WOLFER_DATA_DIR": str(root),
+        "WOLFER_UPLOAD_DIR": str(root / "uploads"),
+        "WOLFER_JOB_DIR": str(root / "jobs"),
+        "WOLFER_JOB_WORKERS": "0",
+        "WOLFER_BATCH_EXECUTOR": "thread",
+        "WOLFER_LOG_LEVEL": "WARNING",
+    })
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
@@ -0,0 +1,89 @@
+import os
+import re
+import subprocess
+import sys
+import types
+
+import pytest
+
+import serve
+from conftest import BACKEND_DIR
+
+
+def _run(code, tmp_path):
+    env = dict(os.environ, HOME=str(tmp_path / "home"), XDG_DATA_HOME="", WOLFER_LOG_LEVEL="WARNING")
+    for name in ("WOLFER_DATA_DIR", "WOLFER_UPLOAD_DIR", "WOLFER_JOB_DIR", "WOLFER_CONFIG_DB"):
+        env.pop(name, None)
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_import_has_no_side_effects(tmp_path):
+    # 导入不创建数据库/目录，也不启动线程
+    out = _run("import threading, app; print(threading.active_count(), app.config_store, app.job_queue)", tmp_path)
+    assert out.split() == ["1", "None", "None"]
+    assert not (tmp_path / "home").exists()
+
+
+def test_create_app_opens_stores_without_starting_runners(tmp_path):
+    out = _run("import app; app.create_app(); print(app.config_store.path, len(app.job_queue._threads))", tmp_path)
+    path, threads = out.split()
+    assert path == str(tmp_path / "home" / ".local" / "share" / "wolfer" / "configs.sqlite3")
+    assert os.path.exists(path) and threads == "0"
+
+
+def test_every_blueprint_route_is_registered(flask_app):
+    import app
+
+    with open(os.path.join(BACKEND_DIR, "app.py"), encoding="utf-8") as fh:
+        declared = set(re.findall(r"@api\.route\('([^']+)'", fh.read()))
+    rules = {rule.rule for rule in flask_app.url_map.iter_rules()}
+    assert declared and declared <= rules
+    # 探针与指标路由由 install_lifecycle / install_request_metrics 注册
+    assert {"/api/health/live", "/api/health/ready", "/api/metrics"} <= rules
+    # 工厂可重复调用，每次得到路由相同的新应用
+    second = app.create_app()
+    assert second is not flask_app
+    assert {rule.rule for rule in second.url_map.iter_rules()} == rules
+
+
+@pytest.fixture
+def chosen(monkeypatch):
+    calls = []
+    monkeypatch.setattr(serve, "serve_gunicorn", lambda args: calls.append("gunicorn"))
+    monkeypatch.setattr(serve, "serve_builtin", lambda args: calls.append("builtin"))
+    monkeypatch.delenv("WOLFER_SERVER", raising=False)
+    monkeypatch.delenv("WOLFER_ARTIFACT_BACKEND", raising=False)
+    monkeypatch.delenv("WOLFER_WORKERS", raising=False)
+    monkeypatch.delenv("WOLFER_METRICS_DIR", raising=False)
+    return calls
+
+
+def test_serve_prefers_gunicorn_when_installed(monkeypatch, chosen):
+    monkeypatch.setitem(sys.modules, "gunicorn", types.ModuleType("gunicorn"))
+    serve.main(["--workers", "1"])
+    serve.main(["--workers", "1", "--server", "builtin"])
+    assert chosen == ["gunicorn", "builtin"]
+
+
+def test_serve_falls_back_to_builtin(monkeypatch, chosen):
+    # sys.modules 中为 None 时 import 抛出 ImportError，相当于未安装
+    monkeypatch.setitem(sys.modules, "gunicorn", None)
+    serve.main(["--workers", "2"])
+    assert chosen == ["builtin"]
+    # 多个worker共享下载文件：artifact 改用磁盘存储
+    assert os.environ["WOLFER_ARTIFACT_BACKEND"] == "disk"
+    # worker 据此划分各自渲染进程池的大小
+    assert os.environ["WOLFER_WORKERS"] == "2"
+    # 各 worker 的指标快照写入临时目录，服务结束后由主进程删除
+    metrics_dir = os.environ["WOLFER_METRICS_DIR"]
+    assert os.path.basename(metrics_dir).startswith("wolfer-metrics-") and not os.path.exists(metrics_dir)
+
+
+def test_parse_args_defaults(monkeypatch):
+    monkeypatch.setenv("WOLFER_THREADS", "3")
+    args = serve.parse_args(["--bind", "127.0.0.1:6000"])
+    assert args.threads == 3 and serve._split_bind(args.bind) == ("127.0.0.1", 6000)
+    assert serve._split_bind(":5001") == ("0.0.0.0", 5001)
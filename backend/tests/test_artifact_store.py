@@ -0,0 +1,175 @@
+import os
+
+import pytest
+
+import app
+from artifact_store import DiskArtifactStore, MemoryArtifactStore, artifact_id_for, create_artifact_store
+
+FILES = {"namelist.wps": "&share\n max_dom = 1,\n/\n", "namelist.input": "&domains\n e_we = 100,\n/\n"}
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "disk"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryArtifactStore(max_artifacts=2, ttl_seconds=60)
+    return DiskArtifactStore(str(tmp_path / "artifacts"), ttl_seconds=60)
+
+
+def _read(located):
+    source, _ = located
+    if isinstance(source, bytes):
+        return source
+    with open(source, "rb") as fh:
+        return fh.read()
+
+
+def test_ids_are_content_addressed():
+    assert artifact_id_for(FILES) == artifact_id_for(dict(reversed(list(FILES.items()))))
+    assert artifact_id_for(FILES) != artifact_id_for(dict(FILES, **{"namelist.wps": ""}))
+    # 文件名与内容之间有分隔，挪动边界不会撞ID
+    assert artifact_id_for({"ab": "c"}) != artifact_id_for({"a": "bc"})
+
+
+def test_identical_files_are_stored_once(store, tmp_path):
+    first = store.put(FILES)
+    assert store.put(dict(FILES)) == first
+    assert _read(store.locate(first, "namelist.wps")) == FILES["namelist.wps"].encode()
+    if isinstance(store, DiskArtifactStore):
+        shards = os.listdir(store.root)
+        assert shards == [first[:2]] and os.listdir(os.path.join(store.root, first[:2])) == [first]
+        assert sorted(os.listdir(os.path.join(store.root, first[:2], first))) == sorted(FILES)
+    else:
+        assert len(store._artifacts) == 1
+
+
+def test_unknown_artifact_or_file(store):
+    artifact_id = store.put(FILES)
+    assert store.locate("0" * 32, "namelist.wps") is None
+    assert store.locate(artifact_id, "namelist.output") is None
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryArtifactStore(max_artifacts=2)
+    a = store.put({"f": "a"})
+    b = store.put({"f": "b"})
+    store.locate(a, "f")
+    store.put({"f": "c"})
+    assert store.locate(b, "f") is None and store.locate(a, "f") is not None
+
+
+@pytest.mark.parametrize("backend", ["memory", "disk"])
+def test_artifacts_expire(backend, tmp_path):
+    clock = FakeClock(1_000_000.0)
+    if backend == "memory":
+        store = MemoryArtifactStore(ttl_seconds=60, clock=clock)
+    else:
+        store = DiskArtifactStore(str(tmp_path), ttl_seconds=60, clock=clock)
+    artifact_id = store.put(FILES)
+    if backend == "disk":
+        # 磁盘后端以目录 mtime 作为创建时间
+        os.utime(os.path.join(str(tmp_path), artifact_id[:2], artifact_id), (clock.now, clock.now))
+    clock.now += 59
+    assert store.locate(artifact_id, "namelist.wps") is not None
+    other = store.put({"f": "later"})
+    if backend == "disk":
+        os.utime(os.path.join(str(tmp_path), other[:2], other), (clock.now, clock.now))
+    clock.now += 1
+    assert store.locate(artifact_id, "namelist.wps") is None
+    assert store.evict_expired() == 0
+    clock.now += 60
+    assert store.evict_expired() == 1
+    assert store.locate(other, "f") is None
+
+
+def test_backend_is_chosen_from_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("WOLFER_ARTIFACT_BACKEND", "disk")
+    monkeypatch.setenv("WOLFER_ARTIFACT_DIR", str(tmp_path / "shared"))
+    assert isinstance(create_artifact_store(), DiskArtifactStore)
+    monkeypatch.setenv("WOLFER_ARTIFACT_BACKEND", "memory")
+    assert isinstance(create_artifact_store(), MemoryArtifactStore)
+    monkeypatch.setenv("WOLFER_ARTIFACT_BACKEND", "s3")
+    with pytest.raises(ValueError, match="Unknown artifact backend"):
+        create_artifact_store()
+
+
+@pytest.fixture(params=["memory", "disk"])
+def download_store(request, monkeypatch, tmp_path):
+    store = MemoryArtifactStore() if request.param == "memory" else DiskArtifactStore(str(tmp_path))
+    monkeypatch.setattr(app, "artifact_store", store)
+    return store
+
+
+def _url(artifact_id, filename="namelist.wps"):
+    return f"/api/download/{artifact_id}/{filename}"
+
+
+def test_download_whole_file(client, download_store):
+    artifact_id = download_store.put(FILES)
+    response = client.get(_url(artifact_id))
+    assert response.status_code == 200
+    assert response.data == FILES["namelist.wps"].encode()
+    assert response.headers["ETag"] == f'"{artifact_id}-namelist.wps"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["Content-Disposition"] == "attachment; filename=namelist.wps"
+    assert "Last-Modified" in response.headers
+    response.close()
+
+
+def test_download_ranges(client, download_store):
+    artifact_id = download_store.put(FILES)
+    payload = FILES["namelist.wps"].encode()
+    partial = client.get(_url(artifact_id), headers={"Range": "bytes=2-6"})
+    assert partial.status_code == 206
+    assert partial.data == payload[2:7]
+    assert partial.headers["Content-Range"] == f"bytes 2-6/{len(payload)}"
+    suffix = client.get(_url(artifact_id), headers={"Range": "bytes=-4"})
+    assert suffix.status_code == 206 and suffix.data == payload[-4:]
+    unsatisfiable = client.get(_url(artifact_id), headers={"Range": f"bytes={len(payload) + 10}-"})
+    assert unsatisfiable.status_code == 416
+    for response in (partial, suffix, unsatisfiable):
+        response.close()
+
+
+def test_download_conditional_requests(client, download_store):
+    artifact_id = download_store.put(FILES)
+    etag = f'"{artifact_id}-namelist.wps"'
+    assert client.get(_url(artifact_id), headers={"If-None-Match": etag}).status_code == 304
+    # If-Range 与ETag一致时按Range返回，不一致时返回整个文件
+    resumed = client.get(_url(artifact_id), headers={"Range": "bytes=0-3", "If-Range": etag})
+    assert resumed.status_code == 206 and len(resumed.data) == 4
+    stale = client.get(_url(artifact_id), headers={"Range": "bytes=0-3", "If-Range": '"old"'})
+    assert stale.status_code == 200 and stale.data == FILES["namelist.wps"].encode()
+    for response in (resumed, stale):
+        response.close()
+
+
+@pytest.mark.parametrize("url", [
+    _url("0" * 32),
+    _url("0" * 32, "namelist.input"),
+    _url("not-an-id"),
+    _url("0" * 32, ".hidden"),
+    "/api/download/namelist.wps",
+])
+def test_download_unknown_artifacts_404(client, download_store, url):
+    download_store.put(FILES)
+    response = client.get(url)
+    assert response.status_code == 404
+    assert "error" in response.get_json()
+
+
+def test_generate_links_download_the_same_bytes(client):
+    body = client.post("/api/generate-namelist", json=app.DEFAULT_CONFIG).get_json()
+    for key, link in body["download_links"].items():
+        path = link.split("://", 1)[1].split("/", 1)[1]
+        response = client.get("/" + path)
+        assert response.status_code == 200
+        assert response.data.decode() == body["file_contents"][key]
+        response.close()
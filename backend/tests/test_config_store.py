@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+import config_store
+from config_store import ConfigNotFound, ConfigStore, ConfigStoreError, VersionConflict, merge_patch
+from namelist_cache import NamelistCache
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConfigStore(str(tmp_path / "configs.sqlite3"), cache=NamelistCache(max_entries=16, ttl_seconds=60))
+
+
+DOCUMENT = {"time_control": {"run_days": 1, "history_interval_arr": [180, 60]}, "physics": {"mp_physics_arr": [8]}}
+
+
+def test_merge_patch_null_deletes():
+    target = {"a": 1, "b": {"c": 2, "d": 3}, "e": [1, 2]}
+    assert merge_patch(target, {"a": None, "b": {"c": None, "f": 4}, "e": [3]}) == {"b": {"d": 3, "f": 4}, "e": [3]}
+    # 删除不存在的键不报错；原对象不被修改
+    assert merge_patch(target, {"missing": None}) == target
+    assert target == {"a": 1, "b": {"c": 2, "d": 3}, "e": [1, 2]}
+    # RFC 7386：非对象补丁整体替换，对象补丁作用在非对象目标上时从空对象开始
+    assert merge_patch(target, [1]) == [1]
+    assert merge_patch({"a": 1}, {"a": {"b": None, "c": 1}}) == {"a": {"c": 1}}
+
+
+def test_patch_creates_versions_and_keeps_history(store):
+    created = store.create(DOCUMENT, project="site-a", name="baseline")
+    config_id = created["config_id"]
+    patched = store.patch(config_id, {"time_control": {"run_days": 3}, "physics": None})
+    assert patched["version"] == 2 and patched["changed"]
+    head = store.get(config_id)
+    assert head["version"] == 2 and head["head_version"] == 2
+    assert head["document"] == {"time_control": {"run_days": 3, "history_interval_arr": [180, 60]}}
+    assert store.get(config_id, version=1)["document"] == DOCUMENT
+    assert [v["version"] for v in store.versions(config_id)] == [2, 1]
+    assert store.versions(config_id, limit=1, before=2)[0]["version"] == 1
+
+
+def test_noop_patch_creates_no_version(store):
+    config_id = store.create(DOCUMENT)["config_id"]
+    for patch in ({}, {"time_control": {"run_days": 1}}, {"missing": None}):
+        result = store.patch(config_id, patch)
+        assert result["version"] == 1 and not result["changed"]
+    assert len(store.versions(config_id)) == 1
+
+
+def test_stale_base_version_conflicts(store):
+    config_id = store.create(DOCUMENT)["config_id"]
+    assert store.patch(config_id, {"physics": None}, base_version=1)["version"] == 2
+    with pytest.raises(VersionConflict) as excinfo:
+        store.patch(config_id, {"time_control": None}, base_version="1")
+    assert excinfo.value.head_version == 2
+    assert store.get(config_id)["version"] == 2
+    assert store.patch(config_id, {"time_control": None}, base_version=2)["version"] == 3
+
+
+def test_hash_matches_across_equal_documents(store):
+    first = store.create({"b": 1, "a": [1, 2]})
+    second = store.create({"a": [1, 2], "b": 1})
+    assert first["config_hash"] == second["config_hash"]
+    assert store.get(second["config_id"])["config_hash"] == first["config_hash"]
+
+
+def test_projects_and_listing(store):
+    store.create(DOCUMENT, project="site-a")
+    store.create(DOCUMENT, project="site-a")
+    store.create(DOCUMENT)
+    assert {p["project"]: p["configs"] for p in store.projects()} == {"default": 1, "site-a": 2}
+    assert len(store.list_configs("site-a")) == 2
+    assert len(store.list_configs(limit=1)) == 1
+
+
+@pytest.mark.parametrize("call", [
+    lambda s: s.get("0" * 32),
+    lambda s: s.get("not-an-id"),
+    lambda s: s.patch("0" * 32, {}),
+    lambda s: s.versions("0" * 32),
+])
+def test_unknown_configs(store, call):
+    with pytest.raises(ConfigNotFound):
+        call(store)
+
+
+@pytest.mark.parametrize("call", [
+    lambda s: s.create([1, 2]),
+    lambda s: s.create({}, project="../etc"),
+    lambda s: s.create({"x": "y" * (1 << 20)}),
+    lambda s: s.patch(s.create({})["config_id"], [1]),
+    lambda s: s.get(s.create({})["config_id"], version=0),
+])
+def test_rejects_bad_requests(store, call):
+    with pytest.raises(ConfigStoreError):
+        call(store)
+
+
+def test_default_path_is_not_temporary(monkeypatch, tmp_path):
+    monkeypatch.delenv("WOLFER_CONFIG_DB", raising=False)
+    monkeypatch.delenv("WOLFER_DATA_DIR", raising=False)
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "share"))
+    assert config_store.default_data_dir() == str(tmp_path / "share" / "wolfer")
+    monkeypatch.setenv("WOLFER_DATA_DIR", str(tmp_path / "data"))
+    store = config_store.create_config_store()
+    assert store.path == str(tmp_path / "data" / "configs.sqlite3") and os.path.exists(store.path)
+    monkeypatch.setenv("WOLFER_CONFIG_DB", str(tmp_path / "explicit.sqlite3"))
+    assert config_store.create_config_store().path == str(tmp_path / "explicit.sqlite3")
@@ -0,0 +1,79 @@
+import pytest
+
+from decomposition import TuningError, apply_tuning, best_decomposition, tune_decomposition
+
+
+def _config(e_we=(301, 331), e_sn=(251, 301), history_minutes=(60, 15)):
+    max_dom = len(e_we)
+    return {
+        "time_control": {
+            "history_interval_arr": list(history_minutes),
+            "history_interval_unit_arr": ["m"] * max_dom,
+            "frames_per_outfile_arr": [24] * max_dom,
+        },
+        "domain_setup": {
+            "max_dom": max_dom,
+            "e_we_arr": list(e_we), "e_sn_arr": list(e_sn), "e_vert_arr": [51] * max_dom,
+            "parent_id_arr": [1, 1][:max_dom], "parent_grid_ratio_arr": [1, 3][:max_dom],
+            "parent_time_step_ratio_arr": [1, 3][:max_dom],
+            "i_parent_start_arr": [1, 90][:max_dom], "j_parent_start_arr": [1, 80][:max_dom],
+        },
+    }
+
+
+def test_best_decomposition_respects_constraints():
+    grids = [(300, 250, 50, 1.0)]
+    x, y, _ = best_decomposition(grids, 64)
+    assert x * y == 64
+    x, y, _ = best_decomposition(grids, 48, row_multiple=8)
+    assert x * y == 48 and y % 8 == 0
+    # 61 是质数：61x1 的 patch 只有 4 个点宽
+    assert best_decomposition(grids, 61, min_patch=10) is None
+
+
+@pytest.mark.parametrize("grid, cores", [
+    ({}, 64), ({}, 100), ({}, 256), ({}, 512), ({}, 1000),
+    # 大网格每次历史写出数 GB，需要多个 I/O 任务一组
+    ({"e_we": (1201, 1501), "e_sn": (1001, 1201)}, 4096),
+    ({"e_we": (1201, 1501), "e_sn": (1001, 1201)}, 3000),
+])
+def test_nproc_y_divisible_by_io_tasks_per_group(grid, cores):
+    plan = tune_decomposition(_config(**grid), {"cores": cores})
+    assert plan["compute_tasks"] == plan["nproc_x"] * plan["nproc_y"]
+    assert plan["compute_tasks"] + plan["io_tasks"] + plan["idle_tasks"] == cores
+    if plan["nio_tasks_per_group"]:
+        assert plan["nproc_y"] % plan["nio_tasks_per_group"] == 0
+    if grid:
+        assert plan["nio_tasks_per_group"] > 1
+    for domain in plan["domains"]:
+        assert min(domain["patch"]) >= plan["min_patch"]
+
+
+def test_quilting_thresholds():
+    assert tune_decomposition(_config(), {"cores": 32})["io_tasks"] == 0
+    assert tune_decomposition(_config(), {"cores": 512, "quilting": "off"})["io_tasks"] == 0
+    # 15 分钟输出间隔且核数足够时用两组 I/O 任务
+    assert tune_decomposition(_config(), {"cores": 512})["nio_groups"] == 2
+    assert tune_decomposition(_config(history_minutes=(60, 60)), {"cores": 512})["nio_groups"] == 1
+
+
+def test_prime_core_count_leaves_tasks_idle():
+    plan = tune_decomposition(_config(), {"cores": 61, "quilting": "off"})
+    assert plan["idle_tasks"] > 0 and "idle" in plan["rationale"][0]
+
+
+def test_apply_tuning():
+    data = dict(_config(), tuning={"cores": 256})
+    plan = tune_decomposition(data, data["tuning"])
+    tuned = apply_tuning(data, plan)
+    assert "tuning" not in tuned and "tuning" in data
+    assert tuned["domain_setup"]["nproc_x"] == plan["nproc_x"]
+    assert tuned["namelist_quilt"] == {"nio_tasks_per_group": plan["nio_tasks_per_group"],
+                                       "nio_groups": plan["nio_groups"]}
+
+
+@pytest.mark.parametrize("options", [{}, {"cores": 0}, {"cores": True}, {"cores": 8, "quilting": "on"},
+                                     {"cores": 4, "min_patch": 400}])
+def test_rejects_bad_options(options):
+    with pytest.raises(TuningError):
+        tune_decomposition(_config(), options)
@@ -0,0 +1,164 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from domain_geometry import (
+    METRES_PER_DEGREE,
+    GeometryError,
+    compute_geometry,
+    geometry_cache,
+    render_geometry,
+    to_binary,
+    to_geojson,
+)
+from nest_validation import validate_nests
+from wrf_projection import EARTH_RADIUS, Projection
+
+# 经纬度网格：格距以度为单位，角点可直接手算
+LATLON = {"map_proj": "lat-lon", "ref_lat": 10.0, "ref_lon": 20.0, "stand_lon": 0.0,
+          "e_we_arr": [11], "e_sn_arr": [5], "dx_arr": [0.5], "dy_arr": [0.5]}
+
+# d02 在 d01 的 (3, 2) 处，比例 2；d03 在 d02 的 (2, 2) 处，比例 2
+NESTED_LATLON = dict(LATLON, max_dom=3, e_we_arr=[11, 9, 5], e_sn_arr=[5, 5, 3],
+                     parent_id_arr=[1, 1, 2], parent_grid_ratio_arr=[1, 2, 2],
+                     i_parent_start_arr=[1, 3, 2], j_parent_start_arr=[1, 2, 2])
+
+
+def _ring_extent(domain):
+    ring = domain["boundary"]
+    return ring[:, 0].min(), ring[:, 0].max(), ring[:, 1].min(), ring[:, 1].max()
+
+
+def test_latlon_corners_and_mesh():
+    domain = compute_geometry(LATLON, mesh_lines=50)["domains"][0]
+    # 外边界为错位网格：中心在 ref，宽 (e_we-1)*dx
+    np.testing.assert_allclose(domain["boundary"], [[17.5, 9.0], [22.5, 9.0], [22.5, 11.0], [17.5, 11.0],
+                                                    [17.5, 9.0]])
+    # 质量点位于格子中心
+    assert domain["mesh_lon"].shape == (4, 10)
+    np.testing.assert_allclose(domain["mesh_lon"][0], 17.75 + 0.5 * np.arange(10))
+    np.testing.assert_allclose(domain["mesh_lat"][:, 0], 9.25 + 0.5 * np.arange(4))
+
+
+def test_latlon_grid_given_in_metres_is_converted():
+    domain = compute_geometry(dict(LATLON, dx_arr=[METRES_PER_DEGREE * 0.5], dy_arr=[METRES_PER_DEGREE * 0.5]))
+    np.testing.assert_allclose(_ring_extent(domain["domains"][0]), (17.5, 22.5, 9.0, 11.0))
+
+
+def test_mercator_corners():
+    setup = {"map_proj": "mercator", "ref_lat": 0.0, "ref_lon": 0.0, "truelat1": 0.0, "stand_lon": 0.0,
+             "e_we_arr": [21], "e_sn_arr": [11], "dx_arr": [METRES_PER_DEGREE], "dy_arr": [METRES_PER_DEGREE]}
+    domain = compute_geometry(setup)["domains"][0]
+    # 赤道 Mercator：x 与经度成正比，纬度 = gd(y / R)
+    north = math.degrees(math.atan(math.sinh(5 * METRES_PER_DEGREE / EARTH_RADIUS)))
+    np.testing.assert_allclose(_ring_extent(domain), (-10.0, 10.0, -north, north), atol=1e-9)
+    assert len(domain["boundary"]) == 5
+
+
+def test_polar_corners_around_the_pole():
+    setup = {"map_proj": "polar", "ref_lat": 90.0, "ref_lon": 0.0, "truelat1": 60.0, "stand_lon": 0.0,
+             "e_we_arr": [41], "e_sn_arr": [41], "dx_arr": [25000], "dy_arr": [25000]}
+    ring = compute_geometry(setup)["domains"][0]["boundary"]
+    # 以极点为中心的正方形：四个角纬度相同，经度为 ±45°/±135°
+    half_diagonal = math.sqrt(2) * 20 * 25000
+    corner_lat = 90 - 2 * math.degrees(math.atan(half_diagonal / (EARTH_RADIUS * (1 + math.sin(math.radians(60))))))
+    corners = ring[[0, 40, 80, 120]]
+    np.testing.assert_allclose(corners[:, 1], corner_lat)
+    np.testing.assert_allclose(np.sort(corners[:, 0]), [-135.0, -45.0, 45.0, 135.0])
+    # 曲线边界逐段采样并首尾闭合
+    assert len(ring) == 4 * 40 + 1 and np.allclose(ring[0], ring[-1])
+
+
+def test_lambert_domain_is_a_rectangle_on_the_plane():
+    setup = {"map_proj": "lambert", "ref_lat": 40.0, "ref_lon": 116.0, "truelat1": 30.0, "truelat2": 60.0,
+             "stand_lon": 116.0, "e_we_arr": [101], "e_sn_arr": [81], "dx_arr": [27000], "dy_arr": [27000]}
+    ring = compute_geometry(setup)["domains"][0]["boundary"]
+    projection = Projection("lambert", 30.0, 60.0, 116.0)
+    x, y = projection.forward(ring[:, 1], ring[:, 0])
+    ref_x, ref_y = projection.forward(40.0, 116.0)
+    np.testing.assert_allclose([x.min(), x.max()], [ref_x - 50 * 27000, ref_x + 50 * 27000], atol=1e-3)
+    np.testing.assert_allclose([y.min(), y.max()], [ref_y - 40 * 27000, ref_y + 40 * 27000], atol=1e-3)
+    # ref_lon == stand_lon 时边界关于中央经线对称
+    sw, se = ring[0], ring[64]
+    assert sw[1] == pytest.approx(se[1]) and sw[0] - 116.0 == pytest.approx(116.0 - se[0])
+
+
+def test_nests_are_placed_in_their_parent():
+    assert validate_nests(NESTED_LATLON) == []
+    d01, d02, d03 = compute_geometry(NESTED_LATLON)["domains"]
+    assert (d02["parent"], d03["parent"]) == (1, 2)
+    assert (d02["dx"], d03["dx"]) == (0.25, 0.125)
+    # d02 左下角在 d01 第 3 个 x 错位格点、第 2 个 y 错位格点
+    np.testing.assert_allclose(_ring_extent(d02), (17.5 + 2 * 0.5, 17.5 + 2 * 0.5 + 8 * 0.25,
+                                                   9.0 + 0.5, 9.0 + 0.5 + 4 * 0.25))
+    np.testing.assert_allclose(_ring_extent(d03), (18.5 + 0.25, 18.5 + 0.25 + 4 * 0.125,
+                                                   9.5 + 0.25, 9.5 + 0.25 + 2 * 0.125))
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"map_proj": "rotated"}, "Unsupported map_proj"),
+    ({"dx_arr": [0]}, "dx and dy must be positive"),
+    ({"ref_lat": 95}, "ref_lat must be between"),
+    ({"ref_lon": "east"}, "ref_lon must be a number"),
+    ({"e_we_arr": [1]}, "e_we values must be numbers >= 2"),
+    ({"max_dom": 2, "e_we_arr": [11, 9], "e_sn_arr": [5, 5], "parent_id_arr": [1, 3],
+      "parent_grid_ratio_arr": [1, 2], "i_parent_start_arr": [1, 3], "j_parent_start_arr": [1, 2]},
+     "d02 parent_id must refer to an earlier domain"),
+])
+def test_undrawable_setups(changes, message):
+    with pytest.raises(GeometryError, match=message):
+        compute_geometry(dict(LATLON, **changes))
+
+
+def test_mesh_is_decimated():
+    domain = compute_geometry(dict(LATLON, e_we_arr=[101], e_sn_arr=[51]), mesh_lines=10)["domains"][0]
+    assert domain["mesh_lat"].shape == (10, 10)
+    with pytest.raises(GeometryError, match="mesh must be between"):
+        compute_geometry(LATLON, mesh_lines=10_000)
+
+
+def test_binary_layout_matches_geojson():
+    geometry = compute_geometry(NESTED_LATLON, mesh_lines=4)
+    layout, body = to_binary(geometry)
+    features = to_geojson(geometry)["features"]
+    assert [f["properties"]["kind"] for f in features] == ["boundary", "mesh"] * 3
+    for entry, boundary in zip(layout["domains"], features[::2]):
+        block = entry["boundary"]
+        count = int(np.prod(block["shape"]))
+        ring = np.frombuffer(body, dtype="<f4", count=count, offset=block["offset"]).reshape(block["shape"])
+        np.testing.assert_allclose(ring, boundary["geometry"]["coordinates"][0], atol=1e-4)
+        assert entry["mesh"]["offset"] == block["offset"] + count * 4
+    last = layout["domains"][-1]["mesh"]
+    assert len(body) == last["offset"] + int(np.prod(last["shape"])) * 4
+
+
+@pytest.mark.parametrize("domain_setup", [[1, 2], "lat-lon", None, 7])
+def test_non_objects_are_rejected_even_when_defaults_are_cached(domain_setup):
+    render_geometry({}, cache=geometry_cache)
+    with pytest.raises(GeometryError, match="domain_setup must be an object"):
+        render_geometry(domain_setup, cache=geometry_cache)
+
+
+def test_geometry_route(client):
+    response = client.post("/api/domain-geometry", json={"domain_setup": LATLON})
+    assert response.status_code == 200 and response.mimetype == "application/geo+json"
+    body = json.loads(response.data)
+    assert body["features"][0]["geometry"]["coordinates"][0][0] == [17.5, 9.0]
+    etag = response.headers["ETag"]
+    assert client.post("/api/domain-geometry", json={"domain_setup": LATLON},
+                       headers={"If-None-Match": etag}).status_code == 304
+
+    binary = client.post("/api/domain-geometry?format=binary&mesh=3", json=LATLON)
+    assert binary.status_code == 200
+    layout = json.loads(binary.headers["X-Geometry-Layout"])
+    assert layout["domains"][0]["mesh"]["shape"] == [3, 3, 2]
+
+    client.post("/api/domain-geometry", json={"domain_setup": {}})
+    for payload in ({"domain_setup": [1, 2]}, {"domain_setup": "x"}, [LATLON]):
+        rejected = client.post("/api/domain-geometry", json=payload)
+        assert rejected.status_code == 400
+        assert rejected.get_json() == {"error": "domain_setup must be an object"}
+    assert client.post("/api/domain-geometry?format=svg", json=LATLON).status_code == 400
+    assert client.post("/api/domain-geometry?mesh=dense", json=LATLON).status_code == 400
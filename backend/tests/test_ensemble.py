@@ -0,0 +1,144 @@
+import io
+import json
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import ensemble
+from app import DEFAULT_CONFIG, generate_input_namelist_content, generate_wps_namelist_content, render_namelist_files
+from ensemble import SweepError, default_pool_size, expand_sweep, stream_archive
+
+SWEEP = {"physics": {"mp_physics": [6, 8], "cu_physics": [0, 1, 3]}}
+
+
+def test_sweep_is_cartesian_product():
+    members = expand_sweep(DEFAULT_CONFIG, SWEEP)
+    assert len(members) == 6
+    assert [m["index"] for m in members] == list(range(6))
+    assert [(m["params"]["physics.mp_physics"], m["params"]["physics.cu_physics"]) for m in members] == [
+        (6, 0), (6, 1), (6, 3), (8, 0), (8, 1), (8, 3)]
+    assert members[4]["name"] == "m0004_mp8_cu1"
+    # 裸键写入每个域列；基础配置不被修改
+    assert members[4]["config"]["physics"]["cu_physics_arr"] == [1]
+    assert DEFAULT_CONFIG["physics"]["cu_physics_arr"] == [1]
+
+
+def test_sweep_start_dates_keep_window_length():
+    members = expand_sweep(DEFAULT_CONFIG, {"start_dates": ["2020-07-01_00:00:00", "2020-07-02_12:00:00"],
+                                            "physics": {"mp_physics_arr": [[6]]}})
+    assert [m["config"]["time_control"]["end_date_str_arr"] for m in members] == [
+        ["2020-07-02_00:00:00"], ["2020-07-03_12:00:00"]]
+    assert members[1]["name"] == "m0001_start20200702T120000_mp6"
+
+
+def test_sweep_member_limit(monkeypatch):
+    monkeypatch.setattr(ensemble, "MAX_BATCH_MEMBERS", 6)
+    assert len(expand_sweep(DEFAULT_CONFIG, SWEEP)) == 6
+    monkeypatch.setattr(ensemble, "MAX_BATCH_MEMBERS", 5)
+    with pytest.raises(SweepError, match="6 members \\(limit 5\\)"):
+        expand_sweep(DEFAULT_CONFIG, SWEEP)
+
+
+@pytest.mark.parametrize("sweep, message", [
+    ([], "sweep must be an object"),
+    ({"physics": [6]}, "value lists"),
+    ({"physics": {"mp_physics": []}}, "non-empty list"),
+    ({"start_dates": ["tomorrow"]}, "Invalid start date"),
+])
+def test_sweep_rejects_bad_specs(sweep, message):
+    with pytest.raises(SweepError, match=message):
+        expand_sweep(DEFAULT_CONFIG, sweep)
+
+
+def _read_archive(data, archive_format):
+    if archive_format == "zip":
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        return {m.name: archive.extractfile(m).read() for m in archive.getmembers()}
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "tar"])
+def test_stream_archive_matches_single_generation(archive_format):
+    members = expand_sweep(DEFAULT_CONFIG, SWEEP)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        chunks = list(stream_archive(members, render_namelist_files, archive_format, executor=pool,
+                                     manifest_extra={"sweep": SWEEP}))
+    # 写入的是不可seek的缓冲区；zip 逐成员产出，tar.gz 的小成员被压缩器缓存到结束时才产出
+    assert len(chunks) == 7 if archive_format == "zip" else len(chunks) >= 1
+    files = _read_archive(b"".join(chunks), archive_format)
+    manifest = json.loads(files.pop("manifest.json"))
+    assert manifest["total"] == manifest["succeeded"] == 6 and manifest["sweep"] == SWEEP
+    assert [e["index"] for e in manifest["members"]] == list(range(6))
+    assert len(files) == 12
+    for member in members:
+        assert files[f"{member['name']}/namelist.wps"].decode() == generate_wps_namelist_content(member["config"])
+        assert files[f"{member['name']}/namelist.input"].decode() == generate_input_namelist_content(member["config"])
+
+
+def _fail_on_kessler(config):
+    if config["physics"]["mp_physics_arr"] == [6]:
+        raise ValueError("no such scheme")
+    return render_namelist_files(config)
+
+
+def test_member_failures_are_reported_in_manifest():
+    members = expand_sweep(DEFAULT_CONFIG, SWEEP)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        data = b"".join(stream_archive(members, _fail_on_kessler, "zip", executor=pool))
+    files = _read_archive(data, "zip")
+    manifest = json.loads(files.pop("manifest.json"))
+    assert (manifest["succeeded"], manifest["failed"]) == (3, 3)
+    failed = [e for e in manifest["members"] if not e["success"]]
+    assert {e["params"]["physics.mp_physics"] for e in failed} == {6}
+    assert failed[0]["error"] == "ValueError: no such scheme"
+    # 失败成员不写文件，其余成员照常打包
+    assert all(not name.startswith(e["name"]) for e in failed for name in files)
+    assert len(files) == 6
+
+
+def test_closing_the_stream_cancels_pending_chunks():
+    size = ensemble.BATCH_CHUNK_SIZE
+    members = expand_sweep(DEFAULT_CONFIG, {"dynamics": {"diff_opt": list(range(4 * size))}})
+    blocked, release, rendered = threading.Event(), threading.Event(), []
+
+    def slow_render(config):
+        rendered.append(config)
+        if len(rendered) > size:
+            blocked.set()
+            release.wait(5)
+        return render_namelist_files(config)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        stream = stream_archive(members, slow_render, "zip", executor=pool)
+        next(stream)
+        assert blocked.wait(5)
+        # 模拟客户端断开：响应关闭时生成器被 close()
+        stream.close()
+        release.set()
+    # 第一块已完成、第二块正在渲染；其余两块被取消
+    assert len(rendered) == 2 * size
+
+
+def test_process_pool_renders_with_start_method(monkeypatch):
+    monkeypatch.delenv("WOLFER_BATCH_START_METHOD", raising=False)
+    context = ensemble._pool_context()
+    assert context.get_start_method() in ("forkserver", "spawn")
+    members = expand_sweep(DEFAULT_CONFIG, {"physics": {"mp_physics": [6, 8]}})
+    # 子进程重新导入 app 来取得渲染函数
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        files = _read_archive(b"".join(stream_archive(members, render_namelist_files, "zip", executor=pool)), "zip")
+    assert json.loads(files["manifest.json"])["succeeded"] == 2
+
+
+def test_pool_size_is_split_between_server_workers(monkeypatch):
+    monkeypatch.setattr(ensemble.os, "cpu_count", lambda: 8)
+    monkeypatch.delenv("WOLFER_WORKERS", raising=False)
+    assert default_pool_size() == 8
+    monkeypatch.setenv("WOLFER_WORKERS", "3")
+    assert default_pool_size() == 2
+    monkeypatch.setenv("WOLFER_WORKERS", "16")
+    assert default_pool_size() == 1
@@ -0,0 +1,95 @@
+import pytest
+
+from job_queue import (
+    MAX_POLL_WAIT,
+    JobError,
+    JobLimitError,
+    JobNotFound,
+    JobQueue,
+    StreamSlots,
+    create_job_queue,
+)
+from lifecycle import Lifecycle
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # 不启动运行线程：作业停在排队状态
+    return JobQueue(str(tmp_path / "jobs"), workers=0, user_queued=2)
+
+
+def _submit(queue, user="alice", **kwargs):
+    return queue.submit({"namelist.input": "&time_control\n/\n"}, user=user, **kwargs)
+
+
+def test_other_users_jobs_are_unknown(queue):
+    job = _submit(queue)
+    assert queue.get(job["job_id"], "alice")["status"] == "queued"
+    for call in (lambda: queue.get(job["job_id"], "eve"),
+                 lambda: queue.cancel(job["job_id"], "eve"),
+                 lambda: next(queue.stream_events(job["job_id"], "eve")),
+                 lambda: queue.events(job["job_id"], "eve")):
+        with pytest.raises(JobNotFound):
+            call()
+    assert queue.list_jobs("eve") == []
+
+
+def test_poll_returns_events_until_done(queue):
+    job = _submit(queue)
+    first = queue.events(job["job_id"], "alice")
+    assert [e["status"] for e in first["events"]] == ["queued"] and not first["done"]
+    assert queue.events(job["job_id"], "alice", after=first["last_event_id"], wait=0.3)["events"] == []
+
+    queue.cancel(job["job_id"], "alice")
+    second = queue.events(job["job_id"], "alice", after=first["last_event_id"], wait=MAX_POLL_WAIT)
+    assert [e["status"] for e in second["events"]] == ["cancelled"] and second["done"]
+    # 终态之后再轮询立即返回
+    assert queue.events(job["job_id"], "alice", after=second["last_event_id"], wait=MAX_POLL_WAIT)["done"]
+    # 分页：limit 截断时未到终态事件，done 为假
+    page = queue.events(job["job_id"], "alice", limit=1)
+    assert page["last_event_id"] == 1 and not page["done"]
+
+
+def test_stream_replays_finished_job(queue):
+    job = _submit(queue)
+    queue.cancel(job["job_id"], "alice")
+    body = "".join(queue.stream_events(job["job_id"], "alice"))
+    assert "id: 1\n" in body and body.rstrip().endswith('"status":"cancelled","message":"Cancelled before start"}')
+
+
+def test_submit_limits(queue):
+    _submit(queue)
+    _submit(queue, priority=9)
+    with pytest.raises(JobLimitError):
+        _submit(queue)
+    with pytest.raises(JobError):
+        _submit(queue, user="bob", stages=["wrf", "real"])
+    with pytest.raises(JobError):
+        _submit(queue, user="../bob")
+
+
+def test_stream_slots():
+    slots = StreamSlots(2)
+    assert slots.acquire() and slots.acquire() and not slots.acquire()
+    slots.release()
+    assert slots.active == 1 and slots.acquire()
+
+
+def test_start_and_shutdown_hooks_are_idempotent(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs"), workers=1, commands={"geogrid": ["true"]})
+    state = Lifecycle()
+    for _ in range(3):
+        queue.start()
+        state.on_shutdown(queue.shutdown)
+    assert len(queue._threads) == 1
+    assert state._shutdown_hooks == [queue.shutdown]
+    state.shutdown(timeout=0)
+    assert queue._threads == []
+
+
+def test_default_directory_is_the_data_dir(monkeypatch, tmp_path):
+    monkeypatch.delenv("WOLFER_JOB_DIR", raising=False)
+    monkeypatch.setenv("WOLFER_DATA_DIR", str(tmp_path / "data"))
+    queue = create_job_queue()
+    assert queue.root == str(tmp_path / "data" / "jobs")
+    assert (tmp_path / "data" / "jobs" / "jobs.sqlite3").exists()
@@ -0,0 +1,205 @@
+import logging
+import os
+import pstats
+import re
+
+import pytest
+
+import metrics
+from metrics import (
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    SharedMetrics,
+    clear_shared_metrics,
+    log_sampled,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _registry():
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("t_requests_total", "Requests", ("endpoint",)))
+    latency = registry.register(Histogram("t_latency_seconds", "Latency", ("endpoint",), buckets=(0.1, 1.0)))
+    return registry, requests, latency
+
+
+def _worker(directory, monkeypatch, pid):
+    """A registry as one worker process would hold it, with its own snapshot file."""
+    registry, requests, latency = _registry()
+    shared = SharedMetrics(str(directory), registry, flush_interval=0)
+    monkeypatch.setattr(metrics.os, "getpid", lambda: pid)
+    return shared, requests, latency
+
+
+def test_shared_metrics_sum_all_workers(tmp_path, monkeypatch):
+    first, requests_a, latency_a = _worker(tmp_path, monkeypatch, 101)
+    requests_a.inc("/a", amount=3)
+    latency_a.observe(0.05, "/a")
+    first.flush(force=True)
+
+    second, requests_b, latency_b = _worker(tmp_path, monkeypatch, 102)
+    requests_b.inc("/a")
+    requests_b.inc("/b", amount=2)
+    latency_b.observe(0.5, "/a")
+    text = second.registry.render_prometheus(second.collect())
+
+    assert 't_requests_total{endpoint="/a"} 4' in text
+    assert 't_requests_total{endpoint="/b"} 2' in text
+    assert 't_latency_seconds_bucket{endpoint="/a",le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{endpoint="/a",le="1"} 2' in text
+    assert 't_latency_seconds_count{endpoint="/a"} 2' in text
+    assert 't_latency_seconds_sum{endpoint="/a"} 0.550000' in text
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_without_snapshots_only_this_process_is_rendered(tmp_path, monkeypatch):
+    shared, requests, _ = _worker(tmp_path, monkeypatch, 101)
+    requests.inc("/a")
+    other, other_requests, _ = _worker(tmp_path, monkeypatch, 102)
+    other_requests.inc("/a", amount=5)
+    other.flush(force=True)
+    assert 't_requests_total{endpoint="/a"} 1' in shared.registry.render_prometheus()
+    assert 't_requests_total{endpoint="/a"} 6' in shared.registry.render_prometheus(shared.collect())
+
+
+def test_new_process_writes_its_own_file(tmp_path, monkeypatch):
+    shared, requests, _ = _worker(tmp_path, monkeypatch, 101)
+    requests.inc("/a")
+    shared.flush(force=True)
+    # fork 后(或 pid 被复用)另起文件，不覆盖之前进程的计数
+    monkeypatch.setattr(metrics.os, "getpid", lambda: 202)
+    shared.flush(force=True)
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 2 and names[0].startswith("101-") and names[1].startswith("202-")
+
+
+def test_throttled_flush_is_deferred(tmp_path):
+    registry, requests, _ = _registry()
+    clock = FakeClock()
+    shared = SharedMetrics(str(tmp_path), registry, flush_interval=0.05, clock=clock)
+    requests.inc("/a")
+    shared.flush()
+    assert len(os.listdir(tmp_path)) == 1
+    requests.inc("/a")
+    shared.flush()
+    timer = shared._timer
+    assert timer is not None
+    timer.join(2)
+    assert 't_requests_total{endpoint="/a"} 2' in registry.render_prometheus(
+        [metrics.json.load(open(os.path.join(tmp_path, os.listdir(tmp_path)[0])))])
+
+
+def test_collect_skips_unreadable_files_and_clear_removes_snapshots(tmp_path, monkeypatch):
+    shared, requests, _ = _worker(tmp_path, monkeypatch, 101)
+    requests.inc("/a")
+    (tmp_path / "999-dead.json").write_text("{not json")
+    (tmp_path / "notes.txt").write_text("kept")
+    assert 't_requests_total{endpoint="/a"} 1' in shared.registry.render_prometheus(shared.collect())
+    clear_shared_metrics(str(tmp_path))
+    assert os.listdir(tmp_path) == ["notes.txt"]
+    clear_shared_metrics(str(tmp_path / "missing"))
+
+
+def test_metrics_route_merges_worker_snapshots(client, tmp_path, monkeypatch):
+    shared = SharedMetrics(str(tmp_path), metrics.registry, flush_interval=0)
+    monkeypatch.setattr(metrics, "shared_metrics", shared)
+    # 另一个 worker 留下的快照
+    (tmp_path / "1-other.json").write_text(metrics.json.dumps({
+        "wolfer_http_requests_total": [[["/api/projections", "GET", "200"], 1000]],
+    }))
+    client.get("/api/projections")
+    text = client.get("/api/metrics").get_data(as_text=True)
+    local = metrics.requests_total._values[("/api/projections", "GET", "200")]
+    assert f'wolfer_http_requests_total{{endpoint="/api/projections",method="GET",status="200"}} {local + 1000}' in text
+
+
+@pytest.fixture
+def records():
+    captured = []
+
+    class Handler(logging.Handler):
+        def emit(self, record):
+            captured.append(record)
+
+    handler = Handler()
+    logger = metrics.logger
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    yield captured
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_log_sampled_builds_fields_only_when_emitted(records, monkeypatch):
+    built = []
+
+    def payload():
+        built.append(1)
+        return {"big": True}
+
+    log_sampled(logging.DEBUG, "never", rate=0.0, config=payload)
+    assert records == [] and built == []
+    log_sampled(logging.DEBUG, "always", rate=1.0, config=payload, config_hash="abc")
+    assert [r.getMessage() for r in records] == ["always"]
+    assert records[0].fields == {"config": {"big": True}, "config_hash": "abc"}
+    assert built == [1]
+
+
+def test_log_sampled_rate_and_level(records, monkeypatch):
+    draws = iter([0.05, 0.2, 0.099, 0.5])
+    monkeypatch.setattr(metrics.random, "random", lambda: next(draws))
+    for index in range(4):
+        log_sampled(logging.DEBUG, f"call {index}", rate=0.1)
+    assert [r.getMessage() for r in records] == ["call 0", "call 2"]
+    # 级别未启用时不抽样也不构建字段
+    metrics.logger.setLevel(logging.INFO)
+    log_sampled(logging.DEBUG, "filtered", rate=1.0, config=lambda: pytest.fail("built"))
+    assert len(records) == 2
+
+
+def test_log_sampled_default_rate(records, monkeypatch):
+    monkeypatch.setattr(metrics, "LOG_SAMPLE_RATE", 0.0)
+    log_sampled(logging.INFO, "sampled out")
+    monkeypatch.setattr(metrics, "LOG_SAMPLE_RATE", 1.0)
+    log_sampled(logging.INFO, "sampled in")
+    assert [r.getMessage() for r in records] == ["sampled in"]
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path / "profiles"))
+    return tmp_path / "profiles"
+
+
+def test_profile_id_round_trip(client, profiling, records):
+    response = client.post("/api/generate-namelist", json={"domain_setup": {"e_we_arr": [111]}},
+                           headers={metrics.PROFILE_HEADER: "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Wolfer-Profile-Id"]
+    assert re.fullmatch(r"[0-9a-f]{32}", profile_id)
+    # 响应里只有不透明ID，文件路径只出现在服务器日志
+    assert str(profiling) not in str(response.headers) and str(profiling) not in response.get_data(as_text=True)
+    path = profiling / f"{profile_id}.prof"
+    assert os.listdir(profiling) == [path.name]
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == "generate_namelist_endpoint" for func in stats.stats)
+    saved = [r for r in records if r.getMessage() == "profile saved"]
+    assert saved[0].fields == {"profile_id": profile_id, "path": str(path)}
+
+
+def test_profile_requires_header_and_switch(client, profiling, monkeypatch):
+    assert "X-Wolfer-Profile-Id" not in client.get("/api/projections").headers
+    assert "X-Wolfer-Profile-Id" not in client.get("/api/projections", headers={metrics.PROFILE_HEADER: "yes"}).headers
+    monkeypatch.setattr(metrics, "PROFILING_ENABLED", False)
+    assert "X-Wolfer-Profile-Id" not in client.get("/api/projections", headers={metrics.PROFILE_HEADER: "1"}).headers
+    assert not profiling.exists()
@@ -0,0 +1,109 @@
+import copy
+import json
+
+import app
+from app import DEFAULT_CONFIG
+from namelist_cache import NamelistCache, canonical_config_hash, namelist_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hash_ignores_key_order_and_whitespace():
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    reordered = json.loads(json.dumps({k: dict(reversed(list(v.items()))) for k, v in reversed(config.items())}))
+    assert list(reordered) != list(config)
+    assert canonical_config_hash(reordered) == canonical_config_hash(config)
+    assert canonical_config_hash(json.loads(json.dumps(config, indent=4))) == canonical_config_hash(config)
+    # 值或数组顺序不同则哈希不同
+    config["physics"]["mp_physics_arr"] = [6]
+    assert canonical_config_hash(config) != canonical_config_hash(DEFAULT_CONFIG)
+    assert canonical_config_hash({"a": [1, 2]}) != canonical_config_hash({"a": [2, 1]})
+
+
+def test_hash_is_stable_across_runs():
+    # 哈希写入配置存储并作为ETag发给客户端，不能随进程或版本漂移
+    assert canonical_config_hash({"b": 1, "a": "中", "c": [True, None, 1.5]}) == \
+        "b1cf82d7483bde9009927ff474c9fbae178401f8af26d4fa61190c22e16b8224"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = NamelistCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1 and len(cache) == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = NamelistCache(max_entries=4, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    # 命中不续期：TTL 从写入时算起
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_disabled_cache_stores_nothing():
+    cache = NamelistCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def _generate(client, config, **headers):
+    return client.post("/api/generate-namelist", json=config, headers=headers)
+
+
+def test_generate_sets_etag_and_answers_304(client):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["domain_setup"]["e_we_arr"] = [123]
+    first = _generate(client, config)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag == f'"{canonical_config_hash(config)}"'
+
+    hits = namelist_cache.hits
+    reordered = json.loads(json.dumps(dict(reversed(list(config.items())))))
+    again = _generate(client, reordered)
+    assert again.headers["ETag"] == etag
+    assert namelist_cache.hits == hits + 1
+    assert again.get_json()["file_contents"] == first.get_json()["file_contents"]
+
+    not_modified = _generate(client, reordered, **{"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag and not_modified.data == b""
+    # 不匹配的ETag照常生成；列表中任一匹配即返回304
+    assert _generate(client, config, **{"If-None-Match": '"other"'}).status_code == 200
+    assert _generate(client, config, **{"If-None-Match": f'"other", {etag}'}).status_code == 304
+
+
+def test_stored_config_reference_shares_the_etag(client):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["domain_setup"]["e_sn_arr"] = [77]
+    stored = app.config_store.create(config)
+    response = client.post("/api/generate-namelist", json={"config_id": stored["config_id"]})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{canonical_config_hash(config)}"' == f'"{stored["config_hash"]}"'
+    assert client.post("/api/generate-namelist", json={"config_id": stored["config_id"]},
+                       headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_cache_stats_route(client):
+    _generate(client, DEFAULT_CONFIG)
+    stats = client.get("/api/cache/stats").get_json()
+    assert stats == namelist_cache.stats()
+    assert stats["entries"] >= 1 and stats["max_entries"] == namelist_cache.max_entries
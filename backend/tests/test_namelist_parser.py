@@ -0,0 +1,160 @@
+import copy
+import functools
+import io
+import tarfile
+
+import pytest
+
+import app
+from app import DEFAULT_CONFIG
+from namelist_parser import (
+    ImportLimitError,
+    check_archive_size,
+    iter_tar_pairs,
+    namelists_to_config,
+    parse_namelist,
+)
+from namelist_render import render_input_namelist, render_wps_namelist
+
+
+def _nested_config():
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["time_control"].update(
+        start_date_str_arr=["2001-10-25_00:00:00"] * 2,
+        end_date_str_arr=["2001-10-26_00:00:00", "2001-10-25_12:00:00"],
+        history_interval_arr=[180, 30],
+        history_interval_unit_arr=["m", "m"],
+    )
+    config["domain_setup"].update(
+        max_dom=2, e_we_arr=[100, 61], e_sn_arr=[100, 61], dx_arr=[30000, 10000], dy_arr=[30000, 10000],
+        parent_id_arr=[0, 1], parent_grid_ratio_arr=[1, 3], i_parent_start_arr=[1, 30], j_parent_start_arr=[1, 30],
+    )
+    # 每域一列：单值列在生成时会被补齐到 max_dom，补齐后的结果与输入不再逐字相等
+    for section in ("physics", "dynamics"):
+        config[section] = {key: values * 2 for key, values in config[section].items()}
+    return config
+
+
+def _round_trip(config):
+    return namelists_to_config(parse_namelist(render_wps_namelist(config)),
+                               parse_namelist(render_input_namelist(config)))
+
+
+@pytest.mark.parametrize("config", [DEFAULT_CONFIG, _nested_config()], ids=["single", "nested"])
+def test_generate_parse_round_trip(config):
+    parsed = _round_trip(config)
+    # 输入中的每个字段都原样回到配置里；生成器补上的默认值同样被解析出来
+    for section, values in config.items():
+        for key, value in values.items():
+            assert parsed[section][key] == value, (section, key)
+    # 解析结果再生成，与原配置生成的 namelist 逐字相同
+    assert render_wps_namelist(parsed) == render_wps_namelist(config)
+    assert render_input_namelist(parsed) == render_input_namelist(config)
+
+
+def _tarball(files, mode="w:gz"):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar:
+        for name, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        info = tarfile.TarInfo("runs/empty")
+        info.type = tarfile.DIRTYPE
+        tar.addfile(info)
+    return buffer.getvalue()
+
+
+def _files():
+    wps, nml = render_wps_namelist(DEFAULT_CONFIG), render_input_namelist(DEFAULT_CONFIG)
+    return {
+        "runs/a/namelist.wps": wps,
+        "runs/a/namelist.input": nml,
+        "runs/b/deep/namelist.wps.2001": wps,
+        "runs/b/deep/namelist.input.2001": nml,
+        "runs/b/README": "not a namelist",
+    }
+
+
+def test_tar_pairs_group_nested_directories():
+    pairs = list(iter_tar_pairs(fileobj=io.BytesIO(_tarball(_files()))))
+    assert [name for name, _ in pairs] == ["runs/a/namelist.*", "runs/b/deep/namelist.*.2001"]
+    for _, texts in pairs:
+        assert sorted(texts) == ["input", "wps"]
+        assert texts["wps"] == render_wps_namelist(DEFAULT_CONFIG)
+
+
+def test_tar_pairs_accept_uncompressed_archives():
+    pairs = list(iter_tar_pairs(fileobj=io.BytesIO(_tarball(_files(), mode="w"))))
+    assert len(pairs) == 2
+
+
+def test_tar_member_limit_counts_files_only():
+    archive = _tarball(_files())
+    # 目录成员不计数：5 个文件恰好在上限内
+    assert len(list(iter_tar_pairs(fileobj=io.BytesIO(archive), max_members=5))) == 2
+    with pytest.raises(ImportLimitError, match="more than 4 files"):
+        list(iter_tar_pairs(fileobj=io.BytesIO(archive), max_members=4))
+
+
+def test_tar_size_limit_uses_uncompressed_bytes():
+    files = _files()
+    total = sum(len(text.encode()) for text in files.values())
+    archive = _tarball(files)
+    assert len(archive) < total
+    assert len(list(iter_tar_pairs(fileobj=io.BytesIO(archive), max_bytes=total))) == 2
+    with pytest.raises(ImportLimitError, match="uncompressed bytes"):
+        list(iter_tar_pairs(fileobj=io.BytesIO(archive), max_bytes=total - 1))
+
+
+def test_tar_limit_rejects_before_extracting():
+    read = []
+
+    class Tracking(io.BytesIO):
+        def read(self, *args):
+            chunk = super().read(*args)
+            read.append(len(chunk))
+            return chunk
+
+    files = {f"runs/{i}/namelist.wps": "&share\n max_dom = 1,\n/\n" for i in range(50)}
+    archive = _tarball(files, mode="w")
+    with pytest.raises(ImportLimitError):
+        list(iter_tar_pairs(fileobj=Tracking(archive), max_members=10))
+    # 在第 11 个成员头处停止，没有读完整个归档
+    assert sum(read) < len(archive) / 2
+
+
+def test_archive_size_check():
+    check_archive_size(None, max_bytes=10)
+    check_archive_size(10, max_bytes=10)
+    with pytest.raises(ImportLimitError, match="exceeds 10 bytes"):
+        check_archive_size(11, max_bytes=10)
+
+
+def test_import_route_parses_raw_archive(client):
+    response = client.post("/api/import/namelists", data=_tarball(_files()),
+                           content_type="application/gzip")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["success"] and body["stats"]["configs"] == 2
+    assert body["results"][0]["config"]["domain_setup"]["e_we_arr"] == [100]
+
+
+@pytest.mark.parametrize("field", [None, "archive"])
+def test_import_route_rejects_oversized_body_before_reading(client, monkeypatch, field):
+    monkeypatch.setattr(app, "check_archive_size", functools.partial(check_archive_size, max_bytes=64))
+    archive = _tarball(_files())
+    if field is None:
+        response = client.post("/api/import/namelists", data=archive, content_type="application/gzip")
+    else:
+        response = client.post("/api/import/namelists", data={field: (io.BytesIO(archive), "runs.tar.gz")},
+                               content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert "exceeds 64 bytes" in response.get_json()["error"]
+
+
+def test_import_route_rejects_corrupt_archive(client):
+    response = client.post("/api/import/namelists", data=b"not a tarball", content_type="application/gzip")
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Invalid archive")
@@ -0,0 +1,102 @@
+import copy
+import linecache
+
+import pytest
+
+import legacy_render
+from bench_render import BASE_CONFIG, ensemble_configs
+from namelist_parser import parse_namelist
+from namelist_render import (
+    INPUT_SECTIONS,
+    WPS_SECTIONS,
+    Field,
+    compile_renderer,
+    render_input_namelist,
+    render_wps_namelist,
+)
+
+# 字符串拼接版本(benchmarks/legacy_render.py)只支持单域，是 max_dom == 1 时的逐字节参照
+EDGE_CONFIGS = {
+    "empty": {},
+    "empty_sections": {"time_control": {}, "domain_setup": {}, "physics": {}, "dynamics": {}},
+    "empty_arrays": {
+        "time_control": {"start_date_str_arr": [], "history_interval_arr": []},
+        "domain_setup": {"e_we_arr": [], "dx_arr": [], "parent_id_arr": []},
+        "physics": {"mp_physics_arr": []},
+    },
+    "booleans": dict(
+        copy.deepcopy(BASE_CONFIG),
+        time_control=dict(BASE_CONFIG["time_control"], restart_enabled=True, nocolons=False,
+                          input_from_file_arr=[False]),
+        dynamics={"non_hydrostatic_arr": [False]},
+        bdy_control={"specified_arr": [False], "nested_arr": [True]},
+    ),
+    "scalar_arrays": {"domain_setup": {"e_we_arr": 120, "dx_arr": 9000.5, "map_proj": "'polar'"},
+                      "physics": {"mp_physics_arr": 6}},
+    "none_values": {"domain_setup": {"e_we_arr": [None], "ref_lat": None}, "physics": {"mp_physics_arr": None}},
+    "bad_dates": {"time_control": {"start_date_str_arr": ["yesterday"], "end_date_str_arr": ["2001-10-26_00:00:00"]}},
+    "minutes": {"time_control": {"history_interval_arr": [30], "history_interval_unit_arr": ["m"],
+                                 "restart_interval_h": 1.5}},
+    "bad_max_dom": {"domain_setup": {"max_dom": "two"}},
+    "extra_columns": dict(copy.deepcopy(BASE_CONFIG), physics={"mp_physics_arr": [6, 8, 10]}),
+}
+
+
+@pytest.mark.parametrize("config", EDGE_CONFIGS.values(), ids=EDGE_CONFIGS.keys())
+def test_edge_configs_match_legacy(config):
+    assert render_wps_namelist(config) == legacy_render.generate_wps_namelist_content(config)
+    assert render_input_namelist(config) == legacy_render.generate_input_namelist_content(config)
+
+
+def test_ensemble_members_match_legacy():
+    for config in ensemble_configs(200):
+        assert render_wps_namelist(config) == legacy_render.generate_wps_namelist_content(config)
+        assert render_input_namelist(config) == legacy_render.generate_input_namelist_content(config)
+
+
+def test_decomposition_lines_are_the_only_addition():
+    config = copy.deepcopy(BASE_CONFIG)
+    config["domain_setup"].update(nproc_x=4, nproc_y=8)
+    rendered = render_input_namelist(config)
+    assert " nproc_x = 4,\n nproc_y = 8,\n" in rendered
+    assert rendered.replace(" nproc_x = 4,\n nproc_y = 8,\n", "") == \
+        legacy_render.generate_input_namelist_content(config)
+
+
+@pytest.mark.parametrize("sections, render", [(WPS_SECTIONS, render_wps_namelist),
+                                              (INPUT_SECTIONS, render_input_namelist)], ids=["wps", "input"])
+def test_nested_columns_extend_the_single_domain_output(sections, render):
+    single = copy.deepcopy(BASE_CONFIG)
+    nested = copy.deepcopy(BASE_CONFIG)
+    nested["domain_setup"]["max_dom"] = 3
+    flat, columns = parse_namelist(render(single)), parse_namelist(render(nested))
+    for section, fields in sections:
+        for field in fields:
+            if field.name == "max_dom" or field.optional:
+                continue
+            values, expected = columns[section][field.name], flat[section][field.name]
+            if field.per_domain or (field.multi is not None and field.multi.per_domain):
+                # 逐域一列，d01 列与单域输出一致
+                assert len(values) == 3 and values[:1] == expected, field.name
+            else:
+                assert values == expected, field.name
+
+
+def test_renderer_source_is_inspectable():
+    renderer = compile_renderer((("share", (Field("year", "time_control", "year", 1, spec="04d"),)),),
+                                name="render_year")
+    assert renderer({"time_control": {"year": 7}}) == "&share\n year = 0007,\n/\n"
+    filename = renderer.__code__.co_filename
+    assert filename == "<namelist_render:render_year>"
+    assert linecache.getline(filename, 1) == "def render_year(data):\n"
+    assert "year" in renderer.__source__
+
+
+@pytest.mark.parametrize("sections, name", [
+    ((("share", (Field("x}, y = {0", "time_control", "x"),)),), "render"),
+    ((("share\n/", (Field("x", "time_control", "x"),)),), "render"),
+    ((("share", (Field("x", "time_control", "x"),)),), "render(); import os"),
+])
+def test_renderer_rejects_non_identifier_names(sections, name):
+    with pytest.raises(ValueError, match="Invalid namelist"):
+        compile_renderer(sections, name=name)
@@ -0,0 +1,223 @@
+import copy
+
+import pytest
+
+from namelist_render import render_input_namelist, render_wps_namelist
+from nest_validation import build_nest_table, validate_nest_batch, validate_nests
+
+# d01 27 km；d02 在 d01 内(3:1)，d03 在 d02 内(3:1)
+NESTED = {
+    "max_dom": 3,
+    "e_we_arr": [100, 91, 61],
+    "e_sn_arr": [90, 82, 61],
+    "dx_arr": [27000],
+    "dy_arr": [27000],
+    "parent_id_arr": [1, 1, 2],
+    "parent_grid_ratio_arr": [1, 3, 3],
+    "i_parent_start_arr": [1, 30, 20],
+    "j_parent_start_arr": [1, 25, 20],
+    "map_proj": "lambert",
+    "ref_lat": 40.0,
+    "ref_lon": 116.0,
+    "truelat1": 30.0,
+    "truelat2": 60.0,
+    "stand_lon": 116.0,
+}
+
+NESTED_CONFIG = {
+    "time_control": {
+        "start_date_str_arr": ["2020-07-01_00:00:00", "2020-07-01_06:00:00", "2020-07-01_06:00:00"],
+        "end_date_str_arr": ["2020-07-02_00:00:00"] * 3,
+        "history_interval_arr": [3, 60, 15],
+        "history_interval_unit_arr": ["h", "m", "m"],
+    },
+    "domain_setup": NESTED,
+    "physics": {"mp_physics_arr": [8, 8, 6], "cu_physics_arr": [1, 0]},
+}
+
+
+def _nest(**changes):
+    dom = copy.deepcopy(NESTED)
+    dom.update(changes)
+    return dom
+
+
+def _section(text, name):
+    start = text.index(f"&{name}\n")
+    return text[start:text.index("/\n", start) + 2]
+
+
+def test_valid_trees_have_no_errors():
+    assert validate_nests(NESTED) == []
+    # 单域配置无需逐域数组
+    assert validate_nests({"max_dom": 1, "e_we_arr": [100], "e_sn_arr": [100]}) == []
+    assert validate_nests({}) == []
+    # 两个 d01 的兄弟嵌套
+    assert validate_nests(_nest(parent_id_arr=[1, 1, 1], i_parent_start_arr=[1, 30, 5],
+                                j_parent_start_arr=[1, 25, 5], dx_arr=[27000, 9000, 9000],
+                                dy_arr=[27000, 9000, 9000], e_we_arr=[100, 91, 61],
+                                e_sn_arr=[90, 82, 61])) == []
+
+
+@pytest.mark.parametrize("changes, expected", [
+    ({"parent_id_arr": [1, 3, 1]},
+     ["d02: parent_id 3 must refer to an earlier domain (1..1)"]),
+    ({"parent_id_arr": [1, 2, 2]},
+     ["d02: parent_id 2 must refer to an earlier domain (1..1)"]),
+    ({"parent_id_arr": [1, 1, 0]},
+     ["d03: parent_id 0 must refer to an earlier domain (1..2)"]),
+    ({"parent_grid_ratio_arr": [2, 3, 3]},
+     ["d01: parent_grid_ratio must be 1, got 2"]),
+    ({"parent_grid_ratio_arr": [1, 0, 3]},
+     ["d02: parent_grid_ratio must be a positive integer, got 0"]),
+    ({"e_we_arr": [100, 90, 61]},
+     ["d02: e_we-1 (89) must be divisible by parent_grid_ratio (3)"]),
+    ({"i_parent_start_arr": [1, 0, 20]},
+     ["d02: i_parent_start must be >= 1, got 0"]),
+    ({"i_parent_start_arr": [1, 71, 20]},
+     ["d02: nest ends at parent index 101, beyond parent e_we (100); reduce i_parent_start or e_we"]),
+    ({"j_parent_start_arr": [1, 25, 73]},
+     ["d03: nest ends at parent index 93, beyond parent e_sn (82); reduce j_parent_start or e_sn"]),
+    # d03 未给出 dx，由 d02 的 10000 推出，只有 d02 报错
+    ({"dx_arr": [27000, 10000]},
+     ["d02: dx 10000 should be parent dx / parent_grid_ratio = 9000"]),
+    ({"dx_arr": [27000, 9000, 2000]},
+     ["d03: dx 2000 should be parent dx / parent_grid_ratio = 3000"]),
+    ({"e_sn_arr": [90, 82]},
+     ["e_sn_arr has 2 value(s) but max_dom is 3"]),
+    # 非数值只报一次，不再连带整除、父域与范围检查
+    ({"e_we_arr": [100, "wide", 61]},
+     ["d02: e_we must be numeric"]),
+    ({"parent_id_arr": [1, "d01", 2]},
+     ["d02: parent_id must be numeric"]),
+    # 数字字符串按数值处理；缺省的 parent_id 取上一个域
+    ({"parent_grid_ratio_arr": [1, "3", 3]},
+     []),
+    ({"parent_id_arr": [1, None, 2]},
+     []),
+    ({"parent_grid_ratio_arr": [1, True, 3]},
+     ["d02: parent_grid_ratio must be numeric"]),
+    ({"max_dom": 22},
+     ["max_dom must be an integer between 1 and 21"]),
+    ({"max_dom": 2.5},
+     ["max_dom must be an integer between 1 and 21"]),
+])
+def test_invalid_trees(changes, expected):
+    assert validate_nests(_nest(**changes)) == expected
+
+
+@pytest.mark.parametrize("changes", [{"parent_id_arr": [1, "d01", 2]}, {"parent_id_arr": [1, 1.5, 2]},
+                                     {"parent_grid_ratio_arr": [1, "x", 3]}])
+def test_bad_nest_values_still_render(changes):
+    # 校验报告错误，但渲染(预览/下载)不会因为非法值抛异常
+    config = dict(NESTED_CONFIG, domain_setup=_nest(**changes))
+    assert validate_nests(config["domain_setup"])
+    assert " dx = 27000, " in render_input_namelist(config)
+
+
+def test_nest_exactly_at_parent_edge_is_allowed():
+    # 30 + (91-1)/3 = 60；i_parent_start 40 时恰好到 100
+    assert validate_nests(_nest(i_parent_start_arr=[1, 40, 20])) == []
+
+
+def test_all_errors_of_a_config_are_reported():
+    errors = validate_nests(_nest(parent_grid_ratio_arr=[1, 3, 0], i_parent_start_arr=[1, 0, 20],
+                                 e_sn_arr=[90, 82, 60]))
+    assert errors == [
+        "d03: parent_grid_ratio must be a positive integer, got 0",
+        "d02: i_parent_start must be >= 1, got 0",
+    ]
+
+
+def test_batch_keeps_errors_per_config():
+    results = validate_nest_batch([NESTED, _nest(parent_id_arr=[1, 3, 1]), "not a dict",
+                                   {"max_dom": 1}, _nest(max_dom=2)])
+    assert results[0] == [] and results[3] == [] and results[4] == []
+    assert results[1] == ["d02: parent_id 3 must refer to an earlier domain (1..1)"]
+    assert results[2] == ["domain_setup must be an object"]
+    assert validate_nest_batch([]) == []
+
+
+def test_table_pads_like_the_renderer():
+    table, max_doms, errors = build_nest_table([NESTED, {"max_dom": 1}])
+    assert list(max_doms) == [3, 1] and errors == [[], []]
+    assert table["dx"][0].tolist() == [27000, 9000, 3000]
+    assert table["parent_id"][0].tolist() == [1, 1, 2]
+    # 单域配置按最宽的配置补 NaN 列
+    assert table["e_we"][1][0] == 100 and all(v != v for v in table["e_we"][1][1:])
+
+
+def test_nested_wps_columns():
+    wps = render_wps_namelist(NESTED_CONFIG)
+    assert _section(wps, "share") == (
+        "&share\n"
+        " wrf_core = 'ARW',\n"
+        " max_dom = 3,\n"
+        " start_date = '2020-07-01_00:00:00', '2020-07-01_06:00:00', '2020-07-01_06:00:00',\n"
+        " end_date = '2020-07-02_00:00:00', '2020-07-02_00:00:00', '2020-07-02_00:00:00',\n"
+        " interval_seconds = 21600,\n"
+        " io_form_geogrid = 2,\n"
+        "/\n"
+    )
+    # WPS 只写 d01 的 dx/dy
+    assert _section(wps, "geogrid") == (
+        "&geogrid\n"
+        " parent_id = 1, 1, 2,\n"
+        " parent_grid_ratio = 1, 3, 3,\n"
+        " i_parent_start = 1, 30, 20,\n"
+        " j_parent_start = 1, 25, 20,\n"
+        " e_we = 100, 91, 61,\n"
+        " e_sn = 90, 82, 61,\n"
+        " dx = 27000,\n"
+        " dy = 27000,\n"
+        " map_proj = 'lambert',\n"
+        " ref_lat = 40.0,\n"
+        " ref_lon = 116.0,\n"
+        " truelat1 = 30.0,\n"
+        " truelat2 = 60.0,\n"
+        " stand_lon = 116.0,\n"
+        " geog_data_path = '/path/to/geog',\n"
+        "/\n"
+    )
+
+
+def test_nested_input_columns():
+    text = render_input_namelist(NESTED_CONFIG)
+    time_control = _section(text, "time_control")
+    assert " start_hour = 00, 06, 06,\n" in time_control
+    assert " end_day = 02, 02, 02,\n" in time_control
+    assert " history_interval = 180, 60, 15, ! Converted from hours to minutes\n" in time_control
+    assert " input_from_file = .true., .true., .true.,\n" in time_control
+    # 嵌套域的 dx/dy 由父域分辨率与 parent_grid_ratio 推出；input 中 d01 的 parent_id 为 0
+    assert _section(text, "domains") == (
+        "&domains\n"
+        " time_step = 60,\n"
+        " max_dom = 3,\n"
+        " e_we = 100, 91, 61,\n"
+        " e_sn = 90, 82, 61,\n"
+        " e_vert = 35, 35, 35,\n"
+        " dx = 27000, 9000, 3000,\n"
+        " dy = 27000, 9000, 3000,\n"
+        " grid_id = 1, 2, 3,\n"
+        " parent_id = 0, 1, 2,\n"
+        " i_parent_start = 1, 30, 20,\n"
+        " j_parent_start = 1, 25, 20,\n"
+        " parent_grid_ratio = 1, 3, 3,\n"
+        " parent_time_step_ratio = 1, 3, 3,\n"
+        " feedback = 1,\n"
+        "/\n"
+    )
+    physics = _section(text, "physics")
+    # 较短的数组重复最后一个值补齐
+    assert " mp_physics = 8, 8, 6,\n" in physics
+    assert " cu_physics = 1, 0, 0,\n" in physics
+    assert " radt = 30, 30, 30,\n" in physics
+    assert _section(text, "bdy_control") == (
+        "&bdy_control\n"
+        " spec_bdy_width = 5,\n"
+        " spec_zone = 1,\n"
+        " relax_zone = 4,\n"
+        " specified = .true., .false., .false.,\n"
+        " nested = .false., .true., .true.,\n"
+        "/\n"
+    )
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from netcdf_reader import NetCDFFormatError, open_dataset, sniff_format, wrf_times
+from wrfout_fixture import write_netcdf
+
+
+@pytest.fixture
+def small_file(tmp_path):
+    rng = np.random.default_rng(0)
+    arrays = {
+        "A": rng.normal(size=(7, 3, 5)).astype(">f4"),
+        # 奇数长度的记录变量：多个记录变量时每条记录要补齐到4字节
+        "B": rng.integers(0, 9, size=(7, 3)).astype(">i4"),
+        "C": rng.normal(size=(3, 5)).astype(">f8"),
+    }
+    path = tmp_path / "small.nc"
+    write_netcdf(str(path), [("Time", 0), ("y", 3), ("x", 5)], [
+        ("A", ("Time", "y", "x"), arrays["A"]),
+        ("B", ("Time", "y"), arrays["B"]),
+        ("C", ("y", "x"), arrays["C"]),
+    ], {"TITLE": "test", "DX": 3000.0})
+    return str(path), arrays
+
+
+def test_slabs_match_written_arrays(small_file):
+    path, arrays = small_file
+    with open_dataset(path) as dataset:
+        assert dataset.dimensions == {"Time": 7, "y": 3, "x": 5}
+        assert dataset.attrs["TITLE"] == "test"
+        for name, expected in arrays.items():
+            np.testing.assert_array_equal(np.array(dataset.variables[name][:]), expected)
+        np.testing.assert_array_equal(dataset.variables["A"][2:5, 1:], arrays["A"][2:5, 1:])
+        np.testing.assert_array_equal(dataset.variables["B"][6], arrays["B"][6])
+
+
+def test_take_points_matches_fancy_indexing(small_file):
+    path, arrays = small_file
+    rows, cols = np.array([0, 2, 1]), np.array([4, 0, 3])
+    with open_dataset(path) as dataset:
+        points = dataset.variables["A"].take_points((slice(1, 6),), rows, cols)
+    np.testing.assert_array_equal(points, arrays["A"][1:6][:, rows, cols])
+
+
+def test_wrf_times(wrfout_path):
+    with open_dataset(wrfout_path) as dataset:
+        times = wrf_times(dataset)
+    assert times[0] == "2020-01-01_00:00:00"
+    assert times[-1] == "2020-01-01_22:00:00"
+
+
+def test_rejects_non_netcdf(tmp_path):
+    path = tmp_path / "not.nc"
+    path.write_bytes(b"GRIB0000")
+    assert sniff_format(b"GRIB") is None
+    with pytest.raises(NetCDFFormatError):
+        open_dataset(str(path))
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from ensemble import WRF_DATE_FORMAT
+from segmentation import SegmentError, plan_segments
+
+
+def _config(start="2020-07-01_00:00:00", end="2020-07-11_00:00:00", **time_control):
+    time_control.update(start_date_str_arr=[start, start], end_date_str_arr=[end, end])
+    return {"time_control": time_control, "domain_setup": {"max_dom": 2}}
+
+
+def _time(text):
+    return datetime.strptime(text, WRF_DATE_FORMAT)
+
+
+def test_restart_segments_chain_and_cover_window():
+    members, summary = plan_segments(_config(), {"length_hours": 72})
+    assert [m["params"]["start"] for m in members] == [
+        "2020-07-01_00:00:00", "2020-07-04_00:00:00", "2020-07-07_00:00:00", "2020-07-10_00:00:00"]
+    # 最后一段截止到窗口终点
+    assert members[-1]["params"]["end"] == "2020-07-11_00:00:00"
+    assert all(a["params"]["end"] == b["params"]["start"] for a, b in zip(members, members[1:]))
+    assert [m["params"]["restart"] for m in members] == [False, True, True, True]
+    assert members[2]["params"]["depends_on"] == members[1]["name"]
+    assert members[1]["config"]["time_control"]["restart_interval_h"] == 72
+    assert members[1]["config"]["time_control"]["start_date_str_arr"] == ["2020-07-04_00:00:00"] * 2
+    assert summary["stages"] == [[m["name"]] for m in members]
+    assert summary["adjusted"] == {}
+
+
+def test_independent_segments_overlap_by_spinup():
+    members, summary = plan_segments(_config(), {"length_hours": 96, "spinup_hours": 12, "mode": "independent"})
+    assert len(members) == 3 and summary["stages"] == [[m["name"] for m in members]]
+    first, second = members[0]["params"], members[1]["params"]
+    # 第一段从窗口起点冷启动，无需预热；其后各段提前 spinup 开始，与前一段重叠
+    assert first["run_start"] == first["start"] and first["spinup_hours"] == 0
+    assert _time(second["start"]) - _time(second["run_start"]) == timedelta(hours=12)
+    assert _time(second["run_start"]) < _time(first["end"])
+    assert members[1]["config"]["time_control"]["start_date_str_arr"][0] == second["run_start"]
+    assert not any(m["params"]["restart"] or m["params"]["depends_on"] for m in members)
+
+
+def test_boundaries_fall_on_analysis_times():
+    # 6 小时 WPS 间隔：03:00 起点退到 00:00，25 小时段长取到 30 小时，5 小时预热取到 6 小时
+    members, summary = plan_segments(_config(start="2020-07-01_03:00:00", end="2020-07-05_00:00:00"),
+                                     {"length_hours": 25, "spinup_hours": 5, "mode": "independent"})
+    assert summary["adjusted"] == {
+        "start": {"requested": "2020-07-01_03:00:00", "used": "2020-07-01_00:00:00"},
+        "length_hours": {"requested": 25, "used": 30},
+        "spinup_hours": {"requested": 5, "used": 6},
+    }
+    assert summary["window"]["start"] == "2020-07-01_00:00:00"
+    for member in members:
+        for key in ("start", "run_start"):
+            assert _time(member["params"][key]).hour % 6 == 0 and _time(member["params"][key]).minute == 0
+
+
+def test_boundary_interval_is_common_multiple():
+    _, summary = plan_segments(_config(interval_seconds_wps=10800, interval_seconds_input=14400),
+                               {"length_hours": 10})
+    assert summary["boundary_interval_seconds"] == 43200
+    assert summary["length_hours"] == 12
+
+
+@pytest.mark.parametrize("segment", [
+    {"length_hours": 0.5},
+    {"length_hours": "24"},
+    {"mode": "parallel"},
+    {"spinup_hours": -1, "mode": "independent"},
+])
+def test_rejects_bad_specs(segment):
+    with pytest.raises(SegmentError):
+        plan_segments(_config(), segment)
+
+
+def test_rejects_bad_windows():
+    with pytest.raises(SegmentError):
+        plan_segments(_config(start="2020-07-02_00:00:00", end="2020-07-01_00:00:00"), {})
+    with pytest.raises(SegmentError):
+        plan_segments(_config(interval_seconds_wps=0), {})
+    with pytest.raises(SegmentError):
+        plan_segments(_config(start="2020-01-01_00:00:00", end="2030-01-01_00:00:00"), {"length_hours": 6})
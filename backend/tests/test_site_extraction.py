@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+import site_extraction
+from netcdf_reader import open_dataset
+from site_extraction import NearestIndex, build_site_index, extract_site_series, interpolation_stencil
+from wind_analysis import AnalysisError
+from wrf_projection import Projection
+from wrfout_fixture import write_netcdf
+
+NY, NX, STEPS, DX = 8, 10, 4, 30000.0
+PROJECTION = Projection(1, 30.0, 60.0, 115.0)
+
+
+def _corner():
+    x, y = PROJECTION.forward(30.0, 110.0)
+    return float(x), float(y)
+
+
+def _lat_lon(fi, fj):
+    """Coordinates of the fractional grid index ``(fi, fj)`` on the Lambert grid."""
+    x0, y0 = _corner()
+    lat, lon = PROJECTION.inverse(x0 + np.asarray(fi) * DX, y0 + np.asarray(fj) * DX)
+    return np.atleast_1d(lat), np.atleast_1d(lon)
+
+
+@pytest.fixture(scope="module")
+def lambert_path(tmp_path_factory):
+    """A wrfout on an exact Lambert grid; U10 is linear in (i, j) so bilinear interpolation is exact."""
+    rows, cols = np.mgrid[0:NY, 0:NX].astype(np.float64)
+    lat, lon = _lat_lon(cols, rows)
+    steps = np.arange(STEPS, dtype=np.float64)[:, None, None]
+
+    def surface(field):
+        return np.ascontiguousarray(np.broadcast_to(field, (STEPS, NY, NX)), dtype=">f4")
+
+    times = np.array([list(f"2020-01-01_{t:02d}:00:00") for t in range(STEPS)], dtype="S1")
+    dims = [("Time", 0), ("DateStrLen", 19), ("south_north", NY), ("west_east", NX)]
+    dimensions = ("Time", "south_north", "west_east")
+    path = tmp_path_factory.mktemp("sites") / "wrfout_d01"
+    write_netcdf(str(path), dims, [
+        ("Times", ("Time", "DateStrLen"), times),
+        ("XLAT", dimensions, surface(lat)),
+        ("XLONG", dimensions, surface(lon)),
+        ("U10", dimensions, surface(cols + 10 * rows + steps)),
+        ("V10", dimensions, surface(2 * rows - cols)),
+        ("COSALPHA", dimensions, surface(1.0)),
+        ("SINALPHA", dimensions, surface(0.0)),
+        ("PSFC", dimensions, surface(100000.0)),
+        ("T2", dimensions, surface(288.0)),
+    ], {"MAP_PROJ": 1.0, "DX": DX, "DY": DX, "TRUELAT1": 30.0, "TRUELAT2": 60.0, "STAND_LON": 115.0})
+    return str(path)
+
+
+def test_stencil_weights():
+    rows, cols, weights, inside = interpolation_stencil(np.array([4.0, 4.5]), np.array([3.0, 3.5]),
+                                                        (NY, NX), "bilinear")
+    np.testing.assert_array_equal(rows, [[3, 3, 4, 4], [3, 3, 4, 4]])
+    np.testing.assert_array_equal(cols, [[4, 5, 4, 5], [4, 5, 4, 5]])
+    np.testing.assert_allclose(weights, [[1, 0, 0, 0], [0.25, 0.25, 0.25, 0.25]])
+    assert inside.all()
+
+    # 最后一行/列上的点仍用内侧的格子，权重落在角点上
+    rows, cols, weights, _ = interpolation_stencil(np.array([NX - 1.0]), np.array([NY - 1.0]), (NY, NX), "bilinear")
+    assert (rows[0, 3], cols[0, 3]) == (NY - 1, NX - 1) and weights[0, 3] == 1.0
+
+    rows, cols, weights, inside = interpolation_stencil(np.array([4.4, -0.6]), np.array([3.6, 2.0]),
+                                                        (NY, NX), "nearest")
+    assert (rows[0, 0], cols[0, 0]) == (4, 4) and weights[0].tolist() == [1, 0, 0, 0]
+    assert inside.tolist() == [True, False]
+
+
+def test_projection_index_extracts_grid_points_and_midpoints(lambert_path):
+    lat, lon = _lat_lon([4.0, 4.5, 0.0], [3.0, 3.5, NY - 1.0])
+    with open_dataset(lambert_path) as dataset:
+        index = build_site_index(dataset)
+        assert index.kind == "projection" and index.max_error < 1e-3
+        result = extract_site_series(dataset, lat, lon)
+    np.testing.assert_allclose(result["grid_i"], [4.0, 4.5, 0.0], atol=1e-3)
+    np.testing.assert_allclose(result["grid_j"], [3.0, 3.5, NY - 1.0], atol=1e-3)
+    steps = np.arange(STEPS)
+    np.testing.assert_allclose(result["10m/u"][0], 4 + 30 + steps, atol=1e-2)
+    np.testing.assert_allclose(result["10m/u"][1], 4.5 + 35 + steps, atol=1e-2)
+    np.testing.assert_allclose(result["10m/u"][2], 70 + steps, atol=1e-2)
+    np.testing.assert_allclose(result["10m/v"][1], 2.5, atol=1e-2)
+    assert result["times"].tolist()[-1] == "2020-01-01_03:00:00"
+    assert str(result["index_kind"]) == "projection"
+
+
+def test_nearest_method_and_outside_sites(lambert_path):
+    lat, lon = _lat_lon([4.4, -3.0], [3.4, 2.0])
+    with open_dataset(lambert_path) as dataset:
+        result = extract_site_series(dataset, lat, lon, method="nearest")
+    np.testing.assert_allclose(result["10m/u"][0], 34 + np.arange(STEPS), atol=1e-4)
+    assert result["inside"].tolist() == [True, False]
+    assert np.isnan(result["10m/speed"][1]).all()
+
+
+@pytest.mark.parametrize("use_tree", [True, False])
+def test_nearest_index_fallback(wrfout_path, monkeypatch, use_tree):
+    if not use_tree:
+        monkeypatch.setattr(site_extraction, "cKDTree", None)
+    elif site_extraction.cKDTree is None:
+        pytest.skip("scipy is not installed")
+    with open_dataset(wrfout_path) as dataset:
+        # 合成 wrfout 的 XLAT/XLONG 是规则经纬网格，与 Lambert 属性不符，只能走最近点索引
+        index = build_site_index(dataset)
+        lat = np.array(dataset.variables["XLAT"][0], dtype=np.float64)
+        lon = np.array(dataset.variables["XLONG"][0], dtype=np.float64)
+    assert isinstance(index, NearestIndex)
+    fi, fj = index.locate(np.array([lat[5, 7], 0.5 * (lat[5, 7] + lat[6, 7]), lat[-1, -1]]),
+                          np.array([lon[5, 7], 0.5 * (lon[5, 7] + lon[5, 8]), lon[-1, -1]]))
+    np.testing.assert_allclose(fi, [7.0, 7.5, lat.shape[1] - 1], atol=1e-3)
+    np.testing.assert_allclose(fj, [5.0, 5.5, lat.shape[0] - 1], atol=1e-3)
+
+
+def test_rejects_bad_sites(lambert_path):
+    with open_dataset(lambert_path) as dataset:
+        with pytest.raises(AnalysisError):
+            extract_site_series(dataset, [35.0], [115.0, 116.0])
+        with pytest.raises(AnalysisError):
+            extract_site_series(dataset, [95.0], [115.0])
+        with pytest.raises(AnalysisError):
+            extract_site_series(dataset, [35.0], [115.0], method="cubic")
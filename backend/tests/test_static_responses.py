@@ -0,0 +1,103 @@
+import gzip
+import types
+
+import pytest
+from flask import jsonify
+
+import app
+import static_responses
+from static_responses import PrecomputedResponse
+
+ROUTES = {
+    "/api/options": {"physics": app.PHYSICS_OPTIONS, "projections": app.PROJECTIONS, "dataSources": app.DATA_SOURCES},
+    "/api/physics-options": app.PHYSICS_OPTIONS,
+    "/api/projections": app.PROJECTIONS,
+    "/api/data-sources": app.DATA_SOURCES,
+    "/api/configuration": app.DEFAULT_CONFIG,
+}
+
+
+@pytest.fixture
+def fake_brotli(monkeypatch):
+    # 本机未必安装 brotli：用可逆的替身验证编码选择
+    module = types.SimpleNamespace(compress=lambda body, quality: b"br:" + body)
+    monkeypatch.setattr(static_responses, "brotli", module)
+    return module
+
+
+@pytest.mark.parametrize("url, payload", ROUTES.items(), ids=ROUTES.keys())
+def test_bytes_match_jsonify(client, flask_app, url, payload):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    with flask_app.app_context():
+        assert response.data == jsonify(payload).get_data()
+    assert response.get_json() == payload
+
+
+@pytest.mark.parametrize("url", ROUTES)
+def test_gzip_variant(client, url):
+    plain = client.get(url)
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    for response in (plain, compressed):
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.headers["Cache-Control"] == f"public, max-age={static_responses.STATIC_MAX_AGE}"
+    assert "Content-Encoding" not in plain.headers
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("br", "br"),
+    ("gzip, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br"),
+])
+def test_encoding_is_chosen_from_accept_encoding(fake_brotli, flask_app, accept, expected):
+    precomputed = PrecomputedResponse({"a": 1})
+    headers = {"Accept-Encoding": accept} if accept else {}
+    with flask_app.test_request_context(headers=headers):
+        response = static_responses.serve_precomputed(precomputed)
+    assert response.headers.get("Content-Encoding") == expected
+    body, etag = precomputed.variants[expected]
+    assert response.get_data() == body and response.headers["ETag"] == etag
+    assert precomputed.variants["br"][0] == b"br:" + precomputed.variants[None][0]
+
+
+def test_without_brotli_only_gzip_is_offered(monkeypatch, flask_app):
+    monkeypatch.setattr(static_responses, "brotli", None)
+    precomputed = PrecomputedResponse({"a": 1})
+    assert set(precomputed.variants) == {None, "gzip"}
+    with flask_app.test_request_context(headers={"Accept-Encoding": "br"}):
+        assert "Content-Encoding" not in static_responses.serve_precomputed(precomputed).headers
+
+
+def test_real_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    precomputed = PrecomputedResponse(app.DEFAULT_CONFIG)
+    assert brotli.decompress(precomputed.variants["br"][0]) == precomputed.variants[None][0]
+
+
+@pytest.mark.parametrize("url", ROUTES)
+def test_if_none_match_answers_304(client, url):
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.data == b""
+    assert cached.headers["ETag"] == etag and cached.headers["Vary"] == "Accept-Encoding"
+    # 同一内容的其他编码变体也视为未修改，按本次协商的编码返回ETag
+    gzipped = client.get(url, headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert gzipped.status_code == 304 and gzipped.headers["ETag"] == etag[:-1] + '-gzip"'
+    assert client.get(url, headers={"If-None-Match": "*"}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_etag_follows_content():
+    assert PrecomputedResponse({"a": 1}).digest == PrecomputedResponse({"a": 1}).digest
+    assert PrecomputedResponse({"a": 1}).digest != PrecomputedResponse({"a": 2}).digest
+    assert PrecomputedResponse({"a": 1}, max_age=5).cache_control == "public, max-age=5"
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from namelist_cache import NamelistCache
+from tile_pyramid import (
+    UINT8_NODATA,
+    TileError,
+    build_pyramid,
+    downsample,
+    load_manifest,
+    max_zoom_for,
+    read_tile,
+)
+
+
+def _tile(manifest, data):
+    size = manifest["tile_size"]
+    dtype = np.float16 if manifest["encoding"] == "float16" else np.uint8
+    return np.frombuffer(data, dtype=dtype).reshape(size, size)
+
+
+def test_downsample_ignores_nan_and_pads_odd_edges():
+    array = np.array([[1.0, 3.0, 5.0],
+                      [np.nan, 5.0, 7.0],
+                      [2.0, 2.0, np.nan]], dtype=np.float32)
+    result = downsample(array)
+    np.testing.assert_allclose(result, [[3.0, 6.0], [2.0, np.nan]])
+
+
+def test_max_zoom():
+    assert max_zoom_for((10, 16), 16) == 0
+    assert max_zoom_for((40, 70), 16) == 3
+
+
+def test_float16_pyramid_round_trip(tmp_path):
+    field = np.arange(40 * 70, dtype=np.float32).reshape(40, 70) / 100
+    manifest = build_pyramid({"speed": field}, str(tmp_path), tile_size=16)
+    assert load_manifest(str(tmp_path)) == manifest
+    assert manifest["max_zoom"] == 3
+    assert manifest["levels"]["3"] == {"shape": [40, 70], "tiles": [3, 5]}
+    assert manifest["levels"]["0"]["tiles"] == [1, 1]
+
+    cache = NamelistCache(max_entries=8, ttl_seconds=60)
+    tile = _tile(manifest, read_tile(str(tmp_path), manifest, "speed", 3, 2, 4, cache=cache))
+    # 末行末列瓦片只有 8×6 个有效值，其余为 NaN
+    np.testing.assert_allclose(tile[:8, :6], field[32:40, 64:70], rtol=1e-3)
+    assert np.isnan(tile[8:, :]).all() and np.isnan(tile[:, 6:]).all()
+
+    coarse = _tile(manifest, read_tile(str(tmp_path), manifest, "speed", 2, 0, 0, cache=cache))
+    np.testing.assert_allclose(coarse[:16, :16], downsample(field)[:16, :16], rtol=1e-3)
+
+
+def test_uint8_quantisation(tmp_path):
+    field = np.linspace(0.0, 25.4, 16 * 16, dtype=np.float32).reshape(16, 16)
+    field[0, 0] = np.nan
+    manifest = build_pyramid({"speed": field}, str(tmp_path), tile_size=16, encoding="uint8")
+    meta = manifest["fields"]["speed"]
+    tile = _tile(manifest, read_tile(str(tmp_path), manifest, "speed", 0, 0, 0,
+                                     cache=NamelistCache(max_entries=8, ttl_seconds=60)))
+    assert tile[0, 0] == UINT8_NODATA
+    decoded = meta["offset"] + meta["scale"] * tile.astype(np.float32)
+    np.testing.assert_allclose(decoded.ravel()[1:], field.ravel()[1:], atol=meta["scale"] / 2 + 1e-6)
+
+
+def test_rejects_bad_requests(tmp_path):
+    with pytest.raises(TileError):
+        build_pyramid({"speed": np.zeros((4, 4))}, str(tmp_path), encoding="png")
+    with pytest.raises(TileError):
+        build_pyramid({"speed": np.zeros((4, 4))}, str(tmp_path), tile_size=8)
+    assert load_manifest(str(tmp_path)) is None
+    manifest = build_pyramid({"speed": np.zeros((4, 4))}, str(tmp_path), tile_size=16)
+    with pytest.raises(TileError):
+        read_tile(str(tmp_path), manifest, "speed", 1, 0, 0)
+    with pytest.raises(TileError):
+        read_tile(str(tmp_path), manifest, "power", 0, 0, 0)
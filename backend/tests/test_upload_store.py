@@ -0,0 +1,111 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+import app
+from netcdf_reader import sniff_format
+from upload_store import UploadError, UploadStore
+
+
+class Trickle(io.RawIOBase):
+    """A request stream whose read() returns at most ``step`` bytes, like a slow socket."""
+
+    def __init__(self, data, step=1):
+        self.data = memoryview(data)
+        self.step = step
+        self.reads = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        self.reads += 1
+        chunk = bytes(self.data[:min(self.step, size if size >= 0 else len(self.data))])
+        self.data = self.data[len(chunk):]
+        return chunk
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path / "uploads"), chunk_size=64)
+
+
+@pytest.fixture
+def wrfout_bytes(wrfout_path):
+    with open(wrfout_path, "rb") as fh:
+        return fh.read()
+
+
+def _incoming(store):
+    return os.listdir(os.path.join(store.root, ".incoming"))
+
+
+@pytest.mark.parametrize("step", [1, 3, 5, 64])
+def test_short_reads_are_buffered_before_sniffing(store, wrfout_bytes, step):
+    stream = Trickle(wrfout_bytes, step)
+    info = store.save_stream(stream, "wrfout_d01_2020-01-01_00:00:00")
+    assert info["format"] == sniff_format(wrfout_bytes) is not None
+    assert info["size"] == len(wrfout_bytes)
+    assert info["sha256"] == hashlib.sha256(wrfout_bytes).hexdigest()
+    with open(store.locate(info["upload_id"]), "rb") as fh:
+        assert fh.read() == wrfout_bytes
+    assert _incoming(store) == []
+
+
+@pytest.mark.parametrize("head, kind", [
+    (b"CDF\x01", "netcdf3"),
+    (b"CDF\x02", "netcdf3"),
+    (b"\x89HDF\r\n\x1a\n", "netcdf4"),
+])
+def test_magic_split_across_reads(store, head, kind):
+    info = store.save_stream(Trickle(head + b"\x00" * 100, 1), "data.nc")
+    assert info["format"] == kind
+
+
+@pytest.mark.parametrize("data, step, message", [
+    (b"PK\x03\x04" + b"\x00" * 100, 1, "not a NetCDF file"),
+    (b"C" + b"\x00" * 100, 1, "not a NetCDF file"),
+    # 文件短于文件头
+    (b"CDF", 1, "not a NetCDF file"),
+    (b"", 1, "Empty upload"),
+])
+def test_rejected_uploads_leave_nothing_behind(store, data, step, message):
+    stream = Trickle(data, step)
+    with pytest.raises(UploadError, match=message):
+        store.save_stream(stream, "data.nc")
+    assert _incoming(store) == []
+    # 非 NetCDF 在凑够文件头时即拒绝，不读完整个请求体
+    if data[:1] == b"P":
+        assert stream.reads == 4
+
+
+def test_limits_and_names(tmp_path, wrfout_bytes):
+    store = UploadStore(str(tmp_path), chunk_size=64, max_bytes=len(wrfout_bytes) - 1)
+    with pytest.raises(UploadError, match="byte limit"):
+        store.save_stream(Trickle(wrfout_bytes, 64), "wrfout_d01")
+    with pytest.raises(UploadError, match="Invalid filename"):
+        store.save_stream(Trickle(wrfout_bytes, 64), "../wrfout_d01")
+    assert _incoming(store) == []
+
+
+def test_identical_uploads_share_one_file(store, wrfout_bytes):
+    first = store.save_stream(Trickle(wrfout_bytes, 64), "wrfout_d01")
+    second = store.save_stream(Trickle(wrfout_bytes, 7), "renamed")
+    assert second["upload_id"] == first["upload_id"] and second["filename"] == "wrfout_d01"
+    assert os.listdir(os.path.dirname(store.locate(first["upload_id"]))) == ["wrfout_d01"]
+    store.delete(first["upload_id"])
+    assert store.locate(first["upload_id"]) is None
+    assert store.locate("../../etc") is None
+
+
+def test_upload_route(client, wrfout_bytes):
+    response = client.post("/api/wrfout?filename=wrfout_d01_2020-01-01_00:00:00", data=wrfout_bytes,
+                           content_type="application/octet-stream")
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["size"] == len(wrfout_bytes) and "summary" in body
+    assert app.upload_store.locate(body["upload_id"]) is not None
+    rejected = client.post("/api/wrfout?filename=notes.txt", data=b"hello", content_type="text/plain")
+    assert rejected.status_code == 400 and "not a NetCDF" in rejected.get_json()["error"]
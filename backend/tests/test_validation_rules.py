@@ -0,0 +1,159 @@
+import copy
+
+import pytest
+
+import app
+from app import DEFAULT_CONFIG, PHYSICS_OPTIONS
+from validation_rules import RULES, ValidationFrame, compile_validator
+
+validator = compile_validator(PHYSICS_OPTIONS)
+
+
+def legacy_validate(data):
+    """The per-field checks /api/validate ran before the rule registry (stops at the first gap per section)."""
+    errors = []
+    if 'time_control' not in data:
+        errors.append("Missing time_control section")
+    elif 'start_date_str_arr' not in data['time_control'] or not data['time_control']['start_date_str_arr']:
+        errors.append("Missing start date")
+    elif 'end_date_str_arr' not in data['time_control'] or not data['time_control']['end_date_str_arr']:
+        errors.append("Missing end date")
+    if 'domain_setup' not in data:
+        errors.append("Missing domain_setup section")
+    elif 'e_we_arr' not in data['domain_setup'] or not data['domain_setup']['e_we_arr']:
+        errors.append("Missing grid size (e_we)")
+    elif 'e_sn_arr' not in data['domain_setup'] or not data['domain_setup']['e_sn_arr']:
+        errors.append("Missing grid size (e_sn)")
+    return errors
+
+
+def _config(**changes):
+    """DEFAULT_CONFIG with ``section__key=value`` overrides; ``...`` removes the key, ``section=...`` the section."""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    for path, value in changes.items():
+        section, _, key = path.partition("__")
+        target, name = (config, section) if not key else (config[section], key)
+        if value is ...:
+            target.pop(name)
+        else:
+            target[name] = value
+    return config
+
+
+CFL_D01 = "d01: time step {}s exceeds 6 x dx (180s for dx = 30 km); the run is likely to violate CFL"
+
+INVALID = {
+    "no_time_control": (_config(time_control=...), ["Missing time_control section"]),
+    "no_domain_setup": (_config(domain_setup=...), ["Missing domain_setup section"]),
+    "no_sections": (_config(time_control=..., domain_setup=...),
+                    ["Missing time_control section", "Missing domain_setup section"]),
+    # 旧校验在第一个缺失字段处停止，现在一次报告全部缺失字段
+    "no_dates": (_config(time_control__start_date_str_arr=[], time_control__end_date_str_arr=...),
+                 ["Missing start date", "Missing end date"]),
+    "no_end": (_config(time_control__end_date_str_arr=[]), ["Missing end date"]),
+    "no_grid": (_config(domain_setup__e_we_arr=..., domain_setup__e_sn_arr=[]),
+                ["Missing grid size (e_we)", "Missing grid size (e_sn)"]),
+    "bad_date": (_config(time_control__start_date_str_arr=["2001/10/25"]),
+                 ["Start/end dates must use the format YYYY-MM-DD_HH:MM:SS"]),
+    "end_before_start": (_config(time_control__end_date_str_arr=["2001-10-24_00:00:00"]),
+                         ["End date must be after start date"]),
+    "cfl": (_config(domain_setup__time_step=200), [CFL_D01.format(200)]),
+    "zero_time_step": (_config(domain_setup__time_step=0), ["time_step must be a positive number of seconds"]),
+    "text_time_step": (_config(domain_setup__time_step="fast"), ["time_step must be a positive number of seconds"]),
+    "unknown_option": (_config(physics__mp_physics_arr=[99]), ["d01: mp_physics = 99 is not a supported option"]),
+    "text_option": (_config(physics__mp_physics_arr=["kessler"]), ["d01: mp_physics must be numeric"]),
+    "pbl_sfclay": (_config(physics__bl_pbl_physics_arr=[2]),
+                   ["d01: bl_pbl_physics = 2 requires sf_sfclay_physics in [2], got 1"]),
+    "nest_parent": (_config(domain_setup__max_dom=2, domain_setup__e_we_arr=[100, 31], domain_setup__e_sn_arr=[100, 31],
+                            domain_setup__parent_id_arr=[1, 3], domain_setup__parent_grid_ratio_arr=[1, 3],
+                            domain_setup__i_parent_start_arr=[1, 30], domain_setup__j_parent_start_arr=[1, 30]),
+                    ["d02: parent_id 3 must refer to an earlier domain (1..1)"]),
+    # d02 步长 = 120s / parent_time_step_ratio 1，超过 6 × 10 km
+    "nest_cfl": (_config(domain_setup__max_dom=2, domain_setup__e_we_arr=[100, 31], domain_setup__e_sn_arr=[100, 31],
+                         domain_setup__parent_grid_ratio_arr=[1, 3], domain_setup__i_parent_start_arr=[1, 30],
+                         domain_setup__j_parent_start_arr=[1, 30], domain_setup__parent_time_step_ratio_arr=[1, 1],
+                         domain_setup__time_step=120),
+                 ["d02: time step 120s exceeds 6 x dx (60s for dx = 10 km); the run is likely to violate CFL"]),
+    # 各规则的错误在同一次校验中按注册顺序全部返回
+    "everything": (_config(time_control__end_date_str_arr=["2001-10-24_00:00:00"], domain_setup__e_sn_arr=...,
+                           domain_setup__time_step=400, physics__mp_physics_arr=[99],
+                           physics__bl_pbl_physics_arr=[2]),
+                   ["Missing grid size (e_sn)",
+                    "End date must be after start date",
+                    CFL_D01.format(400),
+                    "d01: mp_physics = 99 is not a supported option",
+                    "d01: bl_pbl_physics = 2 requires sf_sfclay_physics in [2], got 1"]),
+}
+
+
+def test_default_config_is_valid():
+    assert validator.validate(DEFAULT_CONFIG) == {"valid": True, "errors": [], "warnings": []}
+    assert legacy_validate(DEFAULT_CONFIG) == []
+
+
+@pytest.mark.parametrize("config, expected", INVALID.values(), ids=INVALID.keys())
+def test_invalid_configs_report_every_error(config, expected):
+    result = validator.validate(config)
+    assert result["valid"] is False
+    assert result["errors"] == expected
+    # 旧的逐字段校验的结果是新结果的前缀：消息与顺序不变
+    legacy = legacy_validate(config)
+    assert result["errors"][:len(legacy)] == legacy
+
+
+@pytest.mark.parametrize("changes, expected", [
+    ({"physics__radt_arr": [60]},
+     ["radt = 60 min is longer than the recommended 1 min per km of d01 dx (30 min)"]),
+    ({"physics__cu_physics_arr": [3], "physics__radt_arr": [3], "domain_setup__dx_arr": [3000],
+      "domain_setup__dy_arr": [3000], "domain_setup__time_step": 18},
+     []),
+    ({"physics__radt_arr": [3], "domain_setup__dx_arr": [3000], "domain_setup__dy_arr": [3000],
+      "domain_setup__time_step": 18},
+     ["d01: cu_physics = 1 at dx = 3 km; convection is resolved below 4 km, "
+      "use cu_physics = 0 or a scale-aware scheme"]),
+])
+def test_advisories_are_warnings(changes, expected):
+    result = validator.validate(_config(**changes))
+    assert result == {"valid": True, "errors": [], "warnings": expected}
+
+
+def test_batch_matches_single_validation():
+    configs = [config for config, _ in INVALID.values()] + [DEFAULT_CONFIG, "not a config", {}]
+    results = validator.validate_batch(configs)
+    assert results == [validator.validate(config) for config in configs]
+    assert results[-2]["errors"] == ["Missing time_control section", "Missing domain_setup section"]
+    assert validator.validate_batch([]) == []
+
+
+def test_frame_columns():
+    nested = _config(domain_setup__max_dom=2, physics__radt_arr=[30, 10])
+    frame = ValidationFrame([DEFAULT_CONFIG, nested, {"time_control": {}}])
+    assert frame.width == 2 and frame.max_dom.tolist() == [1, 2, 1]
+    assert frame.active.tolist() == [[True, False], [True, True], [False, False]]
+    assert frame.physics["radt"][1].tolist() == [30, 10]
+    assert frame.time_step.tolist() == [60, 60, 60]
+
+
+def test_rules_run_in_registration_order():
+    assert [name for name, _ in RULES] == [
+        "required_sections", "time_window", "nest_geometry", "cfl_time_step", "radiation_interval",
+        "cumulus_resolution", "physics_options", "pbl_surface_layer",
+    ]
+    assert validator.rules == tuple(RULES)
+
+
+def test_validate_route(client):
+    config, expected = INVALID["everything"]
+    response = client.post("/api/validate", json=config)
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == expected
+    assert client.post("/api/validate", json=DEFAULT_CONFIG).get_json() == {"valid": True, "warnings": []}
+
+    batch = client.post("/api/validate", json=[DEFAULT_CONFIG, config])
+    assert batch.status_code == 200
+    body = batch.get_json()
+    assert body["valid"] is False
+    assert [r["index"] for r in body["results"]] == [0, 1]
+    assert body["results"][1]["errors"] == expected
+    assert client.post("/api/validate", json="config").status_code == 400
+    assert app.config_validator.rules == validator.rules
@@ -0,0 +1,67 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from wind_analysis import AnalysisError
+from weibull import K_MAX, fit_weibull_grid, gamma, row_bands, weibull_from_moments
+
+
+def _sample_moments(k, c, size=400_000, seed=0):
+    speed = c * np.random.default_rng(seed).weibull(k, size=size)
+    return speed.mean(), (speed ** 2).mean(), (speed ** 3).mean()
+
+
+def _exact_moments(k, c):
+    return tuple(c ** n * math.gamma(1 + n / k) for n in (1, 2, 3))
+
+
+def test_gamma_matches_math():
+    x = np.array([0.6, 1.0, 1.5, 2.0, 4.0, 11.0])
+    np.testing.assert_allclose(gamma(x), [math.gamma(value) for value in x], rtol=1e-12)
+
+
+@pytest.mark.parametrize("method", ["moments", "energy"])
+@pytest.mark.parametrize("k, c", [(1.6, 6.0), (2.0, 8.0), (3.2, 11.0)])
+def test_recovers_known_parameters(method, k, c):
+    # 精确矩：energy 只有二分误差；moments 经验公式在常见 k 范围内误差约 1%
+    fitted_k, fitted_c = weibull_from_moments(*_exact_moments(k, c), method=method)
+    tolerance = 1e-6 if method == "energy" else 0.02
+    assert float(fitted_k) == pytest.approx(k, rel=tolerance)
+    assert float(fitted_c) == pytest.approx(c, rel=tolerance)
+
+    fitted_k, fitted_c = weibull_from_moments(*_sample_moments(k, c), method=method)
+    assert float(fitted_k) == pytest.approx(k, rel=0.04)
+    assert float(fitted_c) == pytest.approx(c, rel=0.02)
+
+
+def test_calm_and_constant_cells():
+    mean = np.array([0.0, 5.0])
+    k, c = weibull_from_moments(mean, mean ** 2, mean ** 3)
+    assert np.isnan(k[0]) and np.isnan(c[0])
+    assert k[1] == K_MAX and c[1] == pytest.approx(5.0 / float(gamma(1 + 1 / K_MAX)))
+
+
+def test_rejects_unknown_method():
+    with pytest.raises(AnalysisError):
+        weibull_from_moments(1.0, 1.0, 1.0, method="mle")
+
+
+def test_row_bands_cover_all_rows():
+    bands = row_bands(12, 5)
+    assert bands[0].start == 0 and bands[-1].stop == 12
+    assert all(a.stop == b.start for a, b in zip(bands, bands[1:]))
+    assert row_bands(3, 8) == [slice(0, 1), slice(1, 2), slice(2, 3)]
+
+
+def test_banded_fit_matches_single_band(wrfout_path):
+    single = fit_weibull_grid(wrfout_path, heights=("10m", 80), method="energy")
+    with ThreadPoolExecutor(3) as executor:
+        banded = fit_weibull_grid(wrfout_path, heights=("10m", 80), method="energy", workers=3,
+                                  executor=executor)
+    assert single["meta"]["row_bands"] == 1 and banded["meta"]["row_bands"] == 3
+    for label in ("10m", "80m"):
+        for key in ("k", "c", "mean_speed"):
+            np.testing.assert_allclose(banded[label][key], single[label][key], rtol=1e-5)
+        assert np.all(np.isfinite(single[label]["k"]))
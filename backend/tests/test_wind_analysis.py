@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from conftest import WRFOUT_STEPS
+from netcdf_reader import open_dataset
+from wind_analysis import (
+    GRAVITY,
+    R_DRY,
+    WORKING_ARRAYS_10M,
+    WindReader,
+    analyse_wind_resource,
+    direction_sector,
+    earth_relative,
+    interpolate_to_heights,
+    time_chunks,
+)
+
+CHUNK_STEPS = 5
+
+
+def _full(dataset, name):
+    """The whole variable copied into memory, bypassing the chunked reader."""
+    return np.array(dataset.variables[name][:], dtype=np.float64)
+
+
+def _chunk_bytes(dataset):
+    # 只有 10m 时每步工作集为 4*ny*nx*WORKING_ARRAYS_10M 字节；取 5 步，23 步分成 5+5+5+5+3
+    _, ny, nx = dataset.variables["U10"].shape
+    return CHUNK_STEPS * 4 * ny * nx * WORKING_ARRAYS_10M
+
+
+def _reference_10m(dataset):
+    cos, sin = _full(dataset, "COSALPHA"), _full(dataset, "SINALPHA")
+    u10, v10 = _full(dataset, "U10"), _full(dataset, "V10")
+    return u10 * cos - v10 * sin, v10 * cos + u10 * sin
+
+
+def test_time_chunks_cover_steps_when_size_does_not_divide():
+    assert list(time_chunks(23, 10, chunk_bytes=50)) == [(0, 5), (5, 10), (10, 15), (15, 20), (20, 23)]
+    assert list(time_chunks(3, 10, chunk_bytes=1)) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_reader_chunks_match_full_read(wrfout_path):
+    with open_dataset(wrfout_path) as dataset:
+        reader = WindReader(dataset, ["10m"], chunk_bytes=_chunk_bytes(dataset))
+        chunks = list(reader.chunks())
+        u_ref, v_ref = _reference_10m(dataset)
+    assert [len(winds["10m"][0]) for _, winds in chunks] == [5, 5, 5, 5, 3]
+    u = np.concatenate([winds["10m"][0] for _, winds in chunks])
+    v = np.concatenate([winds["10m"][1] for _, winds in chunks])
+    np.testing.assert_allclose(u, u_ref, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(v, v_ref, rtol=1e-5, atol=1e-5)
+    # 分位数需要全部样本：分块读出的风速与整体读取的分位数一致
+    speed, speed_ref = np.hypot(u, v), np.hypot(u_ref, v_ref)
+    for q in (5, 50, 95):
+        np.testing.assert_allclose(np.percentile(speed, q, axis=0), np.percentile(speed_ref, q, axis=0),
+                                   rtol=1e-5, atol=1e-5)
+
+
+def test_chunked_statistics_match_full_read(wrfout_path):
+    with open_dataset(wrfout_path) as dataset:
+        chunked = analyse_wind_resource(dataset, heights=["10m"], sectors=8, chunk_bytes=_chunk_bytes(dataset))
+        whole = analyse_wind_resource(dataset, heights=["10m"], sectors=8, chunk_bytes=1 << 40)
+        u_ref, v_ref = _reference_10m(dataset)
+        density = _full(dataset, "PSFC") / (R_DRY * _full(dataset, "T2"))
+
+    speed = np.hypot(u_ref, v_ref)
+    result = chunked["10m"]
+    np.testing.assert_allclose(result["mean_speed"], speed.mean(axis=0), rtol=1e-5)
+    np.testing.assert_allclose(result["power_density"], (0.5 * density * speed ** 3).mean(axis=0), rtol=1e-4)
+    sectors = direction_sector(u_ref, v_ref, 8)
+    frequency = np.stack([(sectors == s).mean(axis=0) for s in range(8)])
+    np.testing.assert_allclose(result["direction_frequency"], frequency, atol=1e-6)
+    np.testing.assert_allclose(result["direction_frequency"].sum(axis=0), 1.0, rtol=1e-6)
+    assert chunked["meta"]["time_steps"] == WRFOUT_STEPS
+    for key in ("mean_speed", "power_density", "direction_frequency"):
+        np.testing.assert_allclose(result[key], whole["10m"][key], rtol=1e-5)
+
+
+def test_hub_height_chunks_match_full_interpolation(wrfout_path):
+    with open_dataset(wrfout_path) as dataset:
+        chunked = analyse_wind_resource(dataset, heights=[80], sectors=4, chunk_bytes=_chunk_bytes(dataset))
+        u = _full(dataset, "U")
+        v = _full(dataset, "V")
+        u = 0.5 * (u[..., :-1] + u[..., 1:])
+        v = 0.5 * (v[:, :, :-1] + v[:, :, 1:])
+        geopotential = _full(dataset, "PH") + _full(dataset, "PHB")
+        z = geopotential / GRAVITY
+        heights = 0.5 * (z[:, :-1] + z[:, 1:]) - _full(dataset, "HGT")[:, None]
+        cos, sin = _full(dataset, "COSALPHA"), _full(dataset, "SINALPHA")
+        density = _full(dataset, "PSFC") / (R_DRY * _full(dataset, "T2"))
+
+    u80 = interpolate_to_heights(u, heights, [80.0])[0]
+    v80 = interpolate_to_heights(v, heights, [80.0])[0]
+    u80, v80 = earth_relative(u80, v80, cos, sin)
+    speed = np.hypot(u80, v80)
+    np.testing.assert_allclose(chunked["80m"]["mean_speed"], speed.mean(axis=0), rtol=1e-4)
+    np.testing.assert_allclose(chunked["80m"]["power_density"], (0.5 * density * speed ** 3).mean(axis=0),
+                               rtol=1e-3)
+
+
+def test_interpolation_between_levels():
+    field = np.array([10.0, 20.0, 40.0]).reshape(1, 3, 1, 1)
+    heights = np.array([10.0, 50.0, 150.0]).reshape(1, 3, 1, 1)
+    result = interpolate_to_heights(field, heights, [30.0, 100.0, 5.0, 500.0])
+    np.testing.assert_allclose(result[:, 0, 0, 0], [15.0, 30.0, 10.0, 40.0])
+
+
+@pytest.mark.parametrize("alpha_degrees", [0.0, 30.0, 90.0, -45.0])
+def test_rotation_to_earth_relative(alpha_degrees):
+    alpha = np.radians(alpha_degrees)
+    # 网格 x 方向上的单位风，旋转 alpha 后的地球坐标分量为 (cos, sin)
+    u, v = earth_relative(np.array([1.0]), np.array([0.0]), np.cos(alpha), np.sin(alpha))
+    np.testing.assert_allclose([u[0], v[0]], [np.cos(alpha), np.sin(alpha)], atol=1e-12)
+    # 旋转不改变风速
+    u, v = earth_relative(np.array([3.0]), np.array([4.0]), np.cos(alpha), np.sin(alpha))
+    np.testing.assert_allclose(np.hypot(u, v), 5.0)
+
+
+def test_direction_sectors_are_blowing_from():
+    # 南风(从南吹来，v>0)落在 180°，西风(u>0)落在 270°
+    sectors = direction_sector(np.array([0.0, 1.0, 0.0, -1.0]), np.array([1.0, 0.0, -1.0, 0.0]), 4)
+    np.testing.assert_array_equal(sectors, [2, 3, 0, 1])
@@ -0,0 +1,128 @@
+# tile_pyramid.py
+# 多分辨率瓦片金字塔：逐级2×2平均降采样，切成固定大小瓦片以 float16 或 uint8 紧凑格式落盘，读取经LRU缓存
+#
+# 目录结构：<root>/manifest.json 与 <root>/<field>/<z>/<y>/<x>.bin
+# z=0 为整域一张瓦片的最粗级，z=max_zoom 为原始分辨率。
+
+import json
+import math
+import os
+
+import numpy as np
+
+from namelist_cache import NamelistCache
+
+DEFAULT_TILE_SIZE = 256
+TILE_ENCODINGS = ("float16", "uint8")
+UINT8_NODATA = 255
+
+tile_cache = NamelistCache(
+    max_entries=int(os.environ.get("WOLFER_TILE_CACHE_SIZE", 4096)),
+    ttl_seconds=float(os.environ.get("WOLFER_TILE_CACHE_TTL", 86400)),
+)
+
+
+class TileError(ValueError):
+    """Raised for bad pyramid parameters or tile coordinates."""
+
+
+def downsample(array):
+    """2×2 mean that ignores NaN; odd edges are padded with NaN."""
+    ny, nx = array.shape
+    padded = np.full((ny + ny % 2, nx + nx % 2), np.nan, dtype=np.float32)
+    padded[:ny, :nx] = array
+    blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=(1, 3))
+    sums = np.where(valid, blocks, 0.0).sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+
+
+def max_zoom_for(shape, tile_size):
+    return max(0, math.ceil(math.log2(max(shape) / tile_size))) if max(shape) > tile_size else 0
+
+
+def encode_tile(tile, encoding, value_range):
+    if encoding == "float16":
+        return tile.astype(np.float16)
+    low, high = value_range
+    scale = (high - low) / (UINT8_NODATA - 1) if high > low else 1.0
+    quantised = np.round((tile - low) / scale)
+    return np.where(np.isnan(tile), UINT8_NODATA, np.clip(quantised, 0, UINT8_NODATA - 1)).astype(np.uint8)
+
+
+def build_pyramid(fields, root, tile_size=DEFAULT_TILE_SIZE, encoding="float16", extra=None):
+    """Writes every level and tile of each ``(y, x)`` field under ``root``; returns the manifest.
+
+    The manifest is written last, so its presence marks a complete pyramid.
+    """
+    if encoding not in TILE_ENCODINGS:
+        raise TileError(f"encoding must be one of {', '.join(TILE_ENCODINGS)}")
+    if not 16 <= tile_size <= 1024:
+        raise TileError("tile_size must be between 16 and 1024")
+    shape = next(iter(fields.values())).shape
+    max_zoom = max_zoom_for(shape, tile_size)
+    manifest = {
+        "shape": list(shape), "tile_size": tile_size, "encoding": encoding,
+        "max_zoom": max_zoom, "levels": {}, "fields": {},
+        "nodata": "NaN" if encoding == "float16" else UINT8_NODATA,
+    }
+    for name, array in fields.items():
+        array = np.asarray(array, dtype=np.float32)
+        finite = array[np.isfinite(array)]
+        value_range = (float(finite.min()), float(finite.max())) if finite.size else (0.0, 0.0)
+        scale = (value_range[1] - value_range[0]) / (UINT8_NODATA - 1) if value_range[1] > value_range[0] else 1.0
+        manifest["fields"][name] = {"min": value_range[0], "max": value_range[1],
+                                    "mean": float(finite.mean()) if finite.size else None}
+        if encoding == "uint8":
+            # 还原：value = offset + scale * q
+            manifest["fields"][name].update(offset=value_range[0], scale=scale)
+
+        level = array
+        for z in range(max_zoom, -1, -1):
+            rows, cols = math.ceil(level.shape[0] / tile_size), math.ceil(level.shape[1] / tile_size)
+            manifest["levels"][str(z)] = {"shape": list(level.shape), "tiles": [rows, cols]}
+            for ty in range(rows):
+                directory = os.path.join(root, name, str(z), str(ty))
+                os.makedirs(directory, exist_ok=True)
+                for tx in range(cols):
+                    tile = np.full((tile_size, tile_size), np.nan, dtype=np.float32)
+                    block = level[ty * tile_size:(ty + 1) * tile_size, tx * tile_size:(tx + 1) * tile_size]
+                    tile[:block.shape[0], :block.shape[1]] = block
+                    with open(os.path.join(directory, f"{tx}.bin"), "wb") as fh:
+                        fh.write(encode_tile(tile, encoding, value_range).tobytes())
+            if z:
+                level = downsample(level)
+
+    manifest.update(extra or {})
+    tmp_path = os.path.join(root, f"manifest.json.tmp-{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_path, os.path.join(root, "manifest.json"))
+    return manifest
+
+
+def load_manifest(root):
+    """The manifest of a complete pyramid, or ``None``."""
+    try:
+        with open(os.path.join(root, "manifest.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def read_tile(root, manifest, field, z, y, x, cache=tile_cache):
+    """Raw tile bytes (``tile_size²`` values in the pyramid's encoding), served from the LRU cache when warm."""
+    if field not in manifest["fields"]:
+        raise TileError(f"Unknown field {field!r}")
+    level = manifest["levels"].get(str(z))
+    if level is None or not (0 <= y < level["tiles"][0] and 0 <= x < level["tiles"][1]):
+        raise TileError("Tile out of range")
+    key = (root, field, z, y, x)
+    data = cache.get(key)
+    if data is None:
+        with open(os.path.join(root, field, str(z), str(y), f"{x}.bin"), "rb") as fh:
+            data = fh.read()
+        cache.put(key, data)
+    return data
@@ -0,0 +1,112 @@
+# upload_store.py
+# wrfout 上传：请求体按块流式写入磁盘(不在内存中缓冲)，边写边算SHA-256，按内容寻址存放
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from artifact_store import ARTIFACT_ID_RE
+from netcdf_reader import MAGIC_BYTES, sniff_format
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+# wrfout 文件名本身带冒号(wrfout_d01_2020-01-01_00:00:00)
+FILENAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._:-]*$")
+
+
+class UploadError(ValueError):
+    """Raised when an upload is rejected (bad name, not NetCDF, too large, empty)."""
+
+
+class UploadStore:
+    """Keeps uploads under ``root/<id[:2]>/<id>/<filename>``; derived results go in ``<id>/analysis``."""
+
+    def __init__(self, root, chunk_size=UPLOAD_CHUNK_SIZE, max_bytes=None):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, ".incoming"), exist_ok=True)
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, upload_id[:2], upload_id)
+
+    def save_stream(self, stream, filename):
+        """Copies ``stream`` to disk chunk by chunk; returns ``{upload_id, filename, size, sha256, format}``."""
+        if not FILENAME_RE.match(filename or ""):
+            raise UploadError("Invalid filename")
+        digest = hashlib.sha256()
+        size = 0
+        kind = None
+        head = b""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, ".incoming"), prefix="upload-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if kind is None:
+                        # read() 可能返回很短的块：凑够文件头再判断格式
+                        head += chunk[:MAGIC_BYTES - len(head)]
+                        if len(head) == MAGIC_BYTES:
+                            kind = sniff_format(head)
+                            if kind is None:
+                                raise UploadError("Upload is not a NetCDF file")
+                    size += len(chunk)
+                    if self.max_bytes is not None and size > self.max_bytes:
+                        raise UploadError(f"Upload exceeds the {self.max_bytes} byte limit")
+                    digest.update(chunk)
+                    fh.write(chunk)
+            if size == 0:
+                raise UploadError("Empty upload")
+            if kind is None:
+                raise UploadError("Upload is not a NetCDF file")
+
+            sha256 = digest.hexdigest()
+            upload_id = sha256[:32]
+            directory = self._upload_dir(upload_id)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, filename)
+            existing = self._data_file(directory)
+            if existing is not None:
+                # 相同内容已上传过，沿用已有文件
+                os.unlink(tmp_path)
+                path = existing
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return {"upload_id": upload_id, "filename": os.path.basename(path), "size": size,
+                "sha256": sha256, "format": kind}
+
+    @staticmethod
+    def _data_file(directory):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except FileNotFoundError:
+            return None
+        return next((e.path for e in entries if e.is_file() and not e.name.startswith(".")), None)
+
+    def locate(self, upload_id):
+        """Path of the uploaded file, or ``None``."""
+        if not ARTIFACT_ID_RE.match(upload_id):
+            return None
+        return self._data_file(self._upload_dir(upload_id))
+
+    def analysis_dir(self, upload_id):
+        directory = os.path.join(self._upload_dir(upload_id), "analysis")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def delete(self, upload_id):
+        if ARTIFACT_ID_RE.match(upload_id):
+            shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+
+def create_upload_store():
+    root = os.environ.get("WOLFER_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "wolfer_uploads"))
+    max_bytes = os.environ.get("WOLFER_UPLOAD_MAX_BYTES")
+    return UploadStore(root, max_bytes=int(max_bytes) if max_bytes else None)
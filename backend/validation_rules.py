@@ -0,0 +1,265 @@
+# validation_rules.py
+# 配置校验规则注册表：启动时编译一次(查找表 + 规则元组)，对一个或一批配置按列向量化执行，一次报告全部问题
+
+from datetime import datetime
+
+import numpy as np
+
+from namelist_render import INPUT_SECTIONS, domain_columns, get_single_param_val
+from nest_validation import build_nest_table, validate_nest_batch
+
+WRF_DATE_FORMAT = "%Y-%m-%d_%H:%M:%S"
+
+# WRF 经验值：time_step(秒) 不超过 6 × dx(公里)
+CFL_SECONDS_PER_KM = 6.0
+# 低于此分辨率(公里)为对流可分辨尺度，一般应关闭积云参数化
+CONVECTION_PERMITTING_KM = 4.0
+# 尺度自适应的积云方案(Grell-Freitas)在对流可分辨尺度下仍可使用
+SCALE_AWARE_CU = (0, 3)
+
+# 边界层方案 -> 允许搭配的近地面层方案 (WRF 在不匹配时直接报错退出)
+PBL_SFCLAY_COMPATIBILITY = {
+    1: (1, 91),     # YSU -> Revised MM5
+    2: (2,),        # MYJ -> Eta
+    4: (4,),        # QNSE -> QNSE
+    5: (1, 2, 5),   # MYNN2 -> MM5 / Eta / MYNN
+}
+
+PHYSICS_DEFAULTS = {
+    field.key[:-len("_arr")]: field.default
+    for name, fields in INPUT_SECTIONS if name == "physics"
+    for field in fields
+}
+
+RULES = []
+
+
+def rule(name):
+    """Registers a validation rule; rules run in registration order."""
+    def register(fn):
+        RULES.append((name, fn))
+        return fn
+    return register
+
+
+def _as_float(value):
+    if isinstance(value, bool) or value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _epoch(value):
+    if not isinstance(value, str):
+        return np.nan
+    try:
+        return datetime.strptime(value, WRF_DATE_FORMAT).timestamp()
+    except ValueError:
+        return np.nan
+
+
+class ValidationFrame:
+    """Column-oriented view of a batch of configs plus the per-config result lists."""
+
+    def __init__(self, configs):
+        self.configs = configs
+        self.size = len(configs)
+        self.errors = [[] for _ in configs]
+        self.warnings = [[] for _ in configs]
+
+        sections = [c if isinstance(c, dict) else {} for c in configs]
+        self.time_control = [s.get("time_control") for s in sections]
+        self.domain_setup = [s.get("domain_setup") for s in sections]
+        domain_setups = [d if isinstance(d, dict) else {} for d in self.domain_setup]
+        physics = [s.get("physics") if isinstance(s.get("physics"), dict) else {} for s in sections]
+
+        table, max_doms, _ = build_nest_table(domain_setups)
+        self.max_dom = max_doms
+        self.width = table["dx"].shape[1] if self.size else 1
+        column = np.arange(self.width)
+        has_domain = np.array([isinstance(d, dict) for d in self.domain_setup], dtype=bool)
+        # 缺少domain_setup的配置只报缺失，不再对补齐出来的默认网格做物理检查
+        self.active = (column[None, :] < max_doms[:, None]) & has_domain[:, None]
+        self.parent_index = np.clip(np.nan_to_num(table["parent_id"], nan=1.0) - 1, 0, self.width - 1).astype(np.int64)
+        self.dx_km = table["dx"] / 1000.0
+
+        self.time_step = np.array([_as_float(d.get("time_step", 60)) for d in domain_setups])
+        self.time_step_ratio = np.full((self.size, self.width), np.nan)
+        for index, dom in enumerate(domain_setups):
+            ratios = domain_columns(dom.get("parent_time_step_ratio_arr"), int(max_doms[index]), 1, 3)
+            self.time_step_ratio[index, :len(ratios)] = [_as_float(r) for r in ratios]
+
+        self.physics = {}
+        for key, default in PHYSICS_DEFAULTS.items():
+            values = np.full((self.size, self.width), np.nan)
+            for index, phy in enumerate(physics):
+                columns = domain_columns(phy.get(f"{key}_arr"), int(max_doms[index]), default)
+                values[index, :len(columns)] = [_as_float(v) for v in columns]
+            self.physics[key] = values
+
+        tcs = [t if isinstance(t, dict) else {} for t in self.time_control]
+        self.start = np.array([_epoch(get_single_param_val(t, "start_date_str_arr")) for t in tcs])
+        self.end = np.array([_epoch(get_single_param_val(t, "end_date_str_arr")) for t in tcs])
+
+    def _add(self, target, mask, message):
+        mask = np.asarray(mask)
+        if mask.ndim == 1:
+            for config in np.flatnonzero(mask):
+                target[config].append(message(config))
+        else:
+            for config, domain in zip(*np.nonzero(mask)):
+                target[config].append(message(config, domain))
+
+    def error(self, mask, message):
+        self._add(self.errors, mask, message)
+
+    def warn(self, mask, message):
+        self._add(self.warnings, mask, message)
+
+
+# --- 必填项 ---
+@rule("required_sections")
+def check_required(frame, tables):
+    def missing(values, key=None):
+        if key is None:
+            return np.array([not isinstance(v, dict) for v in values], dtype=bool)
+        return np.array([isinstance(v, dict) and not v.get(key) for v in values], dtype=bool)
+
+    frame.error(missing(frame.time_control), lambda c: "Missing time_control section")
+    frame.error(missing(frame.time_control, "start_date_str_arr"), lambda c: "Missing start date")
+    frame.error(missing(frame.time_control, "end_date_str_arr"), lambda c: "Missing end date")
+    frame.error(missing(frame.domain_setup), lambda c: "Missing domain_setup section")
+    frame.error(missing(frame.domain_setup, "e_we_arr"), lambda c: "Missing grid size (e_we)")
+    frame.error(missing(frame.domain_setup, "e_sn_arr"), lambda c: "Missing grid size (e_sn)")
+
+
+# --- 时间 ---
+@rule("time_window")
+def check_time_window(frame, tables):
+    has_dates = np.array([isinstance(t, dict) and bool(t.get("start_date_str_arr")) and bool(t.get("end_date_str_arr"))
+                          for t in frame.time_control], dtype=bool)
+    bad_format = has_dates & (np.isnan(frame.start) | np.isnan(frame.end))
+    frame.error(bad_format, lambda c: "Start/end dates must use the format YYYY-MM-DD_HH:MM:SS")
+    frame.error(has_dates & ~bad_format & (frame.end <= frame.start),
+                lambda c: "End date must be after start date")
+
+
+# --- 嵌套域几何 ---
+@rule("nest_geometry")
+def check_nests(frame, tables):
+    has_domain = [isinstance(d, dict) for d in frame.domain_setup]
+    results = validate_nest_batch([d for d, ok in zip(frame.domain_setup, has_domain) if ok])
+    it = iter(results)
+    for index, ok in enumerate(has_domain):
+        if ok:
+            frame.errors[index].extend(next(it))
+
+
+# --- 数值稳定性 ---
+@rule("cfl_time_step")
+def check_time_step(frame, tables):
+    frame.error(frame.active[:, 0] & ~(frame.time_step > 0),
+                lambda c: "time_step must be a positive number of seconds")
+
+    # 各域实际步长 = 父域步长 / parent_time_step_ratio
+    step = np.full((frame.size, frame.width), np.nan)
+    step[:, 0] = frame.time_step
+    for d in range(1, frame.width):
+        parent_step = step[np.arange(frame.size), frame.parent_index[:, d]]
+        step[:, d] = parent_step / frame.time_step_ratio[:, d]
+
+    with np.errstate(invalid="ignore"):
+        limit = CFL_SECONDS_PER_KM * frame.dx_km
+        too_long = frame.active & (step > limit) & (frame.time_step > 0)[:, None]
+    frame.error(too_long, lambda c, d: (
+        f"d{d + 1:02d}: time step {step[c, d]:g}s exceeds {CFL_SECONDS_PER_KM:g} x dx "
+        f"({limit[c, d]:g}s for dx = {frame.dx_km[c, d]:g} km); the run is likely to violate CFL"))
+
+
+@rule("radiation_interval")
+def check_radt(frame, tables):
+    radt = frame.physics["radt"]
+    # 经验值：radt(分钟) 约等于 d01 的 dx(公里)，各嵌套域使用同一值
+    recommended = np.maximum(frame.dx_km[:, 0], 1.0)
+    with np.errstate(invalid="ignore"):
+        too_long = frame.active[:, 0] & (radt[:, 0] > recommended)
+        differs = frame.active & (radt != radt[:, :1])
+    frame.warn(too_long, lambda c: (
+        f"radt = {radt[c, 0]:g} min is longer than the recommended 1 min per km of d01 dx "
+        f"({recommended[c]:g} min)"))
+    frame.warn(differs, lambda c, d: (
+        f"d{d + 1:02d}: radt = {radt[c, d]:g} differs from d01 ({radt[c, 0]:g}); use the same radt on all domains"))
+
+
+@rule("cumulus_resolution")
+def check_cumulus(frame, tables):
+    cu = frame.physics["cu_physics"]
+    with np.errstate(invalid="ignore"):
+        permitting = frame.active & (frame.dx_km < CONVECTION_PERMITTING_KM)
+    cumulus_on = ~np.isin(cu, SCALE_AWARE_CU) & ~np.isnan(cu)
+    frame.warn(permitting & cumulus_on, lambda c, d: (
+        f"d{d + 1:02d}: cu_physics = {cu[c, d]:g} at dx = {frame.dx_km[c, d]:g} km; convection is resolved "
+        f"below {CONVECTION_PERMITTING_KM:g} km, use cu_physics = 0 or a scale-aware scheme"))
+
+
+# --- 物理方案 ---
+@rule("physics_options")
+def check_physics_ids(frame, tables):
+    for key, valid_ids in tables["valid_ids"].items():
+        values = frame.physics.get(key)
+        if values is None:
+            continue
+        invalid = frame.active & ~np.isin(values, valid_ids)
+        frame.error(invalid, lambda c, d, key=key, values=values: (
+            f"d{d + 1:02d}: {key} = {values[c, d]:g} is not a supported option" if not np.isnan(values[c, d])
+            else f"d{d + 1:02d}: {key} must be numeric"))
+
+
+@rule("pbl_surface_layer")
+def check_pbl_sfclay(frame, tables):
+    compatible = tables["pbl_sfclay"]
+    pbl = frame.physics["bl_pbl_physics"]
+    sfclay = frame.physics["sf_sfclay_physics"]
+    size = compatible.shape[0]
+    known = frame.active & (pbl >= 0) & (pbl < size) & (sfclay >= 0) & (sfclay < size) \
+        & (pbl == np.floor(pbl)) & (sfclay == np.floor(sfclay))
+    pbl_index = np.where(known, pbl, 0).astype(np.int64)
+    sfclay_index = np.where(known, sfclay, 0).astype(np.int64)
+    constrained = known & tables["pbl_constrained"][pbl_index]
+    frame.error(constrained & ~compatible[pbl_index, sfclay_index], lambda c, d: (
+        f"d{d + 1:02d}: bl_pbl_physics = {pbl[c, d]:g} requires sf_sfclay_physics in "
+        f"{list(PBL_SFCLAY_COMPATIBILITY[int(pbl[c, d])])}, got {sfclay[c, d]:g}"))
+
+
+class ConfigValidator:
+    """Rules and lookup tables compiled once; validate()/validate_batch() reuse them."""
+
+    def __init__(self, physics_options):
+        valid_ids = {key: np.array(sorted(option["id"] for option in options), dtype=float)
+                     for key, options in physics_options.items()}
+        size = max(max(PBL_SFCLAY_COMPATIBILITY), max(max(v) for v in PBL_SFCLAY_COMPATIBILITY.values())) + 1
+        pbl_sfclay = np.zeros((size, size), dtype=bool)
+        pbl_constrained = np.zeros(size, dtype=bool)
+        for pbl, sfclays in PBL_SFCLAY_COMPATIBILITY.items():
+            pbl_constrained[pbl] = True
+            pbl_sfclay[pbl, list(sfclays)] = True
+        self.tables = {"valid_ids": valid_ids, "pbl_sfclay": pbl_sfclay, "pbl_constrained": pbl_constrained}
+        self.rules = tuple(RULES)
+
+    def validate_batch(self, configs):
+        """Returns ``[{"valid", "errors", "warnings"}, ...]`` in input order."""
+        frame = ValidationFrame(list(configs))
+        if frame.size:
+            for _, check in self.rules:
+                check(frame, self.tables)
+        return [{"valid": not errors, "errors": errors, "warnings": warnings}
+                for errors, warnings in zip(frame.errors, frame.warnings)]
+
+    def validate(self, config):
+        return self.validate_batch([config])[0]
+
+
+def compile_validator(physics_options):
+    return ConfigValidator(physics_options)
@@ -0,0 +1,323 @@
+# wind_analysis.py
+# 风资源统计：按时间分块读取 U10/V10 或插值到轮毂高度的 U/V，逐格点累计平均风速、风功率密度与风向频率
+#
+# 峰值内存 ≈ 一个时间块 + 累加器，时间块大小由内存预算决定，与文件总时长无关。
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+GRAVITY = 9.81
+R_DRY = 287.05
+STANDARD_AIR_DENSITY = 1.225
+
+DEFAULT_SECTORS = 16
+MAX_SECTORS = 72
+MAX_HUB_HEIGHT = 500.0
+DEFAULT_CHUNK_BYTES = int(os.environ.get("WOLFER_ANALYSIS_CHUNK_MB", 64)) * (1 << 20)
+# 每个时间步、每个格点同时存在的 float32 临时数组个数(粗估，用于换算时间块大小)
+WORKING_ARRAYS_10M = 8
+WORKING_ARRAYS_PER_LEVEL = 6
+
+
+class AnalysisError(ValueError):
+    """Raised when the requested analysis does not fit the file (missing variables, bad levels)."""
+
+
+def _require(dataset, *names):
+    missing = [name for name in names if name not in dataset.variables]
+    if missing:
+        raise AnalysisError(f"wrfout file is missing {', '.join(missing)}")
+
+
+def time_chunks(steps, bytes_per_step, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Yields ``(start, stop)`` time ranges whose working set fits ``chunk_bytes``."""
+    size = max(1, int(chunk_bytes // max(bytes_per_step, 1)))
+    for start in range(0, steps, size):
+        yield start, min(start + size, steps)
+
+
+def earth_relative(u, v, cosalpha, sinalpha):
+    """Rotates grid-relative winds to earth-relative (WRF COSALPHA/SINALPHA)."""
+    return u * cosalpha - v * sinalpha, v * cosalpha + u * sinalpha
+
+
+def direction_sector(u, v, sectors):
+    """Meteorological (blowing-from) direction binned into ``sectors`` centred on north."""
+    direction = np.degrees(np.arctan2(-u, -v)) % 360.0
+    width = 360.0 / sectors
+    return (np.floor((direction + width / 2) / width).astype(np.int64)) % sectors
+
+
+def _destagger(array, axis):
+    first = np.take(array, np.arange(array.shape[axis] - 1), axis=axis)
+    second = np.take(array, np.arange(1, array.shape[axis]), axis=axis)
+    return 0.5 * (first + second)
+
+
+def interpolate_to_heights(field, heights_agl, targets):
+    """Linear interpolation of ``field`` (time, level, y, x) to each target height above ground.
+
+    Heights below the lowest model level take the lowest level's value and
+    heights above the top of ``field`` take the top value.
+    """
+    levels = field.shape[1]
+    result = np.empty((len(targets),) + field.shape[:1] + field.shape[2:], dtype=np.float32)
+    for index, target in enumerate(targets):
+        below = np.sum(heights_agl < target, axis=1, keepdims=True) - 1
+        k0 = np.clip(below, 0, levels - 2)
+        z0 = np.take_along_axis(heights_agl, k0, axis=1)
+        z1 = np.take_along_axis(heights_agl, k0 + 1, axis=1)
+        f0 = np.take_along_axis(field, k0, axis=1)
+        f1 = np.take_along_axis(field, k0 + 1, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.clip((target - z0) / (z1 - z0), 0.0, 1.0)
+        result[index] = (f0 + weight * (f1 - f0))[:, 0]
+    return result
+
+
+def _levels_needed(dataset, top):
+    """Number of mass levels (from the surface) that reach ``top`` metres AGL everywhere at t=0."""
+    ph = dataset.variables["PH"][0].astype(np.float64)
+    phb = dataset.variables["PHB"][0].astype(np.float64)
+    hgt = dataset.variables["HGT"][0].astype(np.float64)
+    z_mass = _destagger((ph + phb) / GRAVITY, axis=0) - hgt
+    reaching = np.flatnonzero(np.min(z_mass, axis=(1, 2)) > top)
+    # 多留一层，防止后续时刻地形/气压变化导致目标高度超出
+    levels = (reaching[0] + 2) if reaching.size else z_mass.shape[0]
+    return int(min(max(levels, 2), z_mass.shape[0]))
+
+
+class _Accumulator:
+    """Running sums per grid cell for one height."""
+
+    def __init__(self, shape, sectors):
+        self.count = 0
+        self.speed_sum = np.zeros(shape, dtype=np.float64)
+        self.power_sum = np.zeros(shape, dtype=np.float64)
+        self.sector_counts = np.zeros((sectors,) + shape, dtype=np.int64)
+        self.sectors = sectors
+
+    def add(self, u, v, density):
+        speed = np.hypot(u, v)
+        self.count += speed.shape[0]
+        self.speed_sum += speed.sum(axis=0, dtype=np.float64)
+        self.power_sum += (0.5 * density * speed ** 3).sum(axis=0, dtype=np.float64)
+        sector = direction_sector(u, v, self.sectors)
+        # 按扇区计数：把 (time, y, x) 的扇区号摊平成 sector*cells + cell 一次 bincount
+        cells = speed.shape[1] * speed.shape[2]
+        flat = (sector.reshape(sector.shape[0], -1) * cells + np.arange(cells)).ravel()
+        self.sector_counts += np.bincount(flat, minlength=self.sectors * cells).reshape(self.sector_counts.shape)
+
+    def result(self):
+        count = max(self.count, 1)
+        return {
+            "mean_speed": (self.speed_sum / count).astype(np.float32),
+            "power_density": (self.power_sum / count).astype(np.float32),
+            "direction_frequency": (self.sector_counts / count).astype(np.float32),
+        }
+
+
+def parse_heights(heights):
+    """Splits a heights list into ``(want_10m, hub_heights)``; raises AnalysisError on bad values."""
+    hub_heights = []
+    want_10m = False
+    for height in heights:
+        if height == "10m":
+            want_10m = True
+            continue
+        try:
+            value = float(height)
+        except (TypeError, ValueError):
+            raise AnalysisError(f"Invalid height {height!r}; use \"10m\" or metres above ground") from None
+        if not 0 < value <= MAX_HUB_HEIGHT:
+            raise AnalysisError(f"Hub heights must be between 0 and {MAX_HUB_HEIGHT:g} m")
+        hub_heights.append(value)
+    if not want_10m and not hub_heights:
+        raise AnalysisError("No heights requested")
+    return want_10m, hub_heights
+
+
+def height_label(height):
+    return height if height == "10m" else f"{float(height):g}m"
+
+
+class WindReader:
+    """Reads earth-relative winds at the requested heights, one time chunk (and optional row band) at a time."""
+
+    def __init__(self, dataset, heights, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        self.dataset = dataset
+        self.want_10m, self.hub_heights = parse_heights(heights)
+        variables = dataset.variables
+        if self.want_10m:
+            _require(dataset, "U10", "V10")
+        if self.hub_heights:
+            _require(dataset, "U", "V", "PH", "PHB", "HGT")
+        reference = variables["U10"] if self.want_10m else variables["HGT"]
+        self.steps, self.ny, self.nx = reference.shape
+        if self.steps == 0:
+            raise AnalysisError("wrfout file has no time steps")
+        self.rotate = "COSALPHA" in variables and "SINALPHA" in variables
+        self.density_from_surface = "PSFC" in variables and "T2" in variables
+        self.levels = _levels_needed(dataset, max(self.hub_heights)) if self.hub_heights else 0
+        self.chunk_bytes = chunk_bytes
+        self.labels = (["10m"] if self.want_10m else []) + [height_label(h) for h in self.hub_heights]
+
+    def chunks(self, rows=None):
+        """Yields ``(density, {label: (u, v)})`` per time chunk for grid rows ``rows`` (a slice)."""
+        rows = rows or slice(0, self.ny)
+        band = rows.stop - rows.start
+        variables = self.dataset.variables
+        bytes_per_step = 4 * band * self.nx * (
+            WORKING_ARRAYS_10M + WORKING_ARRAYS_PER_LEVEL * self.levels * (1 + len(self.hub_heights)))
+        # V 在 south_north 方向错位，比质量点多读一行
+        v_rows = slice(rows.start, rows.stop + 1)
+        for start, stop in time_chunks(self.steps, bytes_per_step, self.chunk_bytes):
+            window = slice(start, stop)
+            if self.density_from_surface:
+                density = (variables["PSFC"][window, rows].astype(np.float32)
+                           / (R_DRY * variables["T2"][window, rows].astype(np.float32)))
+            else:
+                density = np.float32(STANDARD_AIR_DENSITY)
+            if self.rotate:
+                cosalpha = variables["COSALPHA"][window, rows].astype(np.float32)
+                sinalpha = variables["SINALPHA"][window, rows].astype(np.float32)
+
+            winds = {}
+            if self.want_10m:
+                u = variables["U10"][window, rows].astype(np.float32)
+                v = variables["V10"][window, rows].astype(np.float32)
+                winds["10m"] = earth_relative(u, v, cosalpha, sinalpha) if self.rotate else (u, v)
+
+            if self.hub_heights:
+                # 只读取到达最高轮毂高度所需的底层若干层
+                levels = self.levels
+                u = _destagger(variables["U"][window, :levels, rows].astype(np.float32), axis=3)
+                v = _destagger(variables["V"][window, :levels, v_rows].astype(np.float32), axis=2)
+                geopotential = (variables["PH"][window, :levels + 1, rows].astype(np.float32)
+                                + variables["PHB"][window, :levels + 1, rows].astype(np.float32))
+                heights_agl = _destagger(geopotential / GRAVITY, axis=1) \
+                    - variables["HGT"][window, rows].astype(np.float32)[:, None]
+                u_hub = interpolate_to_heights(u, heights_agl, self.hub_heights)
+                v_hub = interpolate_to_heights(v, heights_agl, self.hub_heights)
+                for index, height in enumerate(self.hub_heights):
+                    uh, vh = u_hub[index], v_hub[index]
+                    winds[height_label(height)] = earth_relative(uh, vh, cosalpha, sinalpha) if self.rotate else (uh, vh)
+            yield density, winds
+
+    def point_chunks(self, rows, cols):
+        """Like ``chunks()`` but only at grid points ``(rows[n], cols[n])``; winds are ``(time, points)``."""
+        variables = self.dataset.variables
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        bytes_per_step = 4 * len(rows) * (
+            WORKING_ARRAYS_10M + WORKING_ARRAYS_PER_LEVEL * self.levels * (3 + len(self.hub_heights)))
+        for start, stop in time_chunks(self.steps, bytes_per_step, self.chunk_bytes):
+            window = slice(start, stop)
+
+            def take(name, prefix=(), row_offset=0, col_offset=0):
+                return variables[name].take_points((window,) + prefix, rows + row_offset,
+                                                   cols + col_offset).astype(np.float32)
+
+            if self.rotate:
+                cosalpha, sinalpha = take("COSALPHA"), take("SINALPHA")
+            winds = {}
+            if self.want_10m:
+                u, v = take("U10"), take("V10")
+                winds["10m"] = earth_relative(u, v, cosalpha, sinalpha) if self.rotate else (u, v)
+
+            if self.hub_heights:
+                mass_levels, w_levels = (slice(0, self.levels),), (slice(0, self.levels + 1),)
+                # 错位网格取相邻两点平均到质量点
+                u = 0.5 * (take("U", mass_levels) + take("U", mass_levels, col_offset=1))
+                v = 0.5 * (take("V", mass_levels) + take("V", mass_levels, row_offset=1))
+                geopotential = take("PH", w_levels) + take("PHB", w_levels)
+                heights_agl = _destagger(geopotential / GRAVITY, axis=1) - take("HGT")[:, None]
+                # interpolate_to_heights 需要 (time, level, y, x)，点列当作 y、补一个 x 轴
+                u_hub = interpolate_to_heights(u[..., None], heights_agl[..., None], self.hub_heights)[..., 0]
+                v_hub = interpolate_to_heights(v[..., None], heights_agl[..., None], self.hub_heights)[..., 0]
+                for index, height in enumerate(self.hub_heights):
+                    uh, vh = u_hub[index], v_hub[index]
+                    winds[height_label(height)] = earth_relative(uh, vh, cosalpha, sinalpha) if self.rotate else (uh, vh)
+            yield window, winds
+
+    def meta(self):
+        return {
+            "time_steps": self.steps, "shape": [self.ny, self.nx],
+            "earth_relative": self.rotate,
+            "air_density": "PSFC/(Rd*T2)" if self.density_from_surface else STANDARD_AIR_DENSITY,
+            "model_levels_read": self.levels,
+        }
+
+
+def analyse_wind_resource(dataset, heights=("10m",), sectors=DEFAULT_SECTORS, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Per-cell mean wind speed, wind power density and direction frequency.
+
+    ``heights`` holds ``"10m"`` (U10/V10) and/or hub heights in metres above
+    ground, interpolated from the staggered U/V using PH/PHB/HGT. Air density
+    comes from PSFC/T2 when present, otherwise the standard 1.225 kg/m3.
+    Returns ``{label: {mean_speed, power_density, direction_frequency}}``
+    with ``(y, x)`` / ``(sectors, y, x)`` float32 arrays, plus ``"meta"``.
+    """
+    sectors = int(sectors)
+    if not 1 <= sectors <= MAX_SECTORS:
+        raise AnalysisError(f"sectors must be between 1 and {MAX_SECTORS}")
+    reader = WindReader(dataset, heights, chunk_bytes)
+    accumulators = {label: _Accumulator((reader.ny, reader.nx), sectors) for label in reader.labels}
+    for density, winds in reader.chunks():
+        for label, (u, v) in winds.items():
+            accumulators[label].add(u, v, density)
+
+    results = {label: acc.result() for label, acc in accumulators.items()}
+    results["meta"] = dict(reader.meta(), sectors=sectors)
+    return results
+
+
+def analysis_id_for(upload_id, params):
+    payload = json.dumps({"upload": upload_id, **params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def save_results(results, path, coordinates=None):
+    """Writes the per-height arrays (and XLAT/XLONG if given) to one compressed NPZ."""
+    arrays = {}
+    for label, fields in results.items():
+        if label == "meta":
+            continue
+        for name, array in fields.items():
+            arrays[f"{label}/{name}"] = array
+    for name, array in (coordinates or {}).items():
+        arrays[name] = array
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as fh:
+        np.savez_compressed(fh, **arrays)
+    os.replace(tmp_path, path)
+
+
+def summarize(results):
+    """Domain-wide means of each field, for the JSON response."""
+    summary = {"meta": results["meta"]}
+    for label, fields in results.items():
+        if label == "meta":
+            continue
+        frequency = fields["direction_frequency"].mean(axis=(1, 2))
+        summary[label] = {
+            "mean_speed": round(float(fields["mean_speed"].mean()), 3),
+            "max_mean_speed": round(float(fields["mean_speed"].max()), 3),
+            "mean_power_density": round(float(fields["power_density"].mean()), 1),
+            "prevailing_sector": int(np.argmax(frequency)),
+            "direction_frequency": [round(float(f), 4) for f in frequency],
+        }
+    return summary
+
+
+def grid_coordinates(dataset):
+    """XLAT/XLONG of the first time step, if the file has them."""
+    coordinates = {}
+    for name in ("XLAT", "XLONG"):
+        var = dataset.variables.get(name)
+        if var is not None:
+            coordinates[name] = (var[0] if len(var.shape) == 3 else var[:]).astype(np.float32)
+    return coordinates
@@ -0,0 +1,104 @@
+# wrf_projection.py
+# WRF 地图投影的向量化正反算：经纬度 <-> 投影平面坐标(米；lat-lon 网格为度)
+#
+# 与 WRF/WPS 一致使用球面地球 R = 6370 km；MAP_PROJ: 1 Lambert, 2 极射赤面, 3 Mercator, 6 经纬度。
+
+import numpy as np
+
+EARTH_RADIUS = 6370000.0
+
+MAP_PROJ_CODES = {"lambert": 1, "polar": 2, "mercator": 3, "lat-lon": 6}
+
+
+class ProjectionError(ValueError):
+    """Raised for unsupported or inconsistent projection parameters."""
+
+
+def _wrap_longitude(delta):
+    return (np.asarray(delta, dtype=np.float64) + 180.0) % 360.0 - 180.0
+
+
+def lambert_cone(truelat1, truelat2):
+    """Cone constant of the Lambert conformal projection (tangent cone when the truelats coincide)."""
+    t1, t2 = np.radians(truelat1), np.radians(truelat2)
+    if abs(truelat1 - truelat2) > 0.1:
+        return float((np.log(np.cos(t1)) - np.log(np.cos(t2)))
+                     / (np.log(np.tan(np.pi / 4 - abs(t1) / 2)) - np.log(np.tan(np.pi / 4 - abs(t2) / 2))))
+    return float(np.sin(abs(t1)))
+
+
+class Projection:
+    """Forward and inverse projection for one set of WRF map parameters."""
+
+    def __init__(self, map_proj, truelat1=30.0, truelat2=60.0, stand_lon=0.0):
+        if isinstance(map_proj, str):
+            if map_proj not in MAP_PROJ_CODES:
+                raise ProjectionError(f"Unsupported map_proj {map_proj!r}")
+            map_proj = MAP_PROJ_CODES[map_proj]
+        self.code = int(map_proj)
+        if self.code not in MAP_PROJ_CODES.values():
+            raise ProjectionError(f"Unsupported MAP_PROJ {map_proj}")
+        self.truelat1 = float(truelat1)
+        self.truelat2 = float(truelat2)
+        self.stand_lon = float(stand_lon)
+        self.hemisphere = 1.0 if self.truelat1 >= 0 else -1.0
+        if self.code == 1:
+            if abs(self.truelat1) >= 90 or abs(self.truelat2) >= 90:
+                raise ProjectionError("Lambert truelats must lie strictly between -90 and 90")
+            self.cone = lambert_cone(self.truelat1, self.truelat2)
+            t1 = np.radians(abs(self.truelat1))
+            self._lambert_scale = EARTH_RADIUS * np.cos(t1) / self.cone / np.tan(np.pi / 4 - t1 / 2) ** self.cone
+
+    @property
+    def metric(self):
+        """True when projected coordinates are metres (False for lat-lon grids, which are in degrees)."""
+        return self.code != 6
+
+    def forward(self, lat, lon):
+        """Vectorised ``(lat, lon)`` in degrees -> ``(x, y)`` on the projection plane."""
+        lat = np.asarray(lat, dtype=np.float64)
+        dlon = _wrap_longitude(np.asarray(lon, dtype=np.float64) - self.stand_lon)
+        h = self.hemisphere
+        if self.code == 1:
+            r = self._lambert_scale * np.tan(np.pi / 4 - h * np.radians(lat) / 2) ** self.cone
+            theta = self.cone * np.radians(dlon)
+            return r * np.sin(theta), -h * r * np.cos(theta)
+        if self.code == 2:
+            t1 = np.radians(abs(self.truelat1))
+            r = EARTH_RADIUS * (1 + np.sin(t1)) * np.tan(np.pi / 4 - h * np.radians(lat) / 2)
+            theta = np.radians(dlon)
+            return r * np.sin(theta), -h * r * np.cos(theta)
+        if self.code == 3:
+            scale = EARTH_RADIUS * np.cos(np.radians(self.truelat1))
+            return scale * np.radians(dlon), scale * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+        return dlon, lat
+
+    def inverse(self, x, y):
+        """Vectorised ``(x, y)`` on the projection plane -> ``(lat, lon)`` in degrees, lon in [-180, 180)."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        h = self.hemisphere
+        if self.code in (1, 2):
+            if self.code == 1:
+                cone, scale = self.cone, self._lambert_scale
+            else:
+                cone, scale = 1.0, EARTH_RADIUS * (1 + np.sin(np.radians(abs(self.truelat1))))
+            r = np.hypot(x, y)
+            lat = h * np.degrees(np.pi / 2 - 2 * np.arctan((r / scale) ** (1 / cone)))
+            dlon = np.degrees(np.arctan2(x, -h * y)) / cone
+        elif self.code == 3:
+            scale = EARTH_RADIUS * np.cos(np.radians(self.truelat1))
+            lat = np.degrees(2 * np.arctan(np.exp(y / scale)) - np.pi / 2)
+            dlon = np.degrees(x / scale)
+        else:
+            lat, dlon = y, x
+        return lat, _wrap_longitude(dlon + self.stand_lon)
+
+    @classmethod
+    def from_wrfout(cls, attrs):
+        """Builds the projection from wrfout global attributes (MAP_PROJ, TRUELAT1/2, STAND_LON)."""
+        try:
+            return cls(int(attrs["MAP_PROJ"]), attrs.get("TRUELAT1", 30.0), attrs.get("TRUELAT2", 60.0),
+                       attrs.get("STAND_LON", attrs.get("CEN_LON", 0.0)))
+        except KeyError:
+            raise ProjectionError("wrfout file has no MAP_PROJ attribute") from None
@@ -58,7 +58,7 @@ const apiService = {
   generateNamelist: (config) => api.post('/api/generate-namelist', config),
   
   // 下载生成的文件
-  downloadFile: (filename) => api.get(`/api/download/${filename}`, { 
+  downloadFile: (artifactId, filename) => api.get(`/api/download/${artifactId}/${filename}`, { 
     responseType: 'blob' 
   }),
   